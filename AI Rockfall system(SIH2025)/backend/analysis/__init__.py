@@ -0,0 +1,146 @@
+"""
+Sensor analysis pipelines for AI Rockfall Prediction System
+===========================================================
+
+Importable versions of the per-sensor analysis notebooks. Every sensor
+module exposes ``run(params) -> results`` so the API orchestrator can
+call the pipelines directly in warm worker processes instead of shelling
+out to ``jupyter nbconvert``.
+
+Sensor modules are imported lazily so a worker only pays for the
+dependencies of the sensor it serves (e.g. laspy for LiDAR).
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import hashlib
+import importlib
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Sensor name -> module within this package
+ANALYSIS_MODULES: Dict[str, str] = {
+    "lidar": "lidar",
+    "geophone": "geophone",
+    "piezometer": "piezometer",
+    "gbinsar": "gbinsar",
+    "extensometer": "extensometer",
+    "weather": "weather",
+}
+
+# Alternative names used by DeviceType values and the frontend
+SENSOR_ALIASES: Dict[str, str] = {
+    "weather_station": "weather",
+    "gb-insar": "gbinsar",
+    "gb_insar": "gbinsar",
+}
+
+
+# Columns each sensor's pipeline reads from an uploaded CSV (LiDAR takes LAS/LAZ)
+INPUT_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "geophone": (
+        "timestamp", "event_time", "event_magnitude_mms", "richter_scale", "event_type", "risk_level",
+        "station_id", "x_coord", "y_coord", "z_coord", "dominant_frequency_hz", "peak_ground_accel_g",
+        "event_duration_s", "energy_joules",
+    ),
+    "piezometer": (
+        "timestamp", "pore_pressure", "groundwater_level", "pressure_change_rate", "point_coordinates",
+        "risk_class",
+    ),
+    "gbinsar": (
+        "timestamp", "displacement", "displacement_rate", "cumulative_displacement", "displacement_acceleration",
+        "slope_angle", "coverage_area", "point_coordinates", "risk_class",
+    ),
+    "extensometer": (
+        "timestamp", "crack_opening", "crack_rate", "cumulative_crack_opening", "crack_acceleration",
+        "temperature_correction", "point_coordinates", "risk_class",
+    ),
+    "weather": (
+        "timestamp", "rainfall_intensity", "cumulative_rainfall", "rainfall_duration", "temperature",
+        "humidity", "wind_speed",
+    ),
+}
+
+# A required column may instead be supplied as these (e.g. native float coordinates)
+COLUMN_ALTERNATIVES: Dict[str, Tuple[str, ...]] = {
+    "point_coordinates": ("coord_x", "coord_y"),
+}
+
+
+def normalize_sensor(analysis_type: str) -> str:
+    """Return the canonical sensor name for an analysis type or raise ValueError."""
+    sensor = analysis_type.lower()
+    sensor = SENSOR_ALIASES.get(sensor, sensor)
+    if sensor not in ANALYSIS_MODULES:
+        raise ValueError(f"Unknown analysis type: {analysis_type}")
+    return sensor
+
+
+def get_runner(analysis_type: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Import the sensor module on demand and return its ``run`` function."""
+    sensor = normalize_sensor(analysis_type)
+    module = importlib.import_module(f"{__name__}.{ANALYSIS_MODULES[sensor]}")
+    return module.run
+
+
+def load_sensor_models(analysis_type: str, output_root: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load the artefacts listed in the sensor module's ``MODEL_FILES``: from the
+    registry's current version when one is set, else the newest joblib files.
+    """
+    import joblib
+
+    from .common import load_models
+    from .model_registry import ModelRegistry
+
+    sensor = normalize_sensor(analysis_type)
+    module = importlib.import_module(f"{__name__}.{ANALYSIS_MODULES[sensor]}")
+    model_files = getattr(module, "MODEL_FILES", ())
+    if hasattr(module, "SERVING_SPEC"):
+        registry = ModelRegistry(output_root)
+        version = registry.current_version(sensor)
+        if version:
+            paths = registry.artifact_paths(sensor, version)
+            if all(name in paths for name in model_files):
+                return {name: joblib.load(paths[name]) for name in model_files}
+    return load_models(sensor, model_files, output_root)
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash of this package's sources; changes whenever any pipeline code changes."""
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith(".py"):
+            with open(os.path.join(package_dir, name), "rb") as f:
+                digest.update(name.encode())
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def model_version(analysis_type: str, output_root: Optional[str] = None) -> str:
+    """Fingerprint of the model artefacts a sensor's pipeline would load."""
+    from .common import model_fingerprint
+
+    return model_fingerprint(normalize_sensor(analysis_type), output_root)
+
+
+def state_version(analysis_type: str, site_id: Any = "default", output_root: Optional[str] = None) -> str:
+    """Fingerprint of the stored site state (results history, LiDAR epochs) a pipeline run reads."""
+    from .common import state_fingerprint
+
+    return state_fingerprint(normalize_sensor(analysis_type), str(site_id), output_root)
+
+
+def run_analysis(analysis_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the pipeline for ``analysis_type`` with ``params`` and return its results."""
+    return get_runner(analysis_type)(params)
+
+
+__all__ = [
+    "ANALYSIS_MODULES", "SENSOR_ALIASES", "INPUT_COLUMNS", "COLUMN_ALTERNATIVES", "normalize_sensor", "get_runner",
+    "load_sensor_models", "code_version", "model_version", "state_version", "run_analysis",
+]
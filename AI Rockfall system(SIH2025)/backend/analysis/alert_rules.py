@@ -0,0 +1,218 @@
+"""
+Declarative vectorized alert rules
+==================================
+
+Shared alert engine for the sensor pipelines. Each sensor declares an
+ordered list of rules (thresholds, rate-of-change, quantile-relative and
+multi-condition rules); a rule set compiles them to boolean NumPy masks
+over the whole frame, computes every quantile once, and emits
+CRITICAL/WARNING/CAUTION alerts with their reasons in one pass. Only the
+reason strings of rows that actually alert are formatted in Python.
+
+Rules sharing a ``group`` are mutually exclusive (first match in rule
+order wins); rules without a group are independent, unless the rule set
+is ``exclusive`` (one alert per row, from its first matching rule).
+``collapse=True`` folds a row's alerts into one record at its highest
+level, listing every reason at that level.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+ALERT_LEVELS = ("CRITICAL", "WARNING", "CAUTION")
+LEVEL_RANK = {level: rank for rank, level in enumerate(reversed(ALERT_LEVELS), start=1)}
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def _compare(values: np.ndarray, op: str, threshold: Any) -> np.ndarray:
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown comparison operator: {op}")
+    with np.errstate(invalid="ignore"):
+        return OPERATORS[op](values, threshold)
+
+
+def _values(df: pd.DataFrame, column: str) -> np.ndarray:
+    return df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class Condition(ABC):
+    """Boolean mask over the rows of a frame."""
+
+    @abstractmethod
+    def mask(self, df: pd.DataFrame, context: Dict[Any, Any]) -> np.ndarray:
+        """Row mask of ``df``; ``context`` caches values shared within one evaluation."""
+
+    def __and__(self, other: "Condition") -> "AllOf":
+        return AllOf(self, other)
+
+    def __or__(self, other: "Condition") -> "AnyOf":
+        return AnyOf(self, other)
+
+
+class Threshold(Condition):
+    """``column <op> value``."""
+
+    def __init__(self, column: str, op: str, value: float):
+        self.column, self.op, self.value = column, op, value
+
+    def mask(self, df, context):
+        return _compare(_values(df, self.column), self.op, self.value)
+
+
+class RateOfChange(Condition):
+    """
+    Change of ``column`` over ``periods`` rows (optionally per ``group_by``
+    series, e.g. per instrument), optionally divided by the elapsed time in
+    ``per_seconds`` units of ``time_column``, compared with ``value``.
+    """
+
+    def __init__(self, column: str, op: str, value: float, periods: int = 1,
+                 group_by: Optional[str] = None, time_column: Optional[str] = None,
+                 per_seconds: float = 1.0):
+        self.column, self.op, self.value = column, op, value
+        self.periods, self.group_by = periods, group_by
+        self.time_column, self.per_seconds = time_column, per_seconds
+
+    def mask(self, df, context):
+        series = df.groupby(self.group_by, sort=False)[self.column] if self.group_by else df[self.column]
+        change = series.diff(self.periods).to_numpy(dtype=np.float64, na_value=np.nan)
+        if self.time_column:
+            times = df.groupby(self.group_by, sort=False)[self.time_column] if self.group_by else df[self.time_column]
+            elapsed = times.diff(self.periods).dt.total_seconds().to_numpy() / self.per_seconds
+            with np.errstate(invalid="ignore", divide="ignore"):
+                change = np.where(elapsed > 0, change / elapsed, np.nan)
+        return _compare(change, self.op, self.value)
+
+
+class QuantileRelative(Condition):
+    """``column <op> scale * quantile(column, q)``, the quantile computed once per evaluation."""
+
+    def __init__(self, column: str, q: float, op: str = ">", scale: float = 1.0):
+        self.column, self.q, self.op, self.scale = column, q, op, scale
+
+    def mask(self, df, context):
+        key = ("quantile", self.column, self.q)
+        if key not in context:
+            context[key] = df[self.column].quantile(self.q)
+        return _compare(_values(df, self.column), self.op, self.scale * context[key])
+
+
+class AllOf(Condition):
+    """Every sub-condition holds."""
+
+    def __init__(self, *conditions: Condition):
+        self.conditions = conditions
+
+    def mask(self, df, context):
+        return np.logical_and.reduce([c.mask(df, context) for c in self.conditions])
+
+
+class AnyOf(Condition):
+    """At least one sub-condition holds."""
+
+    def __init__(self, *conditions: Condition):
+        self.conditions = conditions
+
+    def mask(self, df, context):
+        return np.logical_or.reduce([c.mask(df, context) for c in self.conditions])
+
+
+class AlertRule:
+    """
+    An alert level, the condition that triggers it and a reason template
+    formatted with the alerting row's columns, e.g. ``"Rate {crack_rate:.3f}mm/day"``.
+    """
+
+    def __init__(self, level: str, condition: Condition, reason: str, name: Optional[str] = None,
+                 group: Optional[str] = None):
+        if level not in ALERT_LEVELS:
+            raise ValueError(f"Unknown alert level: {level}")
+        self.level = level
+        self.condition = condition
+        self.reason = reason
+        self.name = name or reason.split(" (")[0]
+        self.group = group
+
+
+class AlertRuleSet:
+    """Ordered alert rules for one sensor, evaluated over whole frames."""
+
+    def __init__(self, rules: Sequence[AlertRule], collapse: bool = False, exclusive: bool = False):
+        self.rules = list(rules)
+        self.collapse = collapse
+        self.exclusive = exclusive
+
+    def masks(self, df: pd.DataFrame) -> List[np.ndarray]:
+        """Per-rule match masks, with group exclusivity applied."""
+        context: Dict[Any, Any] = {}
+        taken: Dict[Any, np.ndarray] = {}
+        masks = []
+        for rule in self.rules:
+            mask = rule.condition.mask(df, context)
+            group = rule.group if rule.group is not None or not self.exclusive else "__row__"
+            if group is not None:
+                claimed = taken.setdefault(group, np.zeros(len(df), dtype=bool))
+                mask = mask & ~claimed
+                claimed |= mask
+            masks.append(mask)
+        return masks
+
+    def evaluate(self, df: pd.DataFrame, carry: Optional[Union[Sequence[str], Dict[str, str]]] = None) -> pd.DataFrame:
+        """
+        Alerts for every matching row: ``level``, ``rule`` and ``reason``
+        (``reasons`` list when collapsed) plus the ``carry`` columns
+        (a list, or a mapping of output name to source column).
+        """
+        carry = dict(carry) if isinstance(carry, dict) else {column: column for column in (carry or [])}
+        columns = ["level", "rule", "reasons" if self.collapse else "reason", *carry]
+        if len(df) == 0 or not self.rules:
+            return pd.DataFrame(columns=columns)
+
+        hits = [(np.flatnonzero(mask), index) for index, mask in enumerate(self.masks(df)) if mask.any()]
+        if not hits:
+            return pd.DataFrame(columns=columns)
+
+        rows = np.concatenate([positions for positions, _ in hits])
+        rule_ids = np.concatenate([np.full(len(positions), index) for positions, index in hits])
+        order = np.lexsort((rule_ids, rows))
+        rows, rule_ids = rows[order], rule_ids[order]
+
+        levels = np.array([self.rules[i].level for i in rule_ids], dtype=object)
+        if self.collapse:
+            # Keep only each row's highest-level matches
+            ranks = np.array([LEVEL_RANK[level] for level in levels])
+            best = pd.Series(ranks).groupby(rows).transform("max").to_numpy()
+            keep = ranks == best
+            rows, rule_ids, levels = rows[keep], rule_ids[keep], levels[keep]
+
+        # Only alerting rows are formatted
+        records = df.iloc[rows].to_dict("records")
+        reasons = [self.rules[i].reason.format(**record) for i, record in zip(rule_ids, records)]
+        alerts = pd.DataFrame({
+            "_row": rows,
+            "level": levels,
+            "rule": [self.rules[i].name for i in rule_ids],
+            "reason": reasons,
+        })
+        for name, column in carry.items():
+            alerts[name] = df[column].to_numpy()[rows]
+
+        if self.collapse:
+            alerts = alerts.groupby("_row", sort=True).agg(
+                {"level": "first", "rule": list, "reason": list, **{name: "first" for name in carry}}
+            ).rename(columns={"reason": "reasons"})
+        return alerts.reset_index(drop=True)[columns]
@@ -0,0 +1,471 @@
+"""
+Model benchmark harness for the sensor pipelines
+================================================
+
+Reproducible comparison of candidate models on each sensor's own feature
+set, so model choices are made against a latency budget instead of being
+hard-coded from a single ``train_test_split``.
+
+For every task of a sensor (e.g. geophone risk class, magnitude and
+epicentre zones) each candidate family is searched separately:
+
+- supervised tasks use time-ordered cross-validation (``TimeSeriesSplit``)
+  with a successive-halving grid search (``HalvingGridSearchCV``, plain
+  ``GridSearchCV`` on small datasets), fits running on ``n_jobs`` cores;
+- clustering tasks (DBSCAN / K-Means, as used by the geophone and LiDAR
+  pipelines) score every grid point by silhouette in parallel, noise
+  points counting as 0 so labelling most points noise does not pay off.
+
+The best ``top_k`` candidates of each family are then refitted on the
+older 80% of the data and profiled: fit time, peak fit memory
+(tracemalloc, on a separate fit so it does not slow the timed one),
+pickled model size, hold-out score and single-row / batch predict
+latency. The report lists every candidate, the Pareto
+front (score vs. latency vs. size) and the best candidate within the
+latency budget, and is written as JSON + CSV next to the sensor's other
+analysis artefacts.
+
+Usage:
+    python -m analysis.benchmark geophone --n-jobs -1 --latency-budget-ms 5
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.cluster import DBSCAN, KMeans
+from sklearn.ensemble import (ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingClassifier,
+                              GradientBoostingRegressor, HistGradientBoostingClassifier,
+                              HistGradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor)
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.metrics import get_scorer, silhouette_score
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, ParameterGrid, TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from . import extensometer, gbinsar, geophone, lidar, piezometer, weather
+from .common import get_next_filename, resolve_input_file, save_json, sensor_dirs
+from .training import TRAINERS
+
+logger = logging.getLogger(__name__)
+
+RANDOM_STATE = 42
+CV_SPLITS = 5
+HOLDOUT_FRACTION = 0.2
+HALVING_MIN_ROWS = 500  # below this every candidate sees all rows anyway
+TOP_K = 3
+LATENCY_REPEATS = 200
+SILHOUETTE_SAMPLE = 5000
+LIDAR_MAX_POINTS = 200_000
+
+SCORING = {"classification": "f1_weighted", "regression": "r2"}
+
+# Candidate families per task kind: name -> (estimator factory, parameter grid).
+# Estimators run single-threaded; the search parallelises across fits.
+CANDIDATES: Dict[str, Dict[str, Tuple[Callable[[], Any], Dict[str, List[Any]]]]] = {
+    "classification": {
+        "random_forest": (
+            lambda: RandomForestClassifier(random_state=RANDOM_STATE),
+            {"n_estimators": [50, 100, 200], "max_depth": [None, 10, 20], "min_samples_leaf": [1, 5]},
+        ),
+        "extra_trees": (
+            lambda: ExtraTreesClassifier(random_state=RANDOM_STATE),
+            {"n_estimators": [50, 100, 200], "max_depth": [None, 10, 20], "min_samples_leaf": [1, 5]},
+        ),
+        "gradient_boosting": (
+            lambda: GradientBoostingClassifier(random_state=RANDOM_STATE),
+            {"n_estimators": [50, 100, 200], "max_depth": [3, 5], "learning_rate": [0.05, 0.1]},
+        ),
+        "hist_gradient_boosting": (
+            lambda: HistGradientBoostingClassifier(random_state=RANDOM_STATE),
+            {"max_iter": [100, 200], "max_depth": [None, 6], "learning_rate": [0.05, 0.1]},
+        ),
+        "logistic_regression": (
+            lambda: Pipeline([("scaler", StandardScaler()), ("model", LogisticRegression(max_iter=1000))]),
+            {"model__C": [0.1, 1.0, 10.0]},
+        ),
+    },
+    "regression": {
+        "random_forest": (
+            lambda: RandomForestRegressor(random_state=RANDOM_STATE),
+            {"n_estimators": [50, 100, 200], "max_depth": [None, 10, 20], "min_samples_leaf": [1, 5]},
+        ),
+        "extra_trees": (
+            lambda: ExtraTreesRegressor(random_state=RANDOM_STATE),
+            {"n_estimators": [50, 100, 200], "max_depth": [None, 10, 20], "min_samples_leaf": [1, 5]},
+        ),
+        "gradient_boosting": (
+            lambda: GradientBoostingRegressor(random_state=RANDOM_STATE),
+            {"n_estimators": [50, 100, 200], "max_depth": [3, 5, 8], "learning_rate": [0.05, 0.1]},
+        ),
+        "hist_gradient_boosting": (
+            lambda: HistGradientBoostingRegressor(random_state=RANDOM_STATE),
+            {"max_iter": [100, 200], "max_depth": [None, 6], "learning_rate": [0.05, 0.1]},
+        ),
+        "ridge": (
+            lambda: Pipeline([("scaler", StandardScaler()), ("model", Ridge())]),
+            {"model__alpha": [0.1, 1.0, 10.0]},
+        ),
+    },
+    "clustering": {
+        "dbscan": (
+            lambda: DBSCAN(),
+            {"eps": [0.05, 0.1, 0.2, 0.3, 0.5], "min_samples": [5, 20, 50]},
+        ),
+        "kmeans": (
+            lambda: KMeans(n_init=10, random_state=RANDOM_STATE),
+            {"n_clusters": [3, 4, 5, 6, 8]},
+        ),
+    },
+}
+
+
+def _extensometer_rate(frame: pd.DataFrame) -> pd.Series:
+    rate = frame["crack_rate"].replace([np.inf, -np.inf], np.nan)
+    return rate.shift(-1).fillna(rate.mean())
+
+
+# Per sensor: (task, kind, features, target(frame) -> Series or None for clustering)
+TASKS: Dict[str, List[Tuple[str, str, List[str], Optional[Callable[[pd.DataFrame], pd.Series]]]]] = {
+    "geophone": [
+        ("risk_level", "classification", geophone.ML_FEATURES, lambda f: f["risk_level"]),
+        ("richter_scale", "regression", geophone.ML_FEATURES, lambda f: f["richter_scale"]),
+        ("activity_zones", "clustering", ["x_coord", "y_coord", "z_coord"], None),
+    ],
+    "piezometer": [
+        ("landslide_likely", "classification", piezometer.FEATURE_COLS, lambda f: f["landslide_likely"]),
+        ("days_until_event", "regression", piezometer.FEATURE_COLS, lambda f: f["days_until_event"]),
+    ],
+    "gbinsar": [
+        ("rockfall_likely", "classification", gbinsar.FEATURE_COLS, lambda f: f["rockfall_likely"]),
+        ("days_until_event", "regression", gbinsar.FEATURE_COLS, lambda f: f["days_until_event"]),
+    ],
+    "extensometer": [
+        ("risk_score", "classification", extensometer.ML_FEATURES, lambda f: f["risk_score"]),
+        ("next_day_crack_rate", "regression", extensometer.ML_FEATURES, _extensometer_rate),
+    ],
+    "weather": [
+        ("temperature", "regression", weather.TEMPERATURE_FEATURES, lambda f: f["temperature"]),
+        ("rain_event", "classification", weather.RAIN_FEATURES,
+         lambda f: (f["rainfall_intensity"] > 0).astype(int)),
+    ],
+    "lidar": [
+        ("loose_rock_clusters", "clustering", ["x", "y", "z"], None),
+    ],
+}
+
+
+def load_frame(sensor: str, params: Dict[str, Any]) -> Tuple[pd.DataFrame, str]:
+    """The sensor's engineered feature frame, oldest row first, and the data file it came from."""
+    if sensor == "lidar":
+        data_file = resolve_input_file(params, lidar.DEFAULT_DATA_FILE)
+        points = lidar.LiDARDataLoader(data_file).load_point_cloud(
+            max_points=params.get("max_points", LIDAR_MAX_POINTS)
+        )
+        return pd.DataFrame({name: points[name] for name in ("x", "y", "z")}), data_file
+
+    default_file, build_frame, _ = TRAINERS[sensor]
+    data_file = resolve_input_file(params, default_file)
+    frame, _ = build_frame(data_file, {})
+    if "timestamp" in frame:
+        frame = frame.sort_values("timestamp", kind="stable")
+    return frame.reset_index(drop=True), data_file
+
+
+def _task_data(frame: pd.DataFrame, features: List[str],
+               target: Optional[Callable[[pd.DataFrame], pd.Series]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    data = frame[features].replace([np.inf, -np.inf], np.nan)
+    if target is None:
+        data = data.dropna()
+        return StandardScaler().fit_transform(data.to_numpy(dtype=np.float64)), None
+    data = data.assign(_target=target(frame)).dropna()
+    return data[features].to_numpy(dtype=np.float64), data["_target"].to_numpy()
+
+
+def search_family(kind: str, build: Callable[[], Any], grid: Dict[str, List[Any]], X: np.ndarray,
+                  y: np.ndarray, n_jobs: int, splits: int = CV_SPLITS) -> List[Dict[str, Any]]:
+    """Time-ordered CV search over one candidate family; one record per evaluated candidate."""
+    cv = TimeSeriesSplit(n_splits=max(2, min(splits, len(X) // 10)))
+    options = dict(scoring=SCORING[kind], cv=cv, n_jobs=n_jobs, refit=False, error_score=np.nan)
+    if len(X) >= HALVING_MIN_ROWS:
+        search = HalvingGridSearchCV(build(), grid, factor=3, random_state=RANDOM_STATE, **options)
+    else:
+        search = GridSearchCV(build(), grid, **options)
+    search.fit(X, y)
+
+    results = search.cv_results_
+    last_iter = max(results["iter"]) if "iter" in results else None
+    records = []
+    for i, candidate_params in enumerate(results["params"]):
+        records.append({
+            "params": candidate_params,
+            "cv_score": float(results["mean_test_score"][i]),
+            "cv_score_std": float(results["std_test_score"][i]),
+            "cv_fit_seconds": float(results["mean_fit_time"][i]),
+            "cv_score_seconds": float(results["mean_score_time"][i]),
+            "n_resources": int(results["n_resources"][i]) if "n_resources" in results else len(X),
+            # Candidates dropped by successive halving were scored on fewer rows
+            "final_round": last_iter is None or results["iter"][i] == last_iter,
+        })
+    return records
+
+
+def _cluster_candidate(build: Callable[[], Any], candidate_params: Dict[str, Any], X: np.ndarray) -> Dict[str, Any]:
+    model = clone(build()).set_params(**candidate_params)
+    started = time.perf_counter()
+    labels = model.fit_predict(X)
+    fit_seconds = time.perf_counter() - started
+
+    clustered = labels != -1
+    n_clusters = len(set(labels[clustered].tolist()))
+    silhouette = np.nan
+    if 2 <= n_clusters < clustered.sum():
+        sample = min(SILHOUETTE_SAMPLE, int(clustered.sum()))
+        silhouette = float(silhouette_score(X[clustered], labels[clustered], sample_size=sample,
+                                            random_state=RANDOM_STATE))
+    return {
+        "params": candidate_params,
+        # Mean silhouette over all points with noise points at 0
+        "cv_score": silhouette * float(clustered.mean()),
+        "silhouette": silhouette,
+        "cv_score_std": 0.0,
+        "cv_fit_seconds": fit_seconds,
+        "cv_score_seconds": 0.0,
+        "n_resources": len(X),
+        "final_round": True,
+        "n_clusters": n_clusters,
+        "noise_fraction": float(1 - clustered.mean()),
+    }
+
+
+def search_clustering(build: Callable[[], Any], grid: Dict[str, List[Any]], X: np.ndarray,
+                      n_jobs: int) -> List[Dict[str, Any]]:
+    """Noise-weighted silhouette of every grid point, evaluated in parallel."""
+    return Parallel(n_jobs=n_jobs)(
+        delayed(_cluster_candidate)(build, candidate_params, X) for candidate_params in ParameterGrid(grid)
+    )
+
+
+def _timed_fit(kind: str, build: Callable[[], Any], candidate_params: Dict[str, Any], X: np.ndarray,
+               y: Optional[np.ndarray]) -> Tuple[Any, float]:
+    model = clone(build()).set_params(**candidate_params)
+    started = time.perf_counter()
+    if kind == "clustering":
+        model.fit_predict(X)
+    else:
+        model.fit(X, y)
+    return model, time.perf_counter() - started
+
+
+def profile_candidate(kind: str, build: Callable[[], Any], candidate_params: Dict[str, Any], X: np.ndarray,
+                      y: Optional[np.ndarray], repeats: int = LATENCY_REPEATS) -> Dict[str, Any]:
+    """Refit on the older rows and measure fit time/memory, size, hold-out score and predict latency."""
+    split = int(len(X) * (1 - HOLDOUT_FRACTION))
+    X_train, X_test = (X, X) if kind == "clustering" else (X[:split], X[split:])
+    y_train = None if kind == "clustering" else y[:split]
+
+    # tracemalloc hooks every allocation, so the timed fit runs untraced and memory comes from a second fit
+    model, fit_seconds = _timed_fit(kind, build, candidate_params, X_train, y_train)
+    tracemalloc.start()
+    try:
+        _timed_fit(kind, build, candidate_params, X_train, y_train)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    profile = {
+        "fit_seconds": fit_seconds,
+        "fit_peak_mb": peak / 1e6,
+        "model_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+    }
+    if kind == "clustering":
+        # Transductive: latency is a full fit_predict per batch
+        profile.update(holdout_score=None, latency_p50_ms=fit_seconds * 1000, latency_p95_ms=fit_seconds * 1000,
+                       batch_us_per_row=fit_seconds * 1e6 / len(X))
+        return profile
+
+    scorer = get_scorer(SCORING[kind])
+    try:
+        profile["holdout_score"] = float(scorer(model, X_test, y[split:]))
+    except ValueError:
+        profile["holdout_score"] = None
+
+    rows = np.random.default_rng(RANDOM_STATE).integers(0, len(X_test), size=repeats)
+    timings = np.empty(repeats)
+    for i, row in enumerate(rows):
+        started = time.perf_counter()
+        model.predict(X_test[row:row + 1])
+        timings[i] = time.perf_counter() - started
+    started = time.perf_counter()
+    model.predict(X_test)
+    profile.update(
+        latency_p50_ms=float(np.percentile(timings, 50) * 1000),
+        latency_p95_ms=float(np.percentile(timings, 95) * 1000),
+        batch_us_per_row=(time.perf_counter() - started) * 1e6 / len(X_test),
+    )
+    return profile
+
+
+def pareto_front(candidates: List[Dict[str, Any]]) -> List[int]:
+    """Indices of profiled candidates not dominated on (cv_score max, latency_p50_ms min, model_bytes min)."""
+    points = [(i, c["cv_score"], c["latency_p50_ms"], c["model_bytes"]) for i, c in enumerate(candidates)
+              if "latency_p50_ms" in c and np.isfinite(c["cv_score"])]
+    front = []
+    for i, score, latency, size in points:
+        dominated = any(
+            s >= score and l <= latency and b <= size and (s > score or l < latency or b < size)
+            for j, s, l, b in points if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def recommend(candidates: List[Dict[str, Any]], latency_budget_ms: Optional[float],
+              memory_budget_mb: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Best-scoring profiled candidate whose p95 latency (and fit memory) is within budget."""
+    eligible = [
+        c for c in candidates
+        if "latency_p95_ms" in c and np.isfinite(c["cv_score"])
+        and (latency_budget_ms is None or c["latency_p95_ms"] <= latency_budget_ms)
+        and (memory_budget_mb is None or c["fit_peak_mb"] <= memory_budget_mb)
+    ]
+    return max(eligible, key=lambda c: c["cv_score"]) if eligible else None
+
+
+def benchmark_task(kind: str, X: np.ndarray, y: Optional[np.ndarray], params: Dict[str, Any]) -> Dict[str, Any]:
+    n_jobs = params.get("n_jobs", -1)
+    families = params.get("families") or list(CANDIDATES[kind])
+    candidates = []
+    for family in families:
+        if family not in CANDIDATES[kind]:
+            continue
+        build, grid = CANDIDATES[kind][family]
+        started = time.time()
+        if kind == "clustering":
+            records = search_clustering(build, grid, X, n_jobs)
+        else:
+            records = search_family(kind, build, grid, X, y, n_jobs, params.get("cv_splits", CV_SPLITS))
+        logger.info(f"Searched {family}: {len(records)} candidates in {time.time() - started:.1f}s")
+
+        finalists = sorted((r for r in records if r["final_round"] and np.isfinite(r["cv_score"])),
+                           key=lambda r: r["cv_score"], reverse=True)[:params.get("top_k", TOP_K)]
+        for record in records:
+            record["family"] = family
+        for record in finalists:
+            record.update(profile_candidate(kind, build, record["params"], X, y,
+                                            params.get("latency_repeats", LATENCY_REPEATS)))
+        candidates.extend(records)
+
+    front = set(pareto_front(candidates))
+    for i, candidate in enumerate(candidates):
+        candidate["pareto"] = i in front
+    return {
+        "kind": kind,
+        "scoring": SCORING.get(kind, "silhouette"),
+        "rows": len(X),
+        "features": X.shape[1],
+        "candidates": candidates,
+        "recommended": recommend(candidates, params.get("latency_budget_ms"), params.get("memory_budget_mb")),
+    }
+
+
+def run_benchmark(sensor: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Benchmark candidate models for every task of ``sensor`` and write the report.
+
+    Recognised params: input_files / input_file, n_jobs, families, tasks, cv_splits, top_k,
+    latency_repeats, latency_budget_ms, memory_budget_mb, max_points (LiDAR), output_root.
+    """
+    params = params or {}
+    if sensor not in TASKS:
+        raise ValueError(f"No benchmark tasks for {sensor}")
+
+    started = time.time()
+    frame, data_file = load_frame(sensor, params)
+    tasks = {}
+    for task, kind, features, target in TASKS[sensor]:
+        if params.get("tasks") and task not in params["tasks"]:
+            continue
+        X, y = _task_data(frame, [name for name in features if name in frame], target)
+        logger.info(f"Benchmarking {sensor}/{task} ({kind}, {len(X)} rows)")
+        tasks[task] = benchmark_task(kind, X, y, params)
+
+    report = {
+        "sensor": sensor,
+        "data_file": data_file,
+        "data_file_bytes": os.path.getsize(data_file) if os.path.exists(data_file) else None,
+        "random_state": RANDOM_STATE,
+        "n_jobs": params.get("n_jobs", -1),
+        "latency_budget_ms": params.get("latency_budget_ms"),
+        "memory_budget_mb": params.get("memory_budget_mb"),
+        "environment": {
+            "python": platform.python_version(),
+            "sklearn": sklearn.__version__,
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "tasks": tasks,
+        "elapsed_seconds": round(time.time() - started, 3),
+    }
+
+    analysis_dir = sensor_dirs(sensor, params.get("output_root"))["analysis"]
+    report_path = save_json(report, analysis_dir, "model_benchmark")
+    csv_path = get_next_filename(analysis_dir, "model_benchmark", ".csv")
+    rows = [
+        {"task": task, **{k: v for k, v in candidate.items() if k != "params"}, "params": candidate["params"]}
+        for task, result in tasks.items() for candidate in result["candidates"]
+    ]
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+
+    return {
+        "sensor": sensor,
+        "report_path": report_path,
+        "csv_path": csv_path,
+        "elapsed_seconds": report["elapsed_seconds"],
+        "recommended": {
+            task: None if result["recommended"] is None
+            else {key: result["recommended"].get(key) for key in
+                  ("family", "params", "cv_score", "latency_p95_ms", "model_bytes")}
+            for task, result in tasks.items()
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark candidate models for a sensor pipeline")
+    parser.add_argument("sensor", choices=sorted(TASKS))
+    parser.add_argument("--input-file")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--families", nargs="*")
+    parser.add_argument("--tasks", nargs="*")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--latency-budget-ms", type=float)
+    parser.add_argument("--memory-budget-mb", type=float)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    params = {key: value for key, value in vars(args).items() if value is not None and key != "sensor"}
+    summary = run_benchmark(args.sensor, params)
+    for task, best in summary["recommended"].items():
+        logger.info(f"{task}: {best}")
+    logger.info(f"Report written to {summary['report_path']}")
+
+
+if __name__ == "__main__":
+    main()
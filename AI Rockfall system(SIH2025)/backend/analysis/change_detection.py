@@ -0,0 +1,249 @@
+"""
+Multi-epoch LiDAR change detection
+==================================
+
+Persistent per-site store of every scan's DEM (and voxel statistics) as
+memory-mapped ``.npy`` tiles on a fixed site grid, with incremental
+epoch-to-epoch differencing: tiles whose content hash is unchanged are
+skipped, so each upload only recomputes the regions that moved. Produces
+cell-level displacement and volume-loss maps plus connected hotspots.
+
+Layout (under ``<root>/<site_id>/``):
+    manifest.json                     site grid + per-epoch tile hashes
+    epoch_<n>/dem_<tx>_<ty>.npy       float32 DEM tile (NaN = no data)
+    epoch_<n>/voxels/<column>.npy     VoxelStore keys and columns
+    changes/epoch_<n>/<map>_<tx>_<ty>.npy   displacement / volume_loss tiles
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import ndimage
+
+from .voxel_store import VoxelStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TILE_CELLS = 256
+
+
+def _tile_name(tile: Tuple[int, int]) -> str:
+    return f"{tile[0]}_{tile[1]}"
+
+
+class EpochStore:
+    """Per-site DEM/voxel epochs stored as memory-mapped tiles on a fixed grid."""
+
+    def __init__(self, root: str, site_id: str = "default", tile_cells: int = DEFAULT_TILE_CELLS):
+        self.site_dir = os.path.join(root, site_id)
+        self.manifest_path = os.path.join(self.site_dir, "manifest.json")
+        os.makedirs(self.site_dir, exist_ok=True)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"site_id": site_id, "origin": None, "resolution": None,
+                             "tile_cells": tile_cells, "epochs": []}
+
+    @property
+    def epochs(self) -> List[Dict[str, Any]]:
+        return self.manifest["epochs"]
+
+    def _save_manifest(self) -> None:
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _epoch_dir(self, epoch: int) -> str:
+        return os.path.join(self.site_dir, f"epoch_{epoch}")
+
+    def _to_site_tiles(self, dem: np.ndarray, dem_info: Dict[str, Any]) -> Dict[Tuple[int, int], np.ndarray]:
+        """Resample a (n_x, n_y) DEM onto the site grid by cell centre and split it into tiles."""
+        x_min, x_max, y_min, y_max = dem_info["bounds"]
+        n_x, n_y = dem.shape
+        step_x, step_y = (x_max - x_min) / n_x, (y_max - y_min) / n_y
+        cx, cy = np.meshgrid(x_min + (np.arange(n_x) + 0.5) * step_x,
+                             y_min + (np.arange(n_y) + 0.5) * step_y, indexing="ij")
+        valid = ~np.isnan(dem)
+
+        origin_x, origin_y = self.manifest["origin"]
+        resolution = self.manifest["resolution"]
+        cells = self.manifest["tile_cells"]
+        ix = np.floor((cx[valid] - origin_x) / resolution).astype(np.int64)
+        iy = np.floor((cy[valid] - origin_y) / resolution).astype(np.int64)
+        values = dem[valid].astype(np.float64)
+
+        tx, ty = ix // cells, iy // cells
+        tiles = {}
+        for tile in set(zip(tx.tolist(), ty.tolist())):
+            in_tile = (tx == tile[0]) & (ty == tile[1])
+            local = (ix[in_tile] - tile[0] * cells) * cells + (iy[in_tile] - tile[1] * cells)
+            counts = np.bincount(local, minlength=cells * cells)
+            sums = np.bincount(local, weights=values[in_tile], minlength=cells * cells)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                tile_dem = np.where(counts > 0, sums / counts, np.nan)
+            tiles[tile] = tile_dem.reshape(cells, cells).astype(np.float32)
+        return tiles
+
+    def add_epoch(self, dem: np.ndarray, dem_info: Dict[str, Any], voxel_store: Optional[VoxelStore] = None,
+                  timestamp: Optional[Any] = None, source: Optional[str] = None,
+                  source_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Store a scan's DEM tiles (and voxel columns) as the next epoch. A scan
+        whose ``source_hash`` matches the latest epoch's is not stored again;
+        that epoch's record is returned instead.
+        """
+        if source_hash and self.epochs and self.epochs[-1].get("source_hash") == source_hash:
+            logger.info(f"Scan {source} is already epoch {self.epochs[-1]['epoch']} "
+                        f"of site {self.manifest['site_id']}; not stored again")
+            return self.epochs[-1]
+
+        if self.manifest["origin"] is None:
+            x_min, _, y_min, _ = dem_info["bounds"]
+            self.manifest["origin"] = [float(x_min), float(y_min)]
+            self.manifest["resolution"] = float(dem_info["resolution"])
+
+        epoch = len(self.epochs)
+        epoch_dir = self._epoch_dir(epoch)
+        os.makedirs(epoch_dir, exist_ok=True)
+
+        tile_hashes = {}
+        for tile, values in self._to_site_tiles(dem, dem_info).items():
+            np.save(os.path.join(epoch_dir, f"dem_{_tile_name(tile)}.npy"), values)
+            tile_hashes[_tile_name(tile)] = hashlib.sha1(values.tobytes()).hexdigest()
+
+        if voxel_store is not None:
+            voxel_dir = os.path.join(epoch_dir, "voxels")
+            os.makedirs(voxel_dir, exist_ok=True)
+            np.save(os.path.join(voxel_dir, "keys.npy"), voxel_store.keys)
+            for name, values in voxel_store.columns.items():
+                np.save(os.path.join(voxel_dir, f"{name}.npy"), values)
+
+        timestamp = timestamp or datetime.now()
+        record = {
+            "epoch": epoch,
+            "timestamp": timestamp.isoformat() if hasattr(timestamp, "isoformat") else str(timestamp),
+            "source": source,
+            "source_hash": source_hash,
+            "tiles": tile_hashes,
+        }
+        self.epochs.append(record)
+        self._save_manifest()
+        logger.info(f"Stored epoch {epoch} for site {self.manifest['site_id']} ({len(tile_hashes)} tiles)")
+        return record
+
+    def load_tile(self, epoch: int, tile: str, kind: str = "dem") -> Optional[np.ndarray]:
+        """Memory-map one tile of an epoch, or None if the epoch has no data there."""
+        path = os.path.join(self._epoch_dir(epoch), f"{kind}_{tile}.npy")
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    def load_voxels(self, epoch: int) -> Dict[str, np.ndarray]:
+        """Memory-map the voxel columns stored with an epoch."""
+        voxel_dir = os.path.join(self._epoch_dir(epoch), "voxels")
+        if not os.path.isdir(voxel_dir):
+            return {}
+        return {
+            name[:-4]: np.load(os.path.join(voxel_dir, name), mmap_mode="r")
+            for name in os.listdir(voxel_dir) if name.endswith(".npy")
+        }
+
+    def diff_latest(self, min_change: float = 0.5, max_hotspots: int = 20) -> Dict[str, Any]:
+        """
+        Difference the newest epoch against the previous one, tile by tile.
+
+        Tiles with identical content hashes are skipped. Returns totals, the
+        per-tile change files and hotspots (connected cells whose elevation
+        dropped by more than ``min_change`` metres).
+        """
+        if len(self.epochs) < 2:
+            return {}
+
+        current, previous = self.epochs[-1], self.epochs[-2]
+        resolution = self.manifest["resolution"]
+        cells = self.manifest["tile_cells"]
+        cell_area = resolution ** 2
+        change_dir = os.path.join(self.site_dir, "changes", f"epoch_{current['epoch']}")
+        os.makedirs(change_dir, exist_ok=True)
+
+        changed, skipped = {}, 0
+        for tile, tile_hash in current["tiles"].items():
+            if previous["tiles"].get(tile) == tile_hash:
+                skipped += 1
+                continue
+            prev_dem = self.load_tile(previous["epoch"], tile)
+            if prev_dem is None:
+                continue
+            displacement = np.asarray(self.load_tile(current["epoch"], tile), dtype=np.float32) - prev_dem
+            volume_loss = np.clip(-displacement, 0, None) * cell_area
+            np.save(os.path.join(change_dir, f"displacement_{tile}.npy"), displacement)
+            np.save(os.path.join(change_dir, f"volume_loss_{tile}.npy"), volume_loss)
+            changed[tile] = displacement
+
+        summary = {
+            "epoch": current["epoch"],
+            "previous_epoch": previous["epoch"],
+            "changed_tiles": len(changed),
+            "unchanged_tiles": skipped,
+            "change_dir": change_dir,
+            "compared_cells": 0,
+            "mean_displacement": 0.0,
+            "max_subsidence": 0.0,
+            "volume_loss_m3": 0.0,
+            "volume_gain_m3": 0.0,
+            "hotspots": [],
+        }
+        if not changed:
+            return summary
+
+        # Mosaic only the changed tiles so hotspots spanning tile edges stay connected
+        tile_ids = np.array([[int(v) for v in tile.split("_")] for tile in changed])
+        t_min = tile_ids.min(axis=0)
+        span = tile_ids.max(axis=0) - t_min + 1
+        mosaic = np.full((span[0] * cells, span[1] * cells), np.nan, dtype=np.float32)
+        for (tx, ty), displacement in zip(tile_ids, changed.values()):
+            ox, oy = (tx - t_min[0]) * cells, (ty - t_min[1]) * cells
+            mosaic[ox:ox + cells, oy:oy + cells] = displacement
+
+        valid = ~np.isnan(mosaic)
+        values = mosaic[valid]
+        summary.update({
+            "compared_cells": int(valid.sum()),
+            "mean_displacement": float(values.mean()) if values.size else 0.0,
+            "max_subsidence": float(max(-values.min(), 0.0)) if values.size else 0.0,
+            "volume_loss_m3": float(np.clip(-values, 0, None).sum() * cell_area),
+            "volume_gain_m3": float(np.clip(values, 0, None).sum() * cell_area),
+        })
+
+        labels, n_labels = ndimage.label(np.nan_to_num(mosaic, nan=0.0) < -min_change)
+        if n_labels:
+            index = np.arange(1, n_labels + 1)
+            drop = np.clip(-np.nan_to_num(mosaic, nan=0.0), 0, None)
+            cell_counts = ndimage.sum(np.ones_like(drop), labels, index)
+            volumes = ndimage.sum(drop, labels, index) * cell_area
+            max_drops = ndimage.maximum(drop, labels, index)
+            centroids = ndimage.center_of_mass(drop, labels, index)
+
+            origin_x, origin_y = self.manifest["origin"]
+            hotspots = []
+            for i in np.argsort(volumes)[::-1][:max_hotspots]:
+                gx, gy = centroids[i]
+                hotspots.append({
+                    "area_m2": float(cell_counts[i] * cell_area),
+                    "volume_loss_m3": float(volumes[i]),
+                    "max_drop_m": float(max_drops[i]),
+                    "center_x": origin_x + (t_min[0] * cells + gx + 0.5) * resolution,
+                    "center_y": origin_y + (t_min[1] * cells + gy + 0.5) * resolution,
+                })
+            summary["hotspots"] = hotspots
+
+        return summary
@@ -0,0 +1,523 @@
+"""
+Tiled, parallel density clustering for point clouds
+===================================================
+
+Exact DBSCAN for clouds too large for one neighbour graph, and an
+HDBSCAN option, both working tile by tile:
+
+- points are bucketed into square xy tiles (in memory, or spilled to disk
+  while a LAS file streams); a tile is processed together with an ``eps``
+  halo from its eight neighbours, so memory follows the largest tile
+  rather than the cloud;
+- neighbour counts and core-core links come from batched ``cKDTree`` ball
+  queries with ``workers=-1``;
+- core points are hashed into cells of diagonal ``eps`` - all core points
+  of a cell are density-connected - and clusters are merged across tile
+  borders by a union-find over those cell keys;
+- HDBSCAN runs on the centroids of occupied voxels and labels every point
+  through its voxel;
+- per-cluster counts, moments, extents and occupied-voxel volume are
+  accumulated tile by tile with ``bincount``.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .voxel_store import reduce_by_key
+
+logger = logging.getLogger(__name__)
+
+CLUSTERING_METHODS = ("dbscan", "hdbscan")
+TILE_POINTS = 1_000_000  # target points per tile
+QUERY_BATCH = 100_000  # points per ball query
+EPS_SAMPLE = 20_000  # points used to estimate eps
+KEY_BITS = 21  # per axis in packed cell/voxel keys
+TILE_KEY_BASE = 1 << 32
+
+
+def pack_cells(points: np.ndarray, size: float, origin: np.ndarray) -> np.ndarray:
+    """
+    int64 key of the cubic cell of side ``size`` holding each (n, 3) point;
+    cells are counted from ``origin`` - the cloud's lower corner - with
+    2^21 cells per axis. Points outside that range raise ValueError rather
+    than being folded onto the border cells (which would merge clusters).
+    """
+    cells = np.floor((points - origin) / size).astype(np.int64)
+    if len(cells) and (cells.min() < 0 or cells.max() >= 1 << KEY_BITS):
+        raise ValueError(f"Points span more than {1 << KEY_BITS} cells of {size:g} per axis from {origin}; "
+                         f"use a larger eps/voxel size")
+    return (cells[:, 0] << (2 * KEY_BITS)) | (cells[:, 1] << KEY_BITS) | cells[:, 2]
+
+
+class DisjointSet:
+    """Array-backed union-find with vectorised union and find."""
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, items: np.ndarray) -> np.ndarray:
+        items = np.asarray(items, dtype=np.int64)
+        roots = self.parent[items]
+        while True:
+            grand = self.parent[roots]
+            if np.array_equal(grand, roots):
+                break
+            roots = grand
+        self.parent[items] = roots  # path compression
+        return roots
+
+    def union(self, a: np.ndarray, b: np.ndarray) -> None:
+        """Merge the sets of every pair ``(a[i], b[i])``."""
+        a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+        while len(a):
+            root_a, root_b = self.find(a), self.find(b)
+            differ = root_a != root_b
+            a, b, root_a, root_b = a[differ], b[differ], root_a[differ], root_b[differ]
+            # Hooking the larger root under the smaller keeps parent[i] <= i, so no cycles;
+            # when writes to one root collide, the remaining pairs go another round
+            self.parent[np.maximum(root_a, root_b)] = np.minimum(root_a, root_b)
+
+
+class PointTiles(ABC):
+    """
+    (x, y, z) points bucketed into square xy tiles of ``tile_size`` from
+    ``origin``; ``low`` is the lower corner of the points added so far.
+    """
+
+    def __init__(self, origin: Tuple[float, float], tile_size: float):
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.tile_size = float(tile_size)
+        self.low = np.full(3, np.inf)
+
+    def _extend(self, points: np.ndarray) -> None:
+        if len(points):
+            self.low = np.minimum(self.low, points.min(axis=0))
+
+    def tile_keys(self, points: np.ndarray) -> np.ndarray:
+        tiles = np.maximum(np.floor((points[:, :2] - self.origin) / self.tile_size).astype(np.int64), 0)
+        return tiles[:, 0] * TILE_KEY_BASE + tiles[:, 1]
+
+    @abstractmethod
+    def keys(self) -> List[int]:
+        """Keys of the non-empty tiles."""
+
+    @abstractmethod
+    def count(self, key: int) -> int:
+        """Points in a tile (0 for unknown keys)."""
+
+    @abstractmethod
+    def load(self, key: int) -> np.ndarray:
+        """A tile's (n, 3) points."""
+
+    def __contains__(self, key: int) -> bool:
+        return self.count(key) > 0
+
+    def with_halo(self, key: int, eps: float) -> Tuple[np.ndarray, List[Tuple[int, np.ndarray]]]:
+        """
+        The tile's points followed by the points of its neighbours within ``eps``
+        of it, and for each neighbour the indices of the points taken from it.
+        """
+        tile_x, tile_y = divmod(key, TILE_KEY_BASE)
+        low = self.origin + np.array([tile_x, tile_y]) * self.tile_size - eps
+        high = low + self.tile_size + 2 * eps
+        parts, sources = [self.load(key)], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                neighbour = (tile_x + dx) * TILE_KEY_BASE + tile_y + dy
+                if (dx, dy) == (0, 0) or tile_x + dx < 0 or tile_y + dy < 0 or neighbour not in self:
+                    continue
+                points = self.load(neighbour)
+                near = np.flatnonzero(np.all((points[:, :2] >= low) & (points[:, :2] <= high), axis=1))
+                parts.append(points[near])
+                sources.append((neighbour, near))
+        return np.concatenate(parts), sources
+
+    def densest_sample(self, size: int = EPS_SAMPLE, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+        """Points of the tile with most points, and a random subset of them."""
+        points = self.load(max(self.keys(), key=self.count))
+        rng = np.random.default_rng(seed)
+        return points, points[rng.choice(len(points), min(size, len(points)), replace=False)]
+
+
+class InMemoryTiles(PointTiles):
+    """Tiles over an in-memory (n, 3) array; tiles hold about ``tile_points`` points."""
+
+    def __init__(self, points: np.ndarray, tile_points: int = TILE_POINTS, min_tile_size: float = 0.0):
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        n = len(self.points)
+        low = self.points[:, :2].min(axis=0) if n else np.zeros(2)
+        extent = np.ptp(self.points[:, :2], axis=0) if n else np.ones(2)
+        area = max(float(np.prod(np.maximum(extent, 1e-9))), 1e-9)
+        tile_size = np.sqrt(area * tile_points / max(n, 1)) if n > tile_points else float(extent.max()) + 1.0
+        super().__init__(tuple(low), max(tile_size, min_tile_size))
+        self._extend(self.points)
+
+        tile_keys = self.tile_keys(self.points)
+        self.order = np.argsort(tile_keys, kind="stable")
+        self._keys, self._starts, self._counts = np.unique(
+            tile_keys[self.order], return_index=True, return_counts=True
+        )
+
+    def keys(self) -> List[int]:
+        return [int(key) for key in self._keys]
+
+    def _position(self, key: int) -> int:
+        position = int(np.searchsorted(self._keys, key))
+        return position if position < len(self._keys) and self._keys[position] == key else -1
+
+    def count(self, key: int) -> int:
+        position = self._position(key)
+        return int(self._counts[position]) if position >= 0 else 0
+
+    def indices(self, key: int) -> np.ndarray:
+        """Row indices (into ``points``) of a tile's points."""
+        position = self._position(key)
+        if position < 0:
+            return np.empty(0, dtype=np.int64)
+        start = self._starts[position]
+        return self.order[start:start + self._counts[position]]
+
+    def load(self, key: int) -> np.ndarray:
+        return self.points[self.indices(key)]
+
+
+class SpilledTiles(PointTiles):
+    """Tiles appended chunk by chunk to one binary file each under ``directory``."""
+
+    def __init__(self, directory: str, origin: Tuple[float, float], tile_size: float):
+        super().__init__(origin, tile_size)
+        self.directory = directory
+        self.counts: Dict[int, int] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: int) -> str:
+        return os.path.join(self.directory, f"tile-{key}.f8")
+
+    def add(self, points: np.ndarray) -> "SpilledTiles":
+        points = np.asarray(points, dtype=np.float64)
+        if len(points) == 0:
+            return self
+        self._extend(points)
+        tile_keys = self.tile_keys(points)
+        order = np.argsort(tile_keys, kind="stable")
+        keys, starts = np.unique(tile_keys[order], return_index=True)
+        for key, part in zip(keys, np.split(points[order], starts[1:])):
+            with open(self._path(int(key)), "ab") as f:
+                part.tofile(f)
+            self.counts[int(key)] = self.counts.get(int(key), 0) + len(part)
+        return self
+
+    def keys(self) -> List[int]:
+        return sorted(self.counts)
+
+    def count(self, key: int) -> int:
+        return self.counts.get(key, 0)
+
+    def load(self, key: int) -> np.ndarray:
+        if key not in self.counts:
+            return np.empty((0, 3))
+        return np.fromfile(self._path(key), dtype=np.float64).reshape(-1, 3)
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def estimate_eps(tiles: PointTiles, min_samples: int, workers: int = -1) -> float:
+    """
+    90th percentile of the distance to the ``min_samples``-th neighbour on the
+    densest tile (the usual k-distance heuristic, at full resolution).
+    """
+    points, sample = tiles.densest_sample()
+    k = min(min_samples, len(points))
+    distances, _ = cKDTree(points).query(sample, k=k, workers=workers)
+    return float(np.percentile(np.reshape(distances, (len(sample), k))[:, -1], 90))
+
+
+class TiledClustering(ABC):
+    """Common driver: ``fit`` on tiles, then ``iter_labels`` tile by tile."""
+
+    n_clusters = 0
+
+    @abstractmethod
+    def fit(self, tiles: PointTiles) -> "TiledClustering":
+        """Cluster every tile of ``tiles``."""
+
+    @abstractmethod
+    def tile_labels(self, tiles: PointTiles, key: int) -> Tuple[np.ndarray, np.ndarray]:
+        """A fitted tile's points and their labels (noise is -1)."""
+
+    def iter_labels(self, tiles: PointTiles) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """(tile key, points, labels) per tile; noise is -1."""
+        for key in tiles.keys():
+            points, labels = self.tile_labels(tiles, key)
+            yield key, points, labels
+
+    def fit_predict(self, points: np.ndarray) -> np.ndarray:
+        """Labels of an in-memory (n, 3) array, in its row order."""
+        tiles = InMemoryTiles(points, min_tile_size=getattr(self, "eps", 0.0))
+        self.fit(tiles)
+        labels = np.full(len(tiles.points), -1, dtype=np.int64)
+        for key, _, tile_labels in self.iter_labels(tiles):
+            labels[tiles.indices(key)] = tile_labels
+        return labels
+
+
+class TiledDBSCAN(TiledClustering):
+    """
+    DBSCAN with scikit-learn's core/noise rules (the point itself counts
+    towards ``min_samples``) in three passes over the tiles: core flags,
+    core-core links merged through the cell union-find, labels. A border
+    point within ``eps`` of several clusters joins its nearest core's.
+    """
+
+    def __init__(self, eps: float, min_samples: int = 5, workers: int = -1, batch_size: int = QUERY_BATCH):
+        self.eps = float(eps)
+        self.min_samples = int(min_samples)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cell_size = self.eps / np.sqrt(3)
+        self.origin = np.zeros(3)
+        self.core: Dict[int, np.ndarray] = {}  # packed core flags per tile
+        self.cell_keys = np.empty(0, dtype=np.int64)
+        self.cell_labels = np.empty(0, dtype=np.int64)
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        return pack_cells(points, self.cell_size, self.origin)
+
+    def _is_core(self, tiles: PointTiles, key: int) -> np.ndarray:
+        return np.unpackbits(self.core[key], count=tiles.count(key)).astype(bool)
+
+    def _batches(self, stop: int) -> Iterator[slice]:
+        for start in range(0, stop, self.batch_size):
+            yield slice(start, min(start + self.batch_size, stop))
+
+    def _core_flags(self, tiles: PointTiles) -> None:
+        for key in tiles.keys():
+            points, _ = tiles.with_halo(key, self.eps)
+            tree = cKDTree(points)
+            counts = np.concatenate([
+                tree.query_ball_point(points[batch], self.eps, return_length=True, workers=self.workers)
+                for batch in self._batches(tiles.count(key))
+            ])
+            self.core[key] = np.packbits(counts >= self.min_samples)
+
+    def _tile_cores(self, tiles: PointTiles, key: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Tile + halo points, their core flags, and the number of points in the tile itself."""
+        points, sources = tiles.with_halo(key, self.eps)
+        flags = [self._is_core(tiles, key)] + [self._is_core(tiles, neighbour)[near] for neighbour, near in sources]
+        return points, np.concatenate(flags), tiles.count(key)
+
+    def _links(self, tiles: PointTiles) -> np.ndarray:
+        """Unique (cell, cell) pairs joining every core point's cell to its tile-local component."""
+        pairs = []
+        for key in tiles.keys():
+            points, core, own = self._tile_cores(tiles, key)
+            own_cores = int(core[:own].sum())
+            if own_cores == 0:
+                continue
+            cores = points[core]  # the tile's own core points come first
+            tree = cKDTree(cores)
+            local = DisjointSet(len(cores))
+            for batch in self._batches(own_cores):
+                neighbours = tree.query_ball_point(cores[batch], self.eps, workers=self.workers)
+                lengths = np.fromiter(map(len, neighbours), dtype=np.int64, count=len(neighbours))
+                sources = np.repeat(np.arange(batch.start, batch.stop), lengths)
+                local.union(sources, np.concatenate(neighbours).astype(np.int64))
+            cells = self._cells(cores)
+            roots = local.find(np.arange(len(cores)))
+            pairs.append(np.unique(np.column_stack([cells, cells[roots]]), axis=0))
+        return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+
+    def fit(self, tiles: PointTiles) -> "TiledDBSCAN":
+        if self.eps > tiles.tile_size:
+            raise ValueError(f"eps {self.eps} exceeds the tile size {tiles.tile_size}")
+        self.origin = tiles.low
+        self._core_flags(tiles)
+        links = self._links(tiles)
+        self.cell_keys, inverse = np.unique(links, return_inverse=True)
+        inverse = inverse.reshape(-1, 2)
+        cells = DisjointSet(len(self.cell_keys))
+        cells.union(inverse[:, 0], inverse[:, 1])
+        _, self.cell_labels = np.unique(cells.find(np.arange(len(self.cell_keys))), return_inverse=True)
+        self.cell_labels = self.cell_labels.ravel()
+        self.n_clusters = int(self.cell_labels.max()) + 1 if len(self.cell_labels) else 0
+        logger.info(f"DBSCAN over {len(tiles.keys())} tiles: {self.n_clusters} clusters")
+        return self
+
+    def _label_of(self, points: np.ndarray) -> np.ndarray:
+        return self.cell_labels[np.searchsorted(self.cell_keys, self._cells(points))]
+
+    def tile_labels(self, tiles: PointTiles, key: int) -> Tuple[np.ndarray, np.ndarray]:
+        points, core, own = self._tile_cores(tiles, key)
+        labels = np.full(own, -1, dtype=np.int64)
+        own_core = core[:own]
+        labels[own_core] = self._label_of(points[:own][own_core])
+
+        # Border points join the cluster of their nearest core point within eps
+        border = np.flatnonzero(~own_core)
+        if len(border) and core.any():
+            cores = points[core]
+            distances, nearest = cKDTree(cores).query(
+                points[border], k=1, distance_upper_bound=self.eps * (1 + 1e-9), workers=self.workers
+            )
+            reached = np.isfinite(distances)
+            labels[border[reached]] = self._label_of(cores[nearest[reached]])
+        return points[:own], labels
+
+
+class VoxelHDBSCAN(TiledClustering):
+    """HDBSCAN over occupied-voxel centroids; every point takes its voxel's label."""
+
+    def __init__(self, voxel_size: float, min_cluster_size: int = 5, workers: int = -1):
+        self.voxel_size = float(voxel_size)
+        self.min_cluster_size = int(min_cluster_size)
+        self.workers = workers
+        self.voxel_keys = np.empty(0, dtype=np.int64)
+        self.voxel_labels = np.empty(0, dtype=np.int64)
+        self.origin = np.zeros(3)
+
+    def _voxels(self, points: np.ndarray) -> np.ndarray:
+        return pack_cells(points, self.voxel_size, self.origin)
+
+    def fit(self, tiles: PointTiles) -> "VoxelHDBSCAN":
+        from sklearn.cluster import HDBSCAN
+
+        self.origin = tiles.low
+        keys, sums = [], []
+        for key in tiles.keys():
+            points = tiles.load(key)
+            voxel_keys, reduced = reduce_by_key(
+                self._voxels(points),
+                {"count": np.ones(len(points)), "x": points[:, 0], "y": points[:, 1], "z": points[:, 2]}, {}, {}
+            )
+            keys.append(voxel_keys)
+            sums.append(reduced)
+        if not keys:
+            self.n_clusters = 0
+            return self
+        # A voxel can straddle two tiles; merge its partial sums
+        self.voxel_keys, totals = reduce_by_key(
+            np.concatenate(keys), {name: np.concatenate([s[name] for s in sums]) for name in sums[0]}, {}, {}
+        )
+        centroids = np.column_stack([totals[axis] / totals["count"] for axis in ("x", "y", "z")])
+
+        # min_cluster_size is in points; HDBSCAN sees voxels holding count.mean() points each
+        min_voxels = max(int(round(self.min_cluster_size / totals["count"].mean())), 2)
+        if len(centroids) <= min_voxels:
+            self.voxel_labels = np.full(len(centroids), -1, dtype=np.int64)
+        else:
+            self.voxel_labels = HDBSCAN(min_cluster_size=min_voxels, n_jobs=self.workers).fit_predict(centroids)
+        self.n_clusters = int(self.voxel_labels.max()) + 1 if len(self.voxel_labels) else 0
+        logger.info(f"HDBSCAN over {len(centroids)} voxels: {self.n_clusters} clusters")
+        return self
+
+    def tile_labels(self, tiles: PointTiles, key: int) -> Tuple[np.ndarray, np.ndarray]:
+        points = tiles.load(key)
+        return points, self.voxel_labels[np.searchsorted(self.voxel_keys, self._voxels(points))]
+
+
+class ClusterStatistics:
+    """Per-cluster counts, moments, extents and occupied-voxel volume, accumulated tile by tile."""
+
+    def __init__(self, n_clusters: int, voxel_size: float, origin: np.ndarray):
+        self.n_clusters = n_clusters
+        self.voxel_size = float(voxel_size)
+        self.origin = np.asarray(origin, dtype=np.float64)  # lower corner of the cloud, for voxel keys
+        self.reference: Optional[np.ndarray] = None  # offsets keep the sums of squares well conditioned
+        self.count = np.zeros(n_clusters)
+        self.sum = np.zeros((n_clusters, 3))
+        self.sq_sum = np.zeros((n_clusters, 3))
+        self.low = np.full((n_clusters, 3), np.inf)
+        self.high = np.full((n_clusters, 3), -np.inf)
+        self.voxels: List[np.ndarray] = []
+        self.n_noise = 0
+
+    def update(self, points: np.ndarray, labels: np.ndarray) -> "ClusterStatistics":
+        clustered = labels >= 0
+        self.n_noise += int(np.count_nonzero(~clustered))
+        points, labels = points[clustered], labels[clustered]
+        if len(labels) == 0:
+            return self
+        if self.reference is None:
+            self.reference = points[0].copy()
+        offsets = points - self.reference
+
+        self.count += np.bincount(labels, minlength=self.n_clusters)
+        for axis in range(3):
+            self.sum[:, axis] += np.bincount(labels, weights=offsets[:, axis], minlength=self.n_clusters)
+            self.sq_sum[:, axis] += np.bincount(labels, weights=offsets[:, axis] ** 2, minlength=self.n_clusters)
+        np.minimum.at(self.low, labels, offsets)
+        np.maximum.at(self.high, labels, offsets)
+        voxels = pack_cells(points, self.voxel_size, self.origin)
+        self.voxels.append(np.unique(np.column_stack([labels, voxels]), axis=0))
+        return self
+
+    def result(self) -> Dict[str, np.ndarray]:
+        reference = self.reference if self.reference is not None else np.zeros(3)
+        count = np.maximum(self.count, 1)[:, None]
+        mean = self.sum / count
+        variance = np.maximum(self.sq_sum / count - mean ** 2, 0.0)
+        occupied = np.zeros(self.n_clusters)
+        if self.voxels:
+            voxels = np.unique(np.concatenate(self.voxels), axis=0)
+            occupied = np.bincount(voxels[:, 0], minlength=self.n_clusters).astype(np.float64)
+        volume = occupied * self.voxel_size ** 3
+        return {
+            "point_count": self.count.astype(np.int64),
+            "centroid": mean + reference,
+            "std_deviation": np.sqrt(variance),
+            "z_variance": variance[:, 2],
+            "extent": np.where(self.count[:, None] > 0, self.high - self.low, 0.0),
+            "volume_estimation": volume,
+            "density": np.divide(self.count, volume, out=np.zeros(self.n_clusters), where=volume > 0),
+        }
+
+
+def loose_rock_clusters(statistics: Dict[str, np.ndarray]) -> np.ndarray:
+    """Clusters in the top quartile of z variance that are not trivially small."""
+    if len(statistics["point_count"]) == 0:
+        return np.empty(0, dtype=np.int64)
+    z_var_threshold = np.percentile(statistics["z_variance"], 75)
+    count_threshold = np.percentile(statistics["point_count"], 25)
+    return np.flatnonzero(
+        (statistics["z_variance"] > z_var_threshold)
+        & (statistics["point_count"] > count_threshold * 0.5)
+        & (statistics["density"] > 0)
+    )
+
+
+def cluster_tiles(tiles: PointTiles, method: str = "dbscan", eps: Optional[float] = None, min_samples: int = 5,
+                  voxel_size: Optional[float] = None, workers: int = -1,
+                  keep_labels: bool = False) -> Dict[str, Any]:
+    """
+    Cluster a tiled cloud and accumulate its per-cluster statistics. ``eps``
+    (metres) is estimated from the densest tile when not given; ``voxel_size``
+    (HDBSCAN voxels and the volume estimate) defaults to ``eps``.
+    """
+    if method not in CLUSTERING_METHODS:
+        raise ValueError(f"Unknown clustering method: {method}")
+    eps = float(eps) if eps else estimate_eps(tiles, min_samples, workers)
+    voxel_size = float(voxel_size or eps)
+    if method == "dbscan":
+        model: TiledClustering = TiledDBSCAN(eps, min_samples, workers)
+    else:
+        model = VoxelHDBSCAN(voxel_size, min_samples, workers)
+    model.fit(tiles)
+
+    statistics = ClusterStatistics(model.n_clusters, voxel_size, tiles.low)
+    labels = {}
+    for key, points, tile_labels in model.iter_labels(tiles):
+        statistics.update(points, tile_labels)
+        if keep_labels:
+            labels[key] = tile_labels
+    return {"method": method, "eps": eps, "voxel_size": voxel_size, "n_clusters": model.n_clusters,
+            "n_noise": statistics.n_noise, "statistics": statistics.result(), "labels": labels}
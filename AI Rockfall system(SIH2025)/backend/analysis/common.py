@@ -0,0 +1,291 @@
+"""
+Shared helpers for the sensor analysis pipelines
+================================================
+
+Directory layout, non-overwrite file naming and JSON conversion helpers
+used by every sensor module. Kept free of FastAPI/database imports so the
+pipelines can be imported inside worker processes.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import copy
+import glob
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, date
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Project root (…/AI Rockfall system(SIH2025)); overridable for deployments
+BASE_DIR = os.environ.get(
+    "ROCKFALL_BASE_DIR",
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+UPLOAD_DIR = os.path.join(BASE_DIR, "Upload")
+RESULTS_DIR = os.environ.get("ROCKFALL_RESULTS_DIR", os.path.join(UPLOAD_DIR, "Results"))
+
+# Upload sub-folder used by each sensor (matches the notebooks)
+SENSOR_FOLDERS: Dict[str, str] = {
+    "lidar": "LiDAR",
+    "geophone": "Geophone",
+    "piezometer": "Piezometer",
+    "gbinsar": "GB-InSAR",
+    "extensometer": "Extensometer",
+    "weather": "Auto_Weather_station",
+}
+
+
+def get_next_filename(directory: str, base_name: str, extension: str) -> str:
+    """
+    Generate next available filename with sequential numbering to avoid overwriting.
+
+    Example:
+        get_next_filename('/path', 'data', '.csv')
+        -> '/path/data.csv' (if doesn't exist)
+        -> '/path/data_1.csv' (if data.csv exists)
+    """
+    base_path = os.path.join(directory, f"{base_name}{extension}")
+    if not os.path.exists(base_path):
+        return base_path
+
+    pattern = os.path.join(directory, f"{base_name}_*{extension}")
+    max_num = 0
+    for file_path in glob.glob(pattern):
+        match = re.search(
+            rf"{re.escape(base_name)}_(\d+){re.escape(extension)}$",
+            os.path.basename(file_path)
+        )
+        if match:
+            max_num = max(max_num, int(match.group(1)))
+
+    return os.path.join(directory, f"{base_name}_{max_num + 1}{extension}")
+
+
+def latest_filename(directory: str, base_name: str, extension: str) -> Optional[str]:
+    """Return the newest file written by get_next_filename for ``base_name``, if any."""
+    latest_num, latest_path = -1, None
+    for file_path in glob.glob(os.path.join(directory, f"{base_name}*{extension}")):
+        match = re.search(
+            rf"^{re.escape(base_name)}(?:_(\d+))?{re.escape(extension)}$",
+            os.path.basename(file_path)
+        )
+        if match:
+            num = int(match.group(1)) if match.group(1) else 0
+            if num > latest_num:
+                latest_num, latest_path = num, file_path
+    return latest_path
+
+
+def model_fingerprint(sensor: str, output_root: Optional[str] = None) -> str:
+    """Identity (name, size, mtime) of the newest joblib artefacts in the sensor's Analysis folder."""
+    analysis_dir = os.path.join(output_root or UPLOAD_DIR, SENSOR_FOLDERS.get(sensor, sensor), "Analysis")
+    latest: Dict[str, Tuple[int, str]] = {}
+    for file_path in glob.glob(os.path.join(analysis_dir, "*.joblib")):
+        match = re.search(r"^(.+?)(?:_(\d+))?\.joblib$", os.path.basename(file_path))
+        num = int(match.group(2)) if match.group(2) else 0
+        if match.group(1) not in latest or num > latest[match.group(1)][0]:
+            latest[match.group(1)] = (num, file_path)
+
+    digest = hashlib.sha256()
+    for name in sorted(latest):
+        stat = os.stat(latest[name][1])
+        digest.update(f"{os.path.basename(latest[name][1])}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    # Registry pointer (see model_registry): activating another version changes the models in use
+    current_path = os.path.join(os.path.dirname(analysis_dir), "Models", "CURRENT")
+    if os.path.exists(current_path):
+        with open(current_path) as f:
+            digest.update(f"current:{f.read().strip()}".encode())
+    return digest.hexdigest()[:16]
+
+
+def state_fingerprint(sensor: str, site_id: str = "default", output_root: Optional[str] = None) -> str:
+    """
+    Identity of the stored site state a run reads besides its inputs: the
+    results-store part files of the site/sensor (stored frames, the LiDAR run
+    log behind its alerts) and the LiDAR change-detection epoch manifest.
+    The store is append-only, so file count, bytes and newest mtime suffice.
+    """
+    pattern = os.path.join(results_root(output_root), "*", f"site={site_id}", f"sensor={sensor}", "date=*",
+                           "*.parquet")
+    count, size, newest = 0, 0, 0
+    for path in glob.glob(pattern):
+        stat = os.stat(path)
+        count, size, newest = count + 1, size + stat.st_size, max(newest, stat.st_mtime_ns)
+
+    digest = hashlib.sha256(f"{count}:{size}:{newest};".encode())
+    manifest_path = os.path.join(output_root or UPLOAD_DIR, SENSOR_FOLDERS.get(sensor, sensor), "3-D", "epochs",
+                                 str(site_id), "manifest.json")
+    if os.path.exists(manifest_path):
+        stat = os.stat(manifest_path)
+        digest.update(f"epochs:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+DIGEST_SUFFIX = ".sha256"
+
+
+def write_digest_sidecar(path: str, sha256: str) -> None:
+    """Record a digest computed elsewhere (e.g. while uploading) next to the file, with its size and mtime."""
+    stat = os.stat(path)
+    with open(path + DIGEST_SUFFIX, "w") as f:
+        f.write(f"{sha256} {stat.st_size} {stat.st_mtime_ns}\n")
+
+
+def file_sha256(path: str, block_size: int = 8 * 1024 * 1024) -> str:
+    """
+    SHA-256 of a file: the digest recorded in its sidecar while the file is
+    unchanged, otherwise read in blocks so large LAS/CSV inputs are never
+    held in memory.
+    """
+    try:
+        with open(path + DIGEST_SUFFIX) as f:
+            sha256, size, mtime_ns = f.read().split()
+        stat = os.stat(path)
+        if int(size) == stat.st_size and int(mtime_ns) == stat.st_mtime_ns:
+            return sha256
+    except (OSError, ValueError):
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def results_root(output_root: Optional[str] = None) -> str:
+    """Root of the partitioned results store (see results_store)."""
+    return os.path.join(output_root, "Results") if output_root else RESULTS_DIR
+
+
+def sensor_dirs(sensor: str, output_root: Optional[str] = None) -> Dict[str, str]:
+    """Return (and create) the images/Analysis/Report/3-D folders for a sensor."""
+    root = os.path.join(output_root or UPLOAD_DIR, SENSOR_FOLDERS.get(sensor, sensor))
+    dirs = {
+        "root": root,
+        "images": os.path.join(root, "images"),
+        "analysis": os.path.join(root, "Analysis"),
+        "report": os.path.join(root, "Report"),
+        "3d": os.path.join(root, "3-D"),
+    }
+    for directory in dirs.values():
+        os.makedirs(directory, exist_ok=True)
+    return dirs
+
+
+def resolve_input_file(params: Dict[str, Any], default_path: str) -> str:
+    """Pick the first uploaded input file, falling back to the bundled dataset."""
+    input_files = params.get("input_files") or []
+    if params.get("input_file"):
+        return params["input_file"]
+    if input_files:
+        return input_files[0]
+    return default_path
+
+
+COORDINATE_COLUMNS = ("coord_x", "coord_y", "coord_z")
+
+
+def parse_point_coordinates(df: pd.DataFrame, dims: int = 3) -> pd.DataFrame:
+    """
+    Ingest monitoring-point positions once as float ``coord_x/coord_y[/coord_z]``
+    columns. Quoted ``"x, y[, z]"`` point_coordinates strings are split in
+    one vectorised pass; files that already carry the float columns are kept
+    as they are and get the string column rebuilt for reporting.
+    """
+    columns = list(COORDINATE_COLUMNS[:dims])
+    if all(column in df for column in columns):
+        if "point_coordinates" not in df:
+            df["point_coordinates"] = df[columns[0]].map("{:.2f}".format)
+            for column in columns[1:]:
+                df["point_coordinates"] += ", " + df[column].map("{:.2f}".format)
+        return df
+    parts = df["point_coordinates"].astype(str).str.split(",", n=dims - 1, expand=True)
+    for i, column in enumerate(columns):
+        df[column] = pd.to_numeric(parts[i], errors="coerce")
+    return df
+
+
+def load_models(sensor: str, model_files, output_root: Optional[str] = None) -> Dict[str, Any]:
+    """Load the newest version of each joblib artefact in the sensor's Analysis folder."""
+    analysis_dir = sensor_dirs(sensor, output_root)["analysis"]
+    models = {}
+    for name in model_files:
+        path = latest_filename(analysis_dir, name, ".joblib")
+        if path:
+            models[name] = joblib.load(path)
+    return models
+
+
+# Trees added per warm-started retrain, and the size at which a full refit starts over
+WARM_START_ESTIMATORS = int(os.environ.get("ROCKFALL_WARM_START_ESTIMATORS", 50))
+MAX_ESTIMATORS = int(os.environ.get("ROCKFALL_MAX_ESTIMATORS", 500))
+
+
+def grow_or_build(previous: Any, build: Callable[[], Any], y: Any = None, n_jobs: Optional[int] = None) -> Any:
+    """
+    Warm-start a copy of ``previous`` with WARM_START_ESTIMATORS more trees
+    (kept trees plus new ones fitted on the next ``fit`` data), or ``build()``
+    a fresh model when there is nothing to grow, the ensemble is full, or the
+    classes in ``y`` differ from the ones ``previous`` was trained on.
+    """
+    if previous is not None and "warm_start" in previous.get_params():
+        total = previous.n_estimators + WARM_START_ESTIMATORS
+        same_classes = (
+            y is None or not hasattr(previous, "classes_")
+            or set(np.unique(y).tolist()) == set(np.asarray(previous.classes_).tolist())
+        )
+        if total <= MAX_ESTIMATORS and same_classes:
+            model = copy.deepcopy(previous)
+            model.set_params(warm_start=True, n_estimators=total)
+            if n_jobs is not None and "n_jobs" in model.get_params():
+                model.set_params(n_jobs=n_jobs)
+            return model
+    return build()
+
+
+def preloaded_models(params: Dict[str, Any], model_files) -> Dict[str, Any]:
+    """Return the worker's preloaded artefacts if all of ``model_files`` are present, else {}."""
+    models = params.get("models") or {}
+    if all(name in models for name in model_files):
+        return {name: models[name] for name in model_files}
+    return {}
+
+
+def to_serializable(value: Any) -> Any:
+    """Recursively convert numpy/pandas values into JSON-compatible types."""
+    if isinstance(value, dict):
+        return {str(k): to_serializable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_serializable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return to_serializable(value.tolist())
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating,)):
+        value = float(value)
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if value is pd.NaT:
+        return None
+    return value
+
+
+def save_json(data: Dict[str, Any], directory: str, base_name: str) -> str:
+    """Write a JSON artefact with non-overwrite naming and return its path."""
+    path = get_next_filename(directory, base_name, ".json")
+    with open(path, "w") as f:
+        json.dump(to_serializable(data), f, indent=2)
+    return path
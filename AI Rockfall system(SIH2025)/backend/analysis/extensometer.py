@@ -0,0 +1,394 @@
+"""
+Extensometer crack monitoring pipeline
+======================================
+
+Importable version of Extensometer_Analysis.ipynb: crack opening data
+loading, feature engineering, multi-level alerts and risk/rate models.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from .alert_rules import AlertRule, AlertRuleSet, Threshold
+from .common import (
+    DATA_DIR, get_next_filename, grow_or_build, parse_point_coordinates, preloaded_models, resolve_input_file,
+    save_json, sensor_dirs, to_serializable
+)
+from .failure_forecast import pipeline_failure_forecast
+from .interpolation import pipeline_risk_map
+from .results_store import store_pipeline_frames
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "extensometer"
+DEFAULT_DATA_FILE = os.path.join(DATA_DIR, "extensometer_data.csv")
+MODEL_FILES = ("extensometer_risk_classifier", "extensometer_rate_predictor")
+
+NUMERIC_COLUMNS = [
+    "crack_opening", "crack_rate", "cumulative_crack_opening",
+    "crack_acceleration", "temperature_correction",
+]
+ML_FEATURES = [
+    "crack_opening", "crack_rate", "crack_acceleration",
+    "cumulative_crack_opening", "temperature_correction",
+    "crack_velocity_ma7", "stability_index", "trend_strength",
+    "temp_effect", "coord_x", "coord_y", "coord_z",
+]
+# Online inference (see model_registry); the models take unscaled features
+SERVING_SPEC = {
+    "features": ML_FEATURES,
+    "scaler": None,
+    "outputs": {
+        "risk_score": ("extensometer_risk_classifier", "predict_proba"),
+        "next_day_rate": ("extensometer_rate_predictor", "predict"),
+    },
+}
+TREND_WINDOW = 7
+# Readings are grouped into instrument series by this column when present
+INSTRUMENT_COLUMN = "point_id"
+
+
+def generate_extensometer_data(n_samples: int = 90, n_instruments: int = 5) -> pd.DataFrame:
+    """
+    Generate synthetic daily crack opening data with progressive acceleration:
+    one continuous series per instrument, each at a fixed position and with
+    its own acceleration.
+    """
+    end_date = datetime.now()
+    timestamps = pd.date_range(start=end_date - timedelta(days=n_samples), end=end_date, freq="D")
+
+    rows = []
+    for point_id in range(n_instruments):
+        x = 50 + point_id * 20 + np.random.normal(0, 1)
+        y = 100 + point_id * 15 + np.random.normal(0, 1)
+        z = 300 + point_id * 10 + np.random.normal(0, 1)
+        growth = np.random.uniform(1.0, 3.0)
+
+        cumulative = 0.0
+        previous_opening, previous_rate = None, None
+        for i in range(n_samples):
+            time_factor = i / n_samples
+            temp_effect = 0.05 * np.sin(2 * np.pi * i / 365)
+            crack_opening = max(0, 0.5 + time_factor ** 1.5 * growth + np.random.normal(0, 0.1) + temp_effect)
+            cumulative += crack_opening
+
+            crack_rate = 0 if previous_opening is None else crack_opening - previous_opening
+            crack_acceleration = 0 if i <= 1 else crack_rate - previous_rate
+            previous_opening, previous_rate = crack_opening, crack_rate
+
+            if cumulative > 20 or crack_rate > 0.5 or crack_acceleration > 0.1:
+                risk = "High"
+            elif cumulative > 10 or crack_rate > 0.2 or crack_acceleration > 0.05:
+                risk = "Medium"
+            else:
+                risk = "Low"
+
+            rows.append({
+                "timestamp": timestamps[i],
+                "crack_opening": crack_opening,
+                "crack_rate": crack_rate,
+                "cumulative_crack_opening": cumulative,
+                "crack_acceleration": crack_acceleration,
+                "temperature_correction": crack_opening - temp_effect,
+                "point_coordinates": f"{x:.2f}, {y:.2f}, {z:.2f}",
+                "coord_x": round(x, 2),
+                "coord_y": round(y, 2),
+                "coord_z": round(z, 2),
+                "point_id": point_id,
+                "risk_class": risk,
+            })
+
+    return pd.DataFrame(rows).sort_values(["timestamp", "point_id"]).reset_index(drop=True)
+
+
+def load_or_create_extensometer_data(data_file: str = DEFAULT_DATA_FILE) -> pd.DataFrame:
+    """Load extensometer readings from CSV or generate (and save) a synthetic set."""
+    if os.path.exists(data_file):
+        df = pd.read_csv(data_file)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return parse_point_coordinates(df)
+
+    df = generate_extensometer_data()
+    df.to_csv(data_file, index=False)
+    return df
+
+
+class InstrumentArray:
+    """
+    Scatter/gather between long-form readings and a dense (instrument x time)
+    array: row ``i`` holds one instrument's readings in time order, padded
+    with NaN after its last reading.
+    """
+
+    def __init__(self, instruments: pd.Series, timestamps: pd.Series):
+        self.codes, self.instruments = pd.factorize(instruments.to_numpy(), use_na_sentinel=False)
+        order = np.argsort(timestamps.to_numpy(), kind="stable")
+        self.positions = np.empty(len(order), dtype=np.int64)
+        self.positions[order] = pd.Series(self.codes[order]).groupby(self.codes[order]).cumcount().to_numpy()
+        self.shape = (len(self.instruments), int(self.positions.max()) + 1 if len(order) else 0)
+
+    def stack(self, values) -> np.ndarray:
+        array = np.full(self.shape, np.nan)
+        array[self.codes, self.positions] = np.asarray(values, dtype=np.float64)
+        return array
+
+    def unstack(self, array: np.ndarray) -> np.ndarray:
+        return array[self.codes, self.positions]
+
+
+def _window_sums(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sums and valid-reading counts of every trailing window along axis 1 (cumulative sums)."""
+    valid = np.isfinite(values)
+    padding = np.zeros((len(values), 1))
+    cumulative = np.concatenate([padding, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    counts = np.concatenate([padding, np.cumsum(valid, axis=1)], axis=1)
+    return cumulative[:, window:] - cumulative[:, :-window], counts[:, window:] - counts[:, :-window]
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean per row, NaN until a full window (as ``Series.rolling(window).mean``)."""
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        sums, counts = _window_sums(values, window)
+        result[:, window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return result
+
+
+def rolling_slope(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Least-squares slope against the reading index over every trailing window
+    of every row, i.e. ``linregress(arange(window), y).slope`` per window.
+    """
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] < window:
+        return result
+    index = np.arange(values.shape[1], dtype=np.float64)
+    sum_y, counts = _window_sums(values, window)
+    sum_iy, _ = _window_sums(values * index, window)
+    # Within a window the regressor is (index - start): sum(x*y) = sum(index*y) - start*sum(y)
+    start = index[:len(index) - window + 1]
+    sum_xy = sum_iy - start * sum_y
+    sum_x = window * (window - 1) / 2
+    sum_xx = (window - 1) * window * (2 * window - 1) / 6
+    slope = (window * sum_xy - sum_x * sum_y) / (window * sum_xx - sum_x ** 2)
+    result[:, window - 1:] = np.where(counts == window, slope, np.nan)
+    return result
+
+
+def _diff(values: np.ndarray) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    result[:, 1:] = values[:, 1:] - values[:, :-1]
+    return result
+
+
+def preprocess_extensometer_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Engineer crack velocity, stability and trend features for every instrument
+    at once: readings are stacked into an (instrument x time) array, keyed by
+    INSTRUMENT_COLUMN (a single series when absent), and the rolling features
+    come from cumulative sums over its rows.
+    """
+    processed_df = df.copy()
+    processed_df = parse_point_coordinates(processed_df)
+    if INSTRUMENT_COLUMN in processed_df:
+        instruments = processed_df[INSTRUMENT_COLUMN]
+    else:
+        instruments = pd.Series(0, index=processed_df.index)
+    array = InstrumentArray(instruments, processed_df["timestamp"])
+
+    # Missing logger rates are derived from the instrument's own opening series (per day)
+    days = array.stack((processed_df["timestamp"] - processed_df["timestamp"].min()).dt.total_seconds() / 86400)
+    rate = _diff(array.stack(processed_df["crack_opening"])) / _diff(days)
+    processed_df["crack_rate"] = processed_df["crack_rate"].fillna(pd.Series(array.unstack(rate), processed_df.index))
+    acceleration = _diff(array.stack(processed_df["crack_rate"])) / _diff(days)
+    processed_df["crack_acceleration"] = processed_df["crack_acceleration"].fillna(
+        pd.Series(array.unstack(acceleration), processed_df.index)
+    )
+    processed_df[NUMERIC_COLUMNS] = processed_df[NUMERIC_COLUMNS].fillna(processed_df[NUMERIC_COLUMNS].mean())
+
+    processed_df["day_of_year"] = processed_df["timestamp"].dt.dayofyear
+    processed_df["month"] = processed_df["timestamp"].dt.month
+    processed_df["week"] = processed_df["timestamp"].dt.isocalendar().week
+
+    crack_rate = array.stack(processed_df["crack_rate"])
+    crack_opening = array.stack(processed_df["crack_opening"])
+    processed_df["crack_velocity_ma7"] = array.unstack(rolling_mean(crack_rate, 7))
+    processed_df["crack_jerk"] = array.unstack(_diff(array.stack(processed_df["crack_acceleration"])))
+    processed_df["cumulative_rate"] = array.unstack(np.cumsum(crack_rate, axis=1))
+    processed_df["opening_cumulative_ratio"] = processed_df["crack_opening"] / (
+        processed_df["cumulative_crack_opening"] + 1e-6
+    )
+    processed_df["temp_effect"] = (processed_df["crack_opening"] - processed_df["temperature_correction"]).abs()
+    processed_df["rate_of_rate"] = array.unstack(_diff(crack_rate))
+    # Exponential smoothing is recursive; pandas runs it column-wise over the transposed array
+    processed_df["crack_opening_ema"] = array.unstack(pd.DataFrame(crack_opening.T).ewm(span=10).mean().to_numpy().T)
+    processed_df["stability_index"] = processed_df["crack_acceleration"].abs() + processed_df["crack_rate"].abs() * 2
+    processed_df["critical_threshold"] = (
+        (processed_df["cumulative_crack_opening"] > 15) |
+        (processed_df["crack_rate"] > 0.4) |
+        (processed_df["crack_acceleration"] > 0.08)
+    ).astype(int)
+    processed_df["trend_strength"] = array.unstack(rolling_slope(crack_opening, TREND_WINDOW))
+
+    processed_df = processed_df.replace([np.inf, -np.inf], np.nan)
+    grouped = processed_df.groupby(array.codes, sort=False)
+    processed_df = processed_df.fillna(grouped.ffill()).fillna(grouped.bfill()).fillna(0)
+
+    processed_df["landslide_risk"] = (processed_df["risk_class"] == "High").astype(int)
+    processed_df["risk_score"] = processed_df["risk_class"].map({"Low": 0, "Medium": 1, "High": 2})
+
+    return processed_df
+
+
+CRACK_ALERT_RULES = AlertRuleSet([
+    AlertRule("CRITICAL", Threshold("cumulative_crack_opening", ">", 20),
+              "Cumulative opening exceeds 20mm ({cumulative_crack_opening:.2f}mm)"),
+    AlertRule("CRITICAL", Threshold("crack_rate", ">", 0.6),
+              "Crack rate exceeds 0.6mm/day ({crack_rate:.3f}mm/day)"),
+    AlertRule("CRITICAL", Threshold("crack_acceleration", ">", 0.1),
+              "High acceleration detected ({crack_acceleration:.4f}mm/day²)"),
+    AlertRule("WARNING", Threshold("cumulative_crack_opening", ">", 15),
+              "Cumulative opening > 15mm ({cumulative_crack_opening:.2f}mm)"),
+    AlertRule("WARNING", Threshold("crack_rate", ">", 0.4), "Elevated crack rate ({crack_rate:.3f}mm/day)"),
+    AlertRule("WARNING", Threshold("stability_index", ">", 1.2), "High instability index ({stability_index:.3f})"),
+    AlertRule("CAUTION", Threshold("crack_opening", ">", 0.5), "Crack opening > 0.5mm ({crack_opening:.3f}mm)"),
+    AlertRule("CAUTION", Threshold("trend_strength", ">", 0.05), "Positive trend detected ({trend_strength:.4f})"),
+], collapse=True)
+
+
+def generate_alerts(df: pd.DataFrame) -> pd.DataFrame:
+    """Generate CRITICAL/WARNING/CAUTION alerts from crack monitoring thresholds."""
+    alerts = CRACK_ALERT_RULES.evaluate(df, carry={
+        "timestamp": "timestamp", "crack_opening": "crack_opening",
+        "cumulative_opening": "cumulative_crack_opening", "crack_rate": "crack_rate",
+    })
+    if len(alerts) == 0:
+        return pd.DataFrame()
+    return alerts[["timestamp", "level", "reasons", "crack_opening", "cumulative_opening", "crack_rate"]]
+
+
+def train_models(processed_df: pd.DataFrame, analysis_dir: str, previous: Optional[Dict[str, Any]] = None,
+                 n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Train the risk classifier and next-day crack rate regressor. With
+    ``previous`` artefacts the ensembles are grown (warm start).
+    """
+    previous = previous or {}
+    ml_df = processed_df[ML_FEATURES + ["risk_score"]].copy()
+    ml_df = ml_df.fillna(ml_df.mean()).replace([np.inf, -np.inf], 0)
+
+    X = ml_df[ML_FEATURES]
+    y_classification = ml_df["risk_score"]
+    y_regression = ml_df["crack_rate"].shift(-1).fillna(ml_df["crack_rate"].mean())
+
+    stratify = y_classification if y_classification.value_counts().min() >= 2 else None
+    X_train, X_test, y_class_train, y_class_test = train_test_split(
+        X, y_classification, test_size=0.2, random_state=42, stratify=stratify
+    )
+    X_train_reg, X_test_reg, y_reg_train, y_reg_test = train_test_split(
+        X, y_regression, test_size=0.2, random_state=42
+    )
+
+    rf_classifier = grow_or_build(
+        previous.get("extensometer_risk_classifier"),
+        lambda: RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42, n_jobs=n_jobs),
+        y_class_train, n_jobs
+    )
+    rf_classifier.fit(X_train, y_class_train)
+    gb_regressor = grow_or_build(
+        previous.get("extensometer_rate_predictor"),
+        lambda: GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42)
+    )
+    gb_regressor.fit(X_train_reg, y_reg_train)
+
+    y_pred_reg = gb_regressor.predict(X_test_reg)
+    classifier_path = get_next_filename(analysis_dir, "extensometer_risk_classifier", ".joblib")
+    regressor_path = get_next_filename(analysis_dir, "extensometer_rate_predictor", ".joblib")
+    joblib.dump(rf_classifier, classifier_path)
+    joblib.dump(gb_regressor, regressor_path)
+
+    return {
+        "classifier_accuracy": float((rf_classifier.predict(X_test) == y_class_test).mean()),
+        "rate_r2": float(r2_score(y_reg_test, y_pred_reg)),
+        "rate_rmse": float(np.sqrt(mean_squared_error(y_reg_test, y_pred_reg))),
+        "rate_mae": float(np.mean(np.abs(y_reg_test - y_pred_reg))),
+        "model_paths": {"classifier": classifier_path, "regressor": regressor_path},
+    }
+
+
+def predict_with_models(processed_df: pd.DataFrame, models: Dict[str, Any]) -> pd.DataFrame:
+    """Predict risk class and next-day crack rate with the preloaded models."""
+    X = processed_df[ML_FEATURES]
+    X = X.fillna(X.mean()).replace([np.inf, -np.inf], 0)
+    return pd.DataFrame({
+        "timestamp": processed_df["timestamp"].values,
+        "predicted_risk_score": models["extensometer_risk_classifier"].predict(X),
+        "predicted_next_day_rate": models["extensometer_rate_predictor"].predict(X),
+    })
+
+
+def run(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full extensometer pipeline and return JSON-serializable results.
+
+    Recognised params: input_files / input_file, train_models (default: only when no preloaded
+    models are available), models, site_id, store_results, output_root, failure_forecast /
+    forecast_window (inverse-velocity time of failure per crack gauge).
+    """
+    data_file = resolve_input_file(params, DEFAULT_DATA_FILE)
+    dirs = sensor_dirs(SENSOR, params.get("output_root"))
+
+    df = load_or_create_extensometer_data(data_file)
+    processed_df = preprocess_extensometer_data(df)
+    alerts_df = generate_alerts(processed_df)
+    models = preloaded_models(params, MODEL_FILES)
+    model_performance = (
+        train_models(processed_df, dirs["analysis"]) if params.get("train_models", not models) else {}
+    )
+    predictions = predict_with_models(processed_df, models) if models else pd.DataFrame()
+    risk = predictions["predicted_risk_score"].values if len(predictions) else processed_df["risk_score"].values
+    risk_map = pipeline_risk_map(
+        processed_df[["timestamp", "coord_x", "coord_y"]].assign(risk=risk), "risk", params, dirs["analysis"]
+    )
+    # Gauges are identified by point_id; without it the readings are forecast as one series
+    failure_forecast = pipeline_failure_forecast(
+        processed_df, "crack_rate", INSTRUMENT_COLUMN, params, dirs["analysis"]
+    )
+
+    stored_rows = store_pipeline_frames(
+        params, SENSOR, {"readings": df, "features": processed_df, "predictions": predictions}
+    )
+
+    results = {
+        "sensor": SENSOR,
+        "input_file": data_file,
+        "summary": {
+            "total_readings": len(df),
+            "date_range": {"start": df["timestamp"].min(), "end": df["timestamp"].max()},
+            "max_cumulative_opening": processed_df["cumulative_crack_opening"].max(),
+            "latest_crack_rate": processed_df["crack_rate"].iloc[-1],
+            "critical_threshold_events": int(processed_df["critical_threshold"].sum()),
+            "risk_distribution": df["risk_class"].value_counts().to_dict(),
+        },
+        "alert_counts": alerts_df["level"].value_counts().to_dict() if len(alerts_df) else {},
+        "alerts": alerts_df.tail(50).to_dict("records") if len(alerts_df) else [],
+        "model_performance": model_performance,
+        "model_predictions": predictions.tail(7).to_dict("records") if len(predictions) else [],
+        "risk_map": risk_map,
+        "failure_forecast": failure_forecast,
+    }
+    results["stored_rows"] = stored_rows
+    results["artifacts"] = {"report": save_json(results, dirs["analysis"], "extensometer_report")}
+    return to_serializable(results)
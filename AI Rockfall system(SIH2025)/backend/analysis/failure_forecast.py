@@ -0,0 +1,228 @@
+"""
+Inverse-velocity time-of-failure forecasting
+============================================
+
+Fukuzono's method: ahead of a slope failure the inverse velocity 1/v of
+a monitoring point decreases roughly linearly in time, and the time where
+its trend reaches zero is the predicted time of failure. Instead of a
+regressor trained on labels derived from the risk class, every point's
+1/v is fitted by least squares over a sliding window of readings:
+
+- all points are fitted at once, from cumulative sums over a
+  (points x time) array of the whole history;
+- the time of failure gets delta-method confidence bounds from the fit's
+  residual variance;
+- acceleration onset is the start of the current run of windows whose
+  1/v slope is significantly negative.
+
+``forecast_failure`` runs on a pipeline's long-form readings;
+``pipeline_failure_forecast`` adds it to the extensometer and GB-InSAR runs.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+from typing import Any, Dict, Hashable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .common import get_next_filename
+
+logger = logging.getLogger(__name__)
+
+FORECAST_WINDOW = 12  # readings per 1/v fit
+MIN_FIT_READINGS = 5  # fewer valid readings in a window give no fit
+MIN_VELOCITY = 1e-6  # velocities at or below this (stable or closing) have no inverse
+CONFIDENCE = 0.95
+MAX_FORECAST_DAYS = 365.0  # forecasts further out are reported as no forecast
+SECONDS_PER_DAY = 86400.0
+FORECAST_COLUMNS = [
+    "point", "inverse_velocity_slope", "accelerating", "acceleration_onset", "days_to_failure",
+    "days_to_failure_lower", "days_to_failure_upper", "time_of_failure", "time_of_failure_lower",
+    "time_of_failure_upper",
+]
+SINGLE_SERIES = "site"  # point label of the site-wide series used when readings carry no point identity
+
+
+def inverse_velocity(velocity: np.ndarray) -> np.ndarray:
+    """1/v where the point is moving (v > MIN_VELOCITY), NaN elsewhere."""
+    velocity = np.asarray(velocity, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(velocity > MIN_VELOCITY, 1.0 / velocity, np.nan)
+
+
+def _critical_values(window: int, confidence: float) -> np.ndarray:
+    """Two-sided Student t critical values indexed by degrees of freedom (0 unused)."""
+    table = np.full(window + 1, np.inf)
+    table[1:] = stats.t.ppf((1 + confidence) / 2, np.arange(1, window + 1))
+    return table
+
+
+def _rolling_window_sums(t: np.ndarray, u: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """
+    Regression sums of 1/v against time for every trailing window along the
+    time axis, from cumulative sums; NaN readings are left out.
+    """
+    valid = np.isfinite(u)
+    t = np.where(valid, t, 0.0)
+    u = np.where(valid, u, 0.0)
+    sums = {}
+    for name, values in (("n", valid.astype(np.float64)), ("t", t), ("u", u), ("tt", t * t), ("tu", t * u),
+                         ("uu", u * u)):
+        cumulative = np.concatenate([np.zeros((len(values), 1)), np.cumsum(values, axis=1)], axis=1)
+        sums[name] = cumulative[:, window:] - cumulative[:, :-window]
+    sums["n"] = np.rint(sums["n"]).astype(int)
+    return sums
+
+
+def _fit(sums: Dict[str, np.ndarray], critical: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Least-squares 1/v trend from window sums, with times in days relative to
+    the latest reading. Returns the slope and its t statistic, and the time of
+    failure (days from the latest reading) with its confidence half-width.
+    """
+    n = sums["n"]
+    fitted = n >= MIN_FIT_READINGS
+    count = np.where(fitted, n, 1).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_mean = sums["t"] / count
+        u_mean = sums["u"] / count
+        s_tt = sums["tt"] - sums["t"] * t_mean
+        s_tu = sums["tu"] - sums["t"] * u_mean
+        s_uu = sums["uu"] - sums["u"] * u_mean
+        slope = s_tu / s_tt
+        residual_variance = np.maximum(s_uu - slope * s_tu, 0.0) / (count - 2)
+        slope_error = np.sqrt(residual_variance / s_tt)
+        t_statistic = slope / slope_error
+
+        # u = u_mean + slope * (t - t_mean) reaches zero at t_mean - u_mean / slope;
+        # u_mean and slope are uncorrelated, so the delta-method variance has two terms
+        failure = t_mean - u_mean / slope
+        failure_error = np.sqrt(
+            residual_variance / (count * slope ** 2) + u_mean ** 2 * residual_variance / (s_tt * slope ** 4)
+        )
+    fitted &= np.isfinite(slope) & (s_tt > 0)
+    half_width = critical[np.clip(n - 2, 0, len(critical) - 1)] * failure_error
+    return {
+        "fitted": fitted,
+        "slope": np.where(fitted, slope, np.nan),
+        "t_statistic": np.where(fitted, t_statistic, np.nan),
+        "accelerating": fitted & (t_statistic < -critical[np.clip(n - 2, 0, len(critical) - 1)]),
+        "failure": np.where(fitted & (slope < 0), failure, np.nan),
+        "half_width": np.where(fitted & (slope < 0), half_width, np.nan),
+    }
+
+
+def _forecast_frame(points: Sequence[Hashable], now: pd.Timestamp, fit: Dict[str, np.ndarray],
+                    onset: np.ndarray) -> pd.DataFrame:
+    """One forecast row per point; ``onset`` holds onset times in days relative to ``now``."""
+    days = np.maximum(fit["failure"], 0.0)
+    forecastable = fit["accelerating"] & (days <= MAX_FORECAST_DAYS)
+    lower = np.maximum(fit["failure"] - fit["half_width"], 0.0)
+    upper = fit["failure"] + fit["half_width"]
+
+    def timestamps(offsets: np.ndarray, keep: np.ndarray) -> pd.DatetimeIndex:
+        offsets = np.where(keep & np.isfinite(offsets), offsets, np.nan)
+        return now + pd.to_timedelta(offsets, unit="D")
+
+    forecast = pd.DataFrame({
+        "point": list(points),
+        "inverse_velocity_slope": fit["slope"],
+        "accelerating": fit["accelerating"],
+        "acceleration_onset": timestamps(onset, fit["accelerating"]),
+        "days_to_failure": np.where(forecastable, days, np.nan),
+        "days_to_failure_lower": np.where(forecastable, lower, np.nan),
+        "days_to_failure_upper": np.where(forecastable, upper, np.nan),
+        "time_of_failure": timestamps(days, forecastable),
+        "time_of_failure_lower": timestamps(lower, forecastable),
+        "time_of_failure_upper": timestamps(upper, forecastable),
+    })
+    return forecast[FORECAST_COLUMNS]
+
+
+def forecast_failure(frame: pd.DataFrame, velocity_column: str, point_column: str = "point_coordinates",
+                     window: int = FORECAST_WINDOW, confidence: float = CONFIDENCE) -> pd.DataFrame:
+    """
+    Time-of-failure forecast for every point of a long-form history
+    (``timestamp``, ``point_column``, ``velocity_column`` in units per day).
+
+    The points x time array of 1/v is fitted over every trailing ``window``
+    of readings at once; the latest window gives the forecast and the run of
+    significantly decreasing windows before it the acceleration onset.
+    """
+    velocities = frame.pivot_table(
+        index=point_column, columns="timestamp", values=velocity_column, aggfunc="last"
+    ).sort_index(axis=1)
+    if velocities.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+    times = pd.DatetimeIndex(velocities.columns)
+    window = min(window, len(times))
+    t = np.broadcast_to(((times - times[-1]).total_seconds() / SECONDS_PER_DAY).to_numpy(), velocities.shape)
+    fit = _fit(_rolling_window_sums(t, inverse_velocity(velocities.to_numpy()), window),
+               _critical_values(window, confidence))
+
+    # Onset: end of the first window of the current run of significantly decreasing 1/v
+    accelerating = fit["accelerating"][:, ::-1]
+    run_length = np.where(accelerating.all(axis=1), accelerating.shape[1], accelerating.argmin(axis=1))
+    onset_index = accelerating.shape[1] - np.maximum(run_length, 1) + window - 1
+    onset = t[0, onset_index]
+
+    latest = {name: values[:, -1] for name, values in fit.items()}
+    return _forecast_frame(velocities.index, times[-1], latest, onset)
+
+
+def summarize_forecast(forecast: pd.DataFrame, limit: int = 20) -> Dict[str, Any]:
+    """Counts and the earliest forecast failures, for pipeline results."""
+    upcoming = forecast.dropna(subset=["days_to_failure"]).sort_values("days_to_failure")
+    return {
+        "method": "inverse_velocity",
+        "monitoring_points": len(forecast),
+        "accelerating_points": int(forecast["accelerating"].sum()),
+        "forecast_points": len(upcoming),
+        "earliest_failure": upcoming["time_of_failure"].iloc[0] if len(upcoming) else None,
+        "forecasts": upcoming.head(limit).to_dict("records"),
+    }
+
+
+def _series_frame(frame: pd.DataFrame, velocity_column: str, point_column: str) -> Tuple[pd.DataFrame, str]:
+    """
+    ``frame`` keyed for forecasting: by ``point_column`` when most of its
+    points have repeat readings, otherwise (column missing, or noisy
+    survey coordinates giving every row its own "point") as one site-wide
+    series of the mean velocity per timestamp - the same single-series
+    fallback the extensometer preprocessing uses.
+    """
+    if point_column in frame:
+        counts = frame[point_column].value_counts()
+        if len(counts) and (counts > 1).mean() >= 0.5:
+            return frame, point_column
+    logger.info(f"No repeat readings per {point_column}; forecasting {velocity_column} as a single series")
+    series = frame.groupby("timestamp", as_index=False)[velocity_column].mean()
+    return series.assign(point=SINGLE_SERIES), "point"
+
+
+def pipeline_failure_forecast(frame: pd.DataFrame, velocity_column: str, point_column: str, params: Dict[str, Any],
+                              analysis_dir: str) -> Dict[str, Any]:
+    """
+    Forecast summary of a pipeline run, the per-point table saved next to its
+    other artefacts. Readings without usable point identity are forecast
+    as one site-wide series. Recognised params: failure_forecast (default
+    True), forecast_window, forecast_confidence.
+    """
+    if not params.get("failure_forecast", True) or len(frame) == 0:
+        return {}
+    try:
+        frame, point_column = _series_frame(frame, velocity_column, point_column)
+        forecast = forecast_failure(
+            frame, velocity_column, point_column, params.get("forecast_window", FORECAST_WINDOW),
+            params.get("forecast_confidence", CONFIDENCE)
+        )
+        path = get_next_filename(analysis_dir, "failure_forecast", ".csv")
+        forecast.to_csv(path, index=False)
+        return {**summarize_forecast(forecast), "artifact": path}
+    except Exception as e:
+        logger.error(f"Error forecasting time of failure from {velocity_column}: {e}")
+        return {}
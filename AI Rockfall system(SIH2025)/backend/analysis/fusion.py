@@ -0,0 +1,404 @@
+"""
+Cross-sensor fusion and site-level risk
+=======================================
+
+Rainfall, pore pressure, crack opening, slope displacement and
+microseismicity are causally linked but sampled at different rates. This
+stage puts every stream a site has stored (see ``results_store``) on one
+timeline and scores it with a single site-level model:
+
+- each stream is aggregated into ``freq`` bins; event-like signals
+  (rain depth, seismic counts and energy) are zero when nothing happened,
+  level-like signals are carried forward as-of, for at most ``STALE_AFTER``;
+- lagged features link the streams: antecedent rainfall over 24 h / 72 h /
+  7 d, an antecedent precipitation index, the rain-to-pore-pressure
+  response lag and strength, 24 h changes and seismic rates;
+- the site model predicts the probability of a High (or Critical) risk
+  reading on any sensor within ``HORIZON``. Until one is trained, the
+  highest current per-sensor risk level is used.
+
+``SiteFusionEngine`` keeps a bounded window of binned streams per site and
+refreshes only the stream that ticked, so every update costs the same
+however long the site's history is. ``sync`` folds in streams another
+process stored since the engine last read them.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score, roc_auc_score
+
+from .common import get_next_filename, load_models, sensor_dirs
+from .results_store import ResultsStore
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "fusion"
+MODEL_FILES = ("site_risk_model",)
+
+FREQ = "1h"
+STALE_AFTER = pd.Timedelta(hours=24)  # level readings older than this count as missing
+LOOKBACK = pd.Timedelta(days=10)  # history an incremental update re-reads (longest lagged feature + slack)
+HORIZON = pd.Timedelta(hours=24)  # the site model predicts High risk within this horizon
+MAX_RESPONSE_LAG = pd.Timedelta(hours=72)
+RESPONSE_WINDOW = pd.Timedelta(days=7)
+API_DECAY_PER_DAY = 0.9
+
+RISK_CODES = {"Low": 0, "Medium": 1, "High": 2, "Critical": 3}
+HIGH_RISK = 2
+
+# Stream per sensor: stored dataset and output column -> (source column, aggregation per bin).
+# "events" columns are zero-filled; the rest are carried forward as-of.
+STREAMS: Dict[str, Dict[str, Any]] = {
+    "weather": {
+        "dataset": "readings",
+        "columns": {
+            "rain_intensity": ("rainfall_intensity", "mean"),
+            "temperature": ("temperature", "mean"),
+            "humidity": ("humidity", "mean"),
+        },
+        "events": ("rain_intensity",),
+    },
+    "piezometer": {
+        "dataset": "readings",
+        "columns": {
+            "pore_pressure": ("pore_pressure", "mean"),
+            "groundwater_level": ("groundwater_level", "mean"),
+            "piezometer_risk": ("risk_class", "max"),
+        },
+        "events": (),
+    },
+    "extensometer": {
+        "dataset": "readings",
+        "columns": {
+            "crack_rate": ("crack_rate", "max"),
+            "crack_opening": ("cumulative_crack_opening", "max"),
+            "extensometer_risk": ("risk_class", "max"),
+        },
+        "events": (),
+    },
+    "gbinsar": {
+        "dataset": "readings",
+        "columns": {
+            "displacement_rate": ("displacement_rate", "max"),
+            "displacement": ("cumulative_displacement", "max"),
+            "gbinsar_risk": ("risk_class", "max"),
+        },
+        "events": (),
+    },
+    "geophone": {
+        "dataset": "features",
+        "columns": {
+            "seismic_events": ("richter_scale", "count"),
+            "seismic_energy": ("energy_joules", "sum"),
+            "max_richter": ("richter_scale", "max"),
+            "geophone_risk": ("risk_level", "max"),
+        },
+        "events": ("seismic_events", "seismic_energy"),
+    },
+}
+RISK_COLUMNS = [f"{sensor}_risk" for sensor in STREAMS if f"{sensor}_risk" in STREAMS[sensor]["columns"]]
+
+FUSION_FEATURES = [
+    "rain_depth", "antecedent_rain_24h", "antecedent_rain_72h", "antecedent_rain_7d", "antecedent_precipitation_index",
+    "temperature", "humidity",
+    "pore_pressure", "groundwater_level", "pressure_change_24h", "pressure_response_lag_h", "pressure_response",
+    "crack_rate", "crack_rate_change_24h", "crack_opening",
+    "displacement_rate", "displacement_rate_change_24h", "displacement",
+    "seismic_events_24h", "seismic_energy_24h", "max_richter",
+    "site_risk_level", "reporting_streams",
+]
+
+
+def stream_bins(frame: pd.DataFrame, sensor: str, freq: str = FREQ) -> pd.DataFrame:
+    """One stream's stored rows aggregated into ``freq`` bins (risk labels as codes)."""
+    spec = STREAMS[sensor]
+    if frame is None or len(frame) == 0 or "timestamp" not in frame:
+        return pd.DataFrame(columns=list(spec["columns"]), index=pd.DatetimeIndex([], name="timestamp"))
+    sources = {source for source, _ in spec["columns"].values() if source in frame}
+    data = frame[["timestamp", *sources]].copy()
+    data["timestamp"] = pd.to_datetime(data["timestamp"])
+    for source in sources:
+        if not pd.api.types.is_numeric_dtype(data[source]):
+            data[source] = data[source].map(RISK_CODES)
+    resampled = data.set_index("timestamp").sort_index().resample(freq)
+    index = resampled.size().index
+    bins = pd.DataFrame({
+        column: resampled[source].agg(how) if source in sources else pd.Series(np.nan, index=index)
+        for column, (source, how) in spec["columns"].items()
+    })
+    bins.index.name = "timestamp"
+    return bins
+
+
+def align_streams(streams: Dict[str, pd.DataFrame], freq: str = FREQ,
+                  stale_after: pd.Timedelta = STALE_AFTER) -> pd.DataFrame:
+    """
+    As-of join of binned streams onto one timeline: bins with no reading
+    take the last value within ``stale_after`` (events: zero).
+    """
+    streams = {sensor: bins for sensor, bins in streams.items() if len(bins)}
+    if not streams:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="timestamp"))
+    start = min(bins.index.min() for bins in streams.values())
+    end = max(bins.index.max() for bins in streams.values())
+    timeline = pd.date_range(start, end, freq=freq, name="timestamp")
+    limit = max(int(stale_after / pd.Timedelta(freq)), 1)
+
+    aligned = []
+    for sensor, bins in streams.items():
+        bins = bins.reindex(timeline)
+        events = list(STREAMS[sensor]["events"])
+        levels = [column for column in bins.columns if column not in events]
+        bins[levels] = bins[levels].ffill(limit=limit)
+        bins[events] = bins[events].fillna(0)
+        # Bins a stream has a current (non-stale) reading for
+        bins[f"{sensor}_fresh"] = bins[levels].notna().any(axis=1) if levels else True
+        aligned.append(bins)
+    return pd.concat(aligned, axis=1)
+
+
+def _bins(duration: pd.Timedelta, freq: str) -> int:
+    return max(int(duration / pd.Timedelta(freq)), 1)
+
+
+def response_lag(rain: pd.Series, pressure_change: pd.Series, freq: str = FREQ,
+                 max_lag: pd.Timedelta = MAX_RESPONSE_LAG, window: pd.Timedelta = RESPONSE_WINDOW) -> pd.DataFrame:
+    """
+    Trailing cross-correlation of rainfall with pore pressure change: for every
+    bin, the lag (hours) with the strongest correlation over ``window`` and that
+    correlation.
+    """
+    size = _bins(window, freq)
+    lags = range(_bins(max_lag, freq) + 1)
+    correlations = np.column_stack([
+        pressure_change.rolling(size, min_periods=size // 2).corr(rain.shift(lag)).to_numpy() for lag in lags
+    ])
+    valid = np.isfinite(correlations).any(axis=1)
+    best = np.argmax(np.where(np.isfinite(correlations), correlations, -np.inf), axis=1)
+    hours = pd.Timedelta(freq) / pd.Timedelta(hours=1)
+    return pd.DataFrame({
+        "pressure_response_lag_h": np.where(valid, best * hours, np.nan),
+        "pressure_response": np.where(valid, correlations[np.arange(len(best)), best], np.nan),
+    }, index=rain.index)
+
+
+def add_lagged_features(aligned: pd.DataFrame, freq: str = FREQ) -> pd.DataFrame:
+    """Antecedent rainfall, pressure response, 24 h changes, seismic rates and the site risk level."""
+    fused = aligned.copy()
+    for column in FUSION_FEATURES + RISK_COLUMNS + ["rain_intensity", "seismic_events", "seismic_energy"]:
+        if column not in fused:
+            fused[column] = np.nan
+    hours = pd.Timedelta(freq) / pd.Timedelta(hours=1)
+    day = _bins(pd.Timedelta(hours=24), freq)
+
+    # Mean intensity (mm/h) times bin length: rain depth per bin
+    fused["rain_depth"] = fused["rain_intensity"].fillna(0) * hours
+    for name, duration in (("24h", "24h"), ("72h", "72h"), ("7d", "7D")):
+        fused[f"antecedent_rain_{name}"] = fused["rain_depth"].rolling(_bins(pd.Timedelta(duration), freq),
+                                                                       min_periods=1).sum()
+    decay = API_DECAY_PER_DAY ** (hours / 24)
+    fused["antecedent_precipitation_index"] = lfilter([1.0], [1.0, -decay], fused["rain_depth"].to_numpy())
+
+    fused["pressure_change_24h"] = fused["pore_pressure"].diff(day)
+    response = response_lag(fused["rain_depth"], fused["pore_pressure"].diff(), freq)
+    for column in response:
+        fused[column] = response[column]
+    fused["crack_rate_change_24h"] = fused["crack_rate"].diff(day)
+    fused["displacement_rate_change_24h"] = fused["displacement_rate"].diff(day)
+    fused["seismic_events_24h"] = fused["seismic_events"].fillna(0).rolling(day, min_periods=1).sum()
+    fused["seismic_energy_24h"] = fused["seismic_energy"].fillna(0).rolling(day, min_periods=1).sum()
+
+    fused["site_risk_level"] = fused[RISK_COLUMNS].max(axis=1)
+    fused["reporting_streams"] = fused[[column for column in fused if column.endswith("_fresh")]].sum(axis=1)
+    return fused
+
+
+def site_labels(fused: pd.DataFrame, freq: str = FREQ, horizon: pd.Timedelta = HORIZON) -> pd.Series:
+    """1 when any sensor reports High risk or above in the ``horizon`` after a bin."""
+    ahead = _bins(horizon, freq)
+    upcoming = fused["site_risk_level"][::-1].rolling(ahead, min_periods=1).max()[::-1].shift(-1)
+    return (upcoming >= HIGH_RISK).astype(float).where(upcoming.notna())
+
+
+def feature_matrix(fused: pd.DataFrame) -> pd.DataFrame:
+    """Model inputs; sensors a site does not have read as 0."""
+    return fused.reindex(columns=FUSION_FEATURES).astype(np.float64).fillna(0.0)
+
+
+def risk_level(score: Optional[float]) -> Optional[str]:
+    if score is None or not np.isfinite(score):
+        return None
+    return "High" if score >= 0.8 else "Medium" if score >= 0.5 else "Low"
+
+
+def score_site(fused: pd.DataFrame, model: Optional[Any] = None) -> pd.Series:
+    """Site risk score in [0, 1]: the model's High-risk probability, else the current risk level / High."""
+    if model is not None and len(fused):
+        return pd.Series(model.predict_proba(feature_matrix(fused))[:, 1], index=fused.index)
+    return (fused["site_risk_level"] / HIGH_RISK).clip(0, 1)
+
+
+def read_streams(store: ResultsStore, site_id: str, sensors: Iterable[str], start: Optional[Any] = None,
+                 freq: str = FREQ) -> Dict[str, pd.DataFrame]:
+    """Binned streams of ``sensors`` for a site, from ``start`` on (all history when None)."""
+    streams = {}
+    for sensor in sensors:
+        spec = STREAMS[sensor]
+        try:
+            frame = store.read(spec["dataset"], str(site_id), sensor, start=start)
+        except Exception as e:
+            logger.error(f"Error reading {sensor} {spec['dataset']} for site {site_id}: {e}")
+            continue
+        streams[sensor] = stream_bins(frame, sensor, freq)
+    return streams
+
+
+def stored_sites(store: ResultsStore) -> List[str]:
+    """Sites with any stored stream."""
+    sites = set()
+    for dataset in {spec["dataset"] for spec in STREAMS.values()}:
+        base = os.path.join(store.root, dataset)
+        if os.path.isdir(base):
+            sites.update(name[len("site="):] for name in os.listdir(base) if name.startswith("site="))
+    return sorted(sites)
+
+
+def build_site_timeline(store: ResultsStore, site_id: str, start: Optional[Any] = None,
+                        freq: str = FREQ) -> pd.DataFrame:
+    """The whole fused timeline of a site (or from ``start`` on), with lagged features."""
+    return add_lagged_features(align_streams(read_streams(store, site_id, STREAMS, start, freq), freq), freq)
+
+
+def train_site_model(store: ResultsStore, site_ids: List[str], output_root: Optional[str] = None,
+                     n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Train the site risk model on the fused history of ``site_ids``, holding out
+    the last 20% of every site's timeline for evaluation.
+    """
+    train_parts, test_parts = [], []
+    for site_id in site_ids:
+        fused = build_site_timeline(store, site_id)
+        labels = site_labels(fused)
+        data = feature_matrix(fused).assign(label=labels).dropna(subset=["label"])
+        split = int(len(data) * 0.8)
+        train_parts.append(data.iloc[:split])
+        test_parts.append(data.iloc[split:])
+    train = pd.concat(train_parts) if train_parts else pd.DataFrame()
+    test = pd.concat(test_parts) if test_parts else pd.DataFrame()
+    if len(train) == 0 or train["label"].nunique() < 2:
+        raise ValueError("Site history has no High-risk periods to learn from")
+
+    model = RandomForestClassifier(
+        n_estimators=200, max_depth=12, class_weight="balanced", random_state=42, n_jobs=n_jobs
+    )
+    model.fit(train[FUSION_FEATURES], train["label"])
+    model_path = get_next_filename(sensor_dirs(SENSOR, output_root)["analysis"], "site_risk_model", ".joblib")
+    joblib.dump(model, model_path)
+
+    performance = {"model_path": model_path, "train_rows": len(train), "test_rows": len(test), "sites": site_ids}
+    if len(test) and test["label"].nunique() == 2:
+        probability = model.predict_proba(test[FUSION_FEATURES])[:, 1]
+        performance["roc_auc"] = float(roc_auc_score(test["label"], probability))
+        performance["f1_score"] = float(f1_score(test["label"], probability >= 0.5, zero_division=0))
+    performance["feature_importance"] = sorted(
+        ({"feature": f, "importance": float(i)} for f, i in zip(FUSION_FEATURES, model.feature_importances_)),
+        key=lambda item: item["importance"], reverse=True
+    )
+    return performance
+
+
+def load_site_model(output_root: Optional[str] = None) -> Optional[Any]:
+    return load_models(SENSOR, MODEL_FILES, output_root).get("site_risk_model")
+
+
+class SiteFusionEngine:
+    """
+    Incremental fusion for one site. ``tick(sensor)`` re-reads only that
+    sensor's last ``LOOKBACK`` from the results store, re-aligns the bounded
+    window of binned streams and scores its latest bin.
+    """
+
+    def __init__(self, site_id: Any, store: ResultsStore, model: Optional[Any] = None, freq: str = FREQ,
+                 lookback: pd.Timedelta = LOOKBACK):
+        self.site_id = str(site_id)
+        self.store = store
+        self.model = model
+        self.freq = freq
+        self.lookback = lookback
+        self.streams: Dict[str, pd.DataFrame] = {}
+        self.fused = pd.DataFrame()
+        # Store version of each stream as of its last read
+        self.versions: Dict[str, Tuple[int, int, int]] = {}
+
+    def _since(self, sensor: str) -> Optional[pd.Timestamp]:
+        latest = self.store.max_timestamp(STREAMS[sensor]["dataset"], self.site_id, sensor)
+        return None if latest is None else latest - self.lookback
+
+    def _version(self, sensor: str) -> Tuple[int, int, int]:
+        return self.store.version(STREAMS[sensor]["dataset"], self.site_id, sensor)
+
+    def refresh(self, sensors: Iterable[str]) -> None:
+        for sensor in sensors:
+            # Taken before the read, so rows appended meanwhile show up as stale next time
+            self.versions[sensor] = self._version(sensor)
+            since = self._since(sensor)
+            if since is not None:
+                self.streams.update(read_streams(self.store, self.site_id, [sensor], since, self.freq))
+        # Keep one window: streams far behind the newest one no longer affect the latest bin
+        if self.streams:
+            end = max(bins.index.max() for bins in self.streams.values() if len(bins))
+            self.streams = {
+                sensor: bins[bins.index > end - self.lookback] for sensor, bins in self.streams.items() if len(bins)
+            }
+        self.fused = add_lagged_features(align_streams(self.streams, self.freq), self.freq)
+
+    def tick(self, sensor: Optional[str] = None) -> Dict[str, Any]:
+        """Fold in a stream update (all streams when ``sensor`` is None) and return the site risk."""
+        if sensor is None or not self.streams:
+            self.refresh(STREAMS)
+        elif sensor in STREAMS:
+            self.refresh([sensor])
+        return self.latest()
+
+    def stale(self) -> List[str]:
+        """Streams whose stored rows changed since this engine last read them."""
+        return [sensor for sensor in STREAMS if self._version(sensor) != self.versions.get(sensor)]
+
+    def sync(self) -> Dict[str, Any]:
+        """Fold in every stream stored by any process since the last read and return the site risk."""
+        stale = self.stale()
+        if stale:
+            self.refresh(stale)
+        return self.latest()
+
+    def latest(self) -> Dict[str, Any]:
+        if len(self.fused) == 0:
+            return {"site_id": self.site_id, "timestamp": None, "risk_score": None, "streams": {}}
+        latest = self.fused.iloc[[-1]]
+        score = float(score_site(latest, self.model).iloc[0])
+        return {
+            "site_id": self.site_id,
+            "timestamp": latest.index[0],
+            "risk_score": score,
+            "risk_level": risk_level(score),
+            "model": "site_risk_model" if self.model is not None else "max_sensor_risk",
+            "features": latest[FUSION_FEATURES].iloc[0].to_dict(),
+            "streams": {
+                sensor: {"latest": bins.index.max(), "fresh": bool(latest[f"{sensor}_fresh"].iloc[0])}
+                for sensor, bins in self.streams.items() if f"{sensor}_fresh" in latest
+            },
+        }
+
+    def timeline(self) -> pd.DataFrame:
+        """The engine's window with its site risk score per bin."""
+        return self.fused[FUSION_FEATURES].assign(risk_score=score_site(self.fused, self.model))
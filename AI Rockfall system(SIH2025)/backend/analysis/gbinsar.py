@@ -0,0 +1,252 @@
+"""
+GB-InSAR rockfall analysis pipeline
+===================================
+
+Importable version of GB_InSAR_Rockfall_Prediction.ipynb: radar
+displacement data loading, feature engineering, rockfall occurrence/timing
+models and risk prediction.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from .common import (
+    DATA_DIR, get_next_filename, grow_or_build, parse_point_coordinates, preloaded_models, resolve_input_file,
+    save_json, sensor_dirs, to_serializable
+)
+from .failure_forecast import pipeline_failure_forecast
+from .interpolation import pipeline_risk_map
+from .results_store import store_pipeline_frames
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "gbinsar"
+DEFAULT_DATA_FILE = os.path.join(DATA_DIR, "rockfall_data.csv")
+MODEL_FILES = ("random_forest_model", "gradient_boosting_model", "feature_scaler")
+
+NUMERIC_COLUMNS = [
+    "displacement", "displacement_rate", "cumulative_displacement",
+    "displacement_acceleration", "slope_angle", "coverage_area",
+]
+FEATURE_COLS = [
+    "displacement", "displacement_rate", "cumulative_displacement",
+    "displacement_acceleration", "slope_angle", "daily_displacement_change",
+    "acceleration_ratio",
+]
+SCALED_COLUMNS = NUMERIC_COLUMNS + ["daily_displacement_change", "acceleration_ratio"]
+# Online inference (see model_registry); features are standardized like in training
+SERVING_SPEC = {
+    "features": FEATURE_COLS,
+    "scaler": "feature_scaler",
+    "scaler_features": SCALED_COLUMNS,
+    "outputs": {
+        "occurrence": ("random_forest_model", "predict_proba"),
+        "days_until_event": ("gradient_boosting_model", "predict"),
+    },
+}
+ALERT_THRESHOLD = 0.8
+
+
+def generate_synthetic_data(n_samples: int = 60) -> pd.DataFrame:
+    """Generate synthetic GB-InSAR displacement data (2 readings per day)."""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=n_samples / 2)
+    timestamps = []
+    current_date = start_date
+    while current_date <= end_date:
+        timestamps.extend([current_date, current_date + timedelta(hours=12)])
+        current_date += timedelta(days=1)
+    timestamps = timestamps[:n_samples]
+
+    rows = []
+    for i, timestamp in enumerate(timestamps):
+        base_displacement = np.random.normal(5, 2)
+        risk = "Low" if base_displacement < 4 else "Medium" if base_displacement < 8 else "High"
+        x, y = np.random.uniform(0, 100, 2)
+        rows.append({
+            "timestamp": timestamp,
+            "displacement": base_displacement,
+            "displacement_rate": np.random.normal(0.5, 0.2),
+            "displacement_direction": np.random.randint(0, 360),
+            "cumulative_displacement": base_displacement * (i / 10 + 1),
+            "displacement_acceleration": np.random.normal(0.1, 0.05),
+            "slope_angle": np.random.uniform(30, 80),
+            "slope_aspect": np.random.randint(0, 360),
+            "risk_class": risk,
+            "point_coordinates": f"{x:.2f}, {y:.2f}",
+            "coord_x": round(x, 2),
+            "coord_y": round(y, 2),
+            "coverage_area": np.random.uniform(10, 50),
+        })
+
+    return pd.DataFrame(rows)
+
+
+def load_or_create_data(data_file: str = DEFAULT_DATA_FILE) -> pd.DataFrame:
+    """Load GB-InSAR readings from CSV or generate (and save) a synthetic set."""
+    if os.path.exists(data_file):
+        df = pd.read_csv(data_file)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return parse_point_coordinates(df, dims=2)
+
+    df = generate_synthetic_data()
+    df.to_csv(data_file, index=False)
+    return df
+
+
+def preprocess_data(df: pd.DataFrame, scaler: Optional[StandardScaler] = None) -> Tuple[pd.DataFrame, StandardScaler]:
+    """Engineer displacement features, targets and scale numeric features."""
+    processed_df = df.copy()
+    processed_df[NUMERIC_COLUMNS] = processed_df[NUMERIC_COLUMNS].fillna(processed_df[NUMERIC_COLUMNS].mean())
+    for column in ("displacement_direction", "slope_aspect"):
+        processed_df[column] = processed_df[column].fillna(processed_df[column].mode()[0])
+
+    processed_df["daily_displacement_change"] = processed_df["displacement"].diff().fillna(0)
+    processed_df["acceleration_ratio"] = (
+        processed_df["displacement_acceleration"] / (processed_df["displacement_rate"] + 1e-6)
+    ).fillna(0)
+    processed_df = processed_df.replace([np.inf, -np.inf], 0)
+
+    processed_df["rockfall_likely"] = (processed_df["risk_class"] == "High").astype(int)
+    processed_df["days_until_event"] = processed_df["risk_class"].map({"High": 1, "Medium": 3}).fillna(7).astype(int)
+
+    # A given (already fitted) scaler is applied as-is, e.g. when growing trained models
+    scaler = scaler or StandardScaler().fit(processed_df[SCALED_COLUMNS])
+    processed_df[SCALED_COLUMNS] = scaler.transform(processed_df[SCALED_COLUMNS])
+
+    return processed_df, scaler
+
+
+def train_models(processed_df: pd.DataFrame, analysis_dir: str, scaler: Optional[StandardScaler] = None,
+                 previous: Optional[Dict[str, Any]] = None,
+                 n_jobs: Optional[int] = None) -> Tuple[Dict[str, Any], Any, Any]:
+    """
+    Train the rockfall occurrence classifier and days-until-event regressor (saving
+    ``scaler`` too). With ``previous`` artefacts the ensembles are grown (warm start).
+    """
+    previous = previous or {}
+    X_train, X_test, y_clf_train, y_clf_test, y_reg_train, y_reg_test = train_test_split(
+        processed_df[FEATURE_COLS], processed_df["rockfall_likely"], processed_df["days_until_event"],
+        test_size=0.3, random_state=42
+    )
+
+    rf_model = grow_or_build(
+        previous.get("random_forest_model"),
+        lambda: RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs),
+        y_clf_train, n_jobs
+    )
+    rf_model.fit(X_train, y_clf_train)
+    gb_model = grow_or_build(
+        previous.get("gradient_boosting_model"), lambda: GradientBoostingRegressor(n_estimators=100, random_state=42)
+    )
+    gb_model.fit(X_train, y_reg_train)
+
+    rf_pred = rf_model.predict(X_test)
+    rf_model_path = get_next_filename(analysis_dir, "random_forest_model", ".joblib")
+    gb_model_path = get_next_filename(analysis_dir, "gradient_boosting_model", ".joblib")
+    joblib.dump(rf_model, rf_model_path)
+    joblib.dump(gb_model, gb_model_path)
+    if scaler is not None:
+        joblib.dump(scaler, get_next_filename(analysis_dir, "feature_scaler", ".joblib"))
+
+    feature_importance = sorted(
+        zip(FEATURE_COLS, rf_model.feature_importances_), key=lambda item: item[1], reverse=True
+    )
+
+    performance = {
+        "random_forest": {
+            "accuracy": float(accuracy_score(y_clf_test, rf_pred)),
+            "f1_score": float(f1_score(y_clf_test, rf_pred, zero_division=0)),
+            "model_path": rf_model_path,
+        },
+        "gradient_boosting": {
+            "r2_score": float(r2_score(y_reg_test, gb_model.predict(X_test))),
+            "model_path": gb_model_path,
+        },
+        "feature_importance": [{"feature": f, "importance": i} for f, i in feature_importance],
+    }
+    return performance, rf_model, gb_model
+
+
+def predict_rockfall_risk(rf_model, gb_model, features: pd.DataFrame) -> pd.DataFrame:
+    """Predict occurrence probability, days until event and alert flag."""
+    occurrence_prob = rf_model.predict_proba(features)[:, 1]
+    return pd.DataFrame({
+        "occurrence_probability": occurrence_prob,
+        "predicted_days_until_event": gb_model.predict(features),
+        "alert": occurrence_prob > ALERT_THRESHOLD,
+    })
+
+
+def run(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full GB-InSAR pipeline and return JSON-serializable results.
+
+    Recognised params: input_files / input_file, train_models (default: only when no
+    preloaded models are available), models, site_id, store_results, output_root,
+    failure_forecast / forecast_window (inverse-velocity time of failure per pixel).
+    """
+    data_file = resolve_input_file(params, DEFAULT_DATA_FILE)
+    dirs = sensor_dirs(SENSOR, params.get("output_root"))
+
+    df = load_or_create_data(data_file)
+    models = preloaded_models(params, MODEL_FILES)
+    train = params.get("train_models", not models)
+    # Preloaded models are served in their version's feature space, as by /api/predict
+    processed_df, scaler = preprocess_data(df, None if train else models["feature_scaler"])
+    if train:
+        performance, rf_model, gb_model = train_models(processed_df, dirs["analysis"], scaler)
+    else:
+        performance = {"preloaded": True}
+        rf_model, gb_model = models["random_forest_model"], models["gradient_boosting_model"]
+
+    predictions = predict_rockfall_risk(rf_model, gb_model, processed_df[FEATURE_COLS])
+    predictions["timestamp"] = processed_df["timestamp"].values
+    predictions["point_coordinates"] = processed_df["point_coordinates"].values
+    predictions.to_csv(get_next_filename(dirs["analysis"], "rockfall_predictions", ".csv"), index=False)
+
+    current_alerts = predictions[predictions["alert"]]
+    risk_map = pipeline_risk_map(
+        processed_df[["timestamp", "coord_x", "coord_y"]].assign(risk=predictions["occurrence_probability"].values),
+        "risk", params, dirs["analysis"]
+    )
+    # Pixels without repeat acquisitions (noisy coordinates) fall back to a site-wide series
+    failure_forecast = pipeline_failure_forecast(
+        df, "displacement_rate", "point_coordinates", params, dirs["analysis"]
+    )
+    stored_rows = store_pipeline_frames(
+        params, SENSOR, {"readings": df, "features": processed_df, "predictions": predictions}
+    )
+
+    results = {
+        "sensor": SENSOR,
+        "input_file": data_file,
+        "data_statistics": {
+            "total_records": len(df),
+            "date_range": {"start": df["timestamp"].min(), "end": df["timestamp"].max()},
+            "monitoring_points": df["point_coordinates"].nunique(),
+            "risk_distribution": df["risk_class"].value_counts().to_dict(),
+        },
+        "model_performance": performance,
+        "current_alerts": len(current_alerts),
+        "high_risk_locations": current_alerts["point_coordinates"].tolist(),
+        "alerts": current_alerts.tail(50).to_dict("records"),
+        "risk_map": risk_map,
+        "failure_forecast": failure_forecast,
+    }
+    results["stored_rows"] = stored_rows
+    results["artifacts"] = {"report": save_json(results, dirs["analysis"], "system_report")}
+    return to_serializable(results)
@@ -0,0 +1,98 @@
+"""
+Batched local-plane geometry for point clouds
+=============================================
+
+Per-point slope, aspect, curvature, roughness and planarity from
+neighbourhood covariance (PCA) for a whole cloud at once: one bulk
+``cKDTree.query(..., workers=-1)`` per batch and batched
+``np.linalg.eigh`` over the stacked 3x3 covariance matrices. Batches
+bound peak memory to ``batch_size * k`` neighbours.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+GEOMETRY_FIELDS = ("slope", "aspect", "curvature", "roughness", "planarity")
+
+
+def local_plane_geometry(points: np.ndarray, k: int = 16, max_radius: Optional[float] = None,
+                         batch_size: int = 100_000, workers: int = -1,
+                         tree: Optional[cKDTree] = None) -> Dict[str, np.ndarray]:
+    """
+    Fit a local plane around every point from its k nearest neighbours.
+
+    Returns per-point arrays:
+        slope      - plane dip in degrees (0 = horizontal)
+        aspect     - downslope azimuth in degrees clockwise from +y (north)
+        curvature  - surface variation lambda3 / (lambda1 + lambda2 + lambda3)
+        roughness  - distance of the point from its local plane
+        planarity  - (lambda2 - lambda3) / lambda1
+    Neighbours beyond ``max_radius`` are ignored; points with fewer than
+    three usable neighbours get NaN.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    k = int(min(k, n))
+    result = {name: np.full(n, np.nan) for name in GEOMETRY_FIELDS}
+    if k < 3:
+        return result
+
+    tree = tree if tree is not None else cKDTree(points)
+    bound = np.inf if max_radius is None else float(max_radius)
+    # Missing neighbours come back with index n; pad so they can be gathered and masked
+    padded = np.vstack([points, np.zeros((1, 3))])
+
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        dist, idx = tree.query(points[start:stop], k=k, distance_upper_bound=bound, workers=workers)
+        weights = np.isfinite(dist).astype(np.float64)  # (b, k)
+        counts = weights.sum(axis=1)
+        neighbours = padded[idx]  # (b, k, 3)
+
+        centroid = np.einsum("bk,bki->bi", weights, neighbours) / np.maximum(counts, 1)[:, None]
+        centred = (neighbours - centroid[:, None, :]) * weights[:, :, None]
+        cov = np.einsum("bki,bkj->bij", centred, centred) / np.maximum(counts, 1)[:, None, None]
+
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)  # ascending: l3 <= l2 <= l1
+        eigenvalues = np.clip(eigenvalues, 0.0, None)
+        l3, l2, l1 = eigenvalues[:, 0], eigenvalues[:, 1], eigenvalues[:, 2]
+        normal = eigenvectors[:, :, 0]
+        normal *= np.where(normal[:, 2] < 0, -1.0, 1.0)[:, None]  # orient upwards
+
+        total = l1 + l2 + l3
+        valid = counts >= 3
+        with np.errstate(invalid="ignore", divide="ignore"):
+            batch = {
+                "slope": np.degrees(np.arccos(np.clip(normal[:, 2], -1.0, 1.0))),
+                "aspect": (np.degrees(np.arctan2(normal[:, 0], normal[:, 1])) + 360) % 360,
+                "curvature": np.where(total > 0, l3 / total, 0.0),
+                "roughness": np.abs(np.einsum("bi,bi->b", points[start:stop] - centroid, normal)),
+                "planarity": np.where(l1 > 0, (l2 - l3) / l1, 0.0),
+            }
+        for name, values in batch.items():
+            result[name][start:stop] = np.where(valid, values, np.nan)
+
+    return result
+
+
+def summarize_geometry(geometry: Dict[str, np.ndarray], steep_angle: float = 45.0) -> Dict[str, float]:
+    """Cloud-level statistics of per-point geometry."""
+    slope = geometry["slope"]
+    valid = ~np.isnan(slope)
+    if not valid.any():
+        return {}
+    return {
+        "point_slope_mean": float(np.nanmean(slope)),
+        "point_slope_p90": float(np.nanpercentile(slope, 90)),
+        "point_slope_max": float(np.nanmax(slope)),
+        "steep_point_fraction": float(np.mean(slope[valid] > steep_angle)),
+        "point_curvature_mean": float(np.nanmean(geometry["curvature"])),
+        "point_roughness_mean": float(np.nanmean(geometry["roughness"])),
+        "point_roughness_p95": float(np.nanpercentile(geometry["roughness"], 95)),
+        "planarity_mean": float(np.nanmean(geometry["planarity"])),
+    }
@@ -0,0 +1,400 @@
+"""
+Geophone seismic analysis pipeline
+==================================
+
+Importable version of Geophone_Rockfall_Prediction.ipynb: seismic event
+loading, feature engineering, alert generation, spatial clustering and
+risk/magnitude/anomaly model training.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.ensemble import GradientBoostingRegressor, IsolationForest, RandomForestClassifier
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from .alert_rules import AlertRule, AlertRuleSet, QuantileRelative, Threshold
+from .clustering import TiledDBSCAN
+from .common import (
+    DATA_DIR, get_next_filename, grow_or_build, preloaded_models, resolve_input_file, save_json,
+    sensor_dirs, to_serializable
+)
+from .results_store import store_pipeline_frames
+from .seismic_stream import (
+    B_VALUE_MIN_PERIODS, B_VALUE_WINDOW, EVENT_TYPE_CODES, FREQUENCY_BINS, FREQUENCY_LABELS, RISK_LEVEL_CODES,
+    ROLLING_WINDOW, rolling_b_value, seismic_risk_score
+)
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "geophone"
+DEFAULT_DATA_FILE = os.path.join(DATA_DIR, "geophone_data.csv")
+MODEL_FILES = ("rockfall_classifier", "feature_scaler", "magnitude_predictor", "anomaly_detector")
+
+ML_FEATURES = [
+    "event_magnitude_mms", "dominant_frequency_hz", "peak_ground_accel_g",
+    "event_duration_s", "log_energy", "time_since_last_event",
+    "rolling_mean_magnitude", "rolling_std_magnitude", "rolling_max_magnitude",
+    "event_rate_per_hour", "distance_from_center", "depth",
+    "local_b_value", "hour", "day_of_week", "station_id",
+    "cumulative_events", "magnitude_change", "spatial_shift",
+]
+# Online inference (see model_registry): scaler shared by every head
+SERVING_SPEC = {
+    "features": ML_FEATURES,
+    "scaler": "feature_scaler",
+    "outputs": {
+        "risk_level": ("rockfall_classifier", "predict_proba"),
+        "richter": ("magnitude_predictor", "predict"),
+        "anomaly": ("anomaly_detector", "outlier"),
+    },
+}
+
+STATION_POSITIONS = {
+    1: (100, 200, -50),   # North rim
+    2: (300, 180, -45),   # Northeast rim
+    3: (350, 50, -40),    # East rim
+    4: (280, -100, -48),  # Southeast rim
+    5: (120, -120, -52),  # Southwest rim
+    6: (50, 80, -55),     # West rim
+}
+
+
+def _classify_event(richter_scale: float):
+    """Map a Richter value to (event_type, risk_level)."""
+    if richter_scale < -1.0:
+        return "Background Noise", "Low"
+    if richter_scale < 0.0:
+        return "Microseismic", "Low"
+    if richter_scale < 1.0:
+        return "Minor Event", "Medium"
+    if richter_scale < 2.0:
+        return "Moderate Event", "High"
+    return "Major Event", "Critical"
+
+
+def generate_geophone_data(n_records: int = 200, days: int = 180) -> pd.DataFrame:
+    """Generate synthetic geophone seismic event data."""
+    np.random.seed(42)
+    start_date = datetime.now() - timedelta(days=days)
+    timestamps = sorted(
+        start_date + timedelta(
+            days=np.random.uniform(0, days),
+            hours=np.random.uniform(0, 24),
+            minutes=np.random.uniform(0, 60)
+        )
+        for _ in range(n_records)
+    )
+
+    data = []
+    for ts in timestamps:
+        vibration_velocity = np.random.lognormal(mean=0.5, sigma=1.2)
+        richter_scale = np.log10(vibration_velocity) + np.random.uniform(-0.5, 0.5)
+        event_type, risk_level = _classify_event(richter_scale)
+
+        station_id = np.random.randint(1, 7)
+        base_x, base_y, base_z = STATION_POSITIONS[station_id]
+
+        if event_type == "Background Noise":
+            frequency = np.random.uniform(50, 200)
+        elif event_type == "Microseismic":
+            frequency = np.random.uniform(100, 500)
+        else:
+            frequency = np.random.uniform(5, 100)
+
+        temperature = np.random.normal(25, 5)
+        data.append({
+            "timestamp": ts,
+            "event_time": ts + timedelta(milliseconds=np.random.uniform(0, 100)),
+            "event_magnitude_mms": vibration_velocity,
+            "richter_scale": richter_scale,
+            "event_type": event_type,
+            "risk_level": risk_level,
+            "station_id": station_id,
+            "x_coord": base_x + np.random.normal(0, 20),
+            "y_coord": base_y + np.random.normal(0, 20),
+            "z_coord": base_z + np.random.normal(0, 10),
+            "dominant_frequency_hz": frequency,
+            "peak_ground_accel_g": vibration_velocity * np.random.uniform(0.01, 0.05),
+            "event_duration_s": np.random.exponential(scale=2.0) + 0.1,
+            "energy_joules": 10 ** (1.5 * richter_scale + 4.8),
+            "signal_quality": np.random.beta(8, 2),
+            "temperature_c": temperature,
+            "corrected_magnitude": vibration_velocity * (1 + (temperature - 25) * 0.001),
+        })
+
+    return pd.DataFrame(data)
+
+
+def load_or_create_geophone_data(data_file: str = DEFAULT_DATA_FILE) -> pd.DataFrame:
+    """Load geophone events from CSV or generate (and save) a synthetic set."""
+    if os.path.exists(data_file):
+        df = pd.read_csv(data_file, parse_dates=["timestamp", "event_time"])
+    else:
+        df = generate_geophone_data()
+        df.to_csv(data_file, index=False)
+    return df.sort_values("timestamp").reset_index(drop=True)
+
+
+def engineer_seismic_features(df: pd.DataFrame, b_value_method: str = "least_squares") -> pd.DataFrame:
+    """
+    Create temporal, rolling, spatial and energy features for seismic events.
+
+    Batch version over a whole event history; ``SeismicFeatureEngine``
+    produces the same rows incrementally for live streams.
+    """
+    df = df.copy()
+
+    df["hour"] = df["timestamp"].dt.hour
+    df["day_of_week"] = df["timestamp"].dt.dayofweek
+    df["day_of_year"] = df["timestamp"].dt.dayofyear
+
+    df["time_since_last_event"] = df["timestamp"].diff().dt.total_seconds()
+    df["time_since_last_event"] = df["time_since_last_event"].fillna(df["time_since_last_event"].median())
+
+    window = ROLLING_WINDOW
+    df["rolling_mean_magnitude"] = df["event_magnitude_mms"].rolling(window=window, min_periods=1).mean()
+    df["rolling_std_magnitude"] = df["event_magnitude_mms"].rolling(window=window, min_periods=1).std()
+    df["rolling_max_magnitude"] = df["event_magnitude_mms"].rolling(window=window, min_periods=1).max()
+    df["rolling_mean_richter"] = df["richter_scale"].rolling(window=window, min_periods=1).mean()
+
+    df["cumulative_events"] = np.arange(1, len(df) + 1)
+    df["cumulative_energy"] = df["energy_joules"].cumsum()
+
+    df["event_rate_per_hour"] = (3600 / df["time_since_last_event"]).replace([np.inf, -np.inf], 0)
+
+    df["magnitude_change"] = df["event_magnitude_mms"].diff().fillna(0)
+    df["richter_change"] = df["richter_scale"].diff().fillna(0)
+
+    df["distance_from_center"] = np.sqrt(df["x_coord"] ** 2 + df["y_coord"] ** 2)
+    df["depth"] = df["z_coord"].abs()
+    df["spatial_shift"] = np.sqrt(
+        df["x_coord"].diff() ** 2 + df["y_coord"].diff() ** 2 + df["z_coord"].diff() ** 2
+    ).fillna(0)
+
+    df["frequency_category"] = pd.cut(
+        df["dominant_frequency_hz"],
+        bins=FREQUENCY_BINS,
+        labels=FREQUENCY_LABELS
+    )
+
+    df["log_energy"] = np.log10(df["energy_joules"] + 1)
+    df["energy_per_duration"] = df["energy_joules"] / df["event_duration_s"]
+
+    # Gutenberg-Richter b-value (local estimate): lower b-value = higher stress
+    df["local_b_value"] = np.nan_to_num(
+        rolling_b_value(df["richter_scale"], B_VALUE_WINDOW, B_VALUE_MIN_PERIODS, method=b_value_method),
+        nan=1.0
+    )
+
+    df["seismic_moment"] = 10 ** (1.5 * df["richter_scale"] + 9.1)
+
+    df["risk_score"] = seismic_risk_score(
+        df["event_magnitude_mms"], df["richter_scale"], df["time_since_last_event"],
+        df["rolling_mean_magnitude"], df["event_rate_per_hour"]
+    )
+
+    df["risk_level_encoded"] = df["risk_level"].map(RISK_LEVEL_CODES)
+    df["event_type_encoded"] = df["event_type"].map(EVENT_TYPE_CODES)
+
+    return df
+
+
+ROCKFALL_ALERT_RULES = AlertRuleSet([
+    AlertRule("CRITICAL", Threshold("richter_scale", ">=", 2.0), "Major seismic event (Richter {richter_scale:.2f})"),
+    AlertRule("CRITICAL", QuantileRelative("risk_score", 0.95), "Extreme risk score ({risk_score:.2f})"),
+    AlertRule("CRITICAL", Threshold("time_since_last_event", "<", 300) & Threshold("event_rate_per_hour", ">", 10),
+              "Event swarm detected ({event_rate_per_hour:.1f} events/hr)"),
+    AlertRule("WARNING", Threshold("richter_scale", ">=", 1.0), "Moderate event (Richter {richter_scale:.2f})"),
+    AlertRule("WARNING", Threshold("local_b_value", "<", 0.8),
+              "Low b-value indicates high stress ({local_b_value:.2f})"),
+    AlertRule("WARNING", Threshold("event_rate_per_hour", ">", 5),
+              "High event frequency ({event_rate_per_hour:.2f}/hr)"),
+    AlertRule("CAUTION", QuantileRelative("event_magnitude_mms", 0.75),
+              "Elevated vibration ({event_magnitude_mms:.2f} mm/s)"),
+    AlertRule("CAUTION", QuantileRelative("rolling_mean_magnitude", 0.75),
+              "Increasing magnitude trend ({rolling_mean_magnitude:.2f} mm/s)"),
+], exclusive=True)
+
+
+def generate_rockfall_alerts(df: pd.DataFrame) -> pd.DataFrame:
+    """Generate CRITICAL/WARNING/CAUTION alerts from engineered seismic features."""
+    alerts = ROCKFALL_ALERT_RULES.evaluate(df, carry={
+        "timestamp": "timestamp", "event_time": "event_time", "magnitude_mms": "event_magnitude_mms",
+        "richter_scale": "richter_scale", "event_type": "event_type", "risk_score": "risk_score",
+        "station_id": "station_id", "x": "x_coord", "y": "y_coord", "z": "z_coord",
+    })
+    if len(alerts) == 0:
+        return pd.DataFrame()
+
+    alerts["location"] = [f"({x:.1f}, {y:.1f}, {z:.1f})" for x, y, z in zip(alerts["x"], alerts["y"], alerts["z"])]
+    return alerts.rename(columns={"level": "alert_level"})[[
+        "timestamp", "event_time", "alert_level", "magnitude_mms", "richter_scale", "event_type",
+        "risk_score", "station_id", "location", "reason",
+    ]]
+
+
+def cluster_seismic_events(df: pd.DataFrame, eps: float = 50.0, min_samples: int = 5,
+                           n_zones: int = 5) -> Dict[str, Any]:
+    """Cluster event epicentres with DBSCAN and K-Means to find activity zones."""
+    spatial_features = df[["x_coord", "y_coord", "z_coord"]].values
+    dbscan_labels = TiledDBSCAN(eps, min_samples).fit_predict(spatial_features)
+    kmeans = KMeans(n_clusters=min(n_zones, len(df)), random_state=42, n_init=10)
+    kmeans_labels = kmeans.fit_predict(spatial_features)
+
+    return {
+        "dbscan_labels": dbscan_labels,
+        "kmeans_labels": kmeans_labels,
+        "n_dbscan_clusters": int(len(set(dbscan_labels)) - (1 if -1 in dbscan_labels else 0)),
+        "n_noise": int(np.sum(dbscan_labels == -1)),
+        "zone_centers": kmeans.cluster_centers_,
+    }
+
+
+def train_models(df: pd.DataFrame, analysis_dir: str, previous: Optional[Dict[str, Any]] = None,
+                 n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Train the risk classifier, magnitude regressor and anomaly detector.
+    With ``previous`` artefacts the ensembles are grown (warm start) on ``df``
+    and the previous feature scaler is kept, so existing trees stay valid.
+    """
+    previous = previous or {}
+    ml_df = df[ML_FEATURES + ["risk_level", "richter_scale"]].dropna()
+    X = ml_df[ML_FEATURES].values
+    X_train, X_test, y_class_train, y_class_test, y_reg_train, y_reg_test = train_test_split(
+        X, ml_df["risk_level"].values, ml_df["richter_scale"].values, test_size=0.25, random_state=42
+    )
+
+    scaler = previous.get("feature_scaler") or StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    rf_classifier = grow_or_build(
+        previous.get("rockfall_classifier"),
+        lambda: RandomForestClassifier(n_estimators=150, max_depth=15, min_samples_split=5, random_state=42,
+                                       n_jobs=n_jobs),
+        y_class_train, n_jobs
+    )
+    rf_classifier.fit(X_train_scaled, y_class_train)
+    class_accuracy = float(np.mean(rf_classifier.predict(X_test_scaled) == y_class_test))
+
+    gb_regressor = grow_or_build(
+        previous.get("magnitude_predictor"),
+        lambda: GradientBoostingRegressor(n_estimators=150, max_depth=8, learning_rate=0.1, random_state=42)
+    )
+    gb_regressor.fit(X_train_scaled, y_reg_train)
+    y_reg_pred = gb_regressor.predict(X_test_scaled)
+
+    iso_forest = grow_or_build(
+        previous.get("anomaly_detector"),
+        lambda: IsolationForest(contamination=0.1, random_state=42, n_jobs=n_jobs),
+        n_jobs=n_jobs
+    )
+    anomalies = iso_forest.fit(X_train_scaled).predict(X_train_scaled)
+
+    model_paths = {}
+    for name, model in (("rockfall_classifier", rf_classifier), ("feature_scaler", scaler),
+                        ("magnitude_predictor", gb_regressor), ("anomaly_detector", iso_forest)):
+        model_paths[name] = get_next_filename(analysis_dir, name, ".joblib")
+        joblib.dump(model, model_paths[name])
+
+    feature_importance = sorted(
+        zip(ML_FEATURES, rf_classifier.feature_importances_), key=lambda item: item[1], reverse=True
+    )
+
+    return {
+        "classifier_accuracy": class_accuracy,
+        "magnitude_r2": float(r2_score(y_reg_test, y_reg_pred)),
+        "magnitude_rmse": float(np.sqrt(mean_squared_error(y_reg_test, y_reg_pred))),
+        "training_anomalies": int(np.sum(anomalies == -1)),
+        "top_features": dict(feature_importance[:10]),
+        "model_paths": model_paths,
+    }
+
+
+def score_events(df: pd.DataFrame, models: Dict[str, Any]) -> pd.DataFrame:
+    """Score events with the preloaded classifier, magnitude regressor and anomaly detector."""
+    ml_df = df[ML_FEATURES].dropna()
+    X_scaled = models["feature_scaler"].transform(ml_df.values)
+    return pd.DataFrame({
+        "timestamp": df.loc[ml_df.index, "timestamp"].values,
+        "station_id": df.loc[ml_df.index, "station_id"].values,
+        "predicted_risk_level": models["rockfall_classifier"].predict(X_scaled),
+        "predicted_richter": models["magnitude_predictor"].predict(X_scaled),
+        "anomaly": models["anomaly_detector"].predict(X_scaled) == -1,
+    })
+
+
+def run(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full geophone pipeline and return JSON-serializable results.
+
+    Recognised params: input_files / input_file, dbscan_eps, dbscan_min_samples,
+    n_zones, b_value_method (least_squares / aki), train_models (default: only when
+    no preloaded models are available), models, site_id, store_results, output_root.
+    """
+    data_file = resolve_input_file(params, DEFAULT_DATA_FILE)
+    dirs = sensor_dirs(SENSOR, params.get("output_root"))
+
+    df = engineer_seismic_features(
+        load_or_create_geophone_data(data_file), b_value_method=params.get("b_value_method", "least_squares")
+    )
+    df.to_csv(get_next_filename(dirs["analysis"], "processed_geophone_data", ".csv"), index=False)
+
+    alerts_df = generate_rockfall_alerts(df)
+    if len(alerts_df) > 0:
+        alerts_df.to_csv(get_next_filename(dirs["analysis"], "rockfall_alerts", ".csv"), index=False)
+
+    clustering = cluster_seismic_events(
+        df,
+        eps=params.get("dbscan_eps", 50.0),
+        min_samples=params.get("dbscan_min_samples", 5),
+        n_zones=params.get("n_zones", 5)
+    )
+
+    models = preloaded_models(params, MODEL_FILES)
+    model_performance = train_models(df, dirs["analysis"]) if params.get("train_models", not models) else {}
+    predictions = score_events(df, models) if models else pd.DataFrame()
+
+    stored_rows = store_pipeline_frames(params, SENSOR, {"features": df, "predictions": predictions})
+
+    results = {
+        "sensor": SENSOR,
+        "input_file": data_file,
+        "summary": {
+            "total_events": len(df),
+            "date_range": {"start": df["timestamp"].min(), "end": df["timestamp"].max()},
+            "mean_magnitude_mms": df["event_magnitude_mms"].mean(),
+            "max_richter": df["richter_scale"].max(),
+            "mean_b_value": df["local_b_value"].mean(),
+            "cumulative_energy": df["cumulative_energy"].iloc[-1],
+            "risk_distribution": df["risk_level"].value_counts().to_dict(),
+        },
+        "clustering": {
+            "n_dbscan_clusters": clustering["n_dbscan_clusters"],
+            "n_noise": clustering["n_noise"],
+            "zone_centers": clustering["zone_centers"],
+        },
+        "alert_counts": alerts_df["alert_level"].value_counts().to_dict() if len(alerts_df) else {},
+        "alerts": alerts_df.tail(50).to_dict("records") if len(alerts_df) else [],
+        "model_performance": model_performance,
+        "model_predictions": {
+            "anomalies": int(predictions["anomaly"].sum()),
+            "predicted_risk_distribution": predictions["predicted_risk_level"].value_counts().to_dict(),
+            "latest": predictions.tail(20).to_dict("records"),
+        } if len(predictions) else {},
+    }
+    results["stored_rows"] = stored_rows
+    results["artifacts"] = {"report": save_json(results, dirs["analysis"], "geophone_analysis_report")}
+    return to_serializable(results)
@@ -0,0 +1,258 @@
+"""
+Cached interpolation operators for risk maps
+============================================
+
+Monitoring points (GB-InSAR pixels, piezometers, extensometers) sit at a
+fixed layout, so interpolating their values onto a map grid is a linear
+map that only depends on that layout. It is built once per site and
+layout as a sparse (grid cells x points) weight matrix:
+
+- ``linear``: barycentric weights of a single Delaunay triangulation
+  (cells outside the convex hull are left empty), or
+- ``idw``: inverse-distance weights of the ``k`` nearest points.
+
+Every further time step or risk field is then one sparse matrix product,
+for all time steps at once, instead of a new triangulation per frame.
+Operators are cached in memory and as ``.npz`` files per site.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import Delaunay, cKDTree
+
+from .common import get_next_filename
+
+logger = logging.getLogger(__name__)
+
+GRID_SHAPE = (100, 100)  # (ny, nx) cells
+GRID_PADDING = 0.05  # fraction of the layout extent added around it
+IDW_NEIGHBOURS = 8
+IDW_POWER = 2.0
+MAX_CACHED_OPERATORS = 32
+INTERPOLATION_METHODS = ("linear", "idw")
+
+
+class InterpolationOperator:
+    """Sparse weights from a fixed monitoring-point layout onto a regular grid."""
+
+    def __init__(self, points: np.ndarray, weights: sparse.csr_matrix, grid_x: np.ndarray, grid_y: np.ndarray,
+                 method: str):
+        self.points = points
+        self.weights = weights
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.method = method
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.grid_y), len(self.grid_x)
+
+    @classmethod
+    def build(cls, points: np.ndarray, method: str = "linear", shape: Tuple[int, int] = GRID_SHAPE,
+              k: int = IDW_NEIGHBOURS, power: float = IDW_POWER) -> "InterpolationOperator":
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"Unknown interpolation method: {method}")
+        points = np.asarray(points, dtype=np.float64)
+        low, high = points.min(axis=0), points.max(axis=0)
+        pad = (high - low) * GRID_PADDING
+        grid_x = np.linspace(low[0] - pad[0], high[0] + pad[0], shape[1])
+        grid_y = np.linspace(low[1] - pad[1], high[1] + pad[1], shape[0])
+        xx, yy = np.meshgrid(grid_x, grid_y)
+        cells = np.column_stack([xx.ravel(), yy.ravel()])
+
+        weights = None
+        if method == "linear" and len(points) >= 3:
+            try:
+                weights = _barycentric_weights(points, cells)
+            except Exception as e:
+                # Degenerate (e.g. collinear) layouts cannot be triangulated
+                logger.error(f"Error triangulating {len(points)} monitoring points, using IDW: {e}")
+        if weights is None:
+            method = "idw"
+            weights = _idw_weights(points, cells, k, power)
+        return cls(points, weights, grid_x, grid_y, method)
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """
+        Interpolate point values (N,) or (T, N) to surfaces (ny, nx) or (T, ny, nx);
+        cells no weight reaches (outside the hull for ``linear``) are NaN. NaN
+        values (points without a reading yet) are left out and the remaining
+        weights renormalised, still with two sparse products.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        stacked = np.atleast_2d(values)
+        observed = np.isfinite(stacked)
+        numerator = self.weights @ np.where(observed, stacked, 0.0).T
+        denominator = self.weights @ observed.T.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            surfaces = numerator / denominator
+        surfaces[denominator == 0] = np.nan
+        surfaces = surfaces.T.reshape((len(stacked),) + self.shape)
+        return surfaces[0] if values.ndim == 1 else surfaces
+
+    def save(self, path: str) -> None:
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, points=self.points, data=self.weights.data, indices=self.weights.indices,
+                 indptr=self.weights.indptr, shape=np.array(self.weights.shape), grid_x=self.grid_x,
+                 grid_y=self.grid_y, method=np.array(self.method))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "InterpolationOperator":
+        with np.load(path) as data:
+            weights = sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+            return cls(data["points"], weights, data["grid_x"], data["grid_y"], str(data["method"]))
+
+
+def _barycentric_weights(points: np.ndarray, cells: np.ndarray) -> sparse.csr_matrix:
+    triangulation = Delaunay(points)
+    simplex = triangulation.find_simplex(cells)
+    inside = simplex >= 0
+    # transform[s] maps a cell to the first two barycentric coordinates in triangle s
+    transform = triangulation.transform[simplex[inside]]
+    offset = cells[inside] - transform[:, 2]
+    first_two = np.einsum("nij,nj->ni", transform[:, :2], offset)
+    barycentric = np.column_stack([first_two, 1 - first_two.sum(axis=1)])
+
+    rows = np.repeat(np.flatnonzero(inside), 3)
+    columns = triangulation.simplices[simplex[inside]].ravel()
+    return sparse.csr_matrix((barycentric.ravel(), (rows, columns)), shape=(len(cells), len(points)))
+
+
+def _idw_weights(points: np.ndarray, cells: np.ndarray, k: int, power: float) -> sparse.csr_matrix:
+    k = min(k, len(points))
+    distances, neighbours = cKDTree(points).query(cells, k=k)
+    distances = distances.reshape(len(cells), k)
+    neighbours = neighbours.reshape(len(cells), k)
+    with np.errstate(divide="ignore"):
+        weights = 1.0 / distances ** power
+    # A cell on a monitoring point takes its value exactly
+    exact = ~np.isfinite(weights)
+    weights[exact.any(axis=1)] = 0.0
+    weights[exact] = 1.0
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    rows = np.repeat(np.arange(len(cells)), k)
+    return sparse.csr_matrix((weights.ravel(), (rows, neighbours.ravel())), shape=(len(cells), len(points)))
+
+
+_OPERATORS: "OrderedDict[str, InterpolationOperator]" = OrderedDict()
+
+
+def layout_key(site_id: Any, points: np.ndarray, method: str, shape: Tuple[int, int]) -> str:
+    digest = hashlib.sha256(np.ascontiguousarray(points, dtype=np.float64).tobytes())
+    digest.update(f"{site_id}|{method}|{shape[0]}x{shape[1]}|{IDW_NEIGHBOURS}|{IDW_POWER}".encode())
+    return digest.hexdigest()[:16]
+
+
+def operator_for(site_id: Any, points: np.ndarray, method: str = "linear", shape: Tuple[int, int] = GRID_SHAPE,
+                 cache_dir: Optional[str] = None) -> InterpolationOperator:
+    """The site's operator for this point layout, from memory, ``cache_dir`` or built once."""
+    key = layout_key(site_id, points, method, shape)
+    operator = _OPERATORS.get(key)
+    if operator is not None:
+        _OPERATORS.move_to_end(key)
+        return operator
+
+    path = os.path.join(cache_dir, f"{site_id}-{key}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            operator = InterpolationOperator.load(path)
+        except Exception as e:
+            logger.error(f"Error loading interpolation operator {path}: {e}")
+    if operator is None:
+        operator = InterpolationOperator.build(points, method, shape)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            operator.save(path)
+
+    _OPERATORS[key] = operator
+    if len(_OPERATORS) > MAX_CACHED_OPERATORS:
+        _OPERATORS.popitem(last=False)
+    return operator
+
+
+def risk_evolution(frame: pd.DataFrame, value_column: str, site_id: Any = "default", freq: str = "D",
+                   method: str = "linear", shape: Tuple[int, int] = GRID_SHAPE,
+                   cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Risk surfaces per time step: each point holds its latest value up to the
+    step (points not yet read are left out) and all steps are interpolated
+    with the layout's cached operator in one product.
+    """
+    data = frame[["timestamp", "coord_x", "coord_y", value_column]].dropna(subset=["coord_x", "coord_y"])
+    coordinates = data[["coord_x", "coord_y"]].to_numpy(dtype=np.float64)
+    points, point_index = np.unique(coordinates, axis=0, return_inverse=True)
+
+    steps = pd.to_datetime(data["timestamp"]).dt.floor(freq)
+    values = (
+        pd.DataFrame({"step": steps.to_numpy(), "point": point_index.ravel(), "value": data[value_column].to_numpy()})
+        .pivot_table(index="step", columns="point", values="value", aggfunc="last")
+        .reindex(columns=range(len(points)))
+        .ffill()
+    )
+
+    operator = operator_for(site_id, points, method, shape, cache_dir)
+    return {
+        "times": values.index.to_numpy(),
+        "grid_x": operator.grid_x,
+        "grid_y": operator.grid_y,
+        "points": points,
+        "surfaces": operator.apply(values.to_numpy(dtype=np.float64)),
+        "method": operator.method,
+    }
+
+
+def summarize_risk_evolution(evolution: Dict[str, Any], path: Optional[str] = None) -> Dict[str, Any]:
+    """Peak cell of the latest surface and per-step maxima; optionally saves the surfaces."""
+    surfaces = evolution["surfaces"]
+    if path:
+        np.savez_compressed(path, surfaces=surfaces.astype(np.float32), times=evolution["times"].astype(str),
+                            grid_x=evolution["grid_x"], grid_y=evolution["grid_y"], points=evolution["points"])
+    latest = surfaces[-1]
+    summary = {
+        "method": evolution["method"],
+        "grid_shape": list(latest.shape),
+        "monitoring_points": len(evolution["points"]),
+        "time_steps": len(surfaces),
+        "step_max": [None if np.isnan(step).all() else float(np.nanmax(step)) for step in surfaces],
+        "artifact": path,
+    }
+    if not np.isnan(latest).all():
+        row, column = np.unravel_index(np.nanargmax(latest), latest.shape)
+        summary["latest_peak"] = {
+            "time": str(evolution["times"][-1]),
+            "x": float(evolution["grid_x"][column]),
+            "y": float(evolution["grid_y"][row]),
+            "value": float(latest[row, column]),
+        }
+    return summary
+
+
+def pipeline_risk_map(frame: pd.DataFrame, value_column: str, params: Dict[str, Any],
+                      analysis_dir: str) -> Dict[str, Any]:
+    """
+    Risk evolution of a pipeline run, surfaces saved next to its other artefacts.
+    Recognised params: risk_map (default True), risk_map_method, risk_map_freq, site_id.
+    """
+    if not params.get("risk_map", True) or len(frame) == 0:
+        return {}
+    try:
+        evolution = risk_evolution(
+            frame, value_column, params.get("site_id", "default"), params.get("risk_map_freq", "D"),
+            params.get("risk_map_method", "linear"), cache_dir=os.path.join(analysis_dir, "interpolation")
+        )
+        return summarize_risk_evolution(evolution, get_next_filename(analysis_dir, "risk_surfaces", ".npz"))
+    except Exception as e:
+        logger.error(f"Error building risk map from {value_column}: {e}")
+        return {}
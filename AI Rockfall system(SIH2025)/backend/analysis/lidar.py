@@ -0,0 +1,906 @@
+"""
+LiDAR rockfall analysis pipeline
+================================
+
+Importable version of LiDAR_Rockfall_Prediction.ipynb: LAS loading,
+preprocessing, voxelization, DEM creation, feature extraction, DBSCAN
+clustering, run logging and risk prediction.
+
+Large survey tiles are processed out-of-core: points are streamed with
+``laspy.open(...).chunk_iterator`` into mergeable voxel/DEM aggregates and
+a reservoir sample (see lidar_stream), so peak memory follows the chunk
+size rather than the file size.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import laspy
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+from scipy.stats import binned_statistic_2d
+
+from .change_detection import EpochStore
+from .clustering import TILE_POINTS, InMemoryTiles, PointTiles, SpilledTiles, cluster_tiles, loose_rock_clusters
+from .common import (
+    DATA_DIR, file_sha256, get_next_filename, resolve_input_file, results_root, save_json, sensor_dirs,
+    to_serializable
+)
+from .geometry import GEOMETRY_FIELDS, local_plane_geometry, summarize_geometry
+from .outliers import radius_outlier_mask, statistical_outlier_mask
+from .lidar_stream import GridAccumulator, ReservoirSampler, RunningStats, VoxelAccumulator
+from .results_store import ResultsStore
+from .voxel_store import VoxelStore
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "lidar"
+DEFAULT_DATA_FILE = os.path.join(DATA_DIR, "RealWorld_OpenPit_Mine.las")
+
+POINT_FIELDS = ("x", "y", "z", "intensity", "return_number", "classification")
+DEFAULT_CHUNK_SIZE = 1_000_000
+STREAMING_THRESHOLD_POINTS = 5_000_000  # files above this use the chunked pipeline
+
+
+def extract_timestamp_from_las(las_file_path: str) -> Optional[datetime]:
+    """Extract timestamp from LAS header, falling back to a date in the filename."""
+    try:
+        with laspy.open(las_file_path) as las_file:
+            creation_date = getattr(las_file.header, "creation_date", None)
+            if creation_date:
+                return creation_date
+
+        filename = os.path.basename(las_file_path)
+        for pattern in (r"(\d{4})(\d{2})(\d{2})", r"(\d{4})-(\d{2})-(\d{2})", r"(\d{4})_(\d{2})_(\d{2})"):
+            match = re.search(pattern, filename)
+            if match:
+                year, month, day = match.groups()
+                return datetime(int(year), int(month), int(day))
+    except Exception as e:
+        logger.warning(f"Could not extract timestamp from {las_file_path}: {e}")
+
+    return None
+
+
+class LiDARDataLoader:
+    """LiDAR data loading and metadata extraction."""
+
+    def __init__(self, las_file_path: str):
+        if not os.path.exists(las_file_path):
+            raise FileNotFoundError(f"LAS file not found: {las_file_path}")
+
+        self.las_file_path = las_file_path
+        self.metadata: Dict[str, Any] = {}
+        self.current_data: Optional[Dict[str, np.ndarray]] = None
+
+    def load_metadata(self) -> Dict[str, Any]:
+        """Load metadata from the LAS header."""
+        try:
+            with laspy.open(self.las_file_path) as las_file:
+                header = las_file.header
+                x_extent = header.x_max - header.x_min
+                y_extent = header.y_max - header.y_min
+
+                self.metadata = {
+                    "file_path": self.las_file_path,
+                    "file_size_mb": os.path.getsize(self.las_file_path) / 1024 / 1024,
+                    "point_count": header.point_count,
+                    "creation_date": extract_timestamp_from_las(self.las_file_path),
+                    "x_min": header.x_min, "x_max": header.x_max,
+                    "y_min": header.y_min, "y_max": header.y_max,
+                    "z_min": header.z_min, "z_max": header.z_max,
+                    "z_range": header.z_max - header.z_min,
+                    "area_km2": x_extent * y_extent / 1_000_000,
+                    "point_density_per_m2": header.point_count / (x_extent * y_extent) if x_extent * y_extent > 0 else 0.0,
+                }
+        except Exception as e:
+            logger.error(f"Error reading LAS metadata {self.las_file_path}: {e}")
+            self.metadata = {"error": str(e)}
+
+        return self.metadata
+
+    @staticmethod
+    def _extract_fields(points) -> Dict[str, np.ndarray]:
+        dimension_names = set(points.point_format.dimension_names)
+        return {
+            name: np.asarray(getattr(points, name))
+            for name in POINT_FIELDS
+            if name in ("x", "y", "z") or name in dimension_names
+        }
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Yield point arrays chunk by chunk without reading the whole file."""
+        with laspy.open(self.las_file_path) as las_file:
+            for points in las_file.chunk_iterator(chunk_size):
+                yield self._extract_fields(points)
+
+    def load_point_cloud(self, max_points: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Load point cloud arrays, optionally reservoir-sampled to max_points while streaming."""
+        with laspy.open(self.las_file_path) as las_file:
+            n_points = las_file.header.point_count
+
+        if max_points and n_points > max_points:
+            sampler = ReservoirSampler(max_points, seed)
+            for chunk in self.iter_chunks(chunk_size):
+                sampler.update(chunk)
+            data = sampler.get_sample()
+        else:
+            data = self._extract_fields(laspy.read(self.las_file_path))
+
+        self.current_data = data
+        logger.info(f"Loaded {len(data['x']):,} LiDAR points from {os.path.basename(self.las_file_path)}")
+        return data
+
+
+class PointCloudPreprocessor:
+    """Point cloud outlier removal, ground classification and subsampling."""
+
+    def __init__(self, point_cloud_data: Dict[str, np.ndarray]):
+        self.original_data = point_cloud_data.copy()
+        self.processed_data = point_cloud_data.copy()
+        self.filters_applied: List[str] = []
+
+    def _apply_mask(self, mask: np.ndarray) -> None:
+        for key in self.processed_data:
+            self.processed_data[key] = self.processed_data[key][mask]
+
+    def remove_outliers(self, method: str = "statistical", **kwargs) -> "PointCloudPreprocessor":
+        """Remove outliers using z-score, IQR, percentile, radius or SOR (mean kNN distance) methods."""
+        x, y, z = self.processed_data["x"], self.processed_data["y"], self.processed_data["z"]
+
+        if method == "statistical":
+            z_threshold = kwargs.get("z_threshold", 3.0)
+            mask = np.abs((z - np.mean(z)) / np.std(z)) < z_threshold
+        elif method == "iqr":
+            q1, q3 = np.percentile(z, [25, 75])
+            multiplier = kwargs.get("iqr_multiplier", 1.5)
+            mask = (z >= q1 - multiplier * (q3 - q1)) & (z <= q3 + multiplier * (q3 - q1))
+        elif method == "percentile":
+            lower, upper = np.percentile(z, [kwargs.get("lower_percentile", 1), kwargs.get("upper_percentile", 99)])
+            mask = (z >= lower) & (z <= upper)
+        elif method == "radius":
+            mask = radius_outlier_mask(
+                np.column_stack([x, y, z]),
+                radius=kwargs.get("radius", 10.0),
+                min_points=kwargs.get("min_points", 5),
+                tile_size=kwargs.get("tile_size")
+            )
+        elif method == "sor":
+            mask = statistical_outlier_mask(
+                np.column_stack([x, y, z]),
+                k=kwargs.get("k", 8),
+                std_ratio=kwargs.get("std_ratio", 2.0),
+                tile_size=kwargs.get("tile_size")
+            )
+        else:
+            raise ValueError(f"Unknown outlier removal method: {method}")
+
+        self._apply_mask(mask)
+        self.filters_applied.append(f"outlier_removal_{method}")
+        return self
+
+    def classify_ground_points(self, grid_size: float = 10.0, height_threshold: float = 3.0) -> "PointCloudPreprocessor":
+        """Flag points within height_threshold of their grid-cell minimum as ground."""
+        x, y, z = self.processed_data["x"], self.processed_data["y"], self.processed_data["z"]
+
+        n_x = max(int(np.ceil((x.max() - x.min()) / grid_size)), 1)
+        n_y = max(int(np.ceil((y.max() - y.min()) / grid_size)), 1)
+        grid_x = np.clip(np.floor((x - x.min()) / grid_size).astype(int), 0, n_x - 1)
+        grid_y = np.clip(np.floor((y - y.min()) / grid_size).astype(int), 0, n_y - 1)
+        linear_indices = grid_y * n_x + grid_x
+
+        grid_min_elevations = np.full(n_x * n_y, np.inf)
+        np.minimum.at(grid_min_elevations, linear_indices, z)
+
+        ground_mask = (z - grid_min_elevations[linear_indices]) <= height_threshold
+        self.processed_data["ground_classification"] = ground_mask.astype(int)
+        return self
+
+    def filter_by_elevation_range(self, min_elevation: Optional[float] = None,
+                                  max_elevation: Optional[float] = None) -> "PointCloudPreprocessor":
+        """Keep points within [min_elevation, max_elevation]."""
+        z = self.processed_data["z"]
+        min_elevation = z.min() if min_elevation is None else min_elevation
+        max_elevation = z.max() if max_elevation is None else max_elevation
+
+        self._apply_mask((z >= min_elevation) & (z <= max_elevation))
+        self.filters_applied.append(f"elevation_filter_{min_elevation}_{max_elevation}")
+        return self
+
+    def subsample_points(self, target_count: Optional[int] = None, method: str = "random",
+                         seed: Optional[int] = None) -> "PointCloudPreprocessor":
+        """Subsample points to reduce density."""
+        current_count = len(self.processed_data["x"])
+        if target_count is None or target_count >= current_count:
+            return self
+
+        if method == "random":
+            indices = np.random.default_rng(seed).choice(current_count, target_count, replace=False)
+        elif method == "uniform":
+            indices = np.arange(0, current_count, current_count // target_count)[:target_count]
+        else:
+            raise ValueError(f"Unknown subsampling method: {method}")
+
+        self._apply_mask(indices)
+        self.filters_applied.append(f"subsample_{method}_{target_count}")
+        return self
+
+    def get_processed_data(self) -> Dict[str, np.ndarray]:
+        """Get the processed point cloud data."""
+        return self.processed_data.copy()
+
+    def get_processing_summary(self) -> Dict[str, Any]:
+        """Get a summary of processing steps applied."""
+        original_count = len(self.original_data["x"])
+        processed_count = len(self.processed_data["x"])
+        return {
+            "original_count": original_count,
+            "processed_count": processed_count,
+            "reduction_percentage": (1 - processed_count / original_count) * 100 if original_count else 0.0,
+            "filters_applied": self.filters_applied.copy(),
+            "data_keys": list(self.processed_data.keys()),
+        }
+
+
+class OptimizedVoxelGrid:
+    """Voxelization and DEM gridding for large-scale LiDAR data."""
+
+    def __init__(self, point_cloud_data: Dict[str, np.ndarray], voxel_size: float = 25.0):
+        self.point_cloud_data = {
+            key: np.asarray(val, dtype=np.float64) if key in ("x", "y", "z") else val
+            for key, val in point_cloud_data.items()
+        }
+        self.voxel_size = voxel_size
+        self.voxel_grid: Optional[VoxelStore] = None
+        self.grid_info: Dict[str, Any] = {}
+
+    def create_voxel_grid(self) -> VoxelStore:
+        """Create 3D voxel grid with per-voxel elevation/intensity statistics."""
+        self.voxel_grid = VoxelStore.from_points(
+            self.point_cloud_data["x"], self.point_cloud_data["y"], self.point_cloud_data["z"],
+            self.voxel_size, intensity=self.point_cloud_data.get("intensity")
+        )
+        self.grid_info = self.voxel_grid.summary()
+        return self.voxel_grid
+
+    @classmethod
+    def from_accumulator(cls, point_cloud_data: Dict[str, np.ndarray],
+                         accumulator: VoxelAccumulator) -> "OptimizedVoxelGrid":
+        """Build the voxel grid from streamed aggregates; point_cloud_data is the point sample."""
+        grid = cls(point_cloud_data, voxel_size=accumulator.voxel_size)
+        grid.voxel_grid = accumulator.to_store()
+        grid.grid_info = grid.voxel_grid.summary()
+        return grid
+
+    def create_2d_dem(self, resolution: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Create 2D Digital Elevation Model (mean elevation per cell)."""
+        resolution = max(resolution or self.voxel_size, 15.0)  # Minimum 15m resolution
+        x, y, z = self.point_cloud_data["x"], self.point_cloud_data["y"], self.point_cloud_data["z"]
+        x_min, x_max, y_min, y_max = x.min(), x.max(), y.min(), y.max()
+
+        n_x = max(int(np.ceil((x_max - x_min) / resolution)), 1)
+        n_y = max(int(np.ceil((y_max - y_min) / resolution)), 1)
+        dem, _, _, _ = binned_statistic_2d(
+            x, y, z, statistic="mean",
+            bins=[np.linspace(x_min, x_max, n_x + 1), np.linspace(y_min, y_max, n_y + 1)]
+        )
+
+        return dem, summarize_dem(dem, resolution, (x_min, x_max, y_min, y_max))
+
+
+def summarize_dem(dem: np.ndarray, resolution: float, bounds: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    """Build the dem_info dictionary for a (n_x, n_y) mean-elevation grid."""
+    n_x, n_y = dem.shape
+    valid_cells = int(np.sum(~np.isnan(dem)))
+    return {
+        "resolution": resolution,
+        "dimensions": (n_x, n_y),
+        "bounds": bounds,
+        "valid_cells": valid_cells,
+        "total_cells": n_x * n_y,
+        "coverage_percentage": valid_cells / (n_x * n_y) * 100,
+        "elevation_range": (np.nanmin(dem), np.nanmax(dem)) if valid_cells else (0.0, 0.0),
+        "mean_elevation": np.nanmean(dem) if valid_cells else 0.0,
+    }
+
+
+class StreamingLiDARProcessor:
+    """Out-of-core preprocessing, voxelization and DEM creation over LAS chunks."""
+
+    def __init__(self, loader: LiDARDataLoader, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.loader = loader
+        self.chunk_size = chunk_size
+        self.processing_summary: Dict[str, Any] = {}
+        self.tiles: Optional[SpilledTiles] = None
+
+    def process(self, z_threshold: float = 3.0, ground_grid_size: float = 10.0,
+                ground_height_threshold: float = 3.0, target_points: int = 30000,
+                voxel_size: float = 25.0, dem_resolution: Optional[float] = None,
+                seed: Optional[int] = None, spill_dir: Optional[str] = None
+                ) -> Tuple[Dict[str, np.ndarray], OptimizedVoxelGrid, np.ndarray, Dict[str, Any]]:
+        """
+        Stream the file twice: once for the elevation moments used by the z-score
+        outlier filter, then to aggregate voxel/DEM/ground-grid statistics and
+        reservoir-sample the kept points.
+
+        Returns the point sample (with ground_classification), the voxel grid
+        built from the full-resolution aggregates, the DEM and dem_info. With
+        ``spill_dir`` the kept points are also written there as xy tiles
+        (``self.tiles``) for full-resolution clustering.
+        """
+        with laspy.open(self.loader.las_file_path) as las_file:
+            header = las_file.header
+            x_min, x_max, y_min, y_max = header.x_min, header.x_max, header.y_min, header.y_max
+
+        # Pass 1: global elevation moments
+        z_stats = RunningStats()
+        for chunk in self.loader.iter_chunks(self.chunk_size):
+            z_stats.update(chunk["z"])
+        if z_stats.count == 0:
+            raise ValueError(f"No points in {self.loader.las_file_path}")
+
+        z_mean, z_std = z_stats.mean, z_stats.std
+        z_low = max(z_stats.min, z_mean - z_threshold * z_std)
+        z_high = min(z_stats.max, z_mean + z_threshold * z_std)
+        dimensions = tuple(
+            max(int(np.ceil((high - low) / voxel_size)), 1)
+            for low, high in ((x_min, x_max), (y_min, y_max), (z_low, z_high))
+        )
+        resolution = max(dem_resolution or voxel_size, 15.0)  # Minimum 15m resolution
+
+        voxel_acc = VoxelAccumulator((x_min, y_min, z_low), dimensions, voxel_size)
+        dem_acc = GridAccumulator((x_min, x_max, y_min, y_max), resolution)
+        ground_acc = GridAccumulator((x_min, x_max, y_min, y_max), ground_grid_size)
+        sampler = ReservoirSampler(target_points, seed)
+        if spill_dir:
+            area = max((x_max - x_min) * (y_max - y_min), 1e-9)
+            tile_size = np.sqrt(area * TILE_POINTS / z_stats.count) if z_stats.count > TILE_POINTS else \
+                max(x_max - x_min, y_max - y_min) + 1.0
+            self.tiles = SpilledTiles(spill_dir, (x_min, y_min), tile_size)
+
+        # Pass 2: filter each chunk, then fold it into every aggregate
+        kept_count = 0
+        for chunk in self.loader.iter_chunks(self.chunk_size):
+            if z_std > 0:
+                mask = np.abs((chunk["z"] - z_mean) / z_std) < z_threshold
+                chunk = {key: values[mask] for key, values in chunk.items()}
+            kept_count += len(chunk["x"])
+            voxel_acc.update(chunk)
+            dem_acc.update(chunk)
+            ground_acc.update(chunk)
+            sampler.update(chunk)
+            if self.tiles is not None:
+                self.tiles.add(np.column_stack([chunk["x"], chunk["y"], chunk["z"]]))
+
+        sample = sampler.get_sample()
+        ground_mask = (sample["z"] - ground_acc.min_at(sample["x"], sample["y"])) <= ground_height_threshold
+        sample["ground_classification"] = ground_mask.astype(int)
+
+        voxel_processor = OptimizedVoxelGrid.from_accumulator(sample, voxel_acc)
+        dem = dem_acc.mean_grid()
+        dem_info = summarize_dem(dem, resolution, (x_min, x_max, y_min, y_max))
+
+        self.processing_summary = {
+            "original_count": z_stats.count,
+            "processed_count": kept_count,
+            "sample_count": len(sample["x"]),
+            "reduction_percentage": (1 - kept_count / z_stats.count) * 100,
+            "filters_applied": ["outlier_removal_statistical", f"subsample_reservoir_{target_points}"],
+            "data_keys": list(sample.keys()),
+            "streaming": True,
+            "chunk_size": self.chunk_size,
+        }
+        logger.info(
+            f"Streamed {z_stats.count:,} points ({kept_count:,} kept) from "
+            f"{os.path.basename(self.loader.las_file_path)} in chunks of {self.chunk_size:,}"
+        )
+        return sample, voxel_processor, dem, dem_info
+
+
+class FeatureExtractor:
+    """Feature extraction for rockfall prediction."""
+
+    def __init__(self, point_cloud_data: Dict[str, np.ndarray], dem: np.ndarray,
+                 dem_info: Dict[str, Any], voxel_grid: Optional[VoxelStore]):
+        self.point_cloud_data = {key: np.asarray(val).astype(np.float64) for key, val in point_cloud_data.items()}
+        self.dem = dem
+        self.dem_info = dem_info
+        self.voxel_grid = voxel_grid
+        self.features: Dict[str, Any] = {}
+        self.point_geometry: Dict[str, np.ndarray] = {}
+        self.slope_map: Optional[np.ndarray] = None
+
+    def calculate_basic_metrics(self) -> Dict[str, Any]:
+        """Calculate basic point cloud metrics."""
+        x, y, z = self.point_cloud_data["x"], self.point_cloud_data["y"], self.point_cloud_data["z"]
+        x_range, y_range, z_range = np.ptp(x), np.ptp(y), np.ptp(z)
+        area = x_range * y_range
+
+        basic_metrics = {
+            "point_count": len(x),
+            "x_min": float(x.min()), "x_max": float(x.max()),
+            "y_min": float(y.min()), "y_max": float(y.max()),
+            "z_min": float(z.min()), "z_max": float(z.max()),
+            "z_range": float(z_range),
+            "mean_elevation": float(np.mean(z)),
+            "std_elevation": float(np.std(z)),
+            "area_m2": float(area),
+            "volume_estimation": float(area * z_range),
+            "point_density_per_m2": float(len(x) / area) if area > 0 else 0.0,
+        }
+        self.features.update(basic_metrics)
+        return basic_metrics
+
+    def calculate_slope_metrics(self) -> Dict[str, float]:
+        """Calculate slope and aspect statistics from the DEM."""
+        if np.all(np.isnan(self.dem)):
+            return self._calculate_point_based_slopes()
+
+        grad_y, grad_x = np.gradient(np.nan_to_num(self.dem, nan=0), self.dem_info["resolution"])
+        slope_magnitude = np.degrees(np.arctan(np.hypot(grad_x, grad_y)))
+        slope_direction = (np.degrees(np.arctan2(grad_y, grad_x)) + 360) % 360
+
+        mask = ~np.isnan(self.dem)
+        slope_valid = slope_magnitude[mask]
+        aspect_valid = slope_direction[mask]
+
+        slope_metrics = {
+            "slope_max": float(np.max(slope_valid)),
+            "slope_mean": float(np.mean(slope_valid)),
+            "slope_std": float(np.std(slope_valid)),
+            "slope_direction_mean": float(np.mean(aspect_valid)),
+            "slope_direction_std": float(np.std(aspect_valid)),
+        }
+        self.features.update(slope_metrics)
+        return slope_metrics
+
+    def calculate_point_geometry(self, k: int = 16, max_radius: Optional[float] = None) -> Dict[str, float]:
+        """Per-point slope/aspect/curvature/roughness/planarity for the whole cloud."""
+        points = np.column_stack([self.point_cloud_data["x"], self.point_cloud_data["y"], self.point_cloud_data["z"]])
+        self.point_geometry = local_plane_geometry(points, k=k, max_radius=max_radius)
+
+        geometry_metrics = summarize_geometry(self.point_geometry)
+        self.features.update(geometry_metrics)
+        return geometry_metrics
+
+    def create_slope_map(self) -> np.ndarray:
+        """Rasterize per-point slope onto the DEM grid (mean slope per cell)."""
+        if not self.point_geometry:
+            self.calculate_point_geometry()
+        x_min, x_max, y_min, y_max = self.dem_info["bounds"]
+        n_x, n_y = self.dem_info["dimensions"]
+        slope = self.point_geometry["slope"]
+        valid = ~np.isnan(slope)
+        self.slope_map, _, _, _ = binned_statistic_2d(
+            self.point_cloud_data["x"][valid], self.point_cloud_data["y"][valid], slope[valid],
+            statistic="mean",
+            bins=[np.linspace(x_min, x_max, n_x + 1), np.linspace(y_min, y_max, n_y + 1)]
+        )
+        return self.slope_map
+
+    def _calculate_point_based_slopes(self) -> Dict[str, float]:
+        """Slope statistics from per-point plane fits when no DEM cells are valid."""
+        if not self.point_geometry:
+            self.calculate_point_geometry()
+        slope = self.point_geometry["slope"]
+        aspect = self.point_geometry["aspect"]
+        has_slopes = bool(np.any(~np.isnan(slope)))
+
+        slope_metrics = {
+            "slope_max": float(np.nanmax(slope)) if has_slopes else 0.0,
+            "slope_mean": float(np.nanmean(slope)) if has_slopes else 0.0,
+            "slope_std": float(np.nanstd(slope)) if has_slopes else 0.0,
+            "slope_direction_mean": float(np.nanmean(aspect)) if has_slopes else 0.0,
+            "slope_direction_std": float(np.nanstd(aspect)) if has_slopes else 0.0,
+        }
+        self.features.update(slope_metrics)
+        return slope_metrics
+
+    def calculate_surface_roughness(self) -> Dict[str, float]:
+        """Calculate plane-fit residual roughness and DEM local roughness."""
+        x, y, z = self.point_cloud_data["x"], self.point_cloud_data["y"], self.point_cloud_data["z"]
+        z_range = np.ptp(z)
+
+        try:
+            A = np.column_stack([x - x.mean(), y - y.mean(), np.ones(len(x))])
+            plane_params = np.linalg.lstsq(A, z - z.mean(), rcond=None)[0]
+            fitted_z = plane_params[0] * (x - x.mean()) + plane_params[1] * (y - y.mean()) + z.mean()
+            surface_roughness = float(np.std(z - fitted_z))
+        except np.linalg.LinAlgError:
+            surface_roughness = float(np.std(z))
+
+        local_roughness = 0.0
+        if not np.all(np.isnan(self.dem)):
+            local_std = ndimage.generic_filter(self.dem, np.nanstd, size=3)
+            local_roughness = float(np.nanmean(local_std))
+
+        roughness_metrics = {
+            "surface_roughness": surface_roughness,
+            "local_roughness": local_roughness,
+            "roughness_coefficient": surface_roughness / z_range if z_range > 0 else 0.0,
+        }
+        self.features.update(roughness_metrics)
+        return roughness_metrics
+
+    def calculate_curvature_metrics(self) -> Dict[str, float]:
+        """Calculate mean and Gaussian curvature statistics from the DEM."""
+        if np.all(np.isnan(self.dem)):
+            curvature_metrics = {"curvature_mean": 0.0, "curvature_max": 0.0,
+                                 "curvature_std": 0.0, "gaussian_curvature_mean": 0.0}
+            self.features.update(curvature_metrics)
+            return curvature_metrics
+
+        resolution = self.dem_info["resolution"]
+        grad_y, grad_x = np.gradient(np.nan_to_num(self.dem, nan=0), resolution)
+        grad_xx, _ = np.gradient(grad_x, resolution)
+        grad_xy, grad_yy = np.gradient(grad_y, resolution)
+
+        mask = ~np.isnan(self.dem)
+        mean_curvature = (0.5 * (grad_xx + grad_yy))[mask]
+        gaussian_curvature = (grad_xx * grad_yy - grad_xy ** 2)[mask]
+
+        curvature_metrics = {
+            "curvature_mean": float(np.mean(np.abs(mean_curvature))),
+            "curvature_max": float(np.max(np.abs(mean_curvature))),
+            "curvature_std": float(np.std(mean_curvature)),
+            "gaussian_curvature_mean": float(np.mean(gaussian_curvature)),
+        }
+        self.features.update(curvature_metrics)
+        return curvature_metrics
+
+    def calculate_voxel_features(self) -> Dict[str, Any]:
+        """Calculate features from voxel grid statistics."""
+        if not self.voxel_grid:
+            return {}
+
+        store = self.voxel_grid
+        point_counts = store.columns["point_count"]
+        elevation_stds = store.columns["std_elevation"]
+
+        # Overhangs: empty voxel directly below, but occupied voxels lower in the same column
+        vx, vy, vz = store.indices()
+        n_x, n_y, _ = store.dimensions
+        _, column = np.unique(vy * n_x + vx, return_inverse=True)
+        column_floor = np.full(column.max() + 1, np.iinfo(np.int64).max)
+        np.minimum.at(column_floor, column, vz)
+        overhangs = (store.neighbor_rows((0, 0, -1)) < 0) & (vz > column_floor[column])
+
+        voxel_features = {
+            "number_of_clusters": len(store),
+            "cluster_z_variance_mean": float(np.mean(elevation_stds)),
+            "cluster_z_variance_max": float(np.max(elevation_stds)),
+            "high_risk_voxel_count": int(np.sum(elevation_stds > np.percentile(elevation_stds, 75))),
+            "mean_points_per_voxel": float(np.mean(point_counts)),
+            "voxel_density_variance": float(np.std(point_counts)),
+            "max_voxel_elevation_range": float(np.max(store.elevation_range)),
+            "overhang_voxel_count": int(np.sum(overhangs)),
+        }
+        self.features.update(voxel_features)
+        return voxel_features
+
+    def _calculate_risk_indicators(self) -> Dict[str, Any]:
+        """Calculate composite risk indicators."""
+        slope_risk = min(self.features.get("slope_max", 0) / 45.0, 1.0)
+        roughness_risk = min(self.features.get("surface_roughness", 0) / 5.0, 1.0)
+        variance_risk = min(self.features.get("cluster_z_variance_mean", 0) / 2.0, 1.0)
+
+        predicted_risk_level = slope_risk * 0.4 + roughness_risk * 0.3 + variance_risk * 0.3
+        if predicted_risk_level > 0.7:
+            risk_category = "High"
+        elif predicted_risk_level > 0.4:
+            risk_category = "Medium"
+        else:
+            risk_category = "Low"
+
+        return {
+            "slope_risk_score": slope_risk,
+            "roughness_risk_score": roughness_risk,
+            "variance_risk_score": variance_risk,
+            "predicted_risk_level": predicted_risk_level,
+            "risk_category": risk_category,
+        }
+
+    def extract_all_features(self) -> Dict[str, Any]:
+        """Extract all features for rockfall prediction."""
+        self.calculate_basic_metrics()
+        self.calculate_point_geometry()
+        self.calculate_slope_metrics()
+        self.calculate_surface_roughness()
+        self.calculate_curvature_metrics()
+        self.calculate_voxel_features()
+
+        self.features["timestamp"] = datetime.now().isoformat()
+        self.features["elevation_change"] = 0.0  # Filled by multi-epoch comparison
+        self.features.update(self._calculate_risk_indicators())
+        return self.features
+
+
+class RockfallClustering:
+    """
+    Density clustering (tiled DBSCAN or voxel HDBSCAN, see clustering) for
+    identifying potential loose rock areas. Given ``tiles`` - e.g. the
+    full-resolution cloud spilled by StreamingLiDARProcessor - it clusters
+    those instead of ``point_cloud_data``.
+    """
+
+    def __init__(self, point_cloud_data: Dict[str, np.ndarray], tiles: Optional[PointTiles] = None):
+        self.point_cloud_data = point_cloud_data
+        self.tiles = tiles
+        self.clusters: Optional[np.ndarray] = None
+        self.cluster_info: Dict[str, Any] = {}
+
+    def perform_dbscan_clustering(self, eps: Optional[float] = None, min_samples: int = 50,
+                                  method: str = "dbscan") -> Dict[str, Any]:
+        """
+        Cluster the 3D cloud with ``eps`` in metres (estimated from the
+        k-distance of the densest tile when None) and summarise each cluster.
+        """
+        tiles = self.tiles
+        if tiles is None:
+            points_3d = np.column_stack([self.point_cloud_data["x"], self.point_cloud_data["y"], self.point_cloud_data["z"]])
+            tiles = InMemoryTiles(points_3d, min_tile_size=eps or 0.0)
+        result = cluster_tiles(tiles, method=method, eps=eps, min_samples=min_samples,
+                               keep_labels=isinstance(tiles, InMemoryTiles))
+
+        if isinstance(tiles, InMemoryTiles):
+            self.clusters = np.full(len(tiles.points), -1, dtype=np.int64)
+            for key, labels in result["labels"].items():
+                self.clusters[tiles.indices(key)] = labels
+
+        statistics = result["statistics"]
+        cluster_stats = {
+            label: {
+                "point_count": int(statistics["point_count"][label]),
+                "centroid": statistics["centroid"][label],
+                "std_deviation": statistics["std_deviation"][label],
+                "z_variance": float(statistics["z_variance"][label]),
+                "volume_estimation": float(statistics["volume_estimation"][label]),
+                "density": float(statistics["density"][label]),
+            }
+            for label in range(result["n_clusters"])
+        }
+
+        self.cluster_info = {
+            "method": method,
+            "eps": result["eps"],
+            "n_clusters": result["n_clusters"],
+            "n_noise": result["n_noise"],
+            "clustered_points": int(statistics["point_count"].sum()) + result["n_noise"],
+            "cluster_stats": cluster_stats,
+            "loose_rock_clusters": loose_rock_clusters(statistics).tolist(),
+        }
+        return self.cluster_info
+
+
+class AnalysisLogger:
+    """Per-run feature log (``lidar_runs`` dataset of the results store) for trend tracking."""
+
+    DATASET = "lidar_runs"
+
+    LOG_COLUMNS = [
+        "run_timestamp", "file_name", "point_count",
+        "x_min", "x_max", "y_min", "y_max", "z_min", "z_max", "z_range",
+        "mean_elevation", "std_elevation", "slope_max", "surface_roughness",
+        "number_of_clusters", "cluster_z_variance_mean", "high_risk_voxel_count",
+        "elevation_change", "slope_direction_mean", "curvature_mean", "predicted_risk_level",
+    ]
+
+    ALERT_THRESHOLDS = {
+        "slope_max": {"absolute": 10.0, "percent": 20.0},
+        "surface_roughness": {"absolute": 1.0, "percent": 30.0},
+        "predicted_risk_level": {"absolute": 0.2, "percent": 25.0},
+        "number_of_clusters": {"absolute": 5, "percent": 50.0},
+    }
+
+    def __init__(self, site_id: str = "default", store: Optional[ResultsStore] = None,
+                 results_dir: Optional[str] = None):
+        self.site_id = str(site_id)
+        self.store = store or ResultsStore(results_dir)
+
+    def log_analysis_results(self, features: Dict[str, Any], file_name: str = "current_analysis") -> Dict[str, Any]:
+        """Append one row of run features as a new part file (no read/rewrite of history)."""
+        log_entry = {column: features.get(column, 0.0) for column in self.LOG_COLUMNS}
+        log_entry["run_timestamp"] = datetime.now()
+        log_entry["file_name"] = file_name
+        try:
+            self.store.append(self.DATASET, pd.DataFrame([log_entry]), self.site_id, SENSOR,
+                              timestamp_column="run_timestamp")
+        except Exception as e:
+            logger.error(f"Error logging LiDAR run for site {self.site_id}: {e}")
+        return log_entry
+
+    def get_log_history(self, start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
+        """Retrieve logged runs, optionally limited to a time range."""
+        log_df = self.store.read(self.DATASET, self.site_id, SENSOR, start=start, end=end,
+                                 timestamp_column="run_timestamp")
+        return log_df if len(log_df) else pd.DataFrame(columns=self.LOG_COLUMNS)
+
+    def compare_recent_runs(self) -> Dict[str, Any]:
+        """Compare key metrics between the two most recent runs."""
+        log_df = self.store.tail(self.DATASET, self.site_id, SENSOR, 2, timestamp_column="run_timestamp")
+        if len(log_df) < 2:
+            return {}
+
+        latest, previous = log_df.iloc[-1], log_df.iloc[-2]
+        comparison = {
+            "latest_timestamp": latest["run_timestamp"],
+            "previous_timestamp": previous["run_timestamp"],
+            "changes": {},
+        }
+        for metric in ("slope_max", "surface_roughness", "predicted_risk_level",
+                       "mean_elevation", "elevation_change", "number_of_clusters"):
+            change = latest[metric] - previous[metric]
+            comparison["changes"][metric] = {
+                "current": latest[metric],
+                "previous": previous[metric],
+                "absolute_change": change,
+                "percent_change": change / previous[metric] * 100 if previous[metric] != 0 else 0,
+            }
+        return comparison
+
+    def generate_alerts(self) -> List[str]:
+        """Generate alerts for significant changes since the previous run."""
+        comparison = self.compare_recent_runs()
+        alerts = []
+        for metric, change_data in comparison.get("changes", {}).items():
+            thresholds = self.ALERT_THRESHOLDS.get(metric)
+            if not thresholds:
+                continue
+            if (abs(change_data["absolute_change"]) > thresholds["absolute"]
+                    or abs(change_data["percent_change"]) > thresholds["percent"]):
+                direction = "increased" if change_data["absolute_change"] > 0 else "decreased"
+                alerts.append(
+                    f"{metric} {direction} significantly: "
+                    f"{change_data['absolute_change']:.3f} ({change_data['percent_change']:.1f}%)"
+                )
+        return alerts
+
+
+def run(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full LiDAR pipeline and return JSON-serializable results.
+
+    Recognised params: input_files / input_file, max_points, z_threshold,
+    ground_grid_size, ground_height_threshold, target_points, voxel_size,
+    dem_resolution, dbscan_eps (metres; estimated when omitted),
+    dbscan_min_samples, clustering_method (dbscan or hdbscan),
+    full_resolution_clustering (default True: cluster every kept point, not
+    the target_points sample), streaming (default: files above
+    streaming_threshold points), chunk_size, seed (default 42; fixes every
+    point sample so the same file gives the same results), site_id,
+    change_detection (default True), change_threshold, output_root.
+
+    The DEM and voxel grid stored as change-detection epochs are always built
+    from every kept point (or the streamed aggregates), never from a sample.
+    """
+    las_file = resolve_input_file(params, DEFAULT_DATA_FILE)
+    dirs = sensor_dirs(SENSOR, params.get("output_root"))
+    chunk_size = params.get("chunk_size", DEFAULT_CHUNK_SIZE)
+
+    loader = LiDARDataLoader(las_file)
+    metadata = loader.load_metadata()
+    streaming = params.get(
+        "streaming",
+        metadata.get("point_count", 0) > params.get("streaming_threshold", STREAMING_THRESHOLD_POINTS)
+    )
+
+    full_resolution = params.get("full_resolution_clustering", True)
+    seed = params.get("seed", 42)
+    clustering_tiles: Optional[PointTiles] = None
+    clustering_cloud: Optional[Dict[str, np.ndarray]] = None
+
+    if streaming:
+        processor = StreamingLiDARProcessor(loader, chunk_size=chunk_size)
+        spill_dir = tempfile.mkdtemp(prefix="cluster_tiles_", dir=dirs["3d"]) if full_resolution else None
+        try:
+            processed_data, voxel_processor, dem, dem_info = processor.process(
+                z_threshold=params.get("z_threshold", 3.0),
+                ground_grid_size=params.get("ground_grid_size", 10.0),
+                ground_height_threshold=params.get("ground_height_threshold", 3.0),
+                target_points=params.get("target_points", 30000),
+                voxel_size=params.get("voxel_size", 25.0),
+                dem_resolution=params.get("dem_resolution", 15.0),
+                seed=seed,
+                spill_dir=spill_dir
+            )
+        except Exception:
+            if spill_dir:
+                shutil.rmtree(spill_dir, ignore_errors=True)
+            raise
+        clustering_tiles = processor.tiles
+        voxel_grid = voxel_processor.voxel_grid
+        processing_summary = processor.processing_summary
+    else:
+        point_cloud = loader.load_point_cloud(max_points=params.get("max_points", 50000), chunk_size=chunk_size,
+                                              seed=seed)
+
+        preprocessor = PointCloudPreprocessor(point_cloud)
+        preprocessor.remove_outliers(method="statistical", z_threshold=params.get("z_threshold", 3.0))
+        preprocessor.classify_ground_points(
+            grid_size=params.get("ground_grid_size", 10.0),
+            height_threshold=params.get("ground_height_threshold", 3.0)
+        )
+        kept_cloud = preprocessor.get_processed_data()
+        if full_resolution:
+            clustering_cloud = kept_cloud
+        preprocessor.subsample_points(target_count=params.get("target_points", 30000), method="random", seed=seed)
+        processed_data = preprocessor.get_processed_data()
+        processing_summary = preprocessor.get_processing_summary()
+
+        voxel_processor = OptimizedVoxelGrid(kept_cloud, voxel_size=params.get("voxel_size", 25.0))
+        voxel_grid = voxel_processor.create_voxel_grid()
+        dem, dem_info = voxel_processor.create_2d_dem(resolution=params.get("dem_resolution", 15.0))
+
+    extractor = FeatureExtractor(processed_data, dem, dem_info, voxel_grid)
+    features = extractor.extract_all_features()
+    slope_map = extractor.create_slope_map()
+
+    geometry_path = get_next_filename(dirs["3d"], "point_geometry", ".npz")
+    np.savez_compressed(
+        geometry_path,
+        x=processed_data["x"], y=processed_data["y"], z=processed_data["z"],
+        slope_map=slope_map, **{name: extractor.point_geometry[name] for name in GEOMETRY_FIELDS}
+    )
+
+    clustering = RockfallClustering(clustering_cloud or processed_data, tiles=clustering_tiles)
+    try:
+        cluster_info = clustering.perform_dbscan_clustering(
+            eps=params.get("dbscan_eps"),
+            min_samples=params.get("dbscan_min_samples", 30),
+            method=params.get("clustering_method", "dbscan")
+        )
+    finally:
+        if clustering_tiles is not None:
+            clustering_tiles.cleanup()
+
+    change_summary: Dict[str, Any] = {}
+    if params.get("change_detection", True):
+        epoch_store = EpochStore(os.path.join(dirs["3d"], "epochs"), str(params.get("site_id", "default")))
+        # Uploaded files carry the digest computed while streaming; only other inputs are re-read
+        epoch_store.add_epoch(dem, dem_info, voxel_grid, timestamp=metadata.get("creation_date"), source=las_file,
+                              source_hash=file_sha256(las_file))
+        change_summary = epoch_store.diff_latest(min_change=params.get("change_threshold", 0.5))
+        if change_summary:
+            features["elevation_change"] = change_summary["mean_displacement"]
+
+    run_logger = AnalysisLogger(str(params.get("site_id", "default")),
+                                results_dir=results_root(params.get("output_root")))
+    run_logger.log_analysis_results(features, os.path.basename(las_file))
+    alerts = run_logger.generate_alerts()
+
+    results = {
+        "sensor": SENSOR,
+        "input_file": las_file,
+        "metadata": metadata,
+        "processing_summary": processing_summary,
+        "grid_info": voxel_processor.grid_info,
+        "dem_info": dem_info,
+        "features": features,
+        "clustering": {
+            "method": cluster_info["method"],
+            "eps": cluster_info["eps"],
+            "clustered_points": cluster_info["clustered_points"],
+            "n_clusters": cluster_info["n_clusters"],
+            "n_noise": cluster_info["n_noise"],
+            "loose_rock_clusters": cluster_info["loose_rock_clusters"],
+        },
+        "change_detection": change_summary,
+        "risk_level": features["predicted_risk_level"],
+        "risk_category": features["risk_category"],
+        "alerts": alerts,
+    }
+    results["artifacts"] = {
+        "point_geometry": geometry_path,
+        "summary": save_json(results, dirs["analysis"], "analysis_summary"),
+    }
+    return to_serializable(results)
@@ -0,0 +1,219 @@
+"""
+Streaming aggregation primitives for out-of-core LiDAR processing
+=================================================================
+
+Mergeable per-chunk statistics used when a LAS/LAZ file is read with
+``laspy.open(...).chunk_iterator``: running moments, reservoir sampling,
+sparse voxel aggregates and dense 2D grid (DEM) aggregates. Every
+accumulator's memory is bounded by its output size (sample size, occupied
+voxels, grid cells), never by the number of points streamed through it.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .voxel_store import VoxelStore, reduce_by_key
+
+
+class RunningStats:
+    """Count/mean/variance/min/max over streamed values (Chan et al. parallel merge)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray) -> "RunningStats":
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return self
+        other = RunningStats()
+        other.count = values.size
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        return self.merge(other)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation (matches np.std)."""
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+
+class ReservoirSampler:
+    """Uniform fixed-size sample of a stream of point chunks (vectorized Algorithm R)."""
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        self.size = int(size)
+        self.seen = 0
+        self.sample: Dict[str, np.ndarray] = {}
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, chunk: Dict[str, np.ndarray]) -> "ReservoirSampler":
+        n = len(chunk["x"])
+        if n == 0 or self.size == 0:
+            return self
+        if not self.sample:
+            self.sample = {key: np.empty(self.size, dtype=np.asarray(values).dtype)
+                           for key, values in chunk.items()}
+
+        # Fill phase: the first `size` points go straight into the reservoir
+        take = min(max(self.size - self.seen, 0), n)
+        if take:
+            for key, values in chunk.items():
+                self.sample[key][self.seen:self.seen + take] = values[:take]
+
+        # Replacement phase: point t replaces slot j ~ U[0, t] when j < size
+        if take < n:
+            src = np.arange(take, n)
+            slots = self.rng.integers(0, self.seen + src + 1)
+            keep = slots < self.size
+            src, slots = src[keep], slots[keep]
+            # Later points win when several pick the same slot, as in the sequential algorithm
+            slots, last = np.unique(slots[::-1], return_index=True)
+            src = src[::-1][last]
+            for key, values in chunk.items():
+                self.sample[key][slots] = values[src]
+
+        self.seen += n
+        return self
+
+    def get_sample(self) -> Dict[str, np.ndarray]:
+        count = min(self.seen, self.size)
+        return {key: values[:count].copy() for key, values in self.sample.items()}
+
+
+class VoxelAccumulator:
+    """Sparse per-voxel count/sum/sum-of-squares/min/max merged across chunks."""
+
+    SUM_FIELDS = ("count", "z_sum", "z_sq_sum", "i_sum", "i_sq_sum")
+
+    def __init__(self, origin: Tuple[float, float, float], dimensions: Tuple[int, int, int],
+                 voxel_size: float):
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.dimensions = tuple(int(d) for d in dimensions)
+        self.voxel_size = float(voxel_size)
+        self.has_intensity = False
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values: Dict[str, np.ndarray] = {}
+
+    def _voxel_keys(self, x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+        n_x, n_y, n_z = self.dimensions
+        vx = np.clip(np.floor((x - self.origin[0]) / self.voxel_size).astype(np.int64), 0, n_x - 1)
+        vy = np.clip(np.floor((y - self.origin[1]) / self.voxel_size).astype(np.int64), 0, n_y - 1)
+        vz = np.clip(np.floor((z - self.origin[2]) / self.voxel_size).astype(np.int64), 0, n_z - 1)
+        return (vz * n_y + vy) * n_x + vx
+
+    def update(self, chunk: Dict[str, np.ndarray]) -> "VoxelAccumulator":
+        if len(chunk["x"]) == 0:
+            return self
+        # Offsets from the origin keep sum-of-squares well conditioned
+        dz = np.asarray(chunk["z"], dtype=np.float64) - self.origin[2]
+        intensity = chunk.get("intensity")
+        self.has_intensity = self.has_intensity or intensity is not None
+        i = np.asarray(intensity, dtype=np.float64) if intensity is not None else np.zeros_like(dz)
+
+        keys = self._voxel_keys(chunk["x"], chunk["y"], chunk["z"])
+        chunk_keys, chunk_values = reduce_by_key(
+            keys,
+            {"count": np.ones_like(dz), "z_sum": dz, "z_sq_sum": dz * dz, "i_sum": i, "i_sq_sum": i * i},
+            {"z_min": dz}, {"z_max": dz}
+        )
+        return self._merge_partial(chunk_keys, chunk_values)
+
+    def _merge_partial(self, keys: np.ndarray, values: Dict[str, np.ndarray]) -> "VoxelAccumulator":
+        if not len(self.keys):
+            self.keys, self.values = keys, values
+            return self
+        all_keys = np.concatenate([self.keys, keys])
+        combined = {name: np.concatenate([self.values[name], values[name]]) for name in values}
+        self.keys, self.values = reduce_by_key(
+            all_keys,
+            {name: combined[name] for name in self.SUM_FIELDS},
+            {"z_min": combined["z_min"]}, {"z_max": combined["z_max"]}
+        )
+        return self
+
+    def merge(self, other: "VoxelAccumulator") -> "VoxelAccumulator":
+        self.has_intensity = self.has_intensity or other.has_intensity
+        return self._merge_partial(other.keys, other.values) if len(other.keys) else self
+
+    def to_store(self) -> VoxelStore:
+        """Columnar per-voxel statistics for everything streamed so far."""
+        sums = self.values or {name: np.empty(0) for name in (*self.SUM_FIELDS, "z_min", "z_max")}
+        return VoxelStore.from_sums(
+            self.keys, sums, tuple(self.origin), self.dimensions, self.voxel_size,
+            has_intensity=self.has_intensity
+        )
+
+
+class GridAccumulator:
+    """Dense 2D per-cell count/sum/min/max over streamed points (DEM and ground grids)."""
+
+    def __init__(self, bounds: Tuple[float, float, float, float], cell_size: float):
+        self.bounds = tuple(float(b) for b in bounds)
+        x_min, x_max, y_min, y_max = self.bounds
+        self.cell_size = float(cell_size)
+        self.n_x = max(int(np.ceil((x_max - x_min) / cell_size)), 1)
+        self.n_y = max(int(np.ceil((y_max - y_min) / cell_size)), 1)
+        # Equal-width bins spanning the bounds, as np.linspace edges would give
+        self.step_x = (x_max - x_min) / self.n_x or cell_size
+        self.step_y = (y_max - y_min) / self.n_y or cell_size
+        n_cells = self.n_x * self.n_y
+        self.count = np.zeros(n_cells, dtype=np.int64)
+        self.sum = np.zeros(n_cells, dtype=np.float64)
+        self.min = np.full(n_cells, np.inf)
+        self.max = np.full(n_cells, -np.inf)
+
+    def cell_index(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        ix = np.clip(np.floor((x - self.bounds[0]) / self.step_x).astype(np.int64), 0, self.n_x - 1)
+        iy = np.clip(np.floor((y - self.bounds[2]) / self.step_y).astype(np.int64), 0, self.n_y - 1)
+        return ix * self.n_y + iy
+
+    def update(self, chunk: Dict[str, np.ndarray]) -> "GridAccumulator":
+        if len(chunk["x"]) == 0:
+            return self
+        z = np.asarray(chunk["z"], dtype=np.float64)
+        cells = self.cell_index(chunk["x"], chunk["y"])
+        n_cells = self.count.size
+        self.count += np.bincount(cells, minlength=n_cells)
+        self.sum += np.bincount(cells, weights=z, minlength=n_cells)
+        np.minimum.at(self.min, cells, z)
+        np.maximum.at(self.max, cells, z)
+        return self
+
+    def merge(self, other: "GridAccumulator") -> "GridAccumulator":
+        self.count += other.count
+        self.sum += other.sum
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self
+
+    def mean_grid(self) -> np.ndarray:
+        """Mean elevation per cell, shape (n_x, n_y), NaN where empty."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.sum / self.count, np.nan)
+        return mean.reshape(self.n_x, self.n_y)
+
+    def min_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Cell minimum elevation for each (x, y)."""
+        return self.min[self.cell_index(x, y)]
@@ -0,0 +1,335 @@
+"""
+Versioned model registry and fused inference models
+===================================================
+
+The pipelines write joblib artefacts into ``Upload/<Sensor>/Analysis``
+under auto-incremented names (``rockfall_classifier_3.joblib``). The
+registry snapshots a consistent set of them as an explicit version:
+
+    Upload/<Sensor>/Models/v<N>/<artifact>.joblib   hard-linked or copied artefacts
+    Upload/<Sensor>/Models/v<N>/manifest.json       sources, SHA-256, features, metrics
+    Upload/<Sensor>/Models/CURRENT                  version served by default
+    Upload/<Sensor>/Models/.v<N>.reserved           version numbers already claimed
+
+A ``ServingModel`` loads a version once with memory-mapped joblib (tree
+arrays are shared through the page cache by every worker process) and
+fuses the sensor's ``SERVING_SPEC``: the feature scaler becomes a single
+vectorized ``(X - mean) / scale`` applied once per batch, then every
+head (``predict``, ``predict_proba`` or ``outlier``) runs on the same
+array.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import hashlib
+import importlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from . import ANALYSIS_MODULES, code_version, normalize_sensor
+from .common import latest_filename, sensor_dirs
+
+logger = logging.getLogger(__name__)
+
+MODELS_FOLDER = "Models"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+HEAD_METHODS = ("predict", "predict_proba", "outlier")
+
+
+class ModelNotAvailableError(LookupError):
+    """No registered (or registrable) model version for a sensor."""
+
+
+def serving_spec(sensor: str) -> Dict[str, Any]:
+    """The sensor module's ``SERVING_SPEC`` (features, optional scaler, output heads)."""
+    module = importlib.import_module(f"{__package__}.{ANALYSIS_MODULES[sensor]}")
+    spec = getattr(module, "SERVING_SPEC", None)
+    if spec is None:
+        raise ModelNotAvailableError(f"{sensor} has no servable models")
+    return spec
+
+
+def spec_artifacts(spec: Dict[str, Any]) -> List[str]:
+    names = [head[0] for head in spec["outputs"].values()]
+    if spec.get("scaler"):
+        names.append(spec["scaler"])
+    return names
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ServingModel:
+    """One loaded model version with the scaler fused into a single vectorized step."""
+
+    def __init__(self, sensor: str, manifest: Dict[str, Any], artifacts: Dict[str, Any]):
+        spec = serving_spec(sensor)
+        self.sensor = sensor
+        self.version = manifest["version"]
+        self.manifest = manifest
+        self.features: List[str] = list(spec["features"])
+        positions = {name: i for i, name in enumerate(self.features)}
+
+        # Per-feature (mean, scale) aligned to the serving feature order
+        self.mean = np.zeros(len(self.features))
+        self.scale = np.ones(len(self.features))
+        self.scaled = spec.get("scaler") is not None
+        if self.scaled:
+            scaler = artifacts[spec["scaler"]]
+            scaler_features = list(spec.get("scaler_features") or self.features)
+            for i, name in enumerate(scaler_features):
+                if name in positions:
+                    if getattr(scaler, "mean_", None) is not None:
+                        self.mean[positions[name]] = scaler.mean_[i]
+                    if getattr(scaler, "scale_", None) is not None:
+                        self.scale[positions[name]] = scaler.scale_[i]
+
+        self.heads = []
+        for output, head in spec["outputs"].items():
+            artifact, method = head[0], head[1]
+            if method not in HEAD_METHODS:
+                raise ValueError(f"Unknown head method {method} for {sensor}.{output}")
+            head_features = list(head[2]) if len(head) > 2 else self.features
+            trained_on = getattr(artifacts[artifact], "feature_names_in_", None)
+            if trained_on is not None and list(trained_on) != head_features:
+                raise ValueError(f"{sensor}.{artifact} was trained on {list(trained_on)}, not {head_features}")
+            columns = None if head_features == self.features else np.array([positions[f] for f in head_features])
+            self.heads.append((output, artifacts[artifact], method, columns))
+
+    def prepare(self, rows: List[Any]) -> np.ndarray:
+        """Feature matrix from rows given as feature dicts or ordered value lists."""
+        if rows and isinstance(rows[0], dict):
+            missing = [name for name in self.features if name not in rows[0]]
+            if missing:
+                raise ValueError(f"Missing features: {', '.join(missing)}")
+            X = np.array([[row[name] for name in self.features] for row in rows], dtype=np.float64)
+        else:
+            X = np.asarray(rows, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f"Expected {len(self.features)} features per row: {', '.join(self.features)}")
+        if not np.isfinite(X).all():
+            raise ValueError("Features must be finite numbers")
+        return X
+
+    def predict(self, X: np.ndarray) -> Dict[str, Any]:
+        """Column-wise outputs for a whole batch (one call per head)."""
+        if self.scaled:
+            X = (X - self.mean) / self.scale
+        with warnings.catch_warnings():
+            # Heads were checked against their training feature names in __init__
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return self._predict_heads(X)
+
+    def _predict_heads(self, X: np.ndarray) -> Dict[str, Any]:
+        outputs: Dict[str, Any] = {}
+        for output, model, method, columns in self.heads:
+            X_head = X if columns is None else X[:, columns]
+            if method == "predict":
+                outputs[output] = model.predict(X_head)
+            elif method == "outlier":
+                outputs[output] = model.predict(X_head) == -1
+            else:
+                probabilities = model.predict_proba(X_head)
+                classes = model.classes_
+                outputs[output] = classes[probabilities.argmax(axis=1)]
+                if len(classes) == 2:
+                    outputs[f"{output}_probability"] = probabilities[:, 1]
+                else:
+                    outputs[f"{output}_probability"] = probabilities.max(axis=1)
+        return outputs
+
+
+class ModelRegistry:
+    """Explicit model versions per sensor with a "current" pointer and a load-once cache."""
+
+    def __init__(self, output_root: Optional[str] = None):
+        self.output_root = output_root
+        self._loaded: Dict[tuple, ServingModel] = {}
+        self._current: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+
+    def models_dir(self, sensor: str) -> str:
+        root = sensor_dirs(sensor, self.output_root)["root"]
+        path = os.path.join(root, MODELS_FOLDER)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def versions(self, sensor: str) -> List[Dict[str, Any]]:
+        """Manifests of every registered version, oldest first."""
+        sensor = normalize_sensor(sensor)
+        models_dir = self.models_dir(sensor)
+        manifests = []
+        for name in os.listdir(models_dir):
+            manifest_path = os.path.join(models_dir, name, MANIFEST_FILE)
+            if re.fullmatch(r"v\d+", name) and os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifests.append(json.load(f))
+        return sorted(manifests, key=lambda manifest: int(manifest["version"][1:]))
+
+    def manifest(self, sensor: str, version: str) -> Dict[str, Any]:
+        path = os.path.join(self.models_dir(normalize_sensor(sensor)), version, MANIFEST_FILE)
+        if not re.fullmatch(r"v\d+", version) or not os.path.exists(path):
+            raise ModelNotAvailableError(f"{sensor} has no model version {version}")
+        with open(path) as f:
+            return json.load(f)
+
+    def artifact_paths(self, sensor: str, version: str) -> Dict[str, str]:
+        """Artefact name -> joblib path of a registered version."""
+        sensor = normalize_sensor(sensor)
+        version_dir = os.path.join(self.models_dir(sensor), version)
+        return {name: os.path.join(version_dir, entry["file"])
+                for name, entry in self.manifest(sensor, version)["artifacts"].items()}
+
+    def current_version(self, sensor: str) -> Optional[str]:
+        """Version named by the CURRENT pointer (re-read only when the file changes)."""
+        sensor = normalize_sensor(sensor)
+        path = os.path.join(self.models_dir(sensor), CURRENT_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._current.get(sensor)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f:
+            version = f.read().strip() or None
+        self._current[sensor] = (mtime, version)
+        return version
+
+    def set_current(self, sensor: str, version: str) -> None:
+        """Point ``sensor`` at ``version`` atomically; workers pick it up on their next batch."""
+        sensor = normalize_sensor(sensor)
+        self.manifest(sensor, version)
+        path = os.path.join(self.models_dir(sensor), CURRENT_FILE)
+        with open(path + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(path + ".tmp", path)
+        logger.info(f"{sensor} model version {version} is now current")
+
+    def _reserve_version(self, sensor: str) -> str:
+        """
+        Claim the next version number with an exclusive-create marker file, so
+        two processes registering at once never pick the same number.
+        """
+        models_dir = self.models_dir(sensor)
+        number = max((int(m["version"][1:]) for m in self.versions(sensor)), default=0) + 1
+        while True:
+            try:
+                os.close(os.open(os.path.join(models_dir, f".v{number}.reserved"), os.O_CREAT | os.O_EXCL))
+                return f"v{number}"
+            except FileExistsError:
+                number += 1
+
+    def register(self, sensor: str, artifacts: Dict[str, str], metrics: Optional[Dict[str, Any]] = None,
+                 activate: bool = True) -> Dict[str, Any]:
+        """Snapshot ``artifacts`` (name -> joblib path) as the next version of ``sensor``."""
+        sensor = normalize_sensor(sensor)
+        spec = serving_spec(sensor)
+        missing = [name for name in spec_artifacts(spec) if name not in artifacts]
+        if missing:
+            raise ModelNotAvailableError(f"{sensor} artefacts missing: {', '.join(missing)}")
+
+        with self._lock:
+            models_dir = self.models_dir(sensor)
+            version = self._reserve_version(sensor)
+            staging = os.path.join(models_dir, f".{version}.tmp")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+
+            entries = {}
+            for name in spec_artifacts(spec):
+                target = os.path.join(staging, f"{name}.joblib")
+                try:
+                    os.link(artifacts[name], target)
+                except OSError:
+                    shutil.copy2(artifacts[name], target)
+                entries[name] = {"file": f"{name}.joblib", "source": artifacts[name], "sha256": _sha256(target)}
+
+            manifest = {
+                "sensor": sensor,
+                "version": version,
+                "created_at": time.time(),
+                "code_version": code_version(),
+                "features": list(spec["features"]),
+                "artifacts": entries,
+                "metrics": metrics or {},
+            }
+            with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f, indent=2, default=str)
+            os.replace(staging, os.path.join(models_dir, version))
+
+        logger.info(f"Registered {sensor} model version {version}")
+        if activate:
+            self.set_current(sensor, version)
+        return manifest
+
+    def register_latest(self, sensor: str, activate: bool = True,
+                        metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Register the newest ``_N`` artefacts in the sensor's Analysis folder,
+        unless the current version already holds exactly those files.
+        """
+        sensor = normalize_sensor(sensor)
+        spec = serving_spec(sensor)
+        analysis_dir = sensor_dirs(sensor, self.output_root)["analysis"]
+        artifacts = {name: latest_filename(analysis_dir, name, ".joblib") for name in spec_artifacts(spec)}
+        missing = [name for name, path in artifacts.items() if path is None]
+        if missing:
+            raise ModelNotAvailableError(
+                f"{sensor} has no trained {', '.join(missing)} in {analysis_dir}; run a training analysis first"
+            )
+
+        current = self.current_version(sensor)
+        if current:
+            entries = self.manifest(sensor, current)["artifacts"]
+            if all(entries[name]["source"] == path and entries[name]["sha256"] == _sha256(path)
+                   for name, path in artifacts.items()):
+                return self.manifest(sensor, current)
+        return self.register(sensor, artifacts, metrics, activate=activate)
+
+    def load(self, sensor: str, version: Optional[str] = None) -> ServingModel:
+        """
+        The serving model for ``version`` (default: current, registering the
+        newest Analysis artefacts if nothing is registered yet); loaded once.
+        """
+        sensor = normalize_sensor(sensor)
+        version = version or self.current_version(sensor)
+        if version is None:
+            version = self.register_latest(sensor)["version"]
+
+        key = (sensor, version)
+        model = self._loaded.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            if key not in self._loaded:
+                artifacts = {
+                    name: joblib.load(path, mmap_mode="r")
+                    for name, path in self.artifact_paths(sensor, version).items()
+                }
+                self._loaded[key] = ServingModel(sensor, self.manifest(sensor, version), artifacts)
+                logger.info(f"Loaded {sensor} model version {version}")
+            return self._loaded[key]
+
+    def unload(self, sensor: str, keep: Optional[str] = None) -> None:
+        """Drop cached versions of ``sensor`` other than ``keep``."""
+        with self._lock:
+            for key in [key for key in self._loaded if key[0] == sensor and key[1] != keep]:
+                del self._loaded[key]
@@ -0,0 +1,138 @@
+"""
+Exact point cloud outlier filters
+=================================
+
+Radius outlier removal (minimum neighbour count within a radius) and
+statistical outlier removal (SOR: mean k-nearest-neighbour distance)
+built on ``cKDTree`` with ``workers=-1``. Large clouds are processed in
+XY tiles with a halo overlap, so each KD-tree only spans one tile plus
+its halo, while results stay exact and deterministic (no subsampling).
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Clouds larger than this are filtered tile by tile when no tile_size is given
+TILING_THRESHOLD_POINTS = 2_000_000
+DEFAULT_TILE_SIZE = 250.0
+
+
+class TileIndex:
+    """Points bucketed into square XY tiles for halo-overlapped neighbourhood queries."""
+
+    def __init__(self, points: np.ndarray, tile_size: float):
+        self.points = points
+        self.tile_size = float(tile_size)
+        xy = points[:, :2]
+        self.origin = xy.min(axis=0)
+        cells = np.floor((xy - self.origin) / self.tile_size).astype(np.int64)
+        self.n_tx = int(cells[:, 0].max()) + 1
+        self.n_ty = int(cells[:, 1].max()) + 1
+
+        keys = cells[:, 1] * self.n_tx + cells[:, 0]
+        self.order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[self.order]
+        self.tile_keys, self.starts = np.unique(sorted_keys, return_index=True)
+        self.ends = np.r_[self.starts[1:], len(sorted_keys)]
+
+    def _tile_members(self, key: int) -> np.ndarray:
+        pos = np.searchsorted(self.tile_keys, key)
+        if pos < len(self.tile_keys) and self.tile_keys[pos] == key:
+            return self.order[self.starts[pos]:self.ends[pos]]
+        return np.empty(0, dtype=np.int64)
+
+    def candidates(self, key: int, halo: float) -> np.ndarray:
+        """Indices of points inside tile ``key`` expanded by ``halo`` on every side."""
+        tx, ty = key % self.n_tx, key // self.n_tx
+        reach = int(np.ceil(halo / self.tile_size))
+        members = [
+            self._tile_members(ny * self.n_tx + nx)
+            for ny in range(max(ty - reach, 0), min(ty + reach, self.n_ty - 1) + 1)
+            for nx in range(max(tx - reach, 0), min(tx + reach, self.n_tx - 1) + 1)
+        ]
+        idx = np.concatenate(members)
+        lo = self.origin + np.array([tx, ty]) * self.tile_size - halo
+        hi = lo + self.tile_size + 2 * halo
+        xy = self.points[idx, :2]
+        inside = np.all((xy >= lo) & (xy <= hi), axis=1)
+        return idx[inside]
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (tile key, core point indices) for every occupied tile."""
+        for key, start, end in zip(self.tile_keys, self.starts, self.ends):
+            yield int(key), self.order[start:end]
+
+
+def _resolve_tile_size(n_points: int, tile_size: Optional[float]) -> Optional[float]:
+    if tile_size is None and n_points > TILING_THRESHOLD_POINTS:
+        return DEFAULT_TILE_SIZE
+    return tile_size
+
+
+def radius_neighbor_counts(points: np.ndarray, radius: float, tile_size: Optional[float] = None,
+                           workers: int = -1) -> np.ndarray:
+    """Exact number of other points within ``radius`` of each point."""
+    points = np.asarray(points, dtype=np.float64)
+    tile_size = _resolve_tile_size(len(points), tile_size)
+    if tile_size is None:
+        tree = cKDTree(points)
+        return tree.query_ball_point(points, r=radius, return_length=True, workers=workers) - 1
+
+    counts = np.zeros(len(points), dtype=np.int64)
+    tiles = TileIndex(points, tile_size)
+    for key, core in tiles:
+        # A halo of `radius` contains every neighbour of every core point
+        tree = cKDTree(points[tiles.candidates(key, radius)])
+        counts[core] = tree.query_ball_point(points[core], r=radius, return_length=True, workers=workers) - 1
+    return counts
+
+
+def mean_knn_distances(points: np.ndarray, k: int = 8, tile_size: Optional[float] = None,
+                       workers: int = -1) -> np.ndarray:
+    """Exact mean distance from each point to its k nearest other points."""
+    points = np.asarray(points, dtype=np.float64)
+    k = int(min(k, len(points) - 1))
+    if k < 1:
+        return np.zeros(len(points))
+
+    tile_size = _resolve_tile_size(len(points), tile_size)
+    if tile_size is None:
+        dist, _ = cKDTree(points).query(points, k=k + 1, workers=workers)
+        return dist[:, 1:].mean(axis=1)
+
+    mean_dist = np.empty(len(points))
+    tiles = TileIndex(points, tile_size)
+    extent = float(np.ptp(points[:, :2], axis=0).max())
+    for key, core in tiles:
+        halo = tiles.tile_size / 4
+        pending = core
+        while len(pending):
+            candidates = tiles.candidates(key, halo)
+            dist, _ = cKDTree(points[candidates]).query(points[pending], k=k + 1, workers=workers)
+            # The k-th distance is exact when it lies within the halo; otherwise widen it
+            exact = dist[:, -1] <= halo
+            if halo >= extent:
+                exact[:] = True
+            finite = np.where(np.isfinite(dist[:, 1:]), dist[:, 1:], np.nan)
+            mean_dist[pending[exact]] = np.nanmean(finite[exact], axis=1)
+            pending = pending[~exact]
+            halo *= 2
+    return mean_dist
+
+
+def radius_outlier_mask(points: np.ndarray, radius: float = 10.0, min_points: int = 5,
+                        tile_size: Optional[float] = None) -> np.ndarray:
+    """True for points with at least ``min_points`` neighbours within ``radius``."""
+    return radius_neighbor_counts(points, radius, tile_size=tile_size) >= min_points
+
+
+def statistical_outlier_mask(points: np.ndarray, k: int = 8, std_ratio: float = 2.0,
+                             tile_size: Optional[float] = None) -> np.ndarray:
+    """True for points whose mean kNN distance is within mean + std_ratio * std (SOR)."""
+    mean_dist = mean_knn_distances(points, k=k, tile_size=tile_size)
+    return mean_dist <= mean_dist.mean() + std_ratio * mean_dist.std()
@@ -0,0 +1,255 @@
+"""
+Piezometer landslide analysis pipeline
+======================================
+
+Importable version of Piezometer_Landslide_Prediction.ipynb: groundwater
+data loading, feature engineering, landslide occurrence/timing models and
+risk prediction.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from .common import (
+    DATA_DIR, get_next_filename, grow_or_build, parse_point_coordinates, preloaded_models, resolve_input_file,
+    save_json, sensor_dirs, to_serializable
+)
+from .interpolation import pipeline_risk_map
+from .results_store import store_pipeline_frames
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "piezometer"
+DEFAULT_DATA_FILE = os.path.join(DATA_DIR, "piezometer_data.csv")
+MODEL_FILES = ("rf_model", "gb_model", "feature_scaler")
+
+NUMERIC_COLUMNS = ["pore_pressure", "groundwater_level", "pressure_change_rate"]
+FEATURE_COLS = [
+    "pore_pressure", "groundwater_level", "pressure_change_rate",
+    "pressure_water_ratio", "cumulative_pressure_change",
+    "pressure_acceleration", "water_level_change_rate",
+    "coord_x", "coord_y", "coord_z",
+]
+# Online inference (see model_registry); features are standardized like in training
+SERVING_SPEC = {
+    "features": FEATURE_COLS,
+    "scaler": "feature_scaler",
+    "outputs": {
+        "occurrence": ("rf_model", "predict_proba"),
+        "days_until_event": ("gb_model", "predict"),
+    },
+}
+
+
+def generate_piezometer_data(n_samples: int = 60) -> pd.DataFrame:
+    """Generate synthetic piezometer data (2 readings per day)."""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=n_samples / 2)
+    timestamps = []
+    current_date = start_date
+    while current_date <= end_date:
+        timestamps.extend([current_date, current_date + timedelta(hours=12)])
+        current_date += timedelta(days=1)
+    timestamps = timestamps[:n_samples]
+
+    rows = []
+    previous_pressure = None
+    for i, timestamp in enumerate(timestamps):
+        pore_pressure = 50 + i * 0.3 + np.random.normal(0, 5)
+        water_level = max(0.5, 5 - i * 0.05 + np.random.normal(0, 0.5))
+        pressure_rate = 0 if previous_pressure is None else (pore_pressure - previous_pressure) / 0.5
+        previous_pressure = pore_pressure
+
+        if pore_pressure > 65 or water_level < 2:
+            risk = "High"
+        elif pore_pressure > 55 or water_level < 3.5:
+            risk = "Medium"
+        else:
+            risk = "Low"
+
+        x, y, z = np.random.uniform(0, 100), np.random.uniform(0, 100), np.random.uniform(300, 500)
+        rows.append({
+            "timestamp": timestamp,
+            "pore_pressure": pore_pressure,
+            "groundwater_level": water_level,
+            "pressure_change_rate": pressure_rate,
+            "point_coordinates": f"{x:.2f}, {y:.2f}, {z:.2f}",
+            "coord_x": round(x, 2),
+            "coord_y": round(y, 2),
+            "coord_z": round(z, 2),
+            "risk_class": risk,
+        })
+
+    return pd.DataFrame(rows)
+
+
+def load_or_create_piezometer_data(data_file: str = DEFAULT_DATA_FILE) -> pd.DataFrame:
+    """Load piezometer readings from CSV or generate (and save) a synthetic set."""
+    if os.path.exists(data_file):
+        df = pd.read_csv(data_file)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return parse_point_coordinates(df)
+
+    df = generate_piezometer_data()
+    df.to_csv(data_file, index=False)
+    return df
+
+
+def preprocess_piezometer_data(df: pd.DataFrame,
+                               scaler: Optional[StandardScaler] = None) -> Tuple[pd.DataFrame, StandardScaler]:
+    """Engineer pressure/water-level features, targets and scale numeric features."""
+    processed_df = df.copy()
+    processed_df[NUMERIC_COLUMNS] = processed_df[NUMERIC_COLUMNS].fillna(processed_df[NUMERIC_COLUMNS].mean())
+
+    processed_df["pressure_water_ratio"] = processed_df["pore_pressure"] / (processed_df["groundwater_level"] + 1e-6)
+    processed_df["cumulative_pressure_change"] = processed_df["pore_pressure"].diff().fillna(0).cumsum()
+    processed_df["pressure_acceleration"] = processed_df["pressure_change_rate"].diff().fillna(0)
+    processed_df["water_level_change_rate"] = processed_df["groundwater_level"].diff().fillna(0)
+    processed_df["critical_zone"] = (
+        (processed_df["pore_pressure"] > 60) & (processed_df["groundwater_level"] < 3)
+    ).astype(int)
+
+    processed_df = parse_point_coordinates(processed_df)
+
+    processed_df = processed_df.replace([np.inf, -np.inf], 0)
+
+    processed_df["landslide_likely"] = (processed_df["risk_class"] == "High").astype(int)
+    processed_df["days_until_event"] = processed_df["risk_class"].map({"High": 1, "Medium": 3}).fillna(7).astype(int)
+
+    # A given (already fitted) scaler is applied as-is, e.g. when growing trained models
+    scaler = scaler or StandardScaler().fit(processed_df[FEATURE_COLS])
+    processed_df[FEATURE_COLS] = scaler.transform(processed_df[FEATURE_COLS])
+
+    return processed_df, scaler
+
+
+def train_models(processed_df: pd.DataFrame, analysis_dir: str, scaler: Optional[StandardScaler] = None,
+                 previous: Optional[Dict[str, Any]] = None,
+                 n_jobs: Optional[int] = None) -> Tuple[Dict[str, Any], Any, Any]:
+    """
+    Train the landslide occurrence classifier and days-until-event regressor (saving
+    ``scaler`` too). With ``previous`` artefacts the ensembles are grown (warm start).
+    """
+    previous = previous or {}
+    X_train, X_test, y_clf_train, y_clf_test, y_reg_train, y_reg_test = train_test_split(
+        processed_df[FEATURE_COLS], processed_df["landslide_likely"], processed_df["days_until_event"],
+        test_size=0.3, random_state=42
+    )
+
+    rf_model = grow_or_build(
+        previous.get("rf_model"),
+        lambda: RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42, n_jobs=n_jobs),
+        y_clf_train, n_jobs
+    )
+    rf_model.fit(X_train, y_clf_train)
+    gb_model = grow_or_build(
+        previous.get("gb_model"), lambda: GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42)
+    )
+    gb_model.fit(X_train, y_reg_train)
+
+    rf_pred = rf_model.predict(X_test)
+    rf_model_path = get_next_filename(analysis_dir, "rf_model", ".joblib")
+    gb_model_path = get_next_filename(analysis_dir, "gb_model", ".joblib")
+    joblib.dump(rf_model, rf_model_path)
+    joblib.dump(gb_model, gb_model_path)
+    if scaler is not None:
+        joblib.dump(scaler, get_next_filename(analysis_dir, "feature_scaler", ".joblib"))
+
+    feature_importance = sorted(
+        zip(FEATURE_COLS, rf_model.feature_importances_), key=lambda item: item[1], reverse=True
+    )
+
+    performance = {
+        "classification_model": {
+            "type": "RandomForestClassifier",
+            "accuracy": float(accuracy_score(y_clf_test, rf_pred)),
+            "f1_score": float(f1_score(y_clf_test, rf_pred, average="weighted", zero_division=0)),
+            "model_path": rf_model_path,
+        },
+        "regression_model": {
+            "type": "GradientBoostingRegressor",
+            "r2_score": float(r2_score(y_reg_test, gb_model.predict(X_test))),
+            "model_path": gb_model_path,
+        },
+        "top_features": dict(feature_importance[:5]),
+    }
+    return performance, rf_model, gb_model
+
+
+def predict_landslide_risk(rf_model, gb_model, features: pd.DataFrame) -> pd.DataFrame:
+    """Predict occurrence probability, days until event and alert level."""
+    occurrence_prob = rf_model.predict_proba(features)[:, 1]
+    return pd.DataFrame({
+        "occurrence_probability": occurrence_prob,
+        "predicted_days_until_event": gb_model.predict(features),
+        "alert_level": np.where(occurrence_prob > 0.8, "HIGH", np.where(occurrence_prob > 0.5, "MEDIUM", "LOW")),
+    })
+
+
+def run(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full piezometer pipeline and return JSON-serializable results.
+
+    Recognised params: input_files / input_file, train_models (default: only when no
+    preloaded models are available), models, site_id, store_results, output_root.
+    """
+    data_file = resolve_input_file(params, DEFAULT_DATA_FILE)
+    dirs = sensor_dirs(SENSOR, params.get("output_root"))
+
+    df = load_or_create_piezometer_data(data_file)
+    models = preloaded_models(params, MODEL_FILES)
+    train = params.get("train_models", not models)
+    # Preloaded models are served in their version's feature space, as by /api/predict
+    processed_df, scaler = preprocess_piezometer_data(df, None if train else models["feature_scaler"])
+    if train:
+        performance, rf_model, gb_model = train_models(processed_df, dirs["analysis"], scaler)
+    else:
+        performance, rf_model, gb_model = {"preloaded": True}, models["rf_model"], models["gb_model"]
+
+    predictions = predict_landslide_risk(rf_model, gb_model, processed_df[FEATURE_COLS])
+    predictions["timestamp"] = processed_df["timestamp"].values
+    predictions["point_coordinates"] = processed_df["point_coordinates"].values
+    predictions.to_csv(get_next_filename(dirs["analysis"], "prediction", ".csv"), index=False)
+
+    # Map positions from the raw readings; the feature frame holds scaled coordinates
+    risk_map = pipeline_risk_map(
+        df[["timestamp", "coord_x", "coord_y"]].assign(risk=predictions["occurrence_probability"].values),
+        "risk", params, dirs["analysis"]
+    )
+    risk_distribution = df["risk_class"].value_counts().to_dict()
+    stored_rows = store_pipeline_frames(
+        params, SENSOR, {"readings": df, "features": processed_df, "predictions": predictions}
+    )
+
+    results = {
+        "sensor": SENSOR,
+        "input_file": data_file,
+        "data_statistics": {
+            "total_readings": len(df),
+            "monitoring_points": df["point_coordinates"].nunique(),
+            "date_range": {"start": df["timestamp"].min(), "end": df["timestamp"].max()},
+            "pore_pressure": df["pore_pressure"].describe()[["min", "max", "mean", "std"]].to_dict(),
+            "groundwater_level": df["groundwater_level"].describe()[["min", "max", "mean", "std"]].to_dict(),
+            "risk_distribution": risk_distribution,
+        },
+        "model_performance": performance,
+        "alerts": predictions[predictions["alert_level"] != "LOW"].tail(50).to_dict("records"),
+        "high_risk_percentage": risk_distribution.get("High", 0) / len(df) * 100 if len(df) else 0.0,
+        "risk_map": risk_map,
+    }
+    results["stored_rows"] = stored_rows
+    results["artifacts"] = {"report": save_json(results, dirs["analysis"], "system_report")}
+    return to_serializable(results)
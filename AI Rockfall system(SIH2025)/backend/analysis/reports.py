@@ -0,0 +1,360 @@
+"""
+Off-request PDF/PNG report rendering
+====================================
+
+Reports are a separate stage from the analysis: pipelines only persist
+their frames to the results store and return risk results, and figures
+are rendered here - usually when a report is first opened - by
+``api.report_renderer`` in its own process pool.
+
+- Figures are drawn with the Agg canvas (no GUI backend, no pyplot global
+  state) from a small set of templates (time series, histogram, category
+  counts, scatter, summary page); each process reuses one Figure per size.
+- Every figure's payload (decimated data + template + options + dpi) is
+  hashed; a PNG whose hash is already on disk is not drawn again, so only
+  charts whose data changed are re-rendered.
+- The multi-page PDF is assembled from the figure PNGs and is keyed by the
+  hash of all its pages.
+
+Layout (under the sensor's Report folder):
+    figures/<site>/<figure>-<hash>.png
+    <sensor>_report-<site>-<hash>.pdf
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .common import latest_filename, results_root, sensor_dirs, to_serializable
+from .results_store import ResultsStore
+
+logger = logging.getLogger(__name__)
+
+RENDERER_VERSION = "1"  # bump when templates change so cached figures are redrawn
+REPORT_DPI = 150
+FIGSIZE = (11.0, 4.5)
+SUMMARY_FIGSIZE = (11.0, 8.5)
+MAX_PLOT_POINTS = 4000  # ~2 points per horizontal pixel at the default size and dpi
+MAX_SCATTER_POINTS = 20000
+MAX_SUMMARY_LINES = 40
+
+# Per sensor: (figure, title, results-store dataset, template, options)
+FIGURES: Dict[str, List[Tuple[str, str, str, str, Dict[str, Any]]]] = {
+    "geophone": [
+        ("magnitude", "Event magnitude", "features", "timeseries",
+         {"columns": ["event_magnitude_mms", "rolling_mean_magnitude"], "ylabel": "mm/s"}),
+        ("richter", "Richter scale", "features", "timeseries", {"columns": ["richter_scale"]}),
+        ("risk_score", "Seismic risk score", "features", "timeseries", {"columns": ["risk_score"]}),
+        ("b_value", "Local b-value", "features", "timeseries", {"columns": ["local_b_value"]}),
+        ("risk_levels", "Risk level distribution", "features", "counts", {"column": "risk_level"}),
+        ("magnitude_histogram", "Magnitude distribution", "features", "histogram",
+         {"column": "event_magnitude_mms", "bins": 50}),
+        ("epicentres", "Event epicentres", "features", "scatter",
+         {"x": "x_coord", "y": "y_coord", "color": "richter_scale"}),
+        ("predicted_risk", "Predicted risk levels", "predictions", "counts", {"column": "predicted_risk_level"}),
+    ],
+    "piezometer": [
+        ("pore_pressure", "Pore pressure", "readings", "timeseries", {"columns": ["pore_pressure"], "ylabel": "kPa"}),
+        ("groundwater", "Groundwater level", "readings", "timeseries",
+         {"columns": ["groundwater_level"], "ylabel": "m"}),
+        ("pressure_rate", "Pressure change rate", "readings", "timeseries", {"columns": ["pressure_change_rate"]}),
+        ("occurrence", "Landslide occurrence probability", "predictions", "histogram",
+         {"column": "occurrence_probability", "bins": 20}),
+        ("alert_levels", "Alert levels", "predictions", "counts", {"column": "alert_level"}),
+    ],
+    "gbinsar": [
+        ("displacement", "Displacement", "readings", "timeseries",
+         {"columns": ["displacement", "cumulative_displacement"], "ylabel": "mm"}),
+        ("displacement_rate", "Displacement rate", "readings", "timeseries",
+         {"columns": ["displacement_rate"], "ylabel": "mm/day"}),
+        ("acceleration", "Displacement acceleration", "readings", "timeseries",
+         {"columns": ["displacement_acceleration"]}),
+        ("occurrence", "Rockfall occurrence probability", "predictions", "histogram",
+         {"column": "occurrence_probability", "bins": 20}),
+    ],
+    "extensometer": [
+        ("crack_opening", "Crack opening", "readings", "timeseries",
+         {"columns": ["crack_opening", "cumulative_crack_opening"], "ylabel": "mm"}),
+        ("crack_rate", "Crack rate", "readings", "timeseries", {"columns": ["crack_rate"], "ylabel": "mm/day"}),
+        ("crack_acceleration", "Crack acceleration", "readings", "timeseries", {"columns": ["crack_acceleration"]}),
+        ("predicted_rate", "Predicted next-day crack rate", "predictions", "timeseries",
+         {"columns": ["predicted_next_day_rate"]}),
+        ("risk_scores", "Predicted risk scores", "predictions", "counts", {"column": "predicted_risk_score"}),
+    ],
+    "weather": [
+        ("rainfall", "Rainfall", "readings", "timeseries",
+         {"columns": ["rainfall_intensity", "cumulative_rainfall"], "ylabel": "mm"}),
+        ("temperature", "Temperature and humidity", "readings", "timeseries",
+         {"columns": ["temperature", "humidity"]}),
+        ("wind", "Wind speed", "readings", "timeseries", {"columns": ["wind_speed"], "ylabel": "m/s"}),
+        ("rain_probability", "Rain event probability", "predictions", "timeseries",
+         {"columns": ["rain_probability"]}),
+    ],
+    "lidar": [
+        ("slope", "Maximum slope per survey", "lidar_runs", "timeseries",
+         {"columns": ["slope_max"], "x": "run_timestamp", "ylabel": "degrees"}),
+        ("roughness", "Surface roughness per survey", "lidar_runs", "timeseries",
+         {"columns": ["surface_roughness"], "x": "run_timestamp"}),
+        ("risk", "Predicted risk level per survey", "lidar_runs", "timeseries",
+         {"columns": ["predicted_risk_level"], "x": "run_timestamp"}),
+        ("clusters", "Clusters per survey", "lidar_runs", "timeseries",
+         {"columns": ["number_of_clusters"], "x": "run_timestamp"}),
+        ("elevation_change", "Elevation change per survey", "lidar_runs", "timeseries",
+         {"columns": ["elevation_change"], "x": "run_timestamp", "ylabel": "m"}),
+    ],
+}
+
+# Newest results JSON of each pipeline (its summary is the report's first page)
+RESULTS_JSON = {
+    "geophone": "geophone_analysis_report",
+    "piezometer": "system_report",
+    "gbinsar": "system_report",
+    "extensometer": "extensometer_report",
+    "weather": "weather_report",
+    "lidar": "analysis_summary",
+}
+
+
+def _decimate(frame: pd.DataFrame, columns: List[str], max_points: int) -> pd.DataFrame:
+    """Keep each bucket's min and max row per column so spikes survive downsampling."""
+    if len(frame) <= max_points:
+        return frame
+    buckets = np.arange(len(frame)) * (max_points // 2) // len(frame)
+    keep = set()
+    for column in columns:
+        values = frame[column].reset_index(drop=True).astype(float)
+        # idxmin/idxmax fail on all-NaN buckets (gaps in a sensor stream), so only real readings are grouped
+        valid = values.notna().to_numpy()
+        grouped = values[valid].groupby(buckets[valid])
+        keep.update(grouped.idxmin().astype(int).tolist())
+        keep.update(grouped.idxmax().astype(int).tolist())
+    return frame.iloc[sorted(keep)]
+
+
+def _timeseries(ax, frame: pd.DataFrame, columns: List[str], x: str = "timestamp",
+                ylabel: Optional[str] = None) -> None:
+    for column in columns:
+        ax.plot(frame[x] if x in frame else frame.index, frame[column], linewidth=0.9, label=column)
+    if ylabel:
+        ax.set_ylabel(ylabel)
+    if len(columns) > 1:
+        ax.legend(loc="upper left", fontsize=8)
+    ax.grid(alpha=0.3)
+
+
+def _histogram(ax, frame: pd.DataFrame, column: str, bins: int = 30) -> None:
+    values = frame[column].to_numpy(dtype=float)
+    ax.hist(values[np.isfinite(values)], bins=bins, color="#4472c4", alpha=0.85)
+    ax.set_xlabel(column)
+    ax.set_ylabel("count")
+
+
+def _counts(ax, frame: pd.DataFrame, column: str) -> None:
+    counts = frame[column].astype(str).value_counts().sort_index()
+    ax.bar(counts.index, counts.values, color="#4472c4")
+    ax.set_ylabel("count")
+
+
+def _scatter(ax, frame: pd.DataFrame, x: str, y: str, color: Optional[str] = None) -> None:
+    points = ax.scatter(frame[x], frame[y], c=frame[color] if color else None, s=6, cmap="viridis")
+    if color:
+        ax.figure.colorbar(points, ax=ax, label=color)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+
+
+def _summary(ax, frame: pd.DataFrame, lines: List[str]) -> None:
+    ax.axis("off")
+    ax.text(0.0, 1.0, "\n".join(lines), va="top", ha="left", family="monospace", fontsize=9,
+            transform=ax.transAxes)
+
+
+TEMPLATES: Dict[str, Callable[..., None]] = {
+    "timeseries": _timeseries,
+    "histogram": _histogram,
+    "counts": _counts,
+    "scatter": _scatter,
+    "summary": _summary,
+}
+
+# One Figure (and Agg canvas) per size, reused for every chart drawn in this process
+_FIGURES: Dict[Tuple[float, float], Figure] = {}
+
+
+def _figure(figsize: Tuple[float, float]) -> Figure:
+    figure = _FIGURES.get(figsize)
+    if figure is None:
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+        _FIGURES[figsize] = figure
+    figure.clear()
+    return figure
+
+
+def _payload(frame: pd.DataFrame, template: str, options: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """The columns a figure draws, decimated; None if the data lacks them."""
+    if template == "timeseries":
+        x = options.get("x", "timestamp")
+        columns = [column for column in options["columns"] if column in frame]
+        if not columns:
+            return None
+        data = frame[[x] + columns] if x in frame else frame[columns]
+        return _decimate(data.dropna(subset=columns, how="all").reset_index(drop=True), columns, MAX_PLOT_POINTS)
+    if template == "scatter":
+        columns = [options["x"], options["y"]] + ([options["color"]] if options.get("color") else [])
+        if not all(column in frame for column in columns):
+            return None
+        data = frame[columns].dropna()
+        step = max(1, len(data) // MAX_SCATTER_POINTS)
+        return data.iloc[::step].reset_index(drop=True)
+    column = options["column"]
+    return frame[[column]].dropna().reset_index(drop=True) if column in frame else None
+
+
+def _content_hash(template: str, title: str, options: Dict[str, Any], data: pd.DataFrame, dpi: int) -> str:
+    digest = hashlib.sha256(json.dumps(
+        {"version": RENDERER_VERSION, "template": template, "title": title, "options": options,
+         "dpi": dpi, "columns": list(data.columns)},
+        sort_keys=True, default=str
+    ).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _summary_lines(sensor: str, site_id: str, results: Dict[str, Any], frames: Dict[str, pd.DataFrame]) -> List[str]:
+    lines = [f"{sensor.upper()} REPORT - site {site_id}", ""]
+    for dataset, frame in frames.items():
+        lines.append(f"{dataset}: {len(frame):,} rows")
+    summary = results.get("summary") or {
+        key: value for key, value in results.items() if isinstance(value, (int, float, str)) and key != "input_file"
+    }
+    if summary:
+        lines.append("")
+    for key, value in to_serializable(summary).items():
+        text = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+        lines.append(f"{key}: {text[:100]}")
+    return lines[:MAX_SUMMARY_LINES]
+
+
+def _figure_dir(sensor: str, site_id: str, output_root: Optional[str]) -> str:
+    directory = os.path.join(sensor_dirs(sensor, output_root)["report"], "figures", str(site_id))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def plan_report(sensor: str, site_id: str = "default", output_root: Optional[str] = None,
+                dpi: int = REPORT_DPI) -> Dict[str, Any]:
+    """
+    Read the stored frames once and describe every page of the report: its
+    payload, content hash and PNG path (``exists`` tells whether it can be
+    reused), plus the PDF path keyed by all page hashes.
+    """
+    if sensor not in FIGURES:
+        raise ValueError(f"No report figures for {sensor}")
+    site_id = str(site_id)
+    store = ResultsStore(results_root(output_root))
+    timestamp_columns = {"lidar_runs": "run_timestamp"}
+    frames = {}
+    for dataset in sorted({spec[2] for spec in FIGURES[sensor]}):
+        frame = store.read(dataset, site_id, sensor, timestamp_column=timestamp_columns.get(dataset, "timestamp"))
+        if len(frame):
+            frames[dataset] = frame
+
+    dirs = sensor_dirs(sensor, output_root)
+    results_path = latest_filename(dirs["analysis"], RESULTS_JSON[sensor], ".json")
+    results = {}
+    if results_path:
+        with open(results_path) as f:
+            results = json.load(f)
+
+    figure_dir = _figure_dir(sensor, site_id, output_root)
+    summary_lines = _summary_lines(sensor, site_id, results, frames)
+    pages = [("summary", "Summary", "summary", {"lines": summary_lines}, pd.DataFrame())]
+    for name, title, dataset, template, options in FIGURES[sensor]:
+        data = _payload(frames[dataset], template, options) if dataset in frames else None
+        if data is not None and len(data):
+            pages.append((name, title, template, options, data))
+
+    figures = []
+    for name, title, template, options, data in pages:
+        content_hash = _content_hash(template, title, options, data, dpi)
+        path = os.path.join(figure_dir, f"{name}-{content_hash}.png")
+        figures.append({
+            "name": name, "title": title, "template": template, "options": options, "data": data,
+            "hash": content_hash, "path": path, "exists": os.path.exists(path),
+        })
+
+    report_hash = hashlib.sha256("".join(f["hash"] for f in figures).encode()).hexdigest()[:16]
+    return {
+        "sensor": sensor,
+        "site_id": site_id,
+        "dpi": dpi,
+        "hash": report_hash,
+        "figures": figures,
+        "pdf_path": os.path.join(dirs["report"], f"{sensor}_report-{site_id}-{report_hash}.pdf"),
+        "rows": {dataset: len(frame) for dataset, frame in frames.items()},
+    }
+
+
+def render_figure(template: str, title: str, options: Dict[str, Any], data: pd.DataFrame, path: str,
+                  dpi: int = REPORT_DPI) -> str:
+    """Draw one page with its template on the Agg canvas and write the PNG atomically."""
+    figure = _figure(SUMMARY_FIGSIZE if template == "summary" else FIGSIZE)
+    ax = figure.add_subplot(1, 1, 1)
+    TEMPLATES[template](ax, data, **options)
+    if template != "summary":
+        ax.set_title(title)
+    if template == "timeseries":
+        figure.autofmt_xdate()
+    figure.tight_layout()
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    figure.savefig(temp_path, dpi=dpi, format="png")
+    os.replace(temp_path, path)
+    return path
+
+
+def assemble_pdf(image_paths: List[str], pdf_path: str, dpi: int = REPORT_DPI) -> str:
+    """Multi-page PDF with one rendered figure per page."""
+    from PIL import Image
+
+    pages = [Image.open(path).convert("RGB") for path in image_paths]
+    temp_path = f"{pdf_path}.{os.getpid()}.tmp"
+    pages[0].save(temp_path, "PDF", resolution=dpi, save_all=True, append_images=pages[1:])
+    for page in pages:
+        page.close()
+    os.replace(temp_path, pdf_path)
+    return pdf_path
+
+
+def prune_report_files(plan: Dict[str, Any]) -> int:
+    """Delete figures and PDFs of the same sensor/site that the current plan no longer uses."""
+    keep = {figure["path"] for figure in plan["figures"]} | {plan["pdf_path"]}
+    figure_dir = os.path.dirname(plan["figures"][0]["path"])
+    report_dir = os.path.dirname(plan["pdf_path"])
+    stale = [
+        path for path in glob.glob(os.path.join(figure_dir, "*.png"))
+        + glob.glob(os.path.join(report_dir, f"{plan['sensor']}_report-{plan['site_id']}-*.pdf"))
+        if path not in keep
+    ]
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Error removing stale report file {path}: {e}")
+    return len(stale)
@@ -0,0 +1,264 @@
+"""
+Append-only columnar results store
+==================================
+
+Partitioned Parquet storage for sensor readings, engineered features,
+predictions and run logs. Every append writes a new part file into
+``<root>/<dataset>/site=<site>/sensor=<sensor>/date=<YYYY-MM-DD>/``, so
+writes are O(rows appended) regardless of history, and reads prune
+partitions and push time-range predicates down to Parquet row groups.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import glob
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .common import RESULTS_DIR, results_root
+
+logger = logging.getLogger(__name__)
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("site", pa.string()), ("sensor", pa.string()), ("date", pa.string())]),
+    flavor="hive"
+)
+# Columns that tell independent series of one site/sensor apart (station, survey point, instrument)
+SERIES_KEY_COLUMNS = ("station_id", "point_id", "instrument_id", "point_coordinates")
+
+
+class ResultsStore:
+    """Append-only Parquet datasets partitioned by site, sensor and day."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or RESULTS_DIR
+        os.makedirs(self.root, exist_ok=True)
+
+    def _partition_dir(self, dataset: str, site_id: str, sensor: str, day: str) -> str:
+        return os.path.join(self.root, dataset, f"site={site_id}", f"sensor={sensor}", f"date={day}")
+
+    def append(self, dataset: str, df: pd.DataFrame, site_id: str, sensor: str,
+               timestamp_column: str = "timestamp") -> List[str]:
+        """Write ``df`` as new part files, one per day of ``timestamp_column``."""
+        if df is None or len(df) == 0:
+            return []
+
+        df = df.copy()
+        if timestamp_column in df.columns:
+            df[timestamp_column] = pd.to_datetime(df[timestamp_column])
+            days = df[timestamp_column].dt.strftime("%Y-%m-%d")
+        else:
+            days = pd.Series(datetime.now().strftime("%Y-%m-%d"), index=df.index)
+
+        # Categorical/object mixes don't round-trip well; store labels as strings
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype(str)
+
+        paths = []
+        for day, part in df.groupby(days, sort=True):
+            directory = self._partition_dir(dataset, site_id, sensor, day)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{datetime.now():%H%M%S}-{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), path)
+            paths.append(path)
+        return paths
+
+    def append_new(self, dataset: str, df: pd.DataFrame, site_id: str, sensor: str,
+                   timestamp_column: str = "timestamp") -> int:
+        """
+        Append only rows not already stored; returns rows written.
+
+        Rows match on (series key, timestamp), the series key being whichever
+        SERIES_KEY_COLUMNS the frame carries, so one station's newer readings
+        never hide another station's older ones. Only the day partitions the
+        frame covers are read.
+        """
+        if df is None or len(df) == 0:
+            return 0
+        if timestamp_column in df.columns:
+            df = df.copy()
+            df[timestamp_column] = pd.to_datetime(df[timestamp_column])
+            df = df[~self._stored_mask(dataset, df, site_id, sensor, timestamp_column)]
+        self.append(dataset, df, site_id, sensor, timestamp_column)
+        return len(df)
+
+    def _stored_mask(self, dataset: str, df: pd.DataFrame, site_id: str, sensor: str,
+                     timestamp_column: str) -> pd.Series:
+        """True for rows of ``df`` whose (series key, timestamp) is already stored."""
+        stored_days = set(self.partition_days(dataset, site_id, sensor))
+        days = sorted(set(df[timestamp_column].dropna().dt.strftime("%Y-%m-%d")) & stored_days)
+        if not days:
+            return pd.Series(False, index=df.index)
+
+        keys = [column for column in SERIES_KEY_COLUMNS if column in df.columns] + [timestamp_column]
+        try:
+            stored = self.read(dataset, site_id, sensor, columns=keys,
+                               timestamp_column=timestamp_column, days=days)
+        except (KeyError, pa.ArrowInvalid) as e:
+            # Older parts without the key columns: fall back to matching on time alone
+            logger.warning(f"Matching {dataset} rows on {timestamp_column} only: {e}")
+            keys = [timestamp_column]
+            stored = self.read(dataset, site_id, sensor, columns=keys,
+                               timestamp_column=timestamp_column, days=days)
+        if stored.empty:
+            return pd.Series(False, index=df.index)
+
+        def index(frame: pd.DataFrame) -> pd.MultiIndex:
+            # Compare ids as strings so int/str round-trips through Parquet still match
+            normalised = frame[keys].copy()
+            for column in keys[:-1]:
+                normalised[column] = normalised[column].astype(str)
+            normalised[timestamp_column] = pd.to_datetime(normalised[timestamp_column])
+            return pd.MultiIndex.from_frame(normalised)
+
+        return pd.Series(index(df).isin(index(stored)), index=df.index)
+
+    def _dataset(self, dataset: str, site_id: Optional[str] = None, sensor: Optional[str] = None,
+                 days: Optional[List[str]] = None) -> Optional[ds.Dataset]:
+        base = os.path.join(self.root, dataset)
+        if not os.path.isdir(base):
+            return None
+        if site_id is None or sensor is None:
+            return ds.dataset(base, format="parquet", partitioning=PARTITIONING)
+
+        # Only list the files of the selected site/sensor days instead of the whole history
+        files = [
+            path
+            for day in (days if days is not None else self.partition_days(dataset, site_id, sensor))
+            for path in glob.glob(os.path.join(self._partition_dir(dataset, site_id, sensor, day), "*.parquet"))
+        ]
+        if not files:
+            return None
+        return ds.dataset(files, format="parquet", partitioning=PARTITIONING, partition_base_dir=base)
+
+    def read(self, dataset: str, site_id: Optional[str] = None, sensor: Optional[str] = None,
+             start: Optional[Any] = None, end: Optional[Any] = None, columns: Optional[List[str]] = None,
+             timestamp_column: str = "timestamp", days: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read rows for a site/sensor/time range.
+
+        site, sensor and day filters prune partition directories; the
+        timestamp bounds are pushed down to Parquet row-group statistics.
+        ``days`` restricts the scan to specific YYYY-MM-DD partitions.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        if site_id is not None and sensor is not None and days is None and (start is not None or end is not None):
+            days = [
+                day for day in self.partition_days(dataset, str(site_id), sensor)
+                if (start is None or day >= start.strftime("%Y-%m-%d"))
+                and (end is None or day <= end.strftime("%Y-%m-%d"))
+            ]
+
+        data = self._dataset(dataset, None if site_id is None else str(site_id), sensor, days)
+        if data is None:
+            return pd.DataFrame(columns=columns or [])
+
+        conditions = []
+        if site_id is not None:
+            conditions.append(ds.field("site") == str(site_id))
+        if sensor is not None:
+            conditions.append(ds.field("sensor") == sensor)
+        if days is not None:
+            conditions.append(ds.field("date").isin(list(days)))
+        has_timestamp = timestamp_column in data.schema.names
+        if start is not None:
+            conditions.append(ds.field("date") >= start.strftime("%Y-%m-%d"))
+            if has_timestamp:
+                conditions.append(ds.field(timestamp_column) >= pa.scalar(start.to_pydatetime()))
+        if end is not None:
+            conditions.append(ds.field("date") <= end.strftime("%Y-%m-%d"))
+            if has_timestamp:
+                conditions.append(ds.field(timestamp_column) <= pa.scalar(end.to_pydatetime()))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        df = data.to_table(columns=columns, filter=expression).to_pandas()
+        if has_timestamp and timestamp_column in df.columns:
+            df = df.sort_values(timestamp_column, kind="stable").reset_index(drop=True)
+        return df
+
+    def partition_days(self, dataset: str, site_id: str, sensor: str) -> List[str]:
+        """Stored days for a site/sensor, oldest first."""
+        pattern = os.path.join(self.root, dataset, f"site={site_id}", f"sensor={sensor}", "date=*")
+        return sorted(os.path.basename(path)[len("date="):] for path in glob.glob(pattern))
+
+    def tail(self, dataset: str, site_id: str, sensor: str, n: int,
+             timestamp_column: str = "timestamp") -> pd.DataFrame:
+        """Last ``n`` rows, reading only as many recent day partitions as needed."""
+        frames, rows = [], 0
+        for day in reversed(self.partition_days(dataset, site_id, sensor)):
+            frame = self.read(dataset, site_id, sensor, timestamp_column=timestamp_column, days=[day])
+            frames.append(frame)
+            rows += len(frame)
+            if rows >= n:
+                break
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames[::-1], ignore_index=True)
+        if timestamp_column in df.columns:
+            df = df.sort_values(timestamp_column, kind="stable")
+        return df.tail(n).reset_index(drop=True)
+
+    def version(self, dataset: str, site_id: str, sensor: str) -> Tuple[int, int, int]:
+        """
+        (part files, bytes, newest mtime) of a site/sensor's dataset. The store
+        is append-only, so this changes whenever any process appends to it.
+        """
+        pattern = os.path.join(self.root, dataset, f"site={site_id}", f"sensor={sensor}", "date=*", "*.parquet")
+        count, size, newest = 0, 0, 0
+        for path in glob.glob(pattern):
+            stat = os.stat(path)
+            count, size, newest = count + 1, size + stat.st_size, max(newest, stat.st_mtime_ns)
+        return count, size, newest
+
+    def max_timestamp(self, dataset: str, site_id: str, sensor: str,
+                      timestamp_column: str = "timestamp") -> Optional[pd.Timestamp]:
+        """Newest stored timestamp, scanning only the latest day partition."""
+        days = self.partition_days(dataset, site_id, sensor)
+        if not days:
+            return None
+        try:
+            latest = self.read(dataset, site_id, sensor, columns=[timestamp_column],
+                               timestamp_column=timestamp_column, days=days[-1:])
+        except (KeyError, pa.ArrowInvalid) as e:
+            logger.warning(f"Could not read {timestamp_column} from {dataset}: {e}")
+            return None
+        return pd.Timestamp(latest[timestamp_column].max()) if len(latest) else None
+
+
+def store_pipeline_frames(params: Dict[str, Any], sensor: str,
+                          frames: Dict[str, Optional[pd.DataFrame]]) -> Dict[str, int]:
+    """
+    Persist a pipeline run's frames (readings, features, predictions, ...)
+    under the run's site_id. Rows already stored for the same series and
+    timestamp are skipped, so re-uploading overlapping files does not
+    duplicate history while late or other-station readings still land.
+    Disabled with params["store_results"] = False.
+    """
+    if not params.get("store_results", True):
+        return {}
+
+    store = ResultsStore(results_root(params.get("output_root")))
+    site_id = str(params.get("site_id", "default"))
+    written = {}
+    for dataset, frame in frames.items():
+        if frame is None or len(frame) == 0:
+            continue
+        try:
+            written[dataset] = store.append_new(dataset, frame, site_id, sensor)
+        except Exception as e:
+            logger.error(f"Error storing {sensor} {dataset} for site {site_id}: {e}")
+    return written
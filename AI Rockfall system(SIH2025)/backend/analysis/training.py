@@ -0,0 +1,230 @@
+"""
+Model training decoupled from analysis runs
+===========================================
+
+Analysis pipelines score with the registry's current model version;
+training happens here, off the request path, on a schedule or when the
+data drifts away from what the current version was trained on.
+
+A retrain is either
+- ``full``: every model refitted from scratch on the whole dataset, or
+- ``warm``: the current ensembles grown with new trees fitted only on
+  rows newer than the version's ``trained_until`` (``warm_start=True``),
+  keeping the current feature scaler so existing trees stay valid.
+
+``auto`` warm-starts when there is a current version with a known
+``trained_until`` (skipping the run if too few rows are new) and refits
+fully otherwise; see common.grow_or_build for the ensemble size cap.
+Random forests and isolation forests fit with ``n_jobs`` workers. Each
+retrain is registered as a new model version with its metrics,
+``trained_until`` and a feature profile (decile histogram) used for
+drift detection by population stability index.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from . import extensometer, gbinsar, geophone, piezometer, weather
+from .common import resolve_input_file, sensor_dirs, to_serializable
+from .model_registry import ModelRegistry, serving_spec
+
+logger = logging.getLogger(__name__)
+
+TRAINING_MODES = ("auto", "full", "warm")
+MIN_NEW_ROWS = 20
+PROFILE_QUANTILES = np.linspace(0.1, 0.9, 9)
+PSI_EPSILON = 1e-4
+
+# Per sensor: (default data file, frame builder(path, previous artefacts) -> (frame, scaler),
+#              fit(frame, analysis_dir, scaler, previous, n_jobs) -> performance)
+TRAINERS: Dict[str, Tuple[str, Callable, Callable]] = {
+    "geophone": (
+        geophone.DEFAULT_DATA_FILE,
+        lambda path, previous: (
+            geophone.engineer_seismic_features(geophone.load_or_create_geophone_data(path)), None
+        ),
+        lambda frame, directory, scaler, previous, n_jobs: geophone.train_models(frame, directory, previous, n_jobs),
+    ),
+    "piezometer": (
+        piezometer.DEFAULT_DATA_FILE,
+        lambda path, previous: piezometer.preprocess_piezometer_data(
+            piezometer.load_or_create_piezometer_data(path), previous.get("feature_scaler")
+        ),
+        lambda frame, directory, scaler, previous, n_jobs: piezometer.train_models(
+            frame, directory, scaler, previous, n_jobs
+        )[0],
+    ),
+    "gbinsar": (
+        gbinsar.DEFAULT_DATA_FILE,
+        lambda path, previous: gbinsar.preprocess_data(gbinsar.load_or_create_data(path), previous.get("feature_scaler")),
+        lambda frame, directory, scaler, previous, n_jobs: gbinsar.train_models(
+            frame, directory, scaler, previous, n_jobs
+        )[0],
+    ),
+    "extensometer": (
+        extensometer.DEFAULT_DATA_FILE,
+        lambda path, previous: (
+            extensometer.preprocess_extensometer_data(extensometer.load_or_create_extensometer_data(path)), None
+        ),
+        lambda frame, directory, scaler, previous, n_jobs: extensometer.train_models(frame, directory, previous, n_jobs),
+    ),
+    "weather": (
+        weather.DEFAULT_DATA_FILE,
+        lambda path, previous: (weather.preprocess_weather_data(weather.load_or_create_weather_data(path)), None),
+        lambda frame, directory, scaler, previous, n_jobs: weather.train_models(frame, directory, previous, n_jobs),
+    ),
+}
+
+
+def feature_profile(frame: pd.DataFrame, features: List[str]) -> Dict[str, Dict[str, List[float]]]:
+    """Decile edges and bin proportions of each feature, the reference for drift checks."""
+    profile = {}
+    for name in features:
+        values = frame[name].to_numpy(dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            continue
+        edges = np.unique(np.quantile(values, PROFILE_QUANTILES))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        profile[name] = {"edges": edges.tolist(), "proportions": (counts / len(values)).tolist()}
+    return profile
+
+
+def population_stability(frame: pd.DataFrame, profile: Dict[str, Dict[str, List[float]]]) -> Dict[str, float]:
+    """Population stability index of each profiled feature in ``frame`` (>0.2 is usually drift)."""
+    scores = {}
+    for name, reference in profile.items():
+        if name not in frame:
+            continue
+        values = frame[name].to_numpy(dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            continue
+        edges = np.asarray(reference["edges"])
+        expected = np.maximum(np.asarray(reference["proportions"]), PSI_EPSILON)
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        actual = np.maximum(counts / len(values), PSI_EPSILON)
+        scores[name] = float(np.sum((actual - expected) * np.log(actual / expected)))
+    return scores
+
+
+def _current(registry: ModelRegistry, sensor: str, artifacts: bool = True) -> Tuple[Optional[Dict], Dict[str, Any]]:
+    """Current version manifest and (optionally) its artefacts, loaded into memory for warm starts."""
+    version = registry.current_version(sensor)
+    if version is None:
+        return None, {}
+    manifest = registry.manifest(sensor, version)
+    if not artifacts:
+        return manifest, {}
+    return manifest, {name: joblib.load(path) for name, path in registry.artifact_paths(sensor, version).items()}
+
+
+def _newer_than(frame: pd.DataFrame, trained_until: Optional[str]) -> pd.DataFrame:
+    if not trained_until or "timestamp" not in frame:
+        return frame.iloc[0:0]
+    return frame[pd.to_datetime(frame["timestamp"]) > pd.Timestamp(trained_until)]
+
+
+def retrain(sensor: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Retrain ``sensor``'s models and register the result as its current version.
+
+    Recognised params: mode (auto / full / warm), input_files / input_file, n_jobs,
+    min_new_rows, activate, reason, output_root.
+    """
+    params = params or {}
+    mode = params.get("mode", "auto")
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode: {mode}")
+    if sensor not in TRAINERS:
+        raise ValueError(f"No trainer for {sensor}")
+
+    started = time.time()
+    default_file, build_frame, fit = TRAINERS[sensor]
+    registry = ModelRegistry(params.get("output_root"))
+    manifest, previous = _current(registry, sensor, artifacts=mode != "full")
+    trained_until = (manifest or {}).get("metrics", {}).get("trained_until")
+
+    data_file = resolve_input_file(params, default_file)
+    frame, scaler = build_frame(data_file, previous)
+    new_rows = _newer_than(frame, trained_until)
+    min_new_rows = params.get("min_new_rows", MIN_NEW_ROWS)
+
+    if mode == "auto":
+        # Versions registered before training metrics existed have no trained_until
+        mode = "warm" if previous and trained_until else "full"
+    if mode == "warm":
+        if not previous:
+            raise ValueError(f"{sensor} has no current model version to warm-start from")
+        # An empty batch cannot be split or fitted, whatever min_new_rows says
+        if new_rows.empty or len(new_rows) < min_new_rows:
+            return {"sensor": sensor, "skipped": True, "reason": f"{len(new_rows)} new rows since {trained_until}"}
+        training_frame = new_rows
+    else:
+        # A full refit also starts from a fresh scaler
+        if previous:
+            frame, scaler = build_frame(data_file, {})
+        training_frame, previous = frame, {}
+
+    performance = fit(training_frame, sensor_dirs(sensor, params.get("output_root"))["analysis"],
+                      scaler, previous, params.get("n_jobs"))
+
+    features = list(serving_spec(sensor)["features"])
+    metrics = {
+        "mode": mode,
+        "reason": params.get("reason", "manual"),
+        "data_file": data_file,
+        "training_rows": len(training_frame),
+        "trained_until": str(pd.to_datetime(frame["timestamp"]).max()) if "timestamp" in frame else None,
+        "training_seconds": round(time.time() - started, 3),
+        "performance": to_serializable(performance),
+        "feature_profile": feature_profile(frame, [name for name in features if name in frame]),
+    }
+    new_manifest = registry.register_latest(sensor, activate=params.get("activate", True), metrics=metrics)
+    logger.info(f"Retrained {sensor} ({mode}, {len(training_frame)} rows) as {new_manifest['version']}")
+    return {"sensor": sensor, "version": new_manifest["version"], "mode": mode,
+            "training_rows": len(training_frame), "training_seconds": metrics["training_seconds"]}
+
+
+def check_drift(sensor: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Population stability of rows newer than the current version's training
+    data against its feature profile. ``drift`` is the largest per-feature index.
+    """
+    params = params or {}
+    default_file, build_frame, _ = TRAINERS[sensor]
+    registry = ModelRegistry(params.get("output_root"))
+    manifest, _ = _current(registry, sensor, artifacts=False)
+    if manifest is None:
+        return {"sensor": sensor, "drift": None, "reason": "no current model version"}
+
+    # Scaled sensors are profiled in the space of the version's own scaler
+    spec = serving_spec(sensor)
+    previous = {}
+    if spec.get("scaler"):
+        path = registry.artifact_paths(sensor, manifest["version"])[spec["scaler"]]
+        previous = {spec["scaler"]: joblib.load(path)}
+    frame, _ = build_frame(resolve_input_file(params, default_file), previous)
+    trained_until = manifest.get("metrics", {}).get("trained_until")
+    recent = _newer_than(frame, trained_until)
+    if len(recent) < params.get("min_new_rows", MIN_NEW_ROWS):
+        return {"sensor": sensor, "drift": None, "new_rows": len(recent), "version": manifest["version"],
+                "trained_until": trained_until}
+
+    scores = population_stability(recent, manifest.get("metrics", {}).get("feature_profile", {}))
+    return {
+        "sensor": sensor,
+        "version": manifest["version"],
+        "new_rows": len(recent),
+        "trained_until": trained_until,
+        "drift": max(scores.values()) if scores else None,
+        "features": scores,
+    }
@@ -0,0 +1,206 @@
+"""
+Columnar voxel store for LiDAR voxel grids
+==========================================
+
+Occupied voxels are held as sorted linear keys
+(``(vz * n_y + vy) * n_x + vx``) with one NumPy column per statistic
+(struct-of-arrays), so memory grows with occupied voxels only and every
+downstream feature is a vectorized column operation. Key-to-row lookup
+uses a dense index when the full grid is small enough and binary search
+over the sorted keys otherwise.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Largest full grid (in voxels) for which a dense key->row index is kept (int32: 64 MB)
+DENSE_INDEX_LIMIT = 16_000_000
+
+
+def reduce_by_key(keys: np.ndarray, sums: Dict[str, np.ndarray], mins: Dict[str, np.ndarray],
+                  maxs: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Sort by key and reduce each run of equal keys with sum/min/max."""
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    if keys.size == 0:
+        empty = {name: np.empty(0) for name in (*sums, *mins, *maxs)}
+        return keys, empty
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    reduced = {}
+    for name, values in sums.items():
+        reduced[name] = np.add.reduceat(values[order], starts)
+    for name, values in mins.items():
+        reduced[name] = np.minimum.reduceat(values[order], starts)
+    for name, values in maxs.items():
+        reduced[name] = np.maximum.reduceat(values[order], starts)
+    return keys[starts], reduced
+
+
+def _sample_std(total: np.ndarray, sq_total: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Sample (ddof=1) standard deviation from sums; 0 for single-point voxels."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (sq_total - total ** 2 / count) / (count - 1)
+    return np.where(count > 1, np.sqrt(np.clip(var, 0.0, None)), 0.0)
+
+
+class VoxelStore:
+    """Struct-of-arrays statistics for the occupied voxels of a regular grid."""
+
+    def __init__(self, keys: np.ndarray, columns: Dict[str, np.ndarray],
+                 origin: Tuple[float, float, float], dimensions: Tuple[int, int, int],
+                 voxel_size: float):
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.columns = columns
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.dimensions = tuple(int(d) for d in dimensions)
+        self.voxel_size = float(voxel_size)
+
+        total_voxels = int(np.prod(self.dimensions))
+        self._dense_index: Optional[np.ndarray] = None
+        if total_voxels <= DENSE_INDEX_LIMIT:
+            self._dense_index = np.full(total_voxels, -1, dtype=np.int32)
+            self._dense_index[self.keys] = np.arange(len(self.keys), dtype=np.int32)
+
+    @classmethod
+    def from_sums(cls, keys: np.ndarray, sums: Dict[str, np.ndarray], origin: Tuple[float, float, float],
+                  dimensions: Tuple[int, int, int], voxel_size: float,
+                  has_intensity: bool = True) -> "VoxelStore":
+        """
+        Build from per-voxel sums: count, z_sum, z_sq_sum, z_min, z_max (elevations
+        relative to origin z) and optionally i_sum, i_sq_sum.
+        """
+        count = np.asarray(sums["count"], dtype=np.float64)
+        z0 = float(origin[2])
+        columns = {
+            "point_count": count.astype(np.int64),
+            "mean_elevation": z0 + sums["z_sum"] / np.maximum(count, 1),
+            "std_elevation": _sample_std(sums["z_sum"], sums["z_sq_sum"], count),
+            "min_elevation": z0 + np.asarray(sums["z_min"], dtype=np.float64),
+            "max_elevation": z0 + np.asarray(sums["z_max"], dtype=np.float64),
+        }
+        if has_intensity:
+            columns["mean_intensity"] = sums["i_sum"] / np.maximum(count, 1)
+            columns["std_intensity"] = _sample_std(sums["i_sum"], sums["i_sq_sum"], count)
+        return cls(keys, columns, origin, dimensions, voxel_size)
+
+    @classmethod
+    def from_points(cls, x: np.ndarray, y: np.ndarray, z: np.ndarray, voxel_size: float,
+                    intensity: Optional[np.ndarray] = None,
+                    origin: Optional[Tuple[float, float, float]] = None,
+                    dimensions: Optional[Tuple[int, int, int]] = None) -> "VoxelStore":
+        """Voxelize points with one sort and segmented reductions (no per-voxel Python loop)."""
+        x, y, z = (np.asarray(a, dtype=np.float64) for a in (x, y, z))
+        if origin is None:
+            origin = (x.min(), y.min(), z.min())
+        if dimensions is None:
+            dimensions = tuple(
+                max(int(np.ceil((a.max() - lo) / voxel_size)), 1) for a, lo in zip((x, y, z), origin)
+            )
+        store = cls(np.empty(0, dtype=np.int64), {}, origin, dimensions, voxel_size)
+        keys = store.point_keys(x, y, z)
+
+        dz = z - store.origin[2]
+        sums = {"count": np.ones_like(dz), "z_sum": dz, "z_sq_sum": dz * dz}
+        if intensity is not None:
+            i = np.asarray(intensity, dtype=np.float64)
+            sums.update({"i_sum": i, "i_sq_sum": i * i})
+        keys, reduced = reduce_by_key(keys, sums, {"z_min": dz}, {"z_max": dz})
+        return cls.from_sums(keys, reduced, origin, dimensions, voxel_size, has_intensity=intensity is not None)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __bool__(self) -> bool:
+        return len(self.keys) > 0
+
+    def linear_keys(self, vx: np.ndarray, vy: np.ndarray, vz: np.ndarray) -> np.ndarray:
+        n_x, n_y, _ = self.dimensions
+        return (np.asarray(vz, dtype=np.int64) * n_y + vy) * n_x + vx
+
+    def point_keys(self, x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+        """Linear voxel key for each point (clipped to the grid)."""
+        n_x, n_y, n_z = self.dimensions
+        vx = np.clip(np.floor((x - self.origin[0]) / self.voxel_size).astype(np.int64), 0, n_x - 1)
+        vy = np.clip(np.floor((y - self.origin[1]) / self.voxel_size).astype(np.int64), 0, n_y - 1)
+        vz = np.clip(np.floor((z - self.origin[2]) / self.voxel_size).astype(np.int64), 0, n_z - 1)
+        return self.linear_keys(vx, vy, vz)
+
+    def indices(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(vx, vy, vz) integer indices of every occupied voxel."""
+        n_x, n_y, _ = self.dimensions
+        return self.keys % n_x, (self.keys // n_x) % n_y, self.keys // (n_x * n_y)
+
+    def centers(self) -> np.ndarray:
+        """(n, 3) voxel centre coordinates."""
+        return self.origin + (np.column_stack(self.indices()) + 0.5) * self.voxel_size
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Row of each linear key, or -1 where the voxel is empty or outside the grid."""
+        keys = np.asarray(keys, dtype=np.int64)
+        inside = (keys >= 0) & (keys < int(np.prod(self.dimensions)))
+        rows = np.full(keys.shape, -1, dtype=np.int64)
+        if self._dense_index is not None:
+            rows[inside] = self._dense_index[keys[inside]]
+            return rows
+        if len(self.keys) == 0:
+            return rows
+        wanted = keys[inside]
+        pos = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        found = self.keys[pos] == wanted
+        rows[np.flatnonzero(inside)[found]] = pos[found]
+        return rows
+
+    def neighbor_rows(self, offset: Tuple[int, int, int]) -> np.ndarray:
+        """Row of the voxel at ``offset`` from every occupied voxel (-1 if empty/outside)."""
+        vx, vy, vz = self.indices()
+        nx, ny, nz = vx + offset[0], vy + offset[1], vz + offset[2]
+        n_x, n_y, n_z = self.dimensions
+        inside = (nx >= 0) & (nx < n_x) & (ny >= 0) & (ny < n_y) & (nz >= 0) & (nz < n_z)
+        rows = np.full(len(self.keys), -1, dtype=np.int64)
+        rows[inside] = self.lookup(self.linear_keys(nx[inside], ny[inside], nz[inside]))
+        return rows
+
+    def __getitem__(self, voxel: Tuple[int, int, int]) -> Dict[str, float]:
+        """Statistics of a single voxel given as (vx, vy, vz)."""
+        row = int(self.lookup(self.linear_keys(*np.array([voxel]).T))[0])
+        if row < 0:
+            raise KeyError(voxel)
+        record = {name: values[row].item() for name, values in self.columns.items()}
+        record.update(dict(zip(("center_x", "center_y", "center_z"), self.centers()[row].tolist())))
+        record["elevation_range"] = record["max_elevation"] - record["min_elevation"]
+        return record
+
+    def __contains__(self, voxel: Tuple[int, int, int]) -> bool:
+        return bool(self.lookup(self.linear_keys(*np.array([voxel]).T))[0] >= 0)
+
+    @property
+    def elevation_range(self) -> np.ndarray:
+        return self.columns["max_elevation"] - self.columns["min_elevation"]
+
+    def to_frame(self) -> pd.DataFrame:
+        """All voxel statistics as a DataFrame (vx, vy, vz, stats, centres)."""
+        vx, vy, vz = self.indices()
+        frame = pd.DataFrame({"vx": vx, "vy": vy, "vz": vz, **self.columns})
+        frame[["center_x", "center_y", "center_z"]] = self.centers()
+        frame["elevation_range"] = self.elevation_range
+        return frame
+
+    def summary(self) -> Dict[str, Any]:
+        """Grid metadata in the grid_info layout used by the pipeline."""
+        n_x, n_y, n_z = self.dimensions
+        total_voxels = n_x * n_y * n_z
+        upper = self.origin + np.asarray(self.dimensions) * self.voxel_size
+        return {
+            "bounds": (self.origin[0], upper[0], self.origin[1], upper[1], self.origin[2], upper[2]),
+            "dimensions": self.dimensions,
+            "voxel_size": self.voxel_size,
+            "total_voxels": total_voxels,
+            "occupied_voxels": len(self),
+            "occupancy_rate": len(self) / total_voxels * 100,
+            "memory_bytes": int(self.keys.nbytes + sum(values.nbytes for values in self.columns.values())),
+        }
@@ -0,0 +1,280 @@
+"""
+Automatic weather station analysis pipeline
+===========================================
+
+Importable version of Automatic_Weather_Station_Analysis.ipynb: hourly
+weather data loading, feature engineering, weather alerts and the
+temperature/rainfall models.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestRegressor
+from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from .alert_rules import AlertRule, AlertRuleSet, Threshold
+from .common import (
+    DATA_DIR, get_next_filename, grow_or_build, preloaded_models, resolve_input_file, save_json,
+    sensor_dirs, to_serializable
+)
+from .results_store import store_pipeline_frames
+
+logger = logging.getLogger(__name__)
+
+SENSOR = "weather"
+DEFAULT_DATA_FILE = os.path.join(DATA_DIR, "weather_station_data.csv")
+MODEL_FILES = ("temperature_model", "rainfall_classifier")
+
+NUMERIC_COLUMNS = [
+    "rainfall_intensity", "cumulative_rainfall", "rainfall_duration",
+    "temperature", "humidity", "wind_speed",
+]
+TEMPERATURE_FEATURES = ["humidity", "wind_speed", "rainfall_intensity", "hour", "day"]
+RAIN_FEATURES = ["temperature", "humidity", "wind_speed", "hour"]
+# Online inference (see model_registry); each head reads its own feature subset
+SERVING_SPEC = {
+    "features": ["temperature", "humidity", "wind_speed", "rainfall_intensity", "hour", "day"],
+    "scaler": None,
+    "outputs": {
+        "temperature": ("temperature_model", "predict", TEMPERATURE_FEATURES),
+        "rain": ("rainfall_classifier", "predict_proba", RAIN_FEATURES),
+    },
+}
+
+
+def generate_weather_data(n_samples: int = 168) -> pd.DataFrame:
+    """Generate synthetic hourly weather station data (default 7 days)."""
+    end_date = datetime.now()
+    timestamps = pd.date_range(start=end_date - timedelta(hours=n_samples), end=end_date, freq="H")
+
+    rows = []
+    cumulative_rain = 0.0
+    current_rain_duration = 0
+    rain_event = False
+    for i in range(n_samples):
+        hour = timestamps[i].hour
+        daily_phase = np.sin(2 * np.pi * hour / 24)
+
+        if not rain_event and np.random.random() < 0.1:
+            rain_event = True
+            current_rain_duration = 0
+        elif rain_event and np.random.random() < 0.3:
+            rain_event = False
+
+        if rain_event:
+            current_rain_duration += 1
+            rainfall_intensity = max(0, np.random.normal(5, 2))
+            cumulative_rain += rainfall_intensity
+        else:
+            rainfall_intensity = 0
+            current_rain_duration = 0
+
+        rows.append({
+            "timestamp": timestamps[i],
+            "rainfall_intensity": rainfall_intensity,
+            "cumulative_rainfall": cumulative_rain,
+            "rainfall_duration": current_rain_duration,
+            "temperature": 25 + 5 * daily_phase + np.random.normal(0, 2),
+            "humidity": np.clip(60 - 3 * daily_phase + np.random.normal(0, 5), 30, 100),
+            "wind_speed": max(0, 5 + 2 * daily_phase + np.random.normal(0, 1)),
+        })
+
+    return pd.DataFrame(rows)
+
+
+def load_or_create_weather_data(data_file: str = DEFAULT_DATA_FILE) -> pd.DataFrame:
+    """Load weather readings from CSV or generate (and save) a synthetic set."""
+    if os.path.exists(data_file):
+        df = pd.read_csv(data_file)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return df
+
+    df = generate_weather_data()
+    df.to_csv(data_file, index=False)
+    return df
+
+
+def preprocess_weather_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Engineer datetime, heat index, change-rate and moving-average features."""
+    processed_df = df.copy()
+    processed_df[NUMERIC_COLUMNS] = processed_df[NUMERIC_COLUMNS].fillna(processed_df[NUMERIC_COLUMNS].mean())
+
+    processed_df["hour"] = processed_df["timestamp"].dt.hour
+    processed_df["day"] = processed_df["timestamp"].dt.day
+    processed_df["month"] = processed_df["timestamp"].dt.month
+    processed_df["season"] = (processed_df["month"] % 12 + 3) // 3
+
+    t = processed_df["temperature"]
+    h = processed_df["humidity"]
+    processed_df["heat_index"] = np.where(
+        (t > 20) & (h > 40),
+        -8.784695 + 1.61139411 * t + 2.338549 * h - 0.14611605 * t * h
+        - 0.012308094 * t ** 2 - 0.016424828 * h ** 2 + 0.002211732 * t ** 2 * h
+        + 0.00072546 * t * h ** 2 - 0.000003582 * t ** 2 * h ** 2,
+        t
+    )
+
+    for column in ("temperature", "humidity", "wind_speed"):
+        prefix = "temp" if column == "temperature" else column
+        processed_df[f"{prefix}_change"] = processed_df[column].diff()
+        processed_df[f"{prefix}_ma_24h"] = processed_df[column].rolling(window=24).mean()
+
+    processed_df["rain_intensity_category"] = pd.cut(
+        processed_df["rainfall_intensity"],
+        bins=[-np.inf, 0, 2.5, 7.5, 15, np.inf],
+        labels=["None", "Light", "Moderate", "Heavy", "Extreme"]
+    )
+    processed_df["comfort_index"] = 0.5 * t + 0.3 * h - 0.2 * processed_df["wind_speed"]
+
+    return processed_df.ffill().bfill()
+
+
+WEATHER_ALERT_RULES = AlertRuleSet([
+    AlertRule("WARNING", Threshold("rainfall_intensity", ">", 15),
+              "Extreme rainfall detected: {rainfall_intensity:.1f} mm/hr", name="Extreme Rainfall", group="rain"),
+    AlertRule("CAUTION", Threshold("rainfall_intensity", ">", 7.5),
+              "Heavy rainfall detected: {rainfall_intensity:.1f} mm/hr", name="Heavy Rainfall", group="rain"),
+    AlertRule("WARNING", Threshold("heat_index", ">", 35),
+              "Dangerous heat conditions: Heat index {heat_index:.1f}°C", name="Extreme Heat", group="heat"),
+    AlertRule("CAUTION", Threshold("heat_index", ">", 30),
+              "High heat conditions: Heat index {heat_index:.1f}°C", name="High Heat", group="heat"),
+    AlertRule("WARNING", Threshold("wind_speed", ">", 10.7),
+              "Strong winds detected: {wind_speed:.1f} m/s", name="Strong Winds", group="wind"),
+    AlertRule("CAUTION", Threshold("wind_speed", ">", 7.9),
+              "Fresh breeze conditions: {wind_speed:.1f} m/s", name="Fresh Breeze", group="wind"),
+    AlertRule("WARNING", Threshold("rainfall_intensity", ">", 5) & Threshold("wind_speed", ">", 8),
+              "Heavy rain with strong winds detected", name="Stormy Conditions"),
+])
+
+# Severity labels used by the weather notebook and dashboard
+ALERT_SEVERITY = {"CRITICAL": "High", "WARNING": "High", "CAUTION": "Medium"}
+
+
+def generate_weather_alerts(df: pd.DataFrame) -> pd.DataFrame:
+    """Check every reading against rainfall, heat, wind and storm thresholds."""
+    alerts = WEATHER_ALERT_RULES.evaluate(df, carry=["timestamp"])
+    if len(alerts) == 0:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        "type": alerts["rule"],
+        "severity": alerts["level"].map(ALERT_SEVERITY),
+        "level": alerts["level"],
+        "message": alerts["reason"],
+        "timestamp": alerts["timestamp"],
+    })
+
+
+def check_weather_alerts(data: pd.Series) -> List[Dict[str, str]]:
+    """Check a single reading against rainfall, heat, wind and storm thresholds."""
+    alerts = generate_weather_alerts(data.to_frame().T.infer_objects())
+    return alerts.drop(columns="timestamp", errors="ignore").to_dict("records")
+
+
+def train_models(processed_df: pd.DataFrame, analysis_dir: str, previous: Optional[Dict[str, Any]] = None,
+                 n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Train the temperature regressor and rain event classifier. With
+    ``previous`` artefacts the ensembles are grown (warm start).
+    """
+    previous = previous or {}
+    temp_data = processed_df[TEMPERATURE_FEATURES + ["temperature"]].dropna()
+    X_train, X_test, y_train, y_test = train_test_split(
+        temp_data[TEMPERATURE_FEATURES], temp_data["temperature"], test_size=0.3, random_state=42
+    )
+    rf_temp_model = grow_or_build(
+        previous.get("temperature_model"),
+        lambda: RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10, n_jobs=n_jobs),
+        n_jobs=n_jobs
+    )
+    rf_temp_model.fit(X_train, y_train)
+    y_pred_temp = rf_temp_model.predict(X_test)
+
+    rain_data = processed_df[RAIN_FEATURES].assign(
+        rain_event=(processed_df["rainfall_intensity"] > 0).astype(int)
+    ).dropna()
+    X_train_rain, X_test_rain, y_train_rain, y_test_rain = train_test_split(
+        rain_data[RAIN_FEATURES], rain_data["rain_event"], test_size=0.3, random_state=42
+    )
+    gb_rain_model = grow_or_build(
+        previous.get("rainfall_classifier"),
+        lambda: GradientBoostingClassifier(n_estimators=100, random_state=42),
+        y_train_rain
+    )
+    gb_rain_model.fit(X_train_rain, y_train_rain)
+
+    temperature_path = get_next_filename(analysis_dir, "temperature_model", ".joblib")
+    rainfall_path = get_next_filename(analysis_dir, "rainfall_classifier", ".joblib")
+    joblib.dump(rf_temp_model, temperature_path)
+    joblib.dump(gb_rain_model, rainfall_path)
+
+    return {
+        "temperature_r2": float(r2_score(y_test, y_pred_temp)),
+        "temperature_rmse": float(np.sqrt(mean_squared_error(y_test, y_pred_temp))),
+        "rain_accuracy": float(accuracy_score(y_test_rain, gb_rain_model.predict(X_test_rain))),
+        "model_paths": {"temperature": temperature_path, "rainfall": rainfall_path},
+    }
+
+
+def predict_with_models(processed_df: pd.DataFrame, models: Dict[str, Any]) -> pd.DataFrame:
+    """Predict temperature and rain-event probability with the preloaded models."""
+    return pd.DataFrame({
+        "timestamp": processed_df["timestamp"].values,
+        "predicted_temperature": models["temperature_model"].predict(processed_df[TEMPERATURE_FEATURES]),
+        "rain_probability": models["rainfall_classifier"].predict_proba(processed_df[RAIN_FEATURES])[:, 1],
+    })
+
+
+def run(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full weather station pipeline and return JSON-serializable results.
+
+    Recognised params: input_files / input_file, train_models (default: only when no preloaded
+    models are available), models, site_id, store_results, output_root.
+    """
+    data_file = resolve_input_file(params, DEFAULT_DATA_FILE)
+    dirs = sensor_dirs(SENSOR, params.get("output_root"))
+
+    df = load_or_create_weather_data(data_file)
+    processed_df = preprocess_weather_data(df)
+    processed_df.to_csv(get_next_filename(dirs["analysis"], "processed_weather_data", ".csv"), index=False)
+
+    alerts_df = generate_weather_alerts(processed_df)
+    models = preloaded_models(params, MODEL_FILES)
+    model_performance = (
+        train_models(processed_df, dirs["analysis"]) if params.get("train_models", not models) else {}
+    )
+    predictions = predict_with_models(processed_df, models) if models else pd.DataFrame()
+
+    stored_rows = store_pipeline_frames(
+        params, SENSOR, {"readings": df, "features": processed_df, "predictions": predictions}
+    )
+
+    results = {
+        "sensor": SENSOR,
+        "input_file": data_file,
+        "summary": {
+            "total_readings": len(df),
+            "date_range": {"start": df["timestamp"].min(), "end": df["timestamp"].max()},
+            "total_rainfall": df["rainfall_intensity"].sum(),
+            "max_rainfall_intensity": df["rainfall_intensity"].max(),
+            "mean_temperature": df["temperature"].mean(),
+            "max_wind_speed": df["wind_speed"].max(),
+        },
+        "alert_counts": alerts_df["severity"].value_counts().to_dict() if len(alerts_df) else {},
+        "alerts": alerts_df.tail(50).to_dict("records") if len(alerts_df) else [],
+        "model_performance": model_performance,
+        "model_predictions": predictions.tail(24).to_dict("records") if len(predictions) else [],
+    }
+    results["stored_rows"] = stored_rows
+    results["artifacts"] = {"report": save_json(results, dirs["analysis"], "weather_report")}
+    return to_serializable(results)
@@ -0,0 +1,68 @@
+"""
+Worker-process entry points for the sensor analysis pipelines
+=============================================================
+
+Functions executed inside the orchestrator's process pools. Each pool is
+pinned to one sensor: its initializer imports that sensor's pipeline and
+loads the sensor's joblib artifacts once, so every subsequent run in that
+process starts warm.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from . import get_runner, load_sensor_models, normalize_sensor
+
+logger = logging.getLogger(__name__)
+
+# Per-process state populated by init_worker
+_WORKER_SENSOR: Optional[str] = None
+_WORKER_MODELS: Dict[str, Any] = {}
+
+
+def init_worker(sensor: str, output_root: Optional[str] = None) -> None:
+    """Process-pool initializer: pin this process to a sensor and preload its models."""
+    global _WORKER_SENSOR, _WORKER_MODELS
+
+    _WORKER_SENSOR = normalize_sensor(sensor)
+    get_runner(_WORKER_SENSOR)  # import the pipeline module once
+
+    try:
+        _WORKER_MODELS = load_sensor_models(_WORKER_SENSOR, output_root)
+    except Exception as e:
+        logger.error(f"Error preloading {_WORKER_SENSOR} models in worker {os.getpid()}: {e}")
+        _WORKER_MODELS = {}
+
+    logger.info(
+        f"Worker {os.getpid()} ready for {_WORKER_SENSOR} "
+        f"({len(_WORKER_MODELS)} preloaded artifacts)"
+    )
+
+
+def ping() -> int:
+    """No-op task used to spawn (and therefore warm) pool processes eagerly."""
+    return os.getpid()
+
+
+def run_in_worker(sensor: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a pipeline inside a pinned worker, reusing the preloaded artifacts."""
+    sensor = normalize_sensor(sensor)
+    if sensor != _WORKER_SENSOR:
+        raise RuntimeError(f"Worker pinned to {_WORKER_SENSOR} received a {sensor} analysis")
+
+    params = dict(params)
+    params.setdefault("models", _WORKER_MODELS)
+    return get_runner(sensor)(params)
+
+
+def reload_models(output_root: Optional[str] = None) -> int:
+    """Reload this worker's artifacts (e.g. after retraining); returns the count loaded."""
+    global _WORKER_MODELS
+    if _WORKER_SENSOR is None:
+        return 0
+    _WORKER_MODELS = load_sensor_models(_WORKER_SENSOR, output_root)
+    return len(_WORKER_MODELS)
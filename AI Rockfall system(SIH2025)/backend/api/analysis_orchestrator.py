@@ -2,83 +2,143 @@
 Analysis Orchestrator for AI Rockfall Prediction System
 ======================================================
 
-Handles the execution of Jupyter notebook analysis pipelines.
+Handles the execution of the sensor analysis pipelines (backend/analysis).
 Manages concurrent analysis runs, progress tracking, and result aggregation.
 
 Features:
-- Asynchronous notebook execution
+- Asynchronous pipeline execution in warm workers
 - Progress monitoring and status updates
 - Result aggregation and validation
 - Error handling and recovery
 - Resource management and queuing
+- Optional Redis-backed queue, event bus and status cache for multi-worker deployments
+- Content-addressed result cache for re-submitted inputs
+- Report rendering handed off to the report renderer after completion
+- Site-level risk fusion updated as each sensor stream ticks
 
 Author: AI Rockfall Prediction Team
 Date: October 26, 2025
 """
 
 import asyncio
-import json
 import logging
-import os
-import subprocess
-import tempfile
-import time
 from datetime import datetime
-from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
-from concurrent.futures import ThreadPoolExecutor
 import psutil
 
+from ..analysis import normalize_sensor
 from .config import settings
 from .models import Analysis, AnalysisStatus, DeviceType
-from .websocket_manager import WebSocketManager
+from .result_cache import ResultCache
+from .shared_state import LocalAnalysisQueue, RedisAnalysisQueue, RedisEventBus, StatusCache
+from .websocket_manager import WebSocketManager, room_name, websocket_manager as shared_websocket_manager
+from .worker_pool import SensorWorkerPool
 
 logger = logging.getLogger(__name__)
 
+FINAL_STATUSES = (AnalysisStatus.COMPLETED, AnalysisStatus.FAILED, AnalysisStatus.CANCELLED)
+MAX_STATUS_SNAPSHOTS = 10000
+
 class AnalysisOrchestrator:
-    """Orchestrates the execution of analysis notebooks."""
+    """Orchestrates the execution of sensor analysis pipelines."""
 
-    def __init__(self):
+    def __init__(self, websocket_manager: Optional[WebSocketManager] = None):
         self.active_analyses: Dict[int, asyncio.Task] = {}
-        self.websocket_manager = WebSocketManager()
-        self.executor = ThreadPoolExecutor(max_workers=settings.MAX_CONCURRENT_ANALYSES)
-        self.analysis_queue: asyncio.Queue = asyncio.Queue()
+        # Share the API's manager so updates reach the clients connected in main.py
+        self.websocket_manager = websocket_manager or shared_websocket_manager
+        self.analysis_rooms: Dict[int, List[str]] = {}
+        self.worker_pool = SensorWorkerPool(
+            min_workers_per_sensor=settings.MIN_WORKERS_PER_SENSOR,
+            max_workers=settings.MAX_ANALYSIS_WORKERS,
+            output_root=settings.UPLOAD_BASE_DIR
+        )
+        # In-process defaults; use_redis() swaps in the shared implementations
+        self.analysis_queue = LocalAnalysisQueue()
+        # Claim a queued analysis only when a worker slot is free, leaving the rest to other API workers
+        self.dispatch_slots = asyncio.Semaphore(settings.MAX_ANALYSIS_WORKERS)
+        self.broadcaster = self.websocket_manager
+        self.event_bus: Optional[RedisEventBus] = None
+        self.status_cache: Optional[StatusCache] = None
+        self.status_snapshots: Dict[int, Dict[str, Any]] = {}
+        self.result_cache = ResultCache() if settings.RESULT_CACHE_ENABLED else None
+        # Set by the API (api.report_renderer); reports render outside the analysis run
+        self.report_renderer = None
+        # Set by the API (api.fusion); refreshes the site risk score after each run
+        self.fusion = None
+
+    def use_redis(self, redis):
+        """Share the queue, WebSocket broadcasts and status across API workers through Redis."""
+        self.analysis_queue = RedisAnalysisQueue(redis)
+        self.event_bus = RedisEventBus(redis, self.websocket_manager)
+        self.event_bus.on_control("cancel", self._cancel_local)
+        self.broadcaster = self.event_bus
+        self.status_cache = StatusCache(redis)
 
     async def start_monitoring(self):
         """Start the analysis monitoring loop."""
         logger.info("Starting analysis orchestrator monitoring")
+        self.worker_pool.warm_up()
+        if self.event_bus is not None:
+            asyncio.create_task(self.event_bus.listen())
+        await self.analysis_queue.recover(own=True)
         asyncio.create_task(self._process_analysis_queue())
+        asyncio.create_task(self._recover_dead_consumers())
         asyncio.create_task(self._monitor_system_resources())
 
+    def shutdown(self):
+        """Stop the analysis worker processes."""
+        self.worker_pool.shutdown(wait=False)
+
     async def _process_analysis_queue(self):
-        """Process queued analysis requests."""
+        """Dispatch queued analysis requests, at most MAX_ANALYSIS_WORKERS at a time."""
         while True:
+            await self.dispatch_slots.acquire()
             try:
-                analysis_id = await self.analysis_queue.get()
-                await self._execute_analysis(analysis_id)
-                self.analysis_queue.task_done()
+                item, receipt = await self.analysis_queue.get()
+                analysis_id = item["analysis_id"]
+                # The submitting API worker may not be the one executing the analysis
+                self.analysis_rooms[analysis_id] = item.get("rooms") or self._rooms_for(analysis_id, item["parameters"])
+                task = asyncio.create_task(
+                    self._execute_analysis(
+                        analysis_id, item["analysis_type"], item["parameters"], item["input_files"],
+                        item.get("cache_key")
+                    )
+                )
+                task.add_done_callback(lambda _, r=receipt: asyncio.ensure_future(self.analysis_queue.ack(r)))
+                task.add_done_callback(lambda _: self.dispatch_slots.release())
             except Exception as e:
+                self.dispatch_slots.release()
                 logger.error(f"Error processing analysis queue: {e}")
 
+    async def _recover_dead_consumers(self):
+        """Requeue analyses claimed by API workers that stopped heartbeating."""
+        while True:
+            await asyncio.sleep(settings.QUEUE_RECOVERY_INTERVAL)
+            try:
+                await self.analysis_queue.recover()
+            except Exception as e:
+                logger.error(f"Error recovering analysis queue: {e}")
+
     async def _monitor_system_resources(self):
-        """Monitor system resources and adjust concurrency."""
+        """Monitor system resources and resize the worker pools."""
         while True:
             try:
                 # Check CPU and memory usage
                 cpu_percent = psutil.cpu_percent()
                 memory_percent = psutil.virtual_memory().percent
 
-                # Adjust max workers based on resource usage
-                if cpu_percent > 80 or memory_percent > 80:
-                    # Reduce concurrency under high load
-                    if self.executor._max_workers > 1:
-                        logger.warning(f"High resource usage (CPU: {cpu_percent}%, Memory: {memory_percent}%). Reducing concurrency.")
-                        # Note: In real implementation, you'd recreate the executor with fewer workers
+                # Grow pools with a backlog while there is headroom, shrink under pressure
+                self.worker_pool.autoscale(
+                    cpu_percent,
+                    memory_percent,
+                    scale_up_below=settings.WORKER_SCALE_UP_BELOW,
+                    scale_down_above=settings.WORKER_SCALE_DOWN_ABOVE
+                )
 
-                await asyncio.sleep(30)  # Check every 30 seconds
+                await asyncio.sleep(settings.WORKER_SCALE_INTERVAL)
             except Exception as e:
                 logger.error(f"Error monitoring system resources: {e}")
-                await asyncio.sleep(30)
+                await asyncio.sleep(settings.WORKER_SCALE_INTERVAL)
 
     async def submit_analysis(
         self,
@@ -89,16 +149,47 @@ class AnalysisOrchestrator:
     ) -> bool:
         """Submit an analysis for execution."""
         try:
+            # Validate type up front so bad requests fail fast
+            analysis_type = normalize_sensor(analysis_type)
+
+            rooms = self._rooms_for(analysis_id, parameters)
+
+            # Unchanged inputs, parameters, code and models: answer from the result cache
+            cache_key, cached = None, None
+            if self.result_cache is not None and parameters.get("use_cache", True):
+                try:
+                    cache_key = await asyncio.to_thread(
+                        self.result_cache.key_for, analysis_type, parameters, input_files
+                    )
+                    cached = await asyncio.to_thread(self.result_cache.get, cache_key)
+                except Exception as e:
+                    logger.error(f"Result cache lookup failed for analysis {analysis_id}: {e}")
+                if cached is not None:
+                    self.analysis_rooms[analysis_id] = rooms
+                    await self._update_analysis_status(analysis_id, AnalysisStatus.COMPLETED, cached)
+                    self.analysis_rooms.pop(analysis_id, None)
+                    logger.info(f"Analysis {analysis_id} served from result cache")
+                    return True
+
             # Add to queue
-            await self.analysis_queue.put(analysis_id)
+            await self.analysis_queue.put({
+                "analysis_id": analysis_id,
+                "analysis_type": analysis_type,
+                "parameters": parameters,
+                "input_files": input_files,
+                "rooms": rooms,
+                "cache_key": cache_key,
+            })
 
             # Broadcast status update
-            await self.websocket_manager.broadcast({
+            queued = {
                 "type": "analysis_update",
                 "analysis_id": analysis_id,
                 "status": "queued",
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }
+            await self._store_status(analysis_id, queued, final=False)
+            await self.broadcaster.publish(queued, rooms)
 
             logger.info(f"Analysis {analysis_id} submitted to queue")
             return True
@@ -107,172 +198,79 @@ class AnalysisOrchestrator:
             logger.error(f"Error submitting analysis {analysis_id}: {e}")
             return False
 
-    async def _execute_analysis(self, analysis_id: int):
+    @staticmethod
+    def _rooms_for(analysis_id: int, parameters: Dict[str, Any]) -> List[str]:
+        """WebSocket rooms interested in an analysis: the analysis itself, its site and device."""
+        rooms = [room_name("analysis", analysis_id)]
+        for kind in ("site", "device"):
+            if parameters.get(f"{kind}_id") is not None:
+                rooms.append(room_name(kind, parameters[f"{kind}_id"]))
+        return rooms
+
+    async def _execute_analysis(
+        self,
+        analysis_id: int,
+        analysis_type: str,
+        parameters: Dict[str, Any],
+        input_files: List[str],
+        cache_key: Optional[str] = None
+    ):
         """Execute a single analysis."""
         try:
             # Update status to running
             await self._update_analysis_status(analysis_id, AnalysisStatus.RUNNING)
 
-            # Get analysis details from database
-            # In real implementation, fetch from DB
-            analysis_type = "lidar"  # Placeholder
-            parameters = {}
-            input_files = []
-
-            # Execute based on type
-            if analysis_type == "lidar":
-                success, results = await self._execute_lidar_analysis(analysis_id, parameters, input_files)
-            elif analysis_type == "geophone":
-                success, results = await self._execute_geophone_analysis(analysis_id, parameters, input_files)
-            # Add other analysis types...
+            task = asyncio.ensure_future(
+                self._run_pipeline(analysis_id, analysis_type, parameters, input_files)
+            )
+            self.active_analyses[analysis_id] = task
+            success, results = await asyncio.wait_for(task, timeout=settings.ANALYSIS_TIMEOUT)
 
             # Update final status
             if success:
+                if cache_key is not None:
+                    await self._cache_results(analysis_type, parameters, input_files, results)
                 await self._update_analysis_status(analysis_id, AnalysisStatus.COMPLETED, results)
+                if self.report_renderer is not None:
+                    self.report_renderer.schedule(analysis_type, parameters.get("site_id", "default"))
+                if self.fusion is not None:
+                    self.fusion.schedule(analysis_type, parameters.get("site_id", "default"))
             else:
-                await self._update_analysis_status(analysis_id, AnalysisStatus.FAILED)
-
+                await self._update_analysis_status(
+                    analysis_id, AnalysisStatus.FAILED, error_message=results.get("error")
+                )
+
+        except asyncio.CancelledError:
+            logger.info(f"Analysis {analysis_id} was cancelled")
+        except asyncio.TimeoutError:
+            logger.error(f"Analysis {analysis_id} timed out after {settings.ANALYSIS_TIMEOUT}s")
+            await self._update_analysis_status(analysis_id, AnalysisStatus.FAILED, error_message="Analysis timed out")
         except Exception as e:
             logger.error(f"Error executing analysis {analysis_id}: {e}")
             await self._update_analysis_status(analysis_id, AnalysisStatus.FAILED, error_message=str(e))
+        finally:
+            self.active_analyses.pop(analysis_id, None)
+            self.analysis_rooms.pop(analysis_id, None)
 
-    async def _execute_lidar_analysis(
-        self,
-        analysis_id: int,
-        parameters: Dict[str, Any],
-        input_files: List[str]
-    ) -> Tuple[bool, Dict[str, Any]]:
-        """Execute LiDAR analysis notebook."""
-        return await self._execute_notebook(
-            analysis_id,
-            settings.LIDAR_ANALYSIS,
-            parameters,
-            input_files
-        )
-
-    async def _execute_geophone_analysis(
-        self,
-        analysis_id: int,
-        parameters: Dict[str, Any],
-        input_files: List[str]
-    ) -> Tuple[bool, Dict[str, Any]]:
-        """Execute geophone analysis notebook."""
-        return await self._execute_notebook(
-            analysis_id,
-            settings.GEOPHONE_ANALYSIS,
-            parameters,
-            input_files
-        )
-
-    async def _execute_notebook(
+    async def _run_pipeline(
         self,
         analysis_id: int,
-        notebook_path: str,
+        analysis_type: str,
         parameters: Dict[str, Any],
         input_files: List[str]
     ) -> Tuple[bool, Dict[str, Any]]:
-        """Execute a Jupyter notebook with parameters."""
+        """Run a sensor pipeline from the analysis package in the worker pool."""
         try:
-            # Create temporary parameter file
-            param_file = self._create_parameter_file(analysis_id, parameters, input_files)
-
-            # Execute notebook using papermill or nbconvert
-            output_notebook = f"output_{analysis_id}_{int(time.time())}.ipynb"
-
-            # Use subprocess to run jupyter nbconvert execute
-            cmd = [
-                "jupyter", "nbconvert", "--to", "notebook", "--execute",
-                "--output", output_notebook,
-                "--ExecutePreprocessor.timeout", str(settings.JUPYTER_KERNEL_TIMEOUT),
-                notebook_path
-            ]
-
-            # Set environment variables for parameters
-            env = os.environ.copy()
-            env["ANALYSIS_ID"] = str(analysis_id)
-            env["PARAM_FILE"] = param_file
-
-            # Execute in thread pool
-            loop = asyncio.get_event_loop()
-            process = await loop.run_in_executor(
-                self.executor,
-                self._run_subprocess,
-                cmd,
-                env
-            )
+            params = dict(parameters)
+            params["analysis_id"] = analysis_id
+            params["input_files"] = input_files
 
-            if process.returncode == 0:
-                # Parse results from output notebook
-                results = self._parse_notebook_results(output_notebook)
-                return True, results
-            else:
-                logger.error(f"Notebook execution failed with return code {process.returncode}")
-                return False, {"error": "Notebook execution failed"}
+            results = await self.worker_pool.run(analysis_type, params)
+            return True, results
 
         except Exception as e:
-            logger.error(f"Error executing notebook {notebook_path}: {e}")
+            logger.error(f"Error running {analysis_type} pipeline for analysis {analysis_id}: {e}")
             return False, {"error": str(e)}
-        finally:
-            # Cleanup temporary files
-            if 'param_file' in locals():
-                Path(param_file).unlink(missing_ok=True)
-            if 'output_notebook' in locals():
-                Path(output_notebook).unlink(missing_ok=True)
-
-    def _run_subprocess(self, cmd: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
-        """Run subprocess in thread pool."""
-        return subprocess.run(
-            cmd,
-            env=env,
-            cwd=settings.BASE_DIR,
-            capture_output=True,
-            text=True,
-            timeout=settings.JUPYTER_KERNEL_TIMEOUT
-        )
-
-    def _create_parameter_file(
-        self,
-        analysis_id: int,
-        parameters: Dict[str, Any],
-        input_files: List[str]
-    ) -> str:
-        """Create a temporary parameter file for the notebook."""
-        param_data = {
-            "analysis_id": analysis_id,
-            "parameters": parameters,
-            "input_files": input_files,
-            "output_dir": settings.OUTPUT_DIR,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(param_data, f, indent=2)
-            return f.name
-
-    def _parse_notebook_results(self, notebook_path: str) -> Dict[str, Any]:
-        """Parse results from executed notebook."""
-        try:
-            with open(notebook_path, 'r') as f:
-                notebook = json.load(f)
-
-            # Extract results from notebook cells
-            results = {}
-            for cell in notebook.get('cells', []):
-                if cell.get('cell_type') == 'code':
-                    # Look for result variables in cell outputs
-                    for output in cell.get('outputs', []):
-                        if output.get('output_type') == 'execute_result':
-                            # Extract result data
-                            data = output.get('data', {})
-                            if 'application/json' in data:
-                                results.update(data['application/json'])
-
-            return results
-
-        except Exception as e:
-            logger.error(f"Error parsing notebook results: {e}")
-            return {"error": "Failed to parse results"}
 
     async def _update_analysis_status(
         self,
@@ -294,39 +292,94 @@ class AnalysisOrchestrator:
                 "timestamp": datetime.utcnow().isoformat()
             }
 
-            if results:
-                update_data["results"] = results
             if error_message:
                 update_data["error"] = error_message
+            await self._store_status(analysis_id, dict(update_data), final=status in FINAL_STATUSES)
+
+            if results:
+                update_data["results"] = results
 
-            await self.websocket_manager.broadcast(update_data)
+            rooms = self.analysis_rooms.get(analysis_id, [room_name("analysis", analysis_id)])
+            await self.broadcaster.publish(update_data, rooms)
 
         except Exception as e:
             logger.error(f"Error updating analysis status: {e}")
 
-    async def cancel_analysis(self, analysis_id: int) -> bool:
-        """Cancel a running analysis."""
+    async def _cache_results(self, analysis_type: str, parameters: Dict[str, Any], input_files: List[str],
+                             results: Dict[str, Any]):
+        """
+        Keep successful results for identical future submissions. The run
+        itself appends to the site state (stored frames, the LiDAR run log
+        and epochs), so the entry is keyed by the state as it is after the run:
+        that is what an identical re-submission sees.
+        """
         try:
-            if analysis_id in self.active_analyses:
-                task = self.active_analyses[analysis_id]
-                task.cancel()
-                del self.active_analyses[analysis_id]
+            cache_key = await asyncio.to_thread(self.result_cache.key_for, analysis_type, parameters, input_files)
+            await asyncio.to_thread(self.result_cache.put, cache_key, analysis_type, results)
+        except Exception as e:
+            logger.error(f"Error caching results for {analysis_type}: {e}")
+
+    async def _store_status(self, analysis_id: int, status: Dict[str, Any], final: bool):
+        """Record the latest status locally and in the shared cache."""
+        self.status_snapshots.pop(analysis_id, None)
+        self.status_snapshots[analysis_id] = status
+        if len(self.status_snapshots) > MAX_STATUS_SNAPSHOTS:
+            self.status_snapshots.pop(next(iter(self.status_snapshots)))
+        if self.status_cache is None:
+            return
+        if final:
+            await self.status_cache.analysis_finished(analysis_id, status)
+        else:
+            await self.status_cache.set_status(analysis_id, status)
+
+    async def _cancel_local(self, payload: Dict[str, Any]) -> bool:
+        """Cancel an analysis if it is running in this API worker."""
+        analysis_id = payload["analysis_id"]
+        if analysis_id not in self.active_analyses:
+            return False
+        task = self.active_analyses.pop(analysis_id)
+        task.cancel()
+        await self._update_analysis_status(analysis_id, AnalysisStatus.CANCELLED)
+        return True
 
-                await self._update_analysis_status(analysis_id, AnalysisStatus.CANCELLED)
+    async def cancel_analysis(self, analysis_id: int) -> bool:
+        """Cancel a running analysis, in whichever API worker runs it."""
+        try:
+            if await self._cancel_local({"analysis_id": analysis_id}):
                 return True
 
+            if self.event_bus is not None:
+                # Another worker may own it; it records the cancelled status once it has cancelled
+                await self.event_bus.publish_control("cancel", {"analysis_id": analysis_id})
+                return await self._cancel_acknowledged(analysis_id)
+
             return False
 
         except Exception as e:
             logger.error(f"Error cancelling analysis {analysis_id}: {e}")
             return False
 
+    async def _cancel_acknowledged(self, analysis_id: int) -> bool:
+        """Wait up to CANCEL_ACK_TIMEOUT for the owning worker to store the cancelled status."""
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + settings.CANCEL_ACK_TIMEOUT
+        while True:
+            status = await self.status_cache.get_status(analysis_id)
+            if status is not None and status.get("status") == AnalysisStatus.CANCELLED.value:
+                return True
+            # Finished before the owner saw the request: nothing was cancelled
+            finished = status is not None and status.get("status") in (s.value for s in FINAL_STATUSES)
+            if finished or loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+
     async def get_analysis_status(self, analysis_id: int) -> Optional[Dict[str, Any]]:
-        """Get current status of an analysis."""
-        # In real implementation, query database
-        return {
-            "analysis_id": analysis_id,
-            "status": "running",
-            "progress": 50,
-            "timestamp": datetime.utcnow().isoformat()
-        }
\ No newline at end of file
+        """Get current status of an analysis (shared cache first, then this worker's view)."""
+        if self.status_cache is not None:
+            try:
+                cached = await self.status_cache.get_status(analysis_id)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.error(f"Error reading cached status for analysis {analysis_id}: {e}")
+        return self.status_snapshots.get(analysis_id)
\ No newline at end of file
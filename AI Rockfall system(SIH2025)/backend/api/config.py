@@ -33,12 +33,21 @@ class Settings(BaseSettings):
     )
     DB_POOL_SIZE: int = Field(default=10, env="DB_POOL_SIZE")
     DB_MAX_OVERFLOW: int = Field(default=20, env="DB_MAX_OVERFLOW")
+    READING_PARTITION_INTERVAL: int = Field(default=6 * 3600, env="READING_PARTITION_INTERVAL")  # seconds
+    READING_PARTITION_MONTHS_AHEAD: int = Field(default=3, env="READING_PARTITION_MONTHS_AHEAD")
 
     # Redis settings
     REDIS_HOST: str = Field(default="localhost", env="REDIS_HOST")
     REDIS_PORT: int = Field(default=6379, env="REDIS_PORT")
     REDIS_DB: int = Field(default=0, env="REDIS_DB")
     REDIS_PASSWORD: Optional[str] = Field(default=None, env="REDIS_PASSWORD")
+    REDIS_ENABLED: bool = Field(default=True, env="REDIS_ENABLED")  # shared queue/bus/cache across workers
+    ANALYSIS_QUEUE_KEY: str = Field(default="rockfall:analysis_queue", env="ANALYSIS_QUEUE_KEY")
+    EVENT_CHANNEL: str = Field(default="rockfall:events", env="EVENT_CHANNEL")
+    QUEUE_HEARTBEAT_TTL: int = Field(default=60, env="QUEUE_HEARTBEAT_TTL")  # seconds
+    QUEUE_RECOVERY_INTERVAL: int = Field(default=60, env="QUEUE_RECOVERY_INTERVAL")  # dead-consumer sweep, seconds
+    FINAL_STATUS_TTL: int = Field(default=24 * 3600, env="FINAL_STATUS_TTL")  # seconds
+    CANCEL_ACK_TIMEOUT: float = Field(default=5.0, env="CANCEL_ACK_TIMEOUT")  # seconds to wait for the owning worker
 
     # JWT settings
     SECRET_KEY: str = Field(
@@ -57,15 +66,78 @@ class Settings(BaseSettings):
     # File upload settings
     UPLOAD_DIR: str = Field(default="uploads", env="UPLOAD_DIR")
     MAX_UPLOAD_SIZE: int = Field(default=100 * 1024 * 1024, env="MAX_UPLOAD_SIZE")  # 100MB
+    MAX_STREAMING_UPLOAD_SIZE: int = Field(
+        default=20 * 1024 * 1024 * 1024,
+        env="MAX_STREAMING_UPLOAD_SIZE"
+    )  # 20GB, streamed /api/uploads only
+    UPLOAD_CHUNK_SIZE: int = Field(default=8 * 1024 * 1024, env="UPLOAD_CHUNK_SIZE")  # 8MB disk writes
+    UPLOAD_LOCK_TTL: int = Field(default=15 * 60, env="UPLOAD_LOCK_TTL")  # per-session Redis lock, seconds
+    UPLOAD_LOCK_WAIT: float = Field(default=30.0, env="UPLOAD_LOCK_WAIT")  # before answering 409
+    UPLOAD_SESSION_TTL: int = Field(default=24 * 3600, env="UPLOAD_SESSION_TTL")  # seconds from creation
+    UPLOAD_SESSION_SWEEP_INTERVAL: int = Field(default=3600, env="UPLOAD_SESSION_SWEEP_INTERVAL")  # seconds
     ALLOWED_EXTENSIONS: List[str] = Field(
-        default=[".csv", ".las", ".json", ".jpg", ".jpeg", ".png"],
+        default=[".csv", ".las", ".laz", ".json", ".jpg", ".jpeg", ".png"],
         env="ALLOWED_EXTENSIONS"
     )
 
     # Analysis settings
     JUPYTER_KERNEL_TIMEOUT: int = Field(default=3600, env="JUPYTER_KERNEL_TIMEOUT")  # 1 hour
+    ANALYSIS_TIMEOUT: int = Field(default=3600, env="ANALYSIS_TIMEOUT")  # 1 hour per pipeline run
     MAX_CONCURRENT_ANALYSES: int = Field(default=3, env="MAX_CONCURRENT_ANALYSES")
 
+    # Result cache settings (content-addressed by inputs, parameters, code and model versions)
+    RESULT_CACHE_ENABLED: bool = Field(default=True, env="RESULT_CACHE_ENABLED")
+    RESULT_CACHE_DIR: str = Field(
+        default=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "Upload", ".result_cache"),
+        env="RESULT_CACHE_DIR"
+    )
+    RESULT_CACHE_MAX_BYTES: int = Field(default=5 * 1024 * 1024 * 1024, env="RESULT_CACHE_MAX_BYTES")  # 5GB
+    RESULT_CACHE_MAX_ENTRIES: int = Field(default=1000, env="RESULT_CACHE_MAX_ENTRIES")
+
+    # Online prediction settings
+    PREDICT_MAX_BATCH: int = Field(default=1024, env="PREDICT_MAX_BATCH")  # rows per coalesced model call
+    PREDICT_MAX_WAIT_MS: float = Field(default=2.0, env="PREDICT_MAX_WAIT_MS")  # batching window
+    PREDICT_MAX_INSTANCES: int = Field(default=10000, env="PREDICT_MAX_INSTANCES")  # per request
+
+    # Report rendering settings
+    REPORT_WORKERS: int = Field(default=2, env="REPORT_WORKERS")  # figure rendering processes
+    REPORT_DPI: int = Field(default=150, env="REPORT_DPI")
+    REPORT_PRERENDER: bool = Field(default=False, env="REPORT_PRERENDER")  # render after each analysis
+    REPORT_WAIT_SECONDS: float = Field(default=20.0, env="REPORT_WAIT_SECONDS")  # before answering 202
+
+    # Cross-sensor fusion settings
+    FUSION_ENABLED: bool = Field(default=True, env="FUSION_ENABLED")  # update site risk after each analysis
+    FUSION_FREQ: str = Field(default="1h", env="FUSION_FREQ")  # common timeline bin
+    FUSION_LOOKBACK_HOURS: int = Field(default=240, env="FUSION_LOOKBACK_HOURS")  # history an update re-reads
+
+    # Model training settings
+    TRAINING_ENABLED: bool = Field(default=True, env="TRAINING_ENABLED")  # scheduled and drift-triggered retrains
+    TRAINING_INTERVAL: int = Field(default=24 * 3600, env="TRAINING_INTERVAL")  # seconds between scheduled retrains
+    TRAINING_CHECK_INTERVAL: int = Field(default=600, env="TRAINING_CHECK_INTERVAL")  # seconds between checks
+    TRAINING_DRIFT_THRESHOLD: float = Field(default=0.2, env="TRAINING_DRIFT_THRESHOLD")  # population stability index
+    TRAINING_DRIFT_MODE: str = Field(default="full", env="TRAINING_DRIFT_MODE")  # retrain mode on drift
+    TRAINING_MIN_NEW_ROWS: int = Field(default=20, env="TRAINING_MIN_NEW_ROWS")  # below this a warm start is skipped
+    TRAINING_N_JOBS: int = Field(default=-1, env="TRAINING_N_JOBS")  # forest fitting cores
+    TRAINING_MAX_CONCURRENT: int = Field(default=1, env="TRAINING_MAX_CONCURRENT")  # training processes
+    TRAINING_LOCK_TTL: int = Field(default=2 * 3600, env="TRAINING_LOCK_TTL")  # per-sensor Redis lock, seconds
+
+    # Sensor reading ingestion settings
+    READINGS_MAX_BATCH_BYTES: int = Field(default=64 * 1024 * 1024, env="READINGS_MAX_BATCH_BYTES")  # per request
+    READINGS_INSERT_BATCH_SIZE: int = Field(default=5000, env="READINGS_INSERT_BATCH_SIZE")  # rows per executemany
+    READINGS_USE_COPY: bool = Field(default=True, env="READINGS_USE_COPY")  # COPY on PostgreSQL
+
+    # Analysis worker pool settings
+    MIN_WORKERS_PER_SENSOR: int = Field(default=1, env="MIN_WORKERS_PER_SENSOR")
+    MAX_ANALYSIS_WORKERS: int = Field(default=os.cpu_count() or 4, env="MAX_ANALYSIS_WORKERS")
+    WORKER_SCALE_UP_BELOW: float = Field(default=60.0, env="WORKER_SCALE_UP_BELOW")  # % CPU/memory
+    WORKER_SCALE_DOWN_ABOVE: float = Field(default=80.0, env="WORKER_SCALE_DOWN_ABOVE")  # % CPU/memory
+    WORKER_SCALE_INTERVAL: int = Field(default=30, env="WORKER_SCALE_INTERVAL")  # seconds
+
+    # WebSocket fan-out settings
+    WS_CLIENT_QUEUE_SIZE: int = Field(default=100, env="WS_CLIENT_QUEUE_SIZE")  # pending messages per client
+    WS_SLOW_CLIENT_POLICY: str = Field(default="coalesce", env="WS_SLOW_CLIENT_POLICY")  # "drop" or "coalesce"
+    WS_SEND_TIMEOUT: float = Field(default=5.0, env="WS_SEND_TIMEOUT")  # seconds before a stalled client is dropped
+
     # External API settings
     WEATHER_API_KEY: Optional[str] = Field(default=None, env="WEATHER_API_KEY")
     EMAIL_API_KEY: Optional[str] = Field(default=None, env="EMAIL_API_KEY")
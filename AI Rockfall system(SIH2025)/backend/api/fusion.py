@@ -0,0 +1,171 @@
+"""
+Site risk fusion service for AI Rockfall Prediction System
+==========================================================
+
+Keeps one ``analysis.fusion.SiteFusionEngine`` per site and updates it
+whenever a sensor stream of that site ticks (an analysis run stores new
+readings), so each site has one current risk score instead of six
+separate sensor dashboards. Every update is broadcast to the site's
+WebSocket room as a ``site_risk`` message.
+
+Endpoints (mounted under /api/fusion):
+    GET  /{site_id}           current site risk score, features and stream freshness
+    GET  /{site_id}/timeline  fused timeline of the engine's window with risk scores
+    POST /train               train the site risk model on the stored history
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
+
+from ..analysis import normalize_sensor
+from ..analysis.common import results_root, to_serializable
+from ..analysis.fusion import STREAMS, SiteFusionEngine, load_site_model, stored_sites, train_site_model
+from ..analysis.results_store import ResultsStore
+from .config import settings
+from .websocket_manager import room_name
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class FusionService:
+    """Per-site fusion engines, updated as streams tick; one shared site model."""
+
+    def __init__(self, orchestrator=None, output_root: Optional[str] = None):
+        self.orchestrator = orchestrator
+        self.output_root = output_root or settings.UPLOAD_BASE_DIR
+        self.store = ResultsStore(results_root(self.output_root))
+        self.model = self._load_model()
+        self.engines: Dict[str, SiteFusionEngine] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.last_training: Optional[Dict[str, Any]] = None
+
+    def _load_model(self) -> Optional[Any]:
+        try:
+            return load_site_model(self.output_root)
+        except Exception as e:
+            logger.error(f"Error loading site risk model: {e}")
+            return None
+
+    def engine(self, site_id: str) -> SiteFusionEngine:
+        engine = self.engines.get(site_id)
+        if engine is None:
+            engine = self.engines[site_id] = SiteFusionEngine(
+                site_id, self.store, self.model, settings.FUSION_FREQ,
+                pd.Timedelta(hours=settings.FUSION_LOOKBACK_HOURS)
+            )
+            self.locks[site_id] = asyncio.Lock()
+        return engine
+
+    async def tick(self, site_id: str, sensor: Optional[str] = None) -> Dict[str, Any]:
+        """Fold a stream update into the site's engine and broadcast the new site risk."""
+        engine = self.engine(site_id)
+        async with self.locks[site_id]:
+            result = to_serializable(await asyncio.to_thread(engine.tick, sensor))
+        if self.orchestrator is not None and result["risk_score"] is not None:
+            await self.orchestrator.broadcaster.publish(
+                {"type": "site_risk", **result, "trigger": sensor}, [room_name("site", site_id)]
+            )
+        return result
+
+    async def current(self, site_id: str) -> Dict[str, Any]:
+        """
+        Current site risk. Analyses run on other API workers tick those
+        workers' engines, so streams whose stored rows changed since this
+        engine read them are folded in first.
+        """
+        engine = self.engine(site_id)
+        async with self.locks[site_id]:
+            return to_serializable(await asyncio.to_thread(engine.sync))
+
+    def schedule(self, analysis_type: str, site_id: Any = "default") -> None:
+        """Update the site after an analysis stored new rows of one of its streams."""
+        if not settings.FUSION_ENABLED:
+            return
+        try:
+            sensor = normalize_sensor(analysis_type)
+        except ValueError:
+            return
+        if sensor not in STREAMS:
+            return
+        site_id = str(site_id)
+        task = asyncio.create_task(self.tick(site_id, sensor))
+        task.add_done_callback(lambda done: self._finished(site_id, done))
+        self.tasks[site_id] = task
+
+    def _finished(self, site_id: str, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error updating site {site_id} risk: {task.exception()}")
+
+    async def train(self, site_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Train the site model on every stored site (or ``site_ids``) and use it from now on."""
+        site_ids = site_ids or await asyncio.to_thread(stored_sites, self.store)
+        performance = await asyncio.to_thread(
+            train_site_model, self.store, site_ids, self.output_root, settings.TRAINING_N_JOBS
+        )
+        performance["finished_at"] = datetime.utcnow().isoformat()
+        self.last_training = performance
+        self.model = self._load_model()
+        for engine in self.engines.values():
+            engine.model = self.model
+        return performance
+
+    def shutdown(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+
+fusion_service: Optional[FusionService] = None
+
+
+def _service() -> FusionService:
+    if fusion_service is None:
+        raise HTTPException(status_code=503, detail="Fusion service is not running")
+    return fusion_service
+
+
+@router.get("/{site_id}")
+async def get_site_risk(site_id: str):
+    """Current fused risk score of a site."""
+    try:
+        return await _service().current(site_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fusing site {site_id} streams: {e}")
+        raise HTTPException(status_code=500, detail="Site risk fusion failed")
+
+
+@router.get("/{site_id}/timeline")
+async def get_site_timeline(site_id: str, hours: int = Query(72, ge=1, le=24 * 30)):
+    """Fused features and risk score per bin over the last ``hours``."""
+    service = _service()
+    await service.current(site_id)
+    timeline = service.engines[site_id].timeline()
+    if len(timeline):
+        timeline = timeline[timeline.index > timeline.index.max() - pd.Timedelta(hours=hours)]
+    return to_serializable({"site_id": site_id, "timeline": timeline.reset_index().to_dict("records")})
+
+
+@router.post("/train")
+async def train_site_risk_model(site_ids: Optional[List[str]] = Query(None)):
+    """Train the site risk model on the fused history of the stored sites."""
+    try:
+        return await _service().train(site_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error training site risk model: {e}")
+        raise HTTPException(status_code=500, detail="Site risk model training failed")
@@ -34,15 +34,15 @@ from fastapi.websockets import WebSocket, WebSocketDisconnect
 
 # Database and caching
 from sqlalchemy.orm import Session
-import redis.asyncio as redis
 
 # Local imports
 from .database import get_db, init_db
 from .models import Site, Analysis, Device, Alert
 from .auth import get_current_user, create_access_token
 from .analysis_orchestrator import AnalysisOrchestrator
-from .websocket_manager import WebSocketManager
+from .websocket_manager import websocket_manager
 from .config import settings
+from .shared_state import create_redis_client
 
 # Configure logging
 logging.basicConfig(
@@ -52,8 +52,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Global instances
-analysis_orchestrator = AnalysisOrchestrator()
-websocket_manager = WebSocketManager()
+analysis_orchestrator = AnalysisOrchestrator(websocket_manager)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -64,15 +63,30 @@ async def lifespan(app: FastAPI):
     # Initialize database
     init_db()
 
-    # Initialize Redis connection
-    app.state.redis = redis.Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        decode_responses=True
-    )
+    # Initialize Redis connection: durable queue, cross-worker event bus and status cache
+    app.state.redis = create_redis_client()
+    if settings.REDIS_ENABLED:
+        analysis_orchestrator.use_redis(app.state.redis)
+        uploads.upload_sessions.use_redis(app.state.redis)
+    app.state.status_cache = analysis_orchestrator.status_cache
+    app.state.analysis_orchestrator = analysis_orchestrator
+    analysis_orchestrator.report_renderer = report_renderer.report_renderer
+
+    # Model training runs in its own process pool, off the analysis path
+    training.training_scheduler = training.TrainingScheduler(analysis_orchestrator)
+    if settings.REDIS_ENABLED:
+        training.training_scheduler.use_redis(app.state.redis)
+
+    # One fused risk score per site, refreshed as any of its sensor streams ticks
+    fusion.fusion_service = fusion.FusionService(analysis_orchestrator)
+    analysis_orchestrator.fusion = fusion.fusion_service
 
     # Start background tasks
     asyncio.create_task(analysis_orchestrator.start_monitoring())
+    if settings.TRAINING_ENABLED:
+        asyncio.create_task(training.training_scheduler.run())
+    asyncio.create_task(readings.maintain_partitions())
+    asyncio.create_task(uploads.sweep_upload_sessions())
 
     logger.info("System startup complete")
 
@@ -81,6 +95,12 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down AI Rockfall Prediction System...")
     await app.state.redis.close()
+    analysis_orchestrator.shutdown()
+    await websocket_manager.shutdown()
+    predict.prediction_service.shutdown()
+    training.training_scheduler.shutdown()
+    report_renderer.report_renderer.shutdown()
+    fusion.fusion_service.shutdown()
     logger.info("Shutdown complete")
 
 # Create FastAPI application
@@ -105,13 +125,21 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Include routers
 from .routers import auth, sites, devices, analysis, reports, dashboard
+from . import fusion, predict, readings, report_renderer, series, training, uploads
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(sites.router, prefix="/api/sites", tags=["Sites"])
 app.include_router(devices.router, prefix="/api/devices", tags=["Devices"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["Analysis"])
 app.include_router(reports.router, prefix="/api/reports", tags=["Reports"])
+app.include_router(report_renderer.router, prefix="/api/reports", tags=["Reports"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
+app.include_router(uploads.router, prefix="/api/uploads", tags=["Uploads"])
+app.include_router(readings.router, prefix="/api/readings", tags=["Readings"])
+app.include_router(series.router, prefix="/api/series", tags=["Series"])
+app.include_router(training.router, prefix="/api/training", tags=["Training"])
+app.include_router(predict.router, prefix="/api/predict", tags=["Prediction"])
+app.include_router(fusion.router, prefix="/api/fusion", tags=["Fusion"])
 
 @app.get("/")
 async def root():
@@ -138,19 +166,20 @@ async def health_check():
 
 @app.websocket("/ws/updates")
 async def websocket_updates(websocket: WebSocket):
-    """WebSocket endpoint for real-time updates."""
-    await websocket_manager.connect(websocket)
+    """
+    WebSocket endpoint for real-time updates.
+
+    Clients receive every update until they subscribe to rooms, e.g.
+    {"action": "subscribe", "rooms": ["site:1", "analysis:42"]}.
+    """
+    client_id = await websocket_manager.connect(websocket)
     try:
         while True:
-            # Keep connection alive and handle client messages
+            # Keep connection alive and handle subscriptions/pings
             data = await websocket.receive_text()
-            # Process client messages if needed
-            await websocket.send_json({
-                "type": "pong",
-                "timestamp": datetime.utcnow().isoformat()
-            })
+            await websocket_manager.handle_client_message(client_id, data)
     except WebSocketDisconnect:
-        websocket_manager.disconnect(websocket)
+        websocket_manager.disconnect(websocket, client_id)
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -10,16 +10,18 @@ Models:
 - Device: Sensor devices with specifications
 - Analysis: Analysis runs with results and metadata
 - Alert: System alerts and notifications
+- Reading: Raw sensor readings (time series, range-partitioned by month)
+- ReadingRollup: Hourly/daily min/max/sum/count aggregates of readings
 
 Author: AI Rockfall Prediction Team
 Date: October 26, 2025
 """
 
 from datetime import datetime
-from typing import Generator
+from typing import Generator, Tuple
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Float, Boolean, Text,
-    ForeignKey, JSON, Enum, create_engine
+    Column, Integer, SmallInteger, String, DateTime, Float, Boolean, Text,
+    ForeignKey, JSON, Enum, Index, PrimaryKeyConstraint, create_engine, text
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
@@ -127,6 +129,7 @@ class Device(Base):
     # Relationships
     site = relationship("Site", back_populates="devices")
     analyses = relationship("Analysis", back_populates="device", cascade="all, delete-orphan")
+    readings = relationship("Reading", back_populates="device", passive_deletes=True, lazy="dynamic")
 
 class Analysis(Base):
     """Analysis run model with results and metadata."""
@@ -182,6 +185,119 @@ class Alert(Base):
     created_by = relationship("User", back_populates="alerts")
     acknowledged_by = relationship("User", foreign_keys=[acknowledged_by_id])
 
+class Reading(Base):
+    """
+    One measured value of one device at one time (narrow time-series layout).
+
+    On PostgreSQL the table is range-partitioned by month on ``timestamp``
+    (see ``ensure_reading_partitions``); the primary key leads with
+    ``device_id`` so per-device time-range scans stay on one index.
+    Rows are written in bulk by the readings ingestion API, never one ORM
+    object at a time.
+    """
+    __tablename__ = "readings"
+    __table_args__ = (
+        PrimaryKeyConstraint("device_id", "timestamp", "metric", name="pk_readings"),
+        Index("ix_readings_site_timestamp", "site_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    metric = Column(String(50), nullable=False)  # e.g. pore_pressure, displacement, vibration
+    value = Column(Float)
+    site_id = Column(Integer, ForeignKey("sites.id", ondelete="CASCADE"), nullable=False)
+    quality = Column(SmallInteger, default=0, nullable=False)  # 0 = good, gateway-defined flags otherwise
+    ingested_at = Column(DateTime, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP"),
+                         nullable=False)
+
+    # Relationships
+    device = relationship("Device", back_populates="readings")
+
+class ReadingRollup(Base):
+    """
+    Aggregate of one device metric over one time bucket (``1h`` or ``1d``).
+
+    Maintained by the readings ingestion path in the same transaction as
+    the readings themselves; dashboards read these instead of raw values
+    for long time windows.
+    """
+    __tablename__ = "reading_rollups"
+    __table_args__ = (
+        PrimaryKeyConstraint("device_id", "metric", "resolution", "bucket", name="pk_reading_rollups"),
+    )
+
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
+    metric = Column(String(50), nullable=False)
+    resolution = Column(String(8), nullable=False)  # 1h, 1d
+    bucket = Column(DateTime, nullable=False)  # bucket start (UTC)
+    min = Column(Float)
+    max = Column(Float)
+    sum = Column(Float)
+    count = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+def ensure_reading_partitions(bind, start: datetime = None, months_ahead: int = 3) -> None:
+    """
+    Create monthly ``readings`` partitions from ``start``'s month to
+    ``months_ahead`` months later, plus a default partition for stragglers
+    (PostgreSQL only; a no-op on other databases).
+
+    Rows that landed in the default partition (back-filled months, or a
+    month reached before this last ran) are moved into monthly partitions
+    of their own: the default is detached, the month partitions created
+    and filled from it, and the default re-attached. Runs at startup and
+    every READING_PARTITION_INTERVAL; workers serialize on an advisory lock.
+    """
+    if bind.dialect.name != "postgresql":
+        return
+    start = start or datetime.utcnow()
+    with bind.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('readings_partitions'))"))
+        conn.execute(text("CREATE TABLE IF NOT EXISTS readings_default PARTITION OF readings DEFAULT"))
+        stragglers = conn.execute(text(
+            "SELECT DISTINCT date_trunc('month', timestamp) FROM readings_default"
+        )).scalars().all()
+
+        months = {(bucket.year, bucket.month) for bucket in stragglers}
+        year, month = start.year, start.month
+        for _ in range(months_ahead + 1):
+            months.add((year, month))
+            year, month = _next_month(year, month)
+        existing = set(conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = 'readings'"
+        )).scalars().all())
+        missing = sorted(months - {
+            (int(name[9:13]), int(name[14:16])) for name in existing
+            if name.startswith("readings_") and name[9:13].isdigit()
+        })
+        if not missing:
+            return
+
+        # A month partition cannot be created while the default holds rows of its range
+        if stragglers:
+            conn.execute(text("ALTER TABLE readings DETACH PARTITION readings_default"))
+        for year, month in missing:
+            next_year, next_month = _next_month(year, month)
+            name = f"readings_{year:04d}_{month:02d}"
+            lower, upper = f"{year:04d}-{month:02d}-01", f"{next_year:04d}-{next_month:02d}-01"
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF readings FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            ))
+            if stragglers:
+                conn.execute(text(
+                    f"WITH moved AS (DELETE FROM readings_default WHERE timestamp >= '{lower}' "
+                    f"AND timestamp < '{upper}' RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+                ))
+        if stragglers:
+            conn.execute(text("ALTER TABLE readings ATTACH PARTITION readings_default DEFAULT"))
+
 # Database engine and session
 engine = create_engine(
     settings.DATABASE_URL,
@@ -203,6 +319,7 @@ def get_db() -> Generator[Session, None, None]:
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    ensure_reading_partitions(engine, months_ahead=settings.READING_PARTITION_MONTHS_AHEAD)
 
 def drop_db():
     """Drop all database tables (for testing/reset)."""
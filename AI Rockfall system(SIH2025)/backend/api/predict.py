@@ -0,0 +1,309 @@
+"""
+Online prediction API for AI Rockfall Prediction System
+=======================================================
+
+Serves the registered sensor models without going through a notebook or
+a full pipeline run. Concurrent requests for the same sensor and model
+version are micro-batched: they are collected for at most
+``PREDICT_MAX_WAIT_MS`` (or until ``PREDICT_MAX_BATCH`` rows) and scored
+with one call per model head, then split back to their callers.
+
+Endpoints (mounted under /api/predict):
+    POST /{sensor}                               score instances
+    POST /{sensor}/events                        score raw geophone events on arrival
+    GET  /{sensor}/versions                      registered versions and the current one
+    POST /{sensor}/versions                      register the newest trained artefacts
+    POST /{sensor}/versions/{version}/activate   make a version current
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from ..analysis import normalize_sensor
+from ..analysis.model_registry import ModelNotAvailableError, ModelRegistry, ServingModel
+from ..analysis.seismic_stream import SeismicFeatureEngine
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+RETIRE_TIMEOUT = 30.0  # seconds a retired batcher gets to finish its queued requests
+
+
+class BatcherClosedError(RuntimeError):
+    """The batcher was retired or shut down before it could score the request."""
+
+
+class PredictRequest(BaseModel):
+    """Instances as feature dicts or ordered value lists; optional pinned model version."""
+    instances: List[Any]
+    version: Optional[str] = None
+
+
+class EventsRequest(BaseModel):
+    """Raw geophone events (columns of the geophone CSV) of one site; optional pinned model version."""
+    events: List[Dict[str, Any]]
+    site_id: str = "default"
+    version: Optional[str] = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent prediction requests for one model into single batched calls."""
+
+    def __init__(self, model: ServingModel, max_batch: int, max_wait: float):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closing = False
+        self.in_flight: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self.task = asyncio.create_task(self._run())
+        self.batches = 0
+        self.rows = 0
+
+    async def predict(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        if self.closing:
+            raise BatcherClosedError(f"{self.model.sensor} {self.model.version} batcher is retired")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        # Collected items live in self.in_flight so close() can fail them mid-collection
+        batch = self.in_flight = [await self.queue.get()]
+        rows = len(batch[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while rows < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._collect()
+            try:
+                await self._score([(X, future) for X, future in self.in_flight if not future.cancelled()])
+            finally:
+                for _ in self.in_flight:
+                    self.queue.task_done()
+                self.in_flight = []
+
+    async def _score(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        if not batch:
+            return
+        try:
+            X = batch[0][0] if len(batch) == 1 else np.vstack([X for X, _ in batch])
+            outputs = await asyncio.to_thread(self.model.predict, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(X)
+        start = 0
+        for X_part, future in batch:
+            end = start + len(X_part)
+            if not future.done():
+                future.set_result({name: values[start:end] for name, values in outputs.items()})
+            start = end
+
+    async def retire(self, timeout: float = RETIRE_TIMEOUT):
+        """Stop taking requests, let the queued ones finish (up to ``timeout``), then close."""
+        self.closing = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{self.model.sensor} {self.model.version} batcher did not drain within {timeout}s")
+        finally:
+            self.close()
+
+    def close(self):
+        """Cancel the batching task and fail every request it has not answered."""
+        self.closing = True
+        self.task.cancel()
+        pending = list(self.in_flight)
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(
+                    BatcherClosedError(f"{self.model.sensor} {self.model.version} batcher closed")
+                )
+
+
+class PredictionService:
+    """Registry-backed models with one micro-batcher per (sensor, version)."""
+
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or ModelRegistry(settings.UPLOAD_BASE_DIR)
+        self.batchers: Dict[Tuple[str, str], MicroBatcher] = {}
+        self.retiring: Dict[MicroBatcher, asyncio.Task] = {}
+
+    async def batcher(self, sensor: str, version: Optional[str]) -> MicroBatcher:
+        model = await asyncio.to_thread(self.registry.load, sensor, version)
+        key = (model.sensor, model.version)
+        if key not in self.batchers:
+            self.batchers[key] = MicroBatcher(
+                model, settings.PREDICT_MAX_BATCH, settings.PREDICT_MAX_WAIT_MS / 1000.0
+            )
+            # Retire batchers (and cached models) of versions that are no longer current;
+            # requests already queued on them are still answered
+            if version is None:
+                for old_key in [k for k in self.batchers if k[0] == model.sensor and k != key]:
+                    old = self.batchers.pop(old_key)
+                    self.retiring[old] = asyncio.create_task(old.retire())
+                    self.retiring[old].add_done_callback(lambda _, old=old: self.retiring.pop(old, None))
+                self.registry.unload(model.sensor, keep=model.version)
+        return self.batchers[key]
+
+    async def predict(self, sensor: str, instances: List[Any], version: Optional[str] = None) -> Dict[str, Any]:
+        batcher = await self.batcher(sensor, version)
+        X = batcher.model.prepare(instances)
+        try:
+            outputs = await batcher.predict(X)
+        except BatcherClosedError:
+            # Retired between lookup and enqueue: score with the batcher that replaced it
+            replacement = await self.batcher(sensor, version)
+            if replacement is batcher:
+                raise
+            batcher = replacement
+            outputs = await batcher.predict(batcher.model.prepare(instances))
+        names = list(outputs)
+        columns = [values.tolist() for values in outputs.values()]
+        return {
+            "sensor": batcher.model.sensor,
+            "version": batcher.model.version,
+            "predictions": [dict(zip(names, row)) for row in zip(*columns)],
+        }
+
+    def shutdown(self):
+        for batcher in list(self.batchers.values()) + list(self.retiring):
+            batcher.close()
+        for task in self.retiring.values():
+            task.cancel()
+        self.batchers.clear()
+        self.retiring.clear()
+
+
+prediction_service = PredictionService()
+
+# Live seismic feature state per site (each engine keeps per-station windows)
+event_engines: Dict[str, SeismicFeatureEngine] = {}
+
+
+def _sensor(sensor: str) -> str:
+    try:
+        return normalize_sensor(sensor)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/{sensor}")
+async def predict(sensor: str, request: PredictRequest):
+    """Score instances with the current (or pinned) model version of ``sensor``."""
+    sensor = _sensor(sensor)
+    if not request.instances:
+        raise HTTPException(status_code=400, detail="No instances given")
+    if len(request.instances) > settings.PREDICT_MAX_INSTANCES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.PREDICT_MAX_INSTANCES} instances per request")
+
+    started = time.perf_counter()
+    try:
+        response = await prediction_service.predict(sensor, request.instances, request.version)
+    except ModelNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BatcherClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Prediction failed for {sensor}: {e}")
+        raise HTTPException(status_code=500, detail="Prediction failed")
+    response["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return response
+
+
+@router.post("/{sensor}/events")
+async def predict_events(sensor: str, request: EventsRequest):
+    """Fold raw events into their site's feature state and score them as they arrive."""
+    sensor = _sensor(sensor)
+    if sensor != "geophone":
+        raise HTTPException(status_code=404, detail="Event scoring is only available for geophone")
+    if not request.events:
+        raise HTTPException(status_code=400, detail="No events given")
+    if len(request.events) > settings.PREDICT_MAX_INSTANCES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.PREDICT_MAX_INSTANCES} events per request")
+
+    started = time.perf_counter()
+    engine = event_engines.setdefault(request.site_id, SeismicFeatureEngine())
+    try:
+        # Synchronous and O(1) per event, so concurrent requests cannot interleave their updates
+        rows = engine.update_many(sorted(request.events, key=lambda event: str(event.get("timestamp"))))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid event: {e}")
+    try:
+        response = await prediction_service.predict(sensor, rows, request.version)
+    except ModelNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BatcherClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Event scoring failed for {request.site_id}: {e}")
+        raise HTTPException(status_code=500, detail="Event scoring failed")
+    response["site_id"] = request.site_id
+    response["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return response
+
+
+@router.get("/{sensor}/versions")
+async def list_versions(sensor: str):
+    """Registered model versions of ``sensor`` and the current pointer."""
+    sensor = _sensor(sensor)
+    registry = prediction_service.registry
+    return {
+        "sensor": sensor,
+        "current": await asyncio.to_thread(registry.current_version, sensor),
+        "versions": await asyncio.to_thread(registry.versions, sensor),
+    }
+
+
+@router.post("/{sensor}/versions")
+async def register_version(sensor: str, activate: bool = True):
+    """Register the newest trained artefacts of ``sensor`` as a new version."""
+    sensor = _sensor(sensor)
+    try:
+        return await asyncio.to_thread(prediction_service.registry.register_latest, sensor, activate)
+    except ModelNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/{sensor}/versions/{version}/activate")
+async def activate_version(sensor: str, version: str):
+    """Make ``version`` the model served by default."""
+    sensor = _sensor(sensor)
+    try:
+        await asyncio.to_thread(prediction_service.registry.set_current, sensor, version)
+    except ModelNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"sensor": sensor, "current": version}
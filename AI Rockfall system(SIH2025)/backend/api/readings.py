@@ -0,0 +1,303 @@
+"""
+Bulk sensor reading ingestion for AI Rockfall Prediction System
+===============================================================
+
+Field gateways push readings in batches instead of one request per
+value. A batch is either JSON lines (``application/x-ndjson``) or an
+Arrow IPC stream (``application/vnd.apache.arrow.stream``), in long form
+(``device_id, timestamp, metric, value``) or wide form (one column - or a
+``values`` object - per metric). Batches are validated and normalized
+column-wise, then written in one transaction: through a ``COPY`` into a
+staging table on PostgreSQL, or ``executemany`` inserts elsewhere.
+Re-sent readings (same device, timestamp and metric) are ignored. The
+hourly/daily rollups the batch touches are refreshed in the same
+transaction (see ``series.update_rollups``).
+
+Endpoints (mounted under /api/readings):
+    POST /bulk     ingest a batch
+    GET  /         readings of one device over a time range
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Device, Reading, SessionLocal, engine, ensure_reading_partitions
+from .series import update_rollups
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+READING_COLUMNS = ["device_id", "timestamp", "metric", "value", "site_id", "quality"]
+KEY_COLUMNS = ["device_id", "timestamp", "metric"]
+# Columns that are never treated as metrics of a wide batch
+RESERVED_COLUMNS = ("device_id", "timestamp", "metric", "value", "values", "quality", "site_id")
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines", "application/json")
+ARROW_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+
+
+class ReadingBatchError(ValueError):
+    """A reading batch that cannot be ingested."""
+
+
+async def maintain_partitions() -> None:
+    """Keep monthly ``readings`` partitions ahead of the clock and drain the default partition."""
+    while True:
+        await asyncio.sleep(settings.READING_PARTITION_INTERVAL)
+        try:
+            await asyncio.to_thread(
+                ensure_reading_partitions, engine, months_ahead=settings.READING_PARTITION_MONTHS_AHEAD
+            )
+        except Exception as e:
+            logger.error(f"Error maintaining reading partitions: {e}")
+
+
+def parse_ndjson(body: bytes) -> pd.DataFrame:
+    """One JSON object per line; a single JSON array is accepted as well."""
+    text_body = body.decode("utf-8")
+    try:
+        if text_body.lstrip().startswith("["):
+            records = json.loads(text_body)
+        else:
+            records = [json.loads(line) for line in text_body.splitlines() if line.strip()]
+    except ValueError as e:
+        raise ReadingBatchError(f"Invalid JSON lines: {e}")
+    if not all(isinstance(record, dict) for record in records):
+        raise ReadingBatchError("Every JSON line must be an object")
+
+    frame = pd.DataFrame.from_records(records)
+    if "values" in frame.columns:
+        # {"values": {"metric": value, ...}} expands into wide columns
+        values = pd.DataFrame.from_records(
+            [v if isinstance(v, dict) else {} for v in frame.pop("values")], index=frame.index
+        )
+        frame = frame.join(values, rsuffix="_values")
+    return frame
+
+
+def parse_arrow(body: bytes) -> pd.DataFrame:
+    """Arrow IPC stream (or file) with long- or wide-form columns."""
+    import pyarrow as pa
+
+    try:
+        try:
+            table = pa.ipc.open_stream(pa.BufferReader(body)).read_all()
+        except pa.ArrowInvalid:
+            table = pa.ipc.open_file(pa.BufferReader(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ReadingBatchError(f"Invalid Arrow payload: {e}")
+    return table.to_pandas()
+
+
+def _parse_timestamps(values: pd.Series) -> pd.Series:
+    """UTC timestamps from ISO strings, datetimes or numeric epoch seconds."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.to_datetime(values, utc=True)
+    numeric = pd.to_numeric(values, errors="coerce")
+    epoch = pd.to_datetime(numeric, unit="s", errors="coerce", utc=True)
+    if pd.api.types.is_numeric_dtype(values):
+        return epoch
+    # JSON batches may mix epoch numbers with ISO strings
+    return pd.to_datetime(values.where(numeric.isna()), errors="coerce", utc=True).fillna(epoch)
+
+
+def normalize_readings(frame: pd.DataFrame) -> pd.DataFrame:
+    """Long-form frame with typed ``device_id, timestamp, metric, value, quality`` columns."""
+    missing = [column for column in ("device_id", "timestamp") if column not in frame.columns]
+    if missing:
+        raise ReadingBatchError(f"Batch is missing columns: {', '.join(missing)}")
+
+    if "metric" not in frame.columns:
+        metrics = [column for column in frame.columns if column not in RESERVED_COLUMNS]
+        if not metrics:
+            raise ReadingBatchError("Batch has neither a metric column nor metric value columns")
+        id_columns = ["device_id", "timestamp"] + (["quality"] if "quality" in frame.columns else [])
+        frame = frame.melt(id_vars=id_columns, value_vars=metrics, var_name="metric", value_name="value")
+    elif "value" not in frame.columns:
+        raise ReadingBatchError("Long-form batch is missing the value column")
+
+    readings = pd.DataFrame({
+        "device_id": pd.to_numeric(frame["device_id"], errors="coerce"),
+        "timestamp": _parse_timestamps(frame["timestamp"]),
+        "metric": frame["metric"].astype(str).str.strip(),
+        "value": pd.to_numeric(frame["value"], errors="coerce"),
+        "quality": pd.to_numeric(frame["quality"], errors="coerce").fillna(0) if "quality" in frame else 0,
+    })
+    invalid = readings["device_id"].isna() | readings["timestamp"].isna() | (readings["metric"] == "")
+    if invalid.any():
+        first = int(invalid.to_numpy().argmax())
+        raise ReadingBatchError(f"{int(invalid.sum())} readings lack a valid device_id/timestamp/metric "
+                                f"(first at row {first})")
+    if (readings["metric"].str.len() > Reading.metric.type.length).any():
+        raise ReadingBatchError(f"Metric names are limited to {Reading.metric.type.length} characters")
+
+    # Stored as naive UTC like every other timestamp in the schema
+    readings["timestamp"] = readings["timestamp"].dt.tz_convert(None)
+    readings["device_id"] = readings["device_id"].astype("int64")
+    readings["quality"] = readings["quality"].astype("int16")
+    # Within a batch the last value for a key wins
+    return readings.drop_duplicates(KEY_COLUMNS, keep="last").reset_index(drop=True)
+
+
+def attach_sites(db: Session, readings: pd.DataFrame) -> pd.DataFrame:
+    """Add each reading's ``site_id`` with one query; unknown devices reject the batch."""
+    device_ids = readings["device_id"].unique().tolist()
+    sites = dict(db.execute(select(Device.id, Device.site_id).where(Device.id.in_(device_ids))).all())
+    unknown = sorted(set(device_ids) - set(sites))
+    if unknown:
+        raise ReadingBatchError(f"Unknown device ids: {', '.join(map(str, unknown[:20]))}")
+    readings["site_id"] = readings["device_id"].map(sites).astype("int64")
+    return readings
+
+
+def _copy_readings(db: Session, readings: pd.DataFrame) -> int:
+    """COPY into a transaction-scoped staging table, then merge, skipping keys already stored."""
+    buffer = io.StringIO()
+    readings[READING_COLUMNS].to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    buffer.seek(0)
+
+    columns = ", ".join(READING_COLUMNS)
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS readings_staging "
+        "(LIKE readings INCLUDING DEFAULTS) ON COMMIT DROP"
+    ))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY readings_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    result = db.execute(text(
+        f"INSERT INTO readings ({columns}) SELECT {columns} FROM readings_staging "
+        "ON CONFLICT (device_id, timestamp, metric) DO NOTHING"
+    ))
+    return result.rowcount
+
+
+def _insert_ignoring_duplicates(db: Session):
+    """Dialect-specific ``INSERT`` that skips rows whose primary key already exists."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(Reading)
+    return dialect_insert(Reading).on_conflict_do_nothing(index_elements=KEY_COLUMNS)
+
+
+def bulk_insert(db: Session, statement, rows: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+    """Execute ``statement`` as executemany batches of ``batch_size`` rows; returns rows written."""
+    batch_size = batch_size or settings.READINGS_INSERT_BATCH_SIZE
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        result = db.execute(statement, rows[start:start + batch_size])
+        written += max(result.rowcount, 0)
+    return written
+
+
+def write_readings(db: Session, readings: pd.DataFrame) -> int:
+    """Write normalized readings in the current transaction; returns rows inserted."""
+    if readings.empty:
+        return 0
+    if settings.READINGS_USE_COPY and db.get_bind().dialect.name == "postgresql":
+        return _copy_readings(db, readings)
+    rows = readings[READING_COLUMNS].astype(object).where(readings[READING_COLUMNS].notna(), None)
+    records = rows.to_dict("records")
+    for record in records:
+        record["timestamp"] = record["timestamp"].to_pydatetime()
+    return bulk_insert(db, _insert_ignoring_duplicates(db), records)
+
+
+def ingest_batch(body: bytes, content_type: str) -> Dict[str, Any]:
+    """Parse, validate and store one batch (runs in a worker thread)."""
+    started = datetime.utcnow()
+    if content_type in ARROW_TYPES:
+        frame = parse_arrow(body)
+    elif content_type in NDJSON_TYPES or not content_type:
+        frame = parse_ndjson(body)
+    else:
+        raise ReadingBatchError(f"Unsupported content type: {content_type}")
+
+    readings = normalize_readings(frame)
+    with SessionLocal() as db:
+        try:
+            readings = attach_sites(db, readings)
+            inserted = write_readings(db, readings)
+            rollups = update_rollups(db, readings) if inserted else 0
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    return {
+        "received": len(frame),
+        "readings": len(readings),
+        "inserted": inserted,
+        "duplicates": len(readings) - inserted,
+        "rollups_updated": rollups,
+        "devices": int(readings["device_id"].nunique()),
+        "elapsed_seconds": (datetime.utcnow() - started).total_seconds(),
+    }
+
+
+@router.post("/bulk")
+async def ingest_readings(request: Request):
+    """Ingest a batch of readings (JSON lines or Arrow IPC) in one transaction."""
+    declared = int(request.headers.get("content-length") or 0)
+    if declared > settings.READINGS_MAX_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail="Reading batch too large")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > settings.READINGS_MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail="Reading batch too large")
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        return await asyncio.to_thread(ingest_batch, bytes(body), content_type)
+    except ReadingBatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error ingesting reading batch: {e}")
+        raise HTTPException(status_code=500, detail="Failed to ingest readings")
+
+
+def query_readings(device_id: int, start: datetime, end: datetime, metric: Optional[str], limit: int) -> List[Dict]:
+    with SessionLocal() as db:
+        statement = (
+            select(Reading.timestamp, Reading.metric, Reading.value, Reading.quality)
+            .where(Reading.device_id == device_id, Reading.timestamp >= start, Reading.timestamp < end)
+            .order_by(Reading.timestamp)
+            .limit(limit)
+        )
+        if metric:
+            statement = statement.where(Reading.metric == metric)
+        return [dict(row._mapping) for row in db.execute(statement)]
+
+
+@router.get("")
+async def get_readings(
+    device_id: int,
+    start: datetime,
+    end: datetime,
+    metric: Optional[str] = None,
+    limit: int = Query(default=10000, le=100000),
+):
+    """Readings of one device in ``[start, end)``, served by the (device_id, timestamp) key."""
+    readings = await asyncio.to_thread(query_readings, device_id, start, end, metric, limit)
+    return {"device_id": device_id, "count": len(readings), "readings": readings}
@@ -0,0 +1,203 @@
+"""
+Report rendering service for AI Rockfall Prediction System
+==========================================================
+
+Renders the PDF/PNG reports of ``analysis.reports`` outside of analysis
+runs, so risk results are returned as soon as a pipeline finishes and
+reports catch up separately:
+
+- by default a report is rendered lazily, the first time it is opened
+  (``REPORT_PRERENDER`` also queues one after each completed analysis);
+- figures are drawn in parallel in a dedicated spawn process pool of
+  ``REPORT_WORKERS`` processes, and only those whose content hash changed;
+- concurrent requests for the same sensor/site share one render job.
+
+Endpoints (mounted under /api/reports):
+    GET /{sensor}                   report status (ready / rendering / pending) and figures
+    GET /{sensor}/pdf               the PDF; 202 while it is still rendering
+                                    (``report=<file>`` serves an archived PDF as stored)
+    GET /{sensor}/figures/{figure}  one figure as PNG
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+
+from ..analysis import normalize_sensor
+from ..analysis.common import sensor_dirs
+from ..analysis.reports import FIGURES, assemble_pdf, plan_report, prune_report_files, render_figure
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class ReportRenderer:
+    """Deduplicated, process-pool report rendering with content-hash reuse."""
+
+    def __init__(self, output_root: Optional[str] = None):
+        self.output_root = output_root or settings.UPLOAD_BASE_DIR
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.jobs: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=settings.REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    async def plan(self, sensor: str, site_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(plan_report, sensor, site_id, self.output_root, settings.REPORT_DPI)
+
+    async def render_figures(self, figures) -> None:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(
+                self._executor(), render_figure, figure["template"], figure["title"], figure["options"],
+                figure["data"], figure["path"], settings.REPORT_DPI
+            )
+            for figure in figures if not figure["exists"]
+        ])
+
+    async def _render(self, sensor: str, site_id: str) -> Dict[str, Any]:
+        plan = await self.plan(sensor, site_id)
+        if os.path.exists(plan["pdf_path"]):
+            return plan
+        missing = sum(not figure["exists"] for figure in plan["figures"])
+        logger.info(f"Rendering {sensor} report for site {site_id}: "
+                    f"{missing} of {len(plan['figures'])} figures changed")
+        await self.render_figures(plan["figures"])
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor(), assemble_pdf, [figure["path"] for figure in plan["figures"]],
+            plan["pdf_path"], settings.REPORT_DPI
+        )
+        await asyncio.to_thread(prune_report_files, plan)
+        return plan
+
+    def ensure(self, sensor: str, site_id: str) -> asyncio.Task:
+        """The render job for ``sensor``/``site_id``, started if none is running."""
+        key = (sensor, site_id)
+        job = self.jobs.get(key)
+        if job is None or job.done():
+            job = asyncio.create_task(self._render(sensor, site_id))
+            job.add_done_callback(lambda task: self._finished(key, task))
+            self.jobs[key] = job
+        return job
+
+    def _finished(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error rendering {key[0]} report for site {key[1]}: {task.exception()}")
+
+    def schedule(self, analysis_type: str, site_id: Any = "default") -> None:
+        """Queue a background render after an analysis completes (when REPORT_PRERENDER is on)."""
+        if not settings.REPORT_PRERENDER:
+            return
+        try:
+            sensor = normalize_sensor(analysis_type)
+        except ValueError:
+            return
+        if sensor in FIGURES:
+            self.ensure(sensor, str(site_id))
+
+    def rendering(self, sensor: str, site_id: str) -> bool:
+        job = self.jobs.get((sensor, site_id))
+        return job is not None and not job.done()
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+report_renderer = ReportRenderer()
+
+
+def _sensor(sensor: str) -> str:
+    try:
+        sensor = normalize_sensor(sensor)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if sensor not in FIGURES:
+        raise HTTPException(status_code=404, detail=f"No report for {sensor}")
+    return sensor
+
+
+def _status(plan: Dict[str, Any]) -> Dict[str, Any]:
+    ready = os.path.exists(plan["pdf_path"])
+    return {
+        "sensor": plan["sensor"],
+        "site_id": plan["site_id"],
+        "status": "ready" if ready else
+                  "rendering" if report_renderer.rendering(plan["sensor"], plan["site_id"]) else "pending",
+        "rows": plan["rows"],
+        "figures": [
+            {"name": figure["name"], "title": figure["title"], "ready": figure["exists"]}
+            for figure in plan["figures"]
+        ],
+    }
+
+
+@router.get("/{sensor}")
+async def report_status(sensor: str, site_id: str = "default"):
+    """Whether the report for the current data is rendered, and its figures."""
+    sensor = _sensor(sensor)
+    return _status(await report_renderer.plan(sensor, site_id))
+
+
+@router.get("/{sensor}/pdf")
+async def get_report_pdf(sensor: str, site_id: str = "default", wait: Optional[float] = None,
+                         download: bool = False, report: Optional[str] = None):
+    """
+    The report PDF, rendered on first request; 202 if not done within
+    ``wait`` seconds. ``report`` names an archived PDF in the sensor's
+    report folder to serve as stored instead.
+    """
+    sensor = _sensor(sensor)
+    disposition = "attachment" if download else "inline"
+    if report:
+        name = os.path.basename(report)
+        path = os.path.join(sensor_dirs(sensor, report_renderer.output_root)["report"], name)
+        if not name.endswith(".pdf") or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=f"No archived {sensor} report {name}")
+        return FileResponse(path, media_type="application/pdf", filename=name, content_disposition_type=disposition)
+
+    job = report_renderer.ensure(sensor, site_id)
+    wait = settings.REPORT_WAIT_SECONDS if wait is None else min(wait, settings.REPORT_WAIT_SECONDS)
+    try:
+        plan = await asyncio.wait_for(asyncio.shield(job), timeout=wait)
+    except asyncio.TimeoutError:
+        return JSONResponse(status_code=202, content={"sensor": sensor, "site_id": site_id, "status": "rendering"})
+    except Exception as e:
+        logger.error(f"Error rendering {sensor} report: {e}")
+        raise HTTPException(status_code=500, detail="Report rendering failed")
+    return FileResponse(plan["pdf_path"], media_type="application/pdf", filename=f"{sensor}_report_{site_id}.pdf",
+                        content_disposition_type=disposition)
+
+
+@router.get("/{sensor}/figures/{figure}")
+async def get_report_figure(sensor: str, figure: str, site_id: str = "default"):
+    """One report figure as PNG, rendered now if its data changed."""
+    sensor = _sensor(sensor)
+    plan = await report_renderer.plan(sensor, site_id)
+    matches = [page for page in plan["figures"] if page["name"] == figure.removesuffix(".png")]
+    if not matches:
+        raise HTTPException(status_code=404, detail=f"No figure {figure} in the {sensor} report")
+    try:
+        await report_renderer.render_figures(matches)
+    except Exception as e:
+        logger.error(f"Error rendering {sensor} figure {figure}: {e}")
+        raise HTTPException(status_code=500, detail="Figure rendering failed")
+    return FileResponse(matches[0]["path"], media_type="image/png")
@@ -0,0 +1,206 @@
+"""
+Content-addressed analysis result cache
+=======================================
+
+Cache in front of ``AnalysisOrchestrator.submit_analysis``. The key is a
+SHA-256 over the sensor type, the bytes of every input file, the
+canonical analysis parameters, the analysis code version, the model
+artefact fingerprint and the stored site state the pipeline reads
+(results-store history such as the LiDAR run log behind its alerts, and
+the LiDAR change-detection epochs). Entries are stored under the state
+as it is after their run - which includes the run's own writes - so
+re-submitting an unchanged survey against otherwise unchanged history
+returns the stored results and artifacts instantly instead of re-running the pipeline (and writing another ``_N``
+copy of every output).
+
+Layout (under ``RESULT_CACHE_DIR``):
+    index.sqlite3               entries (size, last access, hits) + file hash memo
+    entries/<kk>/<key>/         results.json and hard-linked artifacts
+
+Entries are evicted least-recently-used first once the cache exceeds
+``RESULT_CACHE_MAX_BYTES`` or ``RESULT_CACHE_MAX_ENTRIES``.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..analysis import code_version, model_version, normalize_sensor, state_version
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Parameters that identify a run rather than change its results
+VOLATILE_PARAMETERS = ("analysis_id", "input_files", "input_file", "models", "use_cache")
+
+
+class ResultCache:
+    """Content-addressed, LRU/size-bounded store of analysis results and artifacts."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        self.cache_dir = cache_dir or settings.RESULT_CACHE_DIR
+        self.max_bytes = max_bytes or settings.RESULT_CACHE_MAX_BYTES
+        self.max_entries = max_entries or settings.RESULT_CACHE_MAX_ENTRIES
+        self.entries_dir = os.path.join(self.cache_dir, "entries")
+        self.index_path = os.path.join(self.cache_dir, "index.sqlite3")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, sensor TEXT, size INTEGER, created REAL, last_access REAL, hits INTEGER)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS file_hashes ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Short-lived connections: safe from worker threads and other API processes
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key[:2], key)
+
+    def file_digest(self, path: str) -> str:
+        """SHA-256 of a file's bytes, memoised by (path, size, mtime) so unchanged files are read once."""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        with closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        self.remember_digest(path, digest.hexdigest())
+        return digest.hexdigest()
+
+    def remember_digest(self, path: str, sha256: str) -> None:
+        """Record a digest computed elsewhere (e.g. while the file was being uploaded)."""
+        stat = os.stat(path)
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sha256)
+            )
+
+    def key_for(self, analysis_type: str, parameters: Dict[str, Any], input_files: Iterable[str]) -> str:
+        """Cache key for running ``analysis_type`` on ``input_files`` with ``parameters``."""
+        sensor = normalize_sensor(analysis_type)
+        params = {k: v for k, v in parameters.items() if k not in VOLATILE_PARAMETERS}
+        identity = {
+            "sensor": sensor,
+            "inputs": [self.file_digest(path) for path in input_files],
+            "parameters": params,
+            "code_version": code_version(),
+            "model_version": model_version(sensor, params.get("output_root") or settings.UPLOAD_BASE_DIR),
+            # History the run reads (and appends to): epochs, run log, stored frames;
+            # looked up before a run and stored with the state after it
+            "state_version": state_version(sensor, params.get("site_id", "default"), params.get("output_root")),
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored results for ``key`` (artifact paths repointed to cached copies if moved), or None."""
+        results_path = os.path.join(self._entry_dir(key), "results.json")
+        try:
+            with open(results_path) as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        results = stored["results"]
+        artifacts = results.get("artifacts")
+        if isinstance(artifacts, dict):
+            for name, cached_path in stored.get("cached_artifacts", {}).items():
+                if not os.path.exists(str(artifacts.get(name))) and os.path.exists(cached_path):
+                    artifacts[name] = cached_path
+
+        with closing(self._connect()) as db, db:
+            db.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        results["cache"] = {"hit": True, "key": key, "created_at": stored.get("created_at")}
+        return results
+
+    def put(self, key: str, analysis_type: str, results: Dict[str, Any]) -> None:
+        """Store results and hard-link their artifact files under ``key``, then enforce the bounds."""
+        entry_dir = self._entry_dir(key)
+        artifact_dir = os.path.join(entry_dir, "artifacts")
+        os.makedirs(artifact_dir, exist_ok=True)
+
+        size, cached_artifacts = 0, {}
+        artifacts = results.get("artifacts")
+        for name, path in (artifacts.items() if isinstance(artifacts, dict) else []):
+            if not isinstance(path, str) or not os.path.isfile(path):
+                continue
+            target = os.path.join(artifact_dir, f"{name}_{os.path.basename(path)}")
+            if not os.path.exists(target):
+                try:
+                    os.link(path, target)
+                except OSError:
+                    shutil.copy2(path, target)
+            cached_artifacts[name] = target
+            size += os.path.getsize(target)
+
+        payload = json.dumps({
+            "created_at": time.time(),
+            "results": results,
+            "cached_artifacts": cached_artifacts,
+        }, default=str)
+        tmp_path = os.path.join(entry_dir, "results.json.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, os.path.join(entry_dir, "results.json"))
+        size += len(payload)
+
+        now = time.time()
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, 0)",
+                (key, normalize_sensor(analysis_type), size, now, now)
+            )
+        self.evict()
+
+    def evict(self) -> List[str]:
+        """Drop least-recently-used entries until the size and count bounds hold."""
+        evicted = []
+        with closing(self._connect()) as db, db:
+            rows = db.execute("SELECT key, size FROM entries ORDER BY last_access DESC").fetchall()
+            total, kept = 0, 0
+            for key, size in rows:
+                total += size
+                kept += 1
+                if total > self.max_bytes or kept > self.max_entries:
+                    evicted.append(key)
+            if evicted:
+                db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} cached analysis results")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as db:
+            count, size, hits = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM entries"
+            ).fetchone()
+        return {"entries": count, "bytes": size, "hits": hits,
+                "max_bytes": self.max_bytes, "max_entries": self.max_entries}
@@ -0,0 +1,319 @@
+"""
+Dashboard time-series service for AI Rockfall Prediction System
+===============================================================
+
+Serves sensor series for dashboard charts at a bounded size instead of
+full-resolution JSON dumps. Each device metric is kept at three
+resolutions - raw readings, hourly and daily rollups (min/max/sum/count)
+- and a request names a time window and a pixel budget. The coarsest
+resolution that still has enough points for the budget is read (so the
+rows touched depend on the budget, not on months of history) and then
+downsampled with Largest-Triangle-Three-Buckets (LTTB).
+
+Rollups are maintained incrementally: the ingestion path recomputes the
+hourly buckets a batch touched from raw readings and the daily buckets
+from those hourly ones. Responses carry an ETag derived from the window,
+the chosen resolution and the rollups' last update, so unchanged charts
+are answered with 304.
+
+Endpoints (mounted under /api/series):
+    GET /       one device metric over [start, end) within ``points``
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from sqlalchemy import and_, delete, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from .models import Reading, ReadingRollup, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+RESOLUTIONS = {"1h": timedelta(hours=1), "1d": timedelta(days=1)}
+ROLLUP_KEY = ["device_id", "metric", "resolution", "bucket"]
+# A resolution is used while it holds at most this many points per pixel
+POINTS_PER_PIXEL = 4
+MAX_POINTS = 5000
+# Raw reads stop at this many rows per requested point
+RAW_ROWS_PER_POINT = 50
+# Bucket ranges per rollup refresh query
+RANGES_PER_QUERY = 200
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of ``threshold`` points chosen by Largest-Triangle-Three-Buckets.
+    The first and last points are always kept; NaN values must be removed first.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket boundaries over the interior points
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(int)
+    # Average of each bucket, used as the third vertex for the bucket before it
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    starts, ends = edges[:-1], np.maximum(edges[1:], edges[:-1] + 1)
+    avg_x = (cum_x[ends] - cum_x[starts]) / (ends - starts)
+    avg_y = (cum_y[ends] - cum_y[starts]) / (ends - starts)
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        xs, ys = x[start:end], y[start:end]
+        area = np.abs((x[previous] - avg_x[i]) * (ys - y[previous]) - (x[previous] - xs) * (avg_y[i] - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def _floor(timestamps: pd.Series, resolution: str) -> pd.Series:
+    return timestamps.dt.floor("h" if resolution == "1h" else "D")
+
+
+def _upsert_rollups(db: Session, rollups: pd.DataFrame) -> int:
+    """Replace the given rollup buckets (delete, then executemany insert)."""
+    if rollups.empty:
+        return 0
+    keys = list(rollups[ROLLUP_KEY].itertuples(index=False, name=None))
+    for start in range(0, len(keys), 1000):
+        db.execute(delete(ReadingRollup).where(
+            tuple_(ReadingRollup.device_id, ReadingRollup.metric, ReadingRollup.resolution,
+                   ReadingRollup.bucket).in_(keys[start:start + 1000])
+        ))
+    rows = rollups.astype(object).where(rollups.notna(), None).to_dict("records")
+    for row in rows:
+        row["bucket"] = row["bucket"].to_pydatetime()
+    db.execute(ReadingRollup.__table__.insert(), rows)
+    return len(rows)
+
+
+def _bucket_ranges(buckets: Iterable[Any], width: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Distinct bucket starts merged into contiguous ``[start, end)`` ranges."""
+    ranges: List[List[datetime]] = []
+    for bucket in sorted({pd.Timestamp(bucket).to_pydatetime() for bucket in buckets}):
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1][1] = bucket + width
+        else:
+            ranges.append([bucket, bucket + width])
+    return [(start, end) for start, end in ranges]
+
+
+def _select_in_ranges(db: Session, query, column, ranges: List[Tuple[datetime, datetime]],
+                      columns: List[str]) -> pd.DataFrame:
+    """Run ``query`` restricted to rows whose ``column`` falls in one of ``ranges``."""
+    rows = []
+    for start in range(0, len(ranges), RANGES_PER_QUERY):
+        chunk = ranges[start:start + RANGES_PER_QUERY]
+        rows.extend(db.execute(
+            query.where(or_(*[and_(column >= low, column < high) for low, high in chunk]))
+        ).all())
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _aggregate(frame: pd.DataFrame, resolution: str, now: datetime) -> pd.DataFrame:
+    grouped = frame.groupby(["device_id", "metric", "bucket"], sort=False)
+    rollups = grouped.agg(min=("min", "min"), max=("max", "max"), sum=("sum", "sum"),
+                          count=("count", "sum")).reset_index()
+    rollups["resolution"] = resolution
+    rollups["updated_at"] = now
+    return rollups
+
+
+def update_rollups(db: Session, readings: pd.DataFrame) -> int:
+    """
+    Recompute the hourly and daily rollups touched by a batch of ``readings``
+    (``device_id, timestamp, metric`` columns) inside the caller's transaction.
+    Hourly buckets are rebuilt from raw readings, daily buckets from hourly ones,
+    so re-sent or late readings always give exact aggregates. Only the distinct
+    hours (and days) the batch touched are read, so a stale reading mixed into
+    a current batch does not rescan the months in between.
+    """
+    if readings.empty:
+        return 0
+    now = datetime.utcnow()
+    keys = list(readings[["device_id", "metric"]].drop_duplicates().itertuples(index=False, name=None))
+    key_filter = tuple_(Reading.device_id, Reading.metric).in_(keys)
+
+    hour_buckets = _floor(readings["timestamp"], "1h")
+    touched_hours = set(zip(readings["device_id"], readings["metric"], hour_buckets))
+    raw = _select_in_ranges(
+        db,
+        select(Reading.device_id, Reading.metric, Reading.timestamp, Reading.value)
+        .where(key_filter, Reading.value.isnot(None)),
+        Reading.timestamp, _bucket_ranges(hour_buckets, RESOLUTIONS["1h"]),
+        ["device_id", "metric", "timestamp", "value"]
+    )
+    if raw.empty:
+        return 0
+    raw["timestamp"] = pd.to_datetime(raw["timestamp"])
+    raw["bucket"] = _floor(raw["timestamp"], "1h")
+    raw = raw[[key in touched_hours for key in zip(raw["device_id"], raw["metric"], raw["bucket"])]]
+    raw = raw.assign(min=raw["value"], max=raw["value"], sum=raw["value"], count=1)
+    hourly = _aggregate(raw, "1h", now)
+    written = _upsert_rollups(db, hourly)
+    if hourly.empty:
+        return written
+
+    day_buckets = _floor(hourly["bucket"], "1d")
+    touched_days = set(zip(hourly["device_id"], hourly["metric"], day_buckets))
+    hours = _select_in_ranges(
+        db,
+        select(ReadingRollup.device_id, ReadingRollup.metric, ReadingRollup.bucket, ReadingRollup.min,
+               ReadingRollup.max, ReadingRollup.sum, ReadingRollup.count)
+        .where(tuple_(ReadingRollup.device_id, ReadingRollup.metric).in_(keys), ReadingRollup.resolution == "1h"),
+        ReadingRollup.bucket, _bucket_ranges(day_buckets, RESOLUTIONS["1d"]),
+        ["device_id", "metric", "bucket", "min", "max", "sum", "count"]
+    )
+    hours["bucket"] = _floor(pd.to_datetime(hours["bucket"]), "1d")
+    hours = hours[[key in touched_days for key in zip(hours["device_id"], hours["metric"], hours["bucket"])]]
+    written += _upsert_rollups(db, _aggregate(hours, "1d", now))
+    return written
+
+
+def _window_summary(db: Session, device_id: int, metric: str, start: datetime, end: datetime) -> Dict[str, Any]:
+    """
+    Estimated reading count and last rollup update in the window, from the
+    daily rollups only: each overlapping day contributes its count in
+    proportion to how much of the day lies inside the window.
+    """
+    day_start = pd.Timestamp(start).floor("D").to_pydatetime()
+    days = db.execute(
+        select(ReadingRollup.bucket, ReadingRollup.count, ReadingRollup.updated_at)
+        .where(ReadingRollup.device_id == device_id, ReadingRollup.metric == metric,
+               ReadingRollup.resolution == "1d", ReadingRollup.bucket >= day_start, ReadingRollup.bucket < end)
+    ).all()
+    day = RESOLUTIONS["1d"]
+    count = sum(
+        (bucket_count or 0) * ((min(bucket + day, end) - max(bucket, start)) / day)
+        for bucket, bucket_count, _ in days
+    )
+    updated = max((row[2] for row in days if row[2] is not None), default=None)
+    return {"count": int(np.ceil(count)), "updated_at": updated}
+
+
+def choose_resolution(count: int, start: datetime, end: datetime, points: int) -> str:
+    """
+    Finest resolution with at most POINTS_PER_PIXEL points per requested
+    point. Raw readings are also used when even hourly buckets would leave
+    the chart with fewer than ``points`` points, provided the raw read
+    stays within RAW_ROWS_PER_POINT rows per point.
+    """
+    budget = points * POINTS_PER_PIXEL
+    if count <= budget:
+        return "raw"
+    span = end - start
+    if span / RESOLUTIONS["1h"] < points and count <= points * RAW_ROWS_PER_POINT:
+        return "raw"
+    for resolution, width in RESOLUTIONS.items():
+        if span / width <= budget:
+            return resolution
+    return "1d"
+
+
+def load_series(device_id: int, metric: str, start: datetime, end: datetime, points: int,
+                resolution: Optional[str] = None, etag: Optional[str] = None) -> Dict[str, Any]:
+    """Downsampled series payload, or ``{"etag": ..., "not_modified": True}`` if ``etag`` still matches."""
+    with SessionLocal() as db:
+        summary = _window_summary(db, device_id, metric, start, end)
+        resolution = resolution or choose_resolution(summary["count"], start, end, points)
+        tag = hashlib.sha256(
+            f"{device_id}|{metric}|{start.isoformat()}|{end.isoformat()}|{points}|{resolution}|"
+            f"{summary['count']}|{summary['updated_at']}".encode()
+        ).hexdigest()[:32]
+        etag_value = f'"{tag}"'
+        if etag == etag_value:
+            return {"etag": etag_value, "not_modified": True}
+
+        raw_limit = points * RAW_ROWS_PER_POINT
+        if resolution == "raw":
+            frame = pd.DataFrame(db.execute(
+                select(Reading.timestamp, Reading.value)
+                .where(Reading.device_id == device_id, Reading.metric == metric, Reading.timestamp >= start,
+                       Reading.timestamp < end, Reading.value.isnot(None))
+                .order_by(Reading.timestamp)
+                .limit(raw_limit)
+            ).all(), columns=["timestamp", "value"])
+        else:
+            frame = pd.DataFrame(db.execute(
+                select(ReadingRollup.bucket, ReadingRollup.min, ReadingRollup.max, ReadingRollup.sum,
+                       ReadingRollup.count)
+                .where(and_(ReadingRollup.device_id == device_id, ReadingRollup.metric == metric,
+                            ReadingRollup.resolution == resolution, ReadingRollup.bucket >= start,
+                            ReadingRollup.bucket < end, ReadingRollup.count > 0))
+                .order_by(ReadingRollup.bucket)
+            ).all(), columns=["timestamp", "min", "max", "sum", "count"])
+            frame["value"] = frame["sum"] / frame["count"]
+
+    total = len(frame)
+    if total:
+        x = pd.to_datetime(frame["timestamp"]).to_numpy("datetime64[ns]").astype(np.int64) / 1e9
+        frame = frame.iloc[lttb(x, frame["value"].to_numpy(dtype=np.float64), points)]
+
+    data: Dict[str, List] = {
+        "timestamps": pd.to_datetime(frame["timestamp"]).dt.strftime("%Y-%m-%dT%H:%M:%SZ").tolist(),
+        "values" if resolution == "raw" else "mean": frame["value"].round(6).tolist(),
+    }
+    if resolution != "raw":
+        data["min"] = frame["min"].tolist()
+        data["max"] = frame["max"].tolist()
+    return {
+        "etag": etag_value,
+        "device_id": device_id,
+        "metric": metric,
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "source_points": total,
+        # The raw read hit its row cap; the series ends before ``end``
+        "truncated": resolution == "raw" and total >= raw_limit,
+        "points": len(frame),
+        "data": data,
+    }
+
+
+@router.get("")
+async def get_series(
+    request: Request,
+    response: Response,
+    device_id: int,
+    metric: str,
+    start: datetime,
+    end: datetime,
+    points: int = Query(default=1000, ge=3, le=MAX_POINTS),
+    resolution: Optional[str] = Query(default=None, pattern="^(raw|1h|1d)$"),
+):
+    """One device metric over ``[start, end)``, at most ``points`` points (typically the chart width)."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    # Stored timestamps are naive UTC
+    start, end = (pd.Timestamp(t).tz_convert(None).to_pydatetime() if t.tzinfo else t for t in (start, end))
+
+    try:
+        payload = await asyncio.to_thread(load_series, device_id, metric, start, end, points,
+                                          resolution, request.headers.get("if-none-match"))
+    except Exception as e:
+        logger.error(f"Error loading series {device_id}/{metric}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load series")
+
+    headers = {"ETag": payload.pop("etag"), "Cache-Control": "private, max-age=0, must-revalidate"}
+    if payload.pop("not_modified", False):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return payload
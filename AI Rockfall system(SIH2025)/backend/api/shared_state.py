@@ -0,0 +1,216 @@
+"""
+Shared state for horizontally scaled API workers
+================================================
+
+Redis-backed building blocks that let several uvicorn workers (or
+replicas behind a load balancer) behave like one API:
+
+- RedisAnalysisQueue: durable analysis queue. Items move atomically to a
+  per-consumer processing list (BLMOVE) and are acknowledged when done;
+  lists of consumers whose heartbeat expired are requeued by a periodic
+  recovery sweep.
+- RedisEventBus: pub/sub channel. Every worker publishes updates to the
+  bus and relays what it receives to its own WebSocket clients.
+- StatusCache: analysis status shared by every worker. Queued and running
+  statuses are kept until replaced; final ones expire after
+  FINAL_STATUS_TTL.
+
+LocalAnalysisQueue keeps the single-process behaviour when Redis is
+disabled.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_redis_client():
+    """Async Redis client from settings."""
+    import redis.asyncio as redis
+    return redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        decode_responses=True
+    )
+
+
+def consumer_name() -> str:
+    """Unique name of this API worker process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LocalAnalysisQueue:
+    """In-process queue with the RedisAnalysisQueue interface."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def put(self, item: Dict[str, Any]) -> None:
+        await self.queue.put(item)
+
+    async def get(self) -> Tuple[Dict[str, Any], Any]:
+        return await self.queue.get(), None
+
+    async def ack(self, receipt: Any) -> None:
+        self.queue.task_done()
+
+    async def recover(self, own: bool = False) -> int:
+        return 0
+
+    async def qsize(self) -> int:
+        return self.queue.qsize()
+
+
+class RedisAnalysisQueue:
+    """Durable at-least-once analysis queue shared by all API workers."""
+
+    def __init__(self, redis, key: str = None, consumer: str = None, heartbeat_ttl: int = None,
+                 poll_timeout: float = 5.0):
+        self.redis = redis
+        self.key = key or settings.ANALYSIS_QUEUE_KEY
+        self.consumer = consumer or consumer_name()
+        self.heartbeat_ttl = heartbeat_ttl or settings.QUEUE_HEARTBEAT_TTL
+        self.poll_timeout = poll_timeout
+        self.processing_key = f"{self.key}:processing:{self.consumer}"
+
+    def _heartbeat_key(self, consumer: str) -> str:
+        return f"{self.key}:consumer:{consumer}"
+
+    async def put(self, item: Dict[str, Any]) -> None:
+        await self.redis.lpush(self.key, json.dumps(item, default=str))
+
+    async def get(self) -> Tuple[Dict[str, Any], str]:
+        """Block until an item is available and claim it for this consumer."""
+        while True:
+            # The consumer loop always waits here, so this doubles as the liveness heartbeat
+            await self.redis.set(self._heartbeat_key(self.consumer), 1, ex=self.heartbeat_ttl)
+            raw = await self.redis.blmove(
+                self.key, self.processing_key, self.poll_timeout, src="RIGHT", dest="LEFT"
+            )
+            if raw is not None:
+                return json.loads(raw), raw
+
+    async def ack(self, receipt: str) -> None:
+        await self.redis.lrem(self.processing_key, 1, receipt)
+
+    async def recover(self, own: bool = False) -> int:
+        """
+        Requeue items claimed by consumers whose heartbeat has expired. With
+        ``own`` (at startup) this consumer's list is requeued too: a restarted
+        process can reuse the name of the one that left it behind.
+        """
+        recovered = 0
+        prefix = f"{self.key}:processing:"
+        async for processing_key in self.redis.scan_iter(match=f"{prefix}*"):
+            consumer = processing_key[len(prefix):]
+            if consumer == self.consumer:
+                if not own:
+                    continue
+            elif await self.redis.exists(self._heartbeat_key(consumer)):
+                continue
+            while await self.redis.lmove(processing_key, self.key, src="RIGHT", dest="RIGHT") is not None:
+                recovered += 1
+        if recovered:
+            logger.info(f"Requeued {recovered} unacknowledged analyses")
+        return recovered
+
+    async def qsize(self) -> int:
+        return await self.redis.llen(self.key)
+
+
+class RedisEventBus:
+    """
+    Pub/sub relay between API workers. ``publish`` has the signature of
+    ``WebSocketManager.publish``; ``listen`` delivers every bus message to
+    the local manager (the publishing worker included) or to a registered
+    control handler.
+    """
+
+    def __init__(self, redis, websocket_manager, channel: str = None):
+        self.redis = redis
+        self.websocket_manager = websocket_manager
+        self.channel = channel or settings.EVENT_CHANNEL
+        self.control_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {}
+
+    def on_control(self, action: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]]) -> None:
+        """Register a coroutine for control messages such as cross-worker cancellation."""
+        self.control_handlers[action] = handler
+
+    async def publish(self, message: Dict[str, Any], rooms: Iterable[str] = (), exclude_client: str = None) -> int:
+        event = {"message": message, "rooms": list(rooms)}
+        return await self.redis.publish(self.channel, json.dumps(event, default=str))
+
+    async def publish_control(self, action: str, payload: Dict[str, Any]) -> int:
+        event = {"control": action, "payload": payload}
+        return await self.redis.publish(self.channel, json.dumps(event, default=str))
+
+    async def _dispatch(self, data: str) -> None:
+        event = json.loads(data)
+        if "control" in event:
+            handler = self.control_handlers.get(event["control"])
+            if handler is not None:
+                await handler(event.get("payload", {}))
+            return
+        await self.websocket_manager.publish(event["message"], event.get("rooms", []))
+
+    async def listen(self) -> None:
+        """Relay bus messages to this worker's sockets, resubscribing after errors."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for raw in pubsub.listen():
+                    if raw.get("type") != "message":
+                        continue
+                    try:
+                        await self._dispatch(raw["data"])
+                    except Exception as e:
+                        logger.error(f"Error relaying bus message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bus connection lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+
+class StatusCache:
+    """Analysis status shared by every API worker."""
+
+    def __init__(self, redis, prefix: str = "rockfall"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def _status_key(self, analysis_id: int) -> str:
+        return f"{self.prefix}:status:{analysis_id}"
+
+    async def get_status(self, analysis_id: int) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.get(self._status_key(analysis_id))
+        return json.loads(raw) if raw else None
+
+    async def set_status(self, analysis_id: int, status: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """
+        Store a status. Without ``ttl`` it is kept until replaced, however long
+        the job runs; the durable queue guarantees a final status follows.
+        """
+        await self.redis.set(self._status_key(analysis_id), json.dumps(status, default=str), ex=ttl)
+
+    async def analysis_finished(self, analysis_id: int, status: Dict[str, Any]) -> None:
+        """Store the final status, kept for FINAL_STATUS_TTL."""
+        await self.set_status(analysis_id, status, ttl=settings.FINAL_STATUS_TTL)
@@ -0,0 +1,282 @@
+"""
+Model training scheduler for AI Rockfall Prediction System
+==========================================================
+
+Runs ``analysis.training`` off the request path in its own process pool,
+so analyses and predictions never wait on a model fit:
+
+- every ``TRAINING_CHECK_INTERVAL`` each servable sensor is checked;
+- a sensor whose current version is older than ``TRAINING_INTERVAL`` and
+  has at least ``TRAINING_MIN_NEW_ROWS`` newer rows is retrained (``auto``:
+  warm start on the new rows when possible);
+- otherwise new rows are compared with the version's feature profile and
+  a population stability index above ``TRAINING_DRIFT_THRESHOLD``
+  triggers a ``TRAINING_DRIFT_MODE`` retrain.
+
+After a retrain the sensor's analysis workers are restarted on the new
+current version (on every API worker, via the event bus when Redis is
+enabled) and a ``model_updated`` message is broadcast. With Redis, a
+per-sensor lock keeps replicas from training the same sensor twice.
+
+Endpoints (mounted under /api/training):
+    GET  /                    scheduler state and last result per sensor
+    POST /{sensor}            start a retrain (mode=auto|full|warm)
+    GET  /{sensor}/drift      drift of the newest data against the current version
+    POST /{sensor}/benchmark  model benchmark report (see analysis.benchmark)
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+
+from ..analysis import normalize_sensor
+from ..analysis.benchmark import TASKS as BENCHMARK_TASKS, run_benchmark
+from ..analysis.model_registry import ModelRegistry
+from ..analysis.training import TRAINERS, TRAINING_MODES, check_drift, retrain
+from .config import settings
+from .shared_state import consumer_name
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Deletes the training lock only while it still holds this worker's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class TrainingScheduler:
+    """Schedules and drift-triggers retraining in a dedicated process pool."""
+
+    def __init__(self, orchestrator, registry: Optional[ModelRegistry] = None):
+        self.orchestrator = orchestrator
+        self.registry = registry or ModelRegistry(settings.UPLOAD_BASE_DIR)
+        self.redis = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.running: Dict[str, asyncio.Task] = {}
+        self.lock_tokens: Dict[str, str] = {}
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+        self.last_drift: Dict[str, Dict[str, Any]] = {}
+
+    def use_redis(self, redis):
+        """Coordinate training across API workers and reload models everywhere after a retrain."""
+        self.redis = redis
+        if self.orchestrator.event_bus is not None:
+            self.orchestrator.event_bus.on_control("models_updated", self._reload_local)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=settings.TRAINING_MAX_CONCURRENT,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    def _params(self, mode: str, reason: str) -> Dict[str, Any]:
+        return {
+            "mode": mode,
+            "reason": reason,
+            "n_jobs": settings.TRAINING_N_JOBS,
+            "min_new_rows": settings.TRAINING_MIN_NEW_ROWS,
+            "output_root": settings.UPLOAD_BASE_DIR,
+        }
+
+    async def _reload_local(self, payload: Dict[str, Any]):
+        self.orchestrator.worker_pool.reload(payload["sensor"])
+
+    async def _acquire(self, sensor: str) -> bool:
+        if self.redis is None:
+            return True
+        key = f"rockfall:training:lock:{sensor}"
+        token = f"{consumer_name()}:{uuid.uuid4().hex}"
+        if not await self.redis.set(key, token, nx=True, ex=settings.TRAINING_LOCK_TTL):
+            return False
+        self.lock_tokens[sensor] = token
+        return True
+
+    async def _release(self, sensor: str):
+        # The lock may have expired and been taken by another worker; leave that one alone
+        token = self.lock_tokens.pop(sensor, None)
+        if self.redis is not None and token is not None:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, f"rockfall:training:lock:{sensor}", token)
+
+    def start_retrain(self, sensor: str, mode: str = "auto", reason: str = "manual") -> bool:
+        """Start a retrain in the background; False if one is already running here."""
+        task = self.running.get(sensor)
+        if task is not None and not task.done():
+            return False
+        self.running[sensor] = asyncio.create_task(self._retrain(sensor, mode, reason))
+        return True
+
+    async def _retrain(self, sensor: str, mode: str, reason: str):
+        if not await self._acquire(sensor):
+            logger.info(f"{sensor} is being retrained by another API worker")
+            return
+        started = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor(), retrain, sensor, self._params(mode, reason))
+            result["finished_at"] = datetime.utcnow().isoformat()
+            self.last_results[sensor] = result
+            if result.get("skipped"):
+                logger.info(f"Skipped {sensor} retrain: {result['reason']}")
+                return
+
+            if self.orchestrator.event_bus is not None:
+                await self.orchestrator.event_bus.publish_control("models_updated", {"sensor": sensor})
+            else:
+                await self._reload_local({"sensor": sensor})
+            await self.orchestrator.broadcaster.publish({
+                "type": "model_updated",
+                "sensor": sensor,
+                "version": result["version"],
+                "mode": result["mode"],
+                "reason": reason,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            logger.error(f"Error retraining {sensor} models: {e}")
+            self.last_results[sensor] = {"sensor": sensor, "error": str(e),
+                                         "finished_at": datetime.utcnow().isoformat()}
+        finally:
+            self.last_results.setdefault(sensor, {})["elapsed_seconds"] = round(time.time() - started, 3)
+            await self._release(sensor)
+
+    async def drift(self, sensor: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(
+            self._executor(), check_drift, sensor, {"output_root": settings.UPLOAD_BASE_DIR,
+                                                    "min_new_rows": settings.TRAINING_MIN_NEW_ROWS}
+        )
+        self.last_drift[sensor] = report
+        return report
+
+    async def benchmark(self, sensor: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        params = {"n_jobs": settings.TRAINING_N_JOBS, "output_root": settings.UPLOAD_BASE_DIR, **params}
+        return await loop.run_in_executor(self._executor(), run_benchmark, sensor, params)
+
+    async def _check(self, sensor: str):
+        version = self.registry.current_version(sensor)
+        if version is None:
+            self.start_retrain(sensor, "auto", "schedule")
+            return
+        report = await self.drift(sensor)
+        # Without rows newer than the version a retrain would only skip (or refit the same data);
+        # versions from before trained_until was recorded cannot tell, so they stay eligible
+        if report.get("trained_until") and report.get("new_rows", 0) < settings.TRAINING_MIN_NEW_ROWS:
+            return
+        if time.time() - self.registry.manifest(sensor, version)["created_at"] > settings.TRAINING_INTERVAL:
+            self.start_retrain(sensor, "auto", "schedule")
+            return
+        if report.get("drift") is not None and report["drift"] > settings.TRAINING_DRIFT_THRESHOLD:
+            logger.warning(f"{sensor} data drift {report['drift']:.3f} exceeds the threshold; retraining")
+            self.start_retrain(sensor, settings.TRAINING_DRIFT_MODE, "drift")
+
+    async def run(self):
+        """Periodic schedule and drift checks for every trainable sensor."""
+        while True:
+            await asyncio.sleep(settings.TRAINING_CHECK_INTERVAL)
+            for sensor in TRAINERS:
+                try:
+                    await self._check(sensor)
+                except Exception as e:
+                    logger.error(f"Error checking {sensor} models for retraining: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.TRAINING_ENABLED,
+            "sensors": {
+                sensor: {
+                    "current_version": self.registry.current_version(sensor),
+                    "training": sensor in self.running and not self.running[sensor].done(),
+                    "last_result": self.last_results.get(sensor),
+                    "last_drift": self.last_drift.get(sensor),
+                }
+                for sensor in TRAINERS
+            },
+        }
+
+    def shutdown(self):
+        for task in self.running.values():
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+training_scheduler: Optional[TrainingScheduler] = None
+
+
+def _scheduler() -> TrainingScheduler:
+    if training_scheduler is None:
+        raise HTTPException(status_code=503, detail="Training scheduler is not running")
+    return training_scheduler
+
+
+def _sensor(sensor: str) -> str:
+    try:
+        sensor = normalize_sensor(sensor)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if sensor not in TRAINERS:
+        raise HTTPException(status_code=404, detail=f"{sensor} has no trainable models")
+    return sensor
+
+
+@router.get("")
+async def training_status():
+    """Current model version, running retrains and last results per sensor."""
+    return await asyncio.to_thread(_scheduler().get_status)
+
+
+@router.post("/{sensor}")
+async def start_training(sensor: str, mode: str = "auto"):
+    """Retrain ``sensor`` in the background (auto: warm start on new data when possible)."""
+    sensor = _sensor(sensor)
+    if mode not in TRAINING_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(TRAINING_MODES)}")
+    started = _scheduler().start_retrain(sensor, mode, "manual")
+    return {"sensor": sensor, "mode": mode, "status": "started" if started else "already_running"}
+
+
+@router.get("/{sensor}/drift")
+async def get_drift(sensor: str):
+    """Population stability of data newer than the current version's training data."""
+    sensor = _sensor(sensor)
+    try:
+        return await _scheduler().drift(sensor)
+    except Exception as e:
+        logger.error(f"Error checking {sensor} drift: {e}")
+        raise HTTPException(status_code=500, detail="Drift check failed")
+
+
+@router.post("/{sensor}/benchmark")
+async def benchmark_models(sensor: str, latency_budget_ms: Optional[float] = None,
+                           memory_budget_mb: Optional[float] = None, top_k: int = 3):
+    """Cross-validated search and latency/memory profile of candidate models for ``sensor``."""
+    try:
+        sensor = normalize_sensor(sensor)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if sensor not in BENCHMARK_TASKS:
+        raise HTTPException(status_code=404, detail=f"{sensor} has no benchmark tasks")
+    params = {"latency_budget_ms": latency_budget_ms, "memory_budget_mb": memory_budget_mb, "top_k": top_k}
+    try:
+        return await _scheduler().benchmark(sensor, params)
+    except Exception as e:
+        logger.error(f"Error benchmarking {sensor} models: {e}")
+        raise HTTPException(status_code=500, detail="Benchmark failed")
@@ -0,0 +1,500 @@
+"""
+Streaming upload ingestion for AI Rockfall Prediction System
+============================================================
+
+Uploads are written to disk chunk by chunk while being hashed
+(SHA-256) and validated on the fly: the LAS/LAZ public header is parsed
+from the first bytes and CSV headers are sniffed against the columns the
+sensor's pipeline expects, so a wrong file is rejected after one chunk
+instead of after gigabytes. Large files use resumable sessions; the
+analysis is submitted as soon as the last chunk is verified.
+
+Endpoints (mounted under /api/uploads):
+    POST   /                      single streamed multipart upload
+    POST   /sessions              start a resumable upload
+    GET    /sessions/{id}         session state (bytes received so far)
+    PUT    /sessions/{id}?offset  append raw bytes at ``offset``
+    DELETE /sessions/{id}         abort and remove the partial file
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import struct
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from pydantic import BaseModel
+
+from ..analysis import COLUMN_ALTERNATIVES, INPUT_COLUMNS, normalize_sensor
+from ..analysis.common import write_digest_sidecar
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+LAS_EXTENSIONS = (".las", ".laz")
+LAS_SIGNATURE = b"LASF"
+LAS_MIN_HEADER_SIZE = 227
+SNIFF_BYTES = 64 * 1024
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class UploadValidationError(ValueError):
+    """Uploaded bytes do not match the declared sensor or format."""
+
+
+class UploadBusyError(RuntimeError):
+    """Another request (possibly on another worker) is writing to the session."""
+
+
+def parse_las_header(data: bytes) -> Dict[str, Any]:
+    """Parse and sanity-check a LAS 1.0-1.4 public header block."""
+    if len(data) < LAS_MIN_HEADER_SIZE or data[:4] != LAS_SIGNATURE:
+        raise UploadValidationError("Not a LAS file (missing LASF signature)")
+
+    version_major, version_minor = struct.unpack_from("<BB", data, 24)
+    header_size, offset_to_points, n_vlrs = struct.unpack_from("<HLL", data, 94)
+    point_format, record_length, legacy_count = struct.unpack_from("<BHL", data, 104)
+    scale = struct.unpack_from("<3d", data, 131)
+    offset = struct.unpack_from("<3d", data, 155)
+    max_x, min_x, max_y, min_y, max_z, min_z = struct.unpack_from("<6d", data, 179)
+
+    if version_major != 1 or version_minor > 4:
+        raise UploadValidationError(f"Unsupported LAS version {version_major}.{version_minor}")
+    if header_size < LAS_MIN_HEADER_SIZE or offset_to_points < header_size:
+        raise UploadValidationError("Corrupt LAS header (header size / point offset)")
+    # Bit 7 flags LAZ-compressed point records
+    compressed = bool(point_format & 0x80)
+    if (point_format & 0x3F) > 10 or record_length == 0:
+        raise UploadValidationError(f"Unsupported LAS point format {point_format & 0x3F}")
+    if any(s == 0 for s in scale) or min_x > max_x or min_y > max_y or min_z > max_z:
+        raise UploadValidationError("Corrupt LAS header (scale or bounds)")
+
+    point_count = legacy_count
+    if version_minor >= 4 and len(data) >= 255:
+        point_count = struct.unpack_from("<Q", data, 247)[0] or legacy_count
+
+    return {
+        "format": "las",
+        "version": f"{version_major}.{version_minor}",
+        "point_format": point_format & 0x3F,
+        "compressed": compressed,
+        "point_record_length": record_length,
+        "point_count": point_count,
+        "offset_to_points": offset_to_points,
+        "scale": list(scale),
+        "offset": list(offset),
+        "bounds": {"x": [min_x, max_x], "y": [min_y, max_y], "z": [min_z, max_z]},
+    }
+
+
+def sniff_csv_columns(data: bytes, sensor: str) -> Dict[str, Any]:
+    """Check a CSV head (header + a few rows) against the sensor's expected columns."""
+    text = data.decode("utf-8-sig", errors="replace")
+    # Drop the last, possibly truncated, line
+    lines = text.splitlines()[:-1] if not text.endswith("\n") else text.splitlines()
+    if not lines:
+        raise UploadValidationError("CSV header not found in the first bytes")
+
+    try:
+        dialect = csv.Sniffer().sniff("\n".join(lines[:20]), delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(io.StringIO("\n".join(lines[:20])), dialect))
+    columns = [column.strip() for column in rows[0]]
+
+    expected = INPUT_COLUMNS.get(sensor, ())
+    alternatives = {column: COLUMN_ALTERNATIVES.get(column) for column in expected}
+    missing = [
+        column for column in expected
+        if column not in columns
+        and not (alternatives[column] and all(alternative in columns for alternative in alternatives[column]))
+    ]
+    if missing:
+        raise UploadValidationError(f"CSV is missing {sensor} columns: {', '.join(missing)}")
+    ragged = [i for i, row in enumerate(rows[1:], start=2) if row and len(row) != len(columns)]
+    if ragged:
+        raise UploadValidationError(f"CSV row {ragged[0]} has {len(rows[ragged[0] - 1])} fields, expected {len(columns)}")
+
+    return {"format": "csv", "delimiter": dialect.delimiter, "columns": columns}
+
+
+def validate_head(data: bytes, extension: str, sensor: str) -> Dict[str, Any]:
+    """Validate the first bytes of an upload for its extension and sensor."""
+    if extension in LAS_EXTENSIONS:
+        if sensor != "lidar":
+            raise UploadValidationError(f"LAS/LAZ files are only accepted for LiDAR, not {sensor}")
+        return parse_las_header(data)
+    if extension == ".csv":
+        return sniff_csv_columns(data, sensor)
+    return {"format": extension.lstrip(".")}
+
+
+class UploadSessionRequest(BaseModel):
+    """Start of a resumable upload."""
+    filename: str
+    sensor_type: str
+    size: int
+    sha256: Optional[str] = None
+    auto_analyze: bool = True
+    analysis_id: Optional[int] = None
+    parameters: Dict[str, Any] = {}
+
+
+class UploadSessions:
+    """
+    Resumable upload sessions stored next to their partial files, so any
+    API worker can accept the next chunk. The running SHA-256 is kept in
+    memory per session together with the number of bytes it has seen; when
+    that differs from the session's ``received`` (other workers wrote chunks
+    in between) the hash is rebuilt from the partial file. Writes to one
+    session are serialised by a Redis lock across workers (``use_redis``),
+    or by an asyncio lock within a single process. Sessions expire
+    UPLOAD_SESSION_TTL seconds after creation; ``sweep`` deletes abandoned ones.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(settings.UPLOAD_DIR, ".sessions")
+        os.makedirs(self.root, exist_ok=True)
+        self.hashers: Dict[str, Tuple[Any, int]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.redis = None
+
+    def use_redis(self, redis):
+        """Serialise chunk writes per session across API workers."""
+        self.redis = redis
+
+    def _meta_path(self, session_id: str) -> str:
+        return os.path.join(self.root, f"{session_id}.json")
+
+    def part_path(self, session_id: str) -> str:
+        return os.path.join(self.root, f"{session_id}.part")
+
+    @contextlib.asynccontextmanager
+    async def lock(self, session_id: str):
+        if self.redis is None:
+            async with self.locks.setdefault(session_id, asyncio.Lock()):
+                yield
+            return
+
+        lock = self.redis.lock(f"rockfall:upload:lock:{session_id}", timeout=settings.UPLOAD_LOCK_TTL,
+                               blocking_timeout=settings.UPLOAD_LOCK_WAIT)
+        if not await lock.acquire():
+            raise UploadBusyError(f"Upload session {session_id} is busy")
+        try:
+            yield
+        finally:
+            try:
+                await lock.release()
+            except Exception as e:
+                logger.error(f"Error releasing upload lock for {session_id}: {e}")
+
+    def create(self, request: UploadSessionRequest) -> Dict[str, Any]:
+        sensor = normalize_sensor(request.sensor_type) if request.sensor_type != "image" else "image"
+        filename = os.path.basename(request.filename)
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in settings.ALLOWED_EXTENSIONS and extension not in LAS_EXTENSIONS:
+            raise UploadValidationError(f"File type {extension} is not allowed")
+        if request.size < 0 or request.size > settings.MAX_STREAMING_UPLOAD_SIZE:
+            raise UploadValidationError(
+                f"Upload size {request.size} exceeds {settings.MAX_STREAMING_UPLOAD_SIZE} bytes"
+            )
+
+        session = {
+            "id": uuid.uuid4().hex,
+            "filename": filename,
+            "extension": extension,
+            "sensor": sensor,
+            "size": request.size,
+            "sha256": request.sha256.lower() if request.sha256 else None,
+            "received": 0,
+            "header": None,
+            "auto_analyze": request.auto_analyze,
+            "analysis_id": request.analysis_id,
+            "parameters": request.parameters,
+            "created_at": time.time(),
+            "status": "uploading",
+        }
+        open(self.part_path(session["id"]), "wb").close()
+        self.hashers[session["id"]] = (hashlib.sha256(), 0)
+        self.save(session)
+        return session
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+            return None
+        try:
+            with open(self._meta_path(session_id)) as f:
+                session = json.load(f)
+        except FileNotFoundError:
+            return None
+        if self.expired(session):
+            self.remove(session_id)
+            return None
+        return session
+
+    @staticmethod
+    def expired(session: Dict[str, Any]) -> bool:
+        return time.time() - session.get("created_at", 0) > settings.UPLOAD_SESSION_TTL
+
+    def save(self, session: Dict[str, Any]) -> None:
+        tmp_path = self._meta_path(session["id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(session, f)
+        os.replace(tmp_path, self._meta_path(session["id"]))
+
+    def remove(self, session_id: str) -> None:
+        for path in (self._meta_path(session_id), self.part_path(session_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        self.hashers.pop(session_id, None)
+        self.locks.pop(session_id, None)
+
+    def sweep(self) -> int:
+        """Delete expired sessions and orphaned partial files; returns the number of sessions removed."""
+        removed = 0
+        cutoff = time.time() - settings.UPLOAD_SESSION_TTL
+        for name in os.listdir(self.root):
+            session_id, extension = os.path.splitext(name)
+            path = os.path.join(self.root, name)
+            try:
+                if extension == ".json":
+                    with open(path) as f:
+                        session = json.load(f)
+                    if self.expired(session):
+                        self.remove(session_id)
+                        removed += 1
+                elif not os.path.exists(self._meta_path(session_id)) and os.path.getmtime(path) < cutoff:
+                    # .part or .json.tmp left without metadata by a crashed worker
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.error(f"Error sweeping upload session file {name}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} expired upload session(s)")
+        return removed
+
+    def hasher(self, session: Dict[str, Any]):
+        """
+        Running SHA-256 of the ``received`` bytes, rebuilt from the partial
+        file if this process lacks it or has not seen every chunk.
+        """
+        hasher, hashed = self.hashers.get(session["id"], (None, -1))
+        if hashed != session["received"]:
+            logger.info(f"Rebuilding hash state for upload session {session['id']}")
+            hasher, remaining = hashlib.sha256(), session["received"]
+            with open(self.part_path(session["id"]), "rb") as f:
+                while remaining > 0:
+                    chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise UploadValidationError("Partial upload file is shorter than the bytes received")
+                    hasher.update(chunk)
+                    remaining -= len(chunk)
+            self.hashers[session["id"]] = (hasher, session["received"])
+        return hasher
+
+    def _write(self, session: Dict[str, Any], data: bytes) -> None:
+        """Append, hash and (once enough bytes exist) validate one chunk; runs in a worker thread."""
+        hasher = self.hasher(session)
+        with open(self.part_path(session["id"]), "r+b") as f:
+            f.seek(session["received"])
+            f.write(data)
+            f.truncate()
+        hasher.update(data)
+        session["received"] += len(data)
+        self.hashers[session["id"]] = (hasher, session["received"])
+
+        if session["header"] is None and session["received"] >= min(SNIFF_BYTES, session["size"]):
+            with open(self.part_path(session["id"]), "rb") as f:
+                head = f.read(SNIFF_BYTES)
+            session["header"] = validate_head(head, session["extension"], session["sensor"])
+
+    async def append(self, session: Dict[str, Any], stream) -> Dict[str, Any]:
+        """Write an async byte stream into the session in large chunks."""
+        buffer = bytearray()
+        try:
+            async for piece in stream:
+                buffer.extend(piece)
+                if session["received"] + len(buffer) > session["size"]:
+                    raise UploadValidationError("More bytes received than the declared upload size")
+                if len(buffer) >= settings.UPLOAD_CHUNK_SIZE:
+                    await asyncio.to_thread(self._write, session, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(self._write, session, bytes(buffer))
+        finally:
+            # Whatever reached disk is durable; the client resumes from `received`
+            self.save(session)
+        return session
+
+    def finalize(self, session: Dict[str, Any]) -> str:
+        """Verify the complete upload and move it into the sensor's upload folder."""
+        digest = self.hasher(session).hexdigest()
+        if session["sha256"] and digest != session["sha256"]:
+            raise UploadValidationError("SHA-256 mismatch: upload is corrupt")
+
+        header = session.get("header") or {}
+        if header.get("format") == "las" and not header.get("compressed"):
+            expected = header["offset_to_points"] + header["point_count"] * header["point_record_length"]
+            if expected > session["size"]:
+                raise UploadValidationError(
+                    f"LAS file truncated: header declares {header['point_count']} points ({expected} bytes)"
+                )
+
+        target_dir = os.path.join(settings.UPLOAD_DIR, session["sensor"])
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, f"{session['id'][:12]}_{session['filename']}")
+        os.replace(self.part_path(session["id"]), target)
+        # Pipelines (e.g. the LiDAR epoch store) reuse the streamed digest instead of re-reading the file
+        write_digest_sidecar(target, digest)
+
+        session.update({"sha256": digest, "path": target, "status": "complete"})
+        self.save(session)
+        self.hashers.pop(session["id"], None)
+        return target
+
+
+upload_sessions = UploadSessions()
+
+
+async def sweep_upload_sessions() -> None:
+    """Delete abandoned upload sessions at startup and every UPLOAD_SESSION_SWEEP_INTERVAL."""
+    while True:
+        try:
+            await asyncio.to_thread(upload_sessions.sweep)
+        except Exception as e:
+            logger.error(f"Error sweeping upload sessions: {e}")
+        await asyncio.sleep(settings.UPLOAD_SESSION_SWEEP_INTERVAL)
+
+
+async def _complete(request: Request, session: Dict[str, Any]) -> Dict[str, Any]:
+    """Finalize a fully received upload and hand it to the analysis orchestrator."""
+    path = await asyncio.to_thread(upload_sessions.finalize, session)
+    orchestrator = getattr(request.app.state, "analysis_orchestrator", None)
+
+    if orchestrator is not None and orchestrator.result_cache is not None:
+        # The digest was computed while streaming; the result cache need not re-read the file
+        await asyncio.to_thread(orchestrator.result_cache.remember_digest, path, session["sha256"])
+
+    if session["auto_analyze"] and session["sensor"] != "image" and orchestrator is not None:
+        analysis_id = session["analysis_id"] or int(time.time() * 1000)
+        submitted = await orchestrator.submit_analysis(analysis_id, session["sensor"], session["parameters"], [path])
+        session.update({"analysis_id": analysis_id, "analysis_submitted": submitted})
+        upload_sessions.save(session)
+    return session
+
+
+def _public(session: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in session.items() if key not in ("parameters",)}
+
+
+@router.post("/sessions")
+async def create_upload_session(request: UploadSessionRequest):
+    """Start a resumable upload; send the bytes with PUT /sessions/{id}?offset=N."""
+    try:
+        return _public(upload_sessions.create(request))
+    except (UploadValidationError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/sessions/{session_id}")
+async def get_upload_session(session_id: str):
+    """Session state; ``received`` is the offset to resume from."""
+    session = upload_sessions.load(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return _public(session)
+
+
+async def _append_chunk(request: Request, session_id: str, offset: int) -> Dict[str, Any]:
+    """Body of upload_chunk, run while holding the session lock."""
+    session = upload_sessions.load(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if session["status"] != "uploading":
+        return _public(session)
+    if offset != session["received"]:
+        raise HTTPException(status_code=409, detail={"message": "Offset mismatch", "received": session["received"]})
+
+    try:
+        await upload_sessions.append(session, request.stream())
+        if session["received"] == session["size"]:
+            session = await _complete(request, session)
+    except UploadValidationError as e:
+        logger.error(f"Rejected upload {session_id}: {e}")
+        upload_sessions.remove(session_id)
+        raise HTTPException(status_code=422, detail=str(e))
+    return _public(session)
+
+
+@router.put("/sessions/{session_id}")
+async def upload_chunk(session_id: str, request: Request, offset: int = 0):
+    """Append the raw request body at ``offset``; completes the upload when all bytes are in."""
+    try:
+        async with upload_sessions.lock(session_id):
+            return await _append_chunk(request, session_id, offset)
+    except UploadBusyError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e)})
+
+
+@router.delete("/sessions/{session_id}")
+async def abort_upload_session(session_id: str):
+    """Abort a resumable upload and delete its partial file."""
+    if upload_sessions.load(session_id) is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    upload_sessions.remove(session_id)
+    return {"id": session_id, "status": "aborted"}
+
+
+@router.post("")
+async def upload_file(
+    request: Request,
+    file: UploadFile = File(...),
+    sensor_type: str = Form(...),
+    auto_analyze: bool = Form(True),
+    analysis_id: Optional[int] = Form(None),
+    parameters: str = Form("{}"),
+):
+    """Single-request upload, streamed to disk with the same hashing and validation."""
+    size = file.size if file.size is not None else settings.MAX_STREAMING_UPLOAD_SIZE
+    try:
+        session = upload_sessions.create(UploadSessionRequest(
+            filename=file.filename, sensor_type=sensor_type, size=size, auto_analyze=auto_analyze,
+            analysis_id=analysis_id, parameters=json.loads(parameters or "{}"),
+        ))
+    except (UploadValidationError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def chunks():
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    try:
+        await upload_sessions.append(session, chunks())
+        if session["header"] is None and session["received"]:
+            # Files smaller than the sniff window are validated once complete
+            with open(upload_sessions.part_path(session["id"]), "rb") as f:
+                session["header"] = validate_head(f.read(SNIFF_BYTES), session["extension"], session["sensor"])
+        session["size"] = session["received"]
+        return _public(await _complete(request, session))
+    except UploadValidationError as e:
+        logger.error(f"Rejected upload {file.filename}: {e}")
+        upload_sessions.remove(session["id"])
+        raise HTTPException(status_code=422, detail=str(e))
@@ -7,8 +7,9 @@ Handles client connections, disconnections, and message broadcasting.
 
 Features:
 - Connection management
-- Real-time broadcasting
-- Room-based messaging
+- Real-time broadcasting (serialized once, fanned out concurrently)
+- Bounded per-client send queues with drop/coalesce backpressure
+- Room-based subscriptions (site, device, analysis)
 - Connection health monitoring
 - Automatic cleanup
 
@@ -17,22 +18,87 @@ Date: October 26, 2025
 """
 
 import asyncio
+import itertools
 import json
 import logging
+from collections import OrderedDict, defaultdict
 from datetime import datetime
-from typing import Dict, List, Set, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
+
 from fastapi import WebSocket
-from collections import defaultdict
+
+from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# Message types where a client only needs the newest pending message per subject
+COALESCABLE_TYPES = ("analysis_update", "system_status", "ping")
+ROOM_KINDS = ("site", "device", "analysis")
+
+
+def room_name(kind: str, identifier: Any) -> str:
+    """Canonical room name, e.g. room_name("site", 3) -> "site:3"."""
+    if kind not in ROOM_KINDS:
+        raise ValueError(f"Unknown room kind: {kind}")
+    return f"{kind}:{identifier}"
+
+
+def _coalesce_key(message: Dict) -> Optional[tuple]:
+    message_type = message.get("type")
+    if message_type not in COALESCABLE_TYPES:
+        return None
+    return (message_type, message.get("analysis_id"), message.get("site_id"), message.get("device_id"))
+
+
+class ClientConnection:
+    """One client's bounded send queue and the task that drains it."""
+
+    def __init__(self, client_id: str, websocket: WebSocket, max_queue: int, policy: str):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.max_queue = max(int(max_queue), 1)
+        self.policy = policy
+        self.pending: "OrderedDict[tuple, str]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.sequence = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def enqueue(self, payload: str, coalesce_key: Optional[tuple] = None) -> None:
+        """Queue a serialized message without waiting on the socket."""
+        if coalesce_key is not None and self.policy == "coalesce":
+            key = ("coalesce", coalesce_key)
+            if key in self.pending:
+                # Replace the stale pending message in place; the client gets the newest state
+                self.pending[key] = payload
+                self.coalesced += 1
+                return
+        else:
+            key = ("message", next(self.sequence))
+
+        if len(self.pending) >= self.max_queue:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[key] = payload
+        self.ready.set()
+
+
 class WebSocketManager:
     """Manages WebSocket connections and real-time messaging."""
 
-    def __init__(self):
+    def __init__(self, max_queue: Optional[int] = None, policy: Optional[str] = None,
+                 send_timeout: Optional[float] = None):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.clients: Dict[str, ClientConnection] = {}
         self.rooms: Dict[str, Set[str]] = defaultdict(set)
         self.connection_metadata: Dict[str, Dict] = {}
+        self.max_queue = max_queue or settings.WS_CLIENT_QUEUE_SIZE
+        self.policy = policy or settings.WS_SLOW_CLIENT_POLICY
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        if self.policy not in ("drop", "coalesce"):
+            raise ValueError(f"Unknown slow client policy: {self.policy}")
 
     async def connect(self, websocket: WebSocket, client_id: str = None) -> str:
         """Accept and register a new WebSocket connection."""
@@ -42,7 +108,10 @@ class WebSocketManager:
         if client_id is None:
             client_id = f"client_{id(websocket)}_{int(asyncio.get_event_loop().time())}"
 
-        # Store connection
+        # Store connection and start its sender
+        client = ClientConnection(client_id, websocket, self.max_queue, self.policy)
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[client_id] = client
         self.active_connections[client_id] = websocket
         self.connection_metadata[client_id] = {
             "connected_at": datetime.utcnow().isoformat(),
@@ -64,68 +133,106 @@ class WebSocketManager:
 
         if client_id and client_id in self.active_connections:
             del self.active_connections[client_id]
-            if client_id in self.connection_metadata:
-                del self.connection_metadata[client_id]
+            self.connection_metadata.pop(client_id, None)
+            client = self.clients.pop(client_id, None)
+            if client and client.task and client.task is not asyncio.current_task():
+                client.task.cancel()
 
             # Remove from all rooms
-            for room in self.rooms:
+            for room in list(self.rooms):
                 self.rooms[room].discard(client_id)
                 if not self.rooms[room]:
                     del self.rooms[room]
 
             logger.info(f"WebSocket client disconnected: {client_id}")
 
+    async def _sender(self, client: ClientConnection):
+        """Drain one client's queue; a slow socket only delays its own messages."""
+        try:
+            while True:
+                await client.ready.wait()
+                while client.pending:
+                    _, payload = client.pending.popitem(last=False)
+                    await asyncio.wait_for(client.websocket.send_text(payload), timeout=self.send_timeout)
+                    client.sent += 1
+                    metadata = self.connection_metadata.get(client.client_id)
+                    if metadata is not None:
+                        metadata["last_activity"] = datetime.utcnow().isoformat()
+                client.ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending to {client.client_id}: {e}")
+            # Remove broken or stalled connection
+            self.disconnect(client.websocket, client.client_id)
+
+    def _fan_out(self, message: Dict, client_ids: Iterable[str], exclude_client: str = None) -> int:
+        """Serialize once and enqueue for every recipient; never awaits a socket."""
+        payload = json.dumps(message, default=str)
+        coalesce_key = _coalesce_key(message)
+        delivered = 0
+        for client_id in client_ids:
+            client = self.clients.get(client_id)
+            if client is None or client_id == exclude_client:
+                continue
+            client.enqueue(payload, coalesce_key)
+            delivered += 1
+        return delivered
+
     async def send_personal_message(self, message: Dict, client_id: str):
         """Send a message to a specific client."""
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_json(message)
-                self.connection_metadata[client_id]["last_activity"] = datetime.utcnow().isoformat()
-            except Exception as e:
-                logger.error(f"Error sending message to {client_id}: {e}")
-                # Remove broken connection
-                self.disconnect(self.active_connections[client_id], client_id)
+        self._fan_out(message, [client_id])
 
     async def broadcast(self, message: Dict, exclude_client: str = None):
         """Broadcast a message to all connected clients."""
-        disconnected_clients = []
-
-        for client_id, websocket in self.active_connections.items():
-            if client_id == exclude_client:
-                continue
-
-            try:
-                await websocket.send_json(message)
-                self.connection_metadata[client_id]["last_activity"] = datetime.utcnow().isoformat()
-            except Exception as e:
-                logger.error(f"Error broadcasting to {client_id}: {e}")
-                disconnected_clients.append(client_id)
-
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(self.active_connections[client_id], client_id)
+        self._fan_out(message, list(self.clients), exclude_client)
 
     async def broadcast_to_room(self, room: str, message: Dict, exclude_client: str = None):
         """Broadcast a message to all clients in a specific room."""
         if room not in self.rooms:
             return
+        self._fan_out(message, list(self.rooms[room]), exclude_client)
+
+    async def publish(self, message: Dict, rooms: Iterable[str] = (), exclude_client: str = None) -> int:
+        """
+        Deliver a message to the members of any of ``rooms`` and to clients
+        without subscriptions (who keep receiving every update).
+        """
+        subscribed = {client_id for members in self.rooms.values() for client_id in members}
+        recipients = {client_id for client_id in self.clients if client_id not in subscribed}
+        for room in rooms:
+            recipients.update(self.rooms.get(room, ()))
+        return self._fan_out(message, recipients, exclude_client)
+
+    async def handle_client_message(self, client_id: str, data: str):
+        """
+        Handle a message from a client: ``{"action": "subscribe" | "unsubscribe",
+        "rooms": ["site:1", "analysis:42"]}`` manages subscriptions; anything
+        else is answered with a pong.
+        """
+        try:
+            request = json.loads(data)
+        except (TypeError, ValueError):
+            request = None
+
+        if isinstance(request, dict) and request.get("action") in ("subscribe", "unsubscribe"):
+            rooms = [str(room) for room in request.get("rooms", [])]
+            for room in rooms:
+                if request["action"] == "subscribe":
+                    self.join_room(client_id, room)
+                else:
+                    self.leave_room(client_id, room)
+            await self.send_personal_message({
+                "type": "subscriptions",
+                "rooms": sorted(room for room, members in self.rooms.items() if client_id in members),
+                "timestamp": datetime.utcnow().isoformat()
+            }, client_id)
+            return
 
-        disconnected_clients = []
-
-        for client_id in self.rooms[room]:
-            if client_id == exclude_client or client_id not in self.active_connections:
-                continue
-
-            try:
-                await self.active_connections[client_id].send_json(message)
-                self.connection_metadata[client_id]["last_activity"] = datetime.utcnow().isoformat()
-            except Exception as e:
-                logger.error(f"Error broadcasting to room {room}, client {client_id}: {e}")
-                disconnected_clients.append(client_id)
-
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(self.active_connections[client_id], client_id)
+        await self.send_personal_message({
+            "type": "pong",
+            "timestamp": datetime.utcnow().isoformat()
+        }, client_id)
 
     def join_room(self, client_id: str, room: str):
         """Add a client to a room."""
@@ -146,8 +253,18 @@ class WebSocketManager:
         return list(self.rooms.get(room, set()))
 
     def get_connection_info(self, client_id: str) -> Optional[Dict]:
-        """Get metadata for a specific connection."""
-        return self.connection_metadata.get(client_id)
+        """Get metadata and send-queue statistics for a specific connection."""
+        metadata = self.connection_metadata.get(client_id)
+        client = self.clients.get(client_id)
+        if metadata is None or client is None:
+            return metadata
+        return {
+            **metadata,
+            "queued": len(client.pending),
+            "sent": client.sent,
+            "dropped": client.dropped,
+            "coalesced": client.coalesced,
+        }
 
     def get_active_connections_count(self) -> int:
         """Get the number of active connections."""
@@ -191,5 +308,14 @@ class WebSocketManager:
 
         await self.broadcast(status_message)
 
-# Global WebSocket manager instance
-websocket_manager = WebSocketManager()
\ No newline at end of file
+    async def shutdown(self):
+        """Stop every client's sender task."""
+        tasks = [client.task for client in self.clients.values() if client.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for client_id in list(self.active_connections):
+            self.disconnect(self.active_connections[client_id], client_id)
+
+# Global WebSocket manager instance shared by the API and the analysis orchestrator
+websocket_manager = WebSocketManager()
@@ -0,0 +1,265 @@
+"""
+Sensor worker pool for AI Rockfall Prediction System
+====================================================
+
+Process-pool scheduler used by the analysis orchestrator. Each sensor type
+gets its own set of worker processes that import that sensor's pipeline
+and preload its joblib artifacts once (see analysis.worker), so runs
+start warm and CPU-bound pipelines scale across cores.
+
+Pools grow a worker at a time while the host has CPU/memory headroom and
+analyses are waiting, and shrink a worker at a time under resource
+pressure; the other workers keep running throughout. A worker whose run
+was cancelled, timed out or crashed is stopped and replaced by a fresh
+warm one, so it never takes another run.
+
+Author: AI Rockfall Prediction Team
+Date: October 26, 2025
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Set
+
+from ..analysis import ANALYSIS_MODULES, normalize_sensor
+from ..analysis.worker import init_worker, ping, run_in_worker
+
+logger = logging.getLogger(__name__)
+
+
+class SensorWorkerPool:
+    """
+    Per-sensor warm worker processes with resource-driven autoscaling.
+
+    Every worker is a single-process executor, so a sensor's pool grows or
+    shrinks one process at a time: runs wait for an idle worker, and a
+    retired worker is stopped once its current run finishes.
+    """
+
+    def __init__(
+        self,
+        min_workers_per_sensor: int = 1,
+        max_workers: Optional[int] = None,
+        output_root: Optional[str] = None
+    ):
+        self.min_workers_per_sensor = max(1, min_workers_per_sensor)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.output_root = output_root
+        self.workers: Dict[str, Set[ProcessPoolExecutor]] = {}
+        self.idle: Dict[str, asyncio.Queue] = {}
+        self.busy: Set[ProcessPoolExecutor] = set()
+        self.pending: Dict[str, int] = defaultdict(int)
+        # spawn: workers must not inherit the event loop or open sockets
+        self._mp_context = multiprocessing.get_context("spawn")
+
+    @property
+    def pool_sizes(self) -> Dict[str, int]:
+        return {sensor: len(workers) for sensor, workers in self.workers.items()}
+
+    @property
+    def total_workers(self) -> int:
+        return sum(len(workers) for workers in self.workers.values())
+
+    def _add_worker(self, sensor: str):
+        worker = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._mp_context,
+            initializer=init_worker,
+            initargs=(sensor, self.output_root)
+        )
+        # Spawn the process now so model loading happens before the first upload
+        worker.submit(ping)
+        self.workers[sensor].add(worker)
+        self.idle[sensor].put_nowait(worker)
+
+    def _retire_worker(self, sensor: str):
+        """Drop one worker, preferring an idle one; a busy one stops after its run."""
+        workers = self.workers[sensor]
+        idle = workers - self.busy
+        worker = next(iter(idle or workers))
+        workers.discard(worker)
+        if worker not in self.busy:
+            worker.shutdown(wait=False)
+
+    def _replace_worker(self, sensor: str, worker: ProcessPoolExecutor):
+        """Stop a worker whose run did not finish cleanly and start a fresh one in its place."""
+        self.busy.discard(worker)
+        # shutdown() does not interrupt a running job; stop the process so it frees its core
+        for process in list((getattr(worker, "_processes", None) or {}).values()):
+            process.terminate()
+        worker.shutdown(wait=False, cancel_futures=True)
+        if worker in self.workers.get(sensor, ()):
+            self.workers[sensor].discard(worker)
+            self._add_worker(sensor)
+            logger.warning(f"Replaced a {sensor} worker after an interrupted run")
+
+    def _reclaim_worker(self, sensor: str) -> bool:
+        """Retire an idle worker of the largest other pool above the minimum, to stay within max_workers."""
+        candidates = [
+            other for other, workers in self.workers.items()
+            if other != sensor and len(workers) > self.min_workers_per_sensor and workers - self.busy
+        ]
+        if not candidates:
+            return False
+        self._retire_worker(max(candidates, key=lambda other: len(self.workers[other])))
+        return True
+
+    def _start(self, sensor: str, size: Optional[int] = None):
+        if sensor not in self.workers:
+            size = size or min(self.min_workers_per_sensor, self.max_workers - self.total_workers)
+            if size <= 0:
+                # At the limit: free a worker elsewhere if possible, but the sensor always gets one
+                size = 1
+                if not self._reclaim_worker(sensor):
+                    logger.warning(f"Worker limit ({self.max_workers}) reached; starting one {sensor} worker anyway")
+            self.workers[sensor] = set()
+            self.idle[sensor] = asyncio.Queue()
+            for _ in range(size):
+                self._add_worker(sensor)
+            logger.info(f"Started {size} {sensor} worker(s)")
+
+    def warm_up(self, sensors=None):
+        """
+        Start the minimum workers for each sensor (all sensors by default),
+        up to max_workers in total; sensors beyond it start on first use.
+        """
+        for sensor in sensors or ANALYSIS_MODULES:
+            sensor = normalize_sensor(sensor)
+            size = min(self.min_workers_per_sensor, self.max_workers - self.total_workers)
+            if size <= 0:
+                logger.info(f"Worker limit ({self.max_workers}) reached; {sensor} workers start on first use")
+                continue
+            self._start(sensor, size)
+
+    async def _acquire(self, sensor: str) -> ProcessPoolExecutor:
+        self._start(sensor)
+        while True:
+            worker = await self.idle[sensor].get()
+            # Workers retired while idle are still queued; skip them
+            if worker in self.workers[sensor]:
+                self.busy.add(worker)
+                return worker
+
+    def _release(self, sensor: str, worker: ProcessPoolExecutor):
+        self.busy.discard(worker)
+        if worker in self.workers.get(sensor, ()):
+            self.idle[sensor].put_nowait(worker)
+        else:
+            worker.shutdown(wait=False)
+
+    async def run(self, analysis_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a pipeline on an idle worker of the sensor and return its results."""
+        sensor = normalize_sensor(analysis_type)
+
+        self.pending[sensor] += 1
+        try:
+            worker = await self._acquire(sensor)
+            try:
+                loop = asyncio.get_event_loop()
+                results = await loop.run_in_executor(worker, run_in_worker, sensor, params)
+            except (asyncio.CancelledError, asyncio.TimeoutError, BrokenProcessPool):
+                self._replace_worker(sensor, worker)
+                raise
+            except BaseException:
+                self._release(sensor, worker)
+                raise
+            self._release(sensor, worker)
+            return results
+        finally:
+            self.pending[sensor] -= 1
+
+    def resize(self, sensor: str, size: int):
+        """Add or retire workers one at a time until the sensor has ``size``; running jobs finish first."""
+        size = max(self.min_workers_per_sensor, size)
+        self._start(sensor)
+        current = len(self.workers[sensor])
+        if current == size:
+            return
+
+        while len(self.workers[sensor]) < size:
+            self._add_worker(sensor)
+        while len(self.workers[sensor]) > size:
+            self._retire_worker(sensor)
+        logger.info(f"Resized {sensor} workers: {current} -> {size}")
+
+    def reload(self, sensor: str):
+        """Replace a sensor's workers so they load its current models (e.g. after retraining)."""
+        sensor = normalize_sensor(sensor)
+        if sensor not in self.workers:
+            return
+        old_workers = set(self.workers[sensor])
+        for _ in range(len(old_workers)):
+            self._add_worker(sensor)
+        # Busy workers finish their run on the old models, then stop in _release
+        for worker in old_workers:
+            self.workers[sensor].discard(worker)
+            if worker not in self.busy:
+                worker.shutdown(wait=False)
+        logger.info(f"Reloaded {sensor} workers with the current models")
+
+    def autoscale(
+        self,
+        cpu_percent: float,
+        memory_percent: float,
+        scale_up_below: float = 60.0,
+        scale_down_above: float = 80.0
+    ) -> Optional[str]:
+        """
+        Grow or shrink by one worker based on CPU/memory usage.
+
+        Grows the sensor with the most waiting runs per worker while there is
+        headroom; shrinks the largest pool under pressure. Returns the sensor
+        that was resized, if any.
+        """
+        if not self.pool_sizes:
+            return None
+
+        if cpu_percent > scale_down_above or memory_percent > scale_down_above:
+            sensor = max(self.pool_sizes, key=self.pool_sizes.get)
+            if self.pool_sizes[sensor] > self.min_workers_per_sensor:
+                logger.warning(
+                    f"High resource usage (CPU: {cpu_percent}%, Memory: {memory_percent}%). "
+                    f"Shrinking {sensor} workers."
+                )
+                self.resize(sensor, self.pool_sizes[sensor] - 1)
+                return sensor
+            return None
+
+        if cpu_percent < scale_up_below and memory_percent < scale_up_below:
+            if self.total_workers >= self.max_workers:
+                return None
+            backlog = {
+                sensor: self.pending[sensor] / size
+                for sensor, size in self.pool_sizes.items()
+                if self.pending[sensor] > size
+            }
+            if backlog:
+                sensor = max(backlog, key=backlog.get)
+                self.resize(sensor, self.pool_sizes[sensor] + 1)
+                return sensor
+
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker counts and queued runs per sensor."""
+        return {
+            "total_workers": self.total_workers,
+            "max_workers": self.max_workers,
+            "sensors": {
+                sensor: {"workers": size, "pending": self.pending[sensor]}
+                for sensor, size in self.pool_sizes.items()
+            },
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop all worker processes."""
+        for worker in set().union(self.busy, *self.workers.values()):
+            worker.shutdown(wait=wait, cancel_futures=True)
+        self.workers.clear()
+        self.idle.clear()
+        self.busy.clear()
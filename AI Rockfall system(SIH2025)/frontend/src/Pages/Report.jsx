@@ -38,6 +38,7 @@ const Report = () => {
       id: 2,
       title: "Extensometer Analysis Report #1",
       category: "extensometer",
+      archived: true,
       date: "2024-10-26",
       size: "48 KB",
       type: "PDF",
@@ -205,12 +206,39 @@ const Report = () => {
     return matchesCategory && matchesSearch;
   });
 
-  const handleDownload = (report) => {
+  // PDF reports are rendered by the backend when first opened; it answers
+  // 202 while rendering, so keep asking until the file is ready. Archived
+  // reports are served as stored, by file name.
+  const reportFileName = (report) => report.path.split("/").pop();
+
+  const fetchRenderedReport = async (report) => {
+    const query = new URLSearchParams({
+      wait: "10",
+      site_id: report.siteId || "default",
+    });
+    if (report.archived) query.set("report", reportFileName(report));
+    for (let attempt = 0; attempt < 30; attempt++) {
+      const response = await fetch(`/api/reports/${report.category}/pdf?${query}`);
+      if (response.status === 202) continue;
+      if (!response.ok) {
+        throw new Error(`Report request failed (${response.status})`);
+      }
+      return URL.createObjectURL(await response.blob());
+    }
+    throw new Error("The report is still being generated, please try again shortly");
+  };
+
+  const handleDownload = async (report) => {
     try {
+      const href =
+        report.type === "PDF" ? await fetchRenderedReport(report) : report.path;
       // Create a temporary link element to trigger download
       const link = document.createElement("a");
-      link.href = report.path;
-      link.download = report.path.split("/").pop(); // Extract filename from path
+      link.href = href;
+      link.download =
+        report.type === "PDF" && !report.archived
+          ? `${report.category}_report_${report.siteId || "default"}.pdf`
+          : reportFileName(report); // Extract filename from path
       document.body.appendChild(link);
       link.click();
       document.body.removeChild(link);
@@ -222,14 +250,12 @@ const Report = () => {
     }
   };
 
-  const handleView = (report) => {
+  const handleView = async (report) => {
     try {
-      // Open file in a new browser tab for viewing
+      // Open the tab right away (pop-up blockers allow it only inside the click)
       // Use the full URL to ensure it bypasses React Router
       const fullUrl = `${window.location.origin}${report.path}`;
-      console.log(`Opening file at: ${fullUrl}`);
-
-      const newWindow = window.open(fullUrl, "_blank");
+      const newWindow = window.open(report.type === "PDF" ? "" : fullUrl, "_blank");
 
       if (
         !newWindow ||
@@ -237,6 +263,11 @@ const Report = () => {
         typeof newWindow.closed === "undefined"
       ) {
         alert("Pop-up blocked! Please allow pop-ups for this site.");
+        return;
+      }
+      if (report.type === "PDF") {
+        newWindow.document.title = "Generating report...";
+        newWindow.location.href = await fetchRenderedReport(report);
       }
     } catch (error) {
       console.error("View error:", error);